@@ -1,11 +1,11 @@
-from typing import List
+from typing import Any, Dict, List
 
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from sqlmodel import Session, select
 from sqlalchemy import func, or_, cast, String
 
-from ..core.db import engine
+from ..core.db import db_diagnostics, engine
 from ..core.permissions import get_effective_allowed_modules, validate_known_modules
 from ..core.rbac import is_superuser
 from ..models import User
@@ -148,9 +148,10 @@ def update_user_permissions(
 
     effective = get_effective_allowed_modules(user.role, user.allowed_modules, username=user.username)
 
-    for s in _SESSIONS.values():
+    for token, s in list(_SESSIONS.items()):
         if s.get("userId") == user_id:
             s["allowedModules"] = effective
+            _SESSIONS[token] = s
 
     return UserPermissionsOut(
         id=user.id or 0,
@@ -158,3 +159,12 @@ def update_user_permissions(
         role=user.role,
         allowedModules=effective,
     )
+
+
+@router.get("/diagnostics/db")
+def get_db_diagnostics(sess: dict = Depends(get_current_user_session)) -> Dict[str, Any]:
+    """Pool de conexiones, PRAGMAs efectivos y cola de escritura (SQLite)."""
+    requester_username = (sess.get("username") or sess.get("user") or "").lower()
+    if not is_superuser(requester_username):
+        raise HTTPException(status_code=403, detail="Requiere privilegios de superusuario")
+    return db_diagnostics()
@@ -1,6 +1,8 @@
 import secrets
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import Iterable, List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Header, Body
 from sqlmodel import Session, select
@@ -9,24 +11,88 @@ from sqlalchemy import func, or_, cast, String
 from ..core.db import engine
 from ..core.permissions import get_effective_allowed_modules
 from ..core.rbac import can_manage_users, is_superuser, normalize_role
+from ..core.session_store import create_session_store
 from ..core.security import get_password_hash, verify_password
+from ..core.settings import get_settings
 from ..models import User, OI
 from ..schemas import UserRead, UserCreate, UserUpdatePassword
 from pydantic import BaseModel
 
 router = APIRouter()
 
-# Almacén de sesiones en memoria (Token -> UserDict)
-_SESSIONS = {}
+# Almacén de sesiones (Token -> UserDict): en memoria o en BD según VI_SESSION_BACKEND
+_SESSIONS = create_session_store()
+
+# Caché tech_number -> (cargado en, 'Nombre Apellido') (None = técnico inexistente).
+# Se invalida al crear/editar/eliminar usuarios en este proceso; en los demás
+# workers las entradas vencen a los VI_FULL_NAME_CACHE_TTL_S segundos.
+_FULL_NAME_CACHE: dict[int, tuple[float, Optional[str]]] = {}
+_FULL_NAME_CACHE_LOCK = threading.Lock()
+_FULL_NAME_CACHE_MAX = 4096
+
+
+def _user_full_name(user: User) -> Optional[str]:
+    full_name = f"{user.first_name} {user.last_name}".strip()
+    return full_name or None
+
+
+def invalidate_full_name_cache() -> None:
+    with _FULL_NAME_CACHE_LOCK:
+        _FULL_NAME_CACHE.clear()
+
+
+def preload_full_names(tech_numbers: Iterable[int]) -> dict[int, Optional[str]]:
+    """
+    Resuelve en una sola consulta los nombres que aún no están en caché
+    (para una página del listado o un export completo).
+    """
+    wanted: set[int] = set()
+    for tech_number in tech_numbers:
+        if tech_number is None:
+            continue
+        try:
+            wanted.add(int(tech_number))
+        except (TypeError, ValueError):
+            continue
+
+    now = time.monotonic()
+    ttl_s = get_settings().full_name_cache_ttl_s
+    result: dict[int, Optional[str]] = {}
+    with _FULL_NAME_CACHE_LOCK:
+        for tn in wanted:
+            entry = _FULL_NAME_CACHE.get(tn)
+            if entry is not None and now - entry[0] <= ttl_s:
+                result[tn] = entry[1]
+    missing = wanted - result.keys()
+    if not missing:
+        return result
+
+    loaded: dict[int, Optional[str]] = {tn: None for tn in missing}
+    with Session(engine) as session:
+        users = session.exec(
+            select(User).where(User.tech_number.in_(list(missing))).order_by(User.id)  # type: ignore[attr-defined]
+        ).all()
+    seen: set[int] = set()
+    for user in users:
+        # Igual que .first(): se toma el primer usuario por tech_number
+        if user.tech_number in seen:
+            continue
+        seen.add(user.tech_number)
+        loaded[user.tech_number] = _user_full_name(user)
+
+    with _FULL_NAME_CACHE_LOCK:
+        if len(_FULL_NAME_CACHE) + len(loaded) > _FULL_NAME_CACHE_MAX:
+            _FULL_NAME_CACHE.clear()
+        _FULL_NAME_CACHE.update((tn, (now, name)) for tn, name in loaded.items())
+    result.update(loaded)
+    return result
+
 
 def get_full_name_by_tech_number(tech_number: int) -> Optional[str]:
     """Devuelve 'Nombre Apellido' para el técnico dado, o None si no existe."""
-    with Session(engine) as session:
-        user = session.exec(select(User).where(User.tech_number == tech_number)).first()
-        if not user:
-            return None
-        full_name = f"{user.first_name} {user.last_name}".strip()
-        return full_name or None
+    if tech_number is None:
+        return None
+    return preload_full_names([tech_number]).get(int(tech_number))
 
 class LoginRequest(BaseModel):
     username: str
@@ -69,9 +135,7 @@ def get_session():
         yield session
 
 def _purge_expired_sessions(now: datetime):
-    expired = [k for k, v in _SESSIONS.items() if v["expiresAt"] < now]
-    for k in expired:
-        del _SESSIONS[k]
+    _SESSIONS.purge_expired(now)
 
 def get_current_user_session(authorization: str | None = Header(default=None)) -> dict:
     if not authorization or not authorization.lower().startswith("bearer "):
@@ -176,12 +240,13 @@ def set_banco(
 ):
     """
     Permite seleccionar/actualizar el banco de trabajo luego del login.
-    Se guarda en la sesiÇün (in-memory) y aplica a filtros/ownership en /oi.
+    Se guarda en la sesiÇün (almacén de sesiones) y aplica a filtros/ownership en /oi.
     """
     if payload.bancoId <= 0:
         raise HTTPException(status_code=422, detail="Banco invÇ­lido")
 
     sess["bancoId"] = int(payload.bancoId)
+    _SESSIONS[sess["token"]] = sess
     return sess
 
 
@@ -281,6 +346,7 @@ def create_user(
     )
     session.add(new_user)
     session.commit()
+    invalidate_full_name_cache()
     session.refresh(new_user)
     return new_user
 
@@ -363,6 +429,7 @@ def update_user(
 
     session.add(target_user)
     session.commit()
+    invalidate_full_name_cache()
     session.refresh(target_user)
     return target_user
 
@@ -395,6 +462,7 @@ def delete_user(
 
     session.delete(target_user)
     session.commit()
+    invalidate_full_name_cache()
     return {"ok": True}
 
 
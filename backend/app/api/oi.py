@@ -1,19 +1,25 @@
 import csv
+import hashlib
 import re
+import threading
+import time
+import uuid
+from collections import defaultdict
 from io import BytesIO, StringIO
-from typing import List, Sequence, cast
+from typing import Iterator, List, Optional, Sequence, cast
 from datetime import datetime, timedelta, timezone
 
-from fastapi import APIRouter, Depends, HTTPException, Header
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Header, Response
+from fastapi.responses import FileResponse, StreamingResponse, JSONResponse
 from sqlmodel import Session, select, delete
 from sqlalchemy import func, desc, update
 from sqlalchemy.sql.elements import ColumnElement
 from zoneinfo import ZoneInfo
 
 from ..core.db import engine
+from ..core.pagination import next_cursor, seek_after
 from ..core.rbac import is_admin_like_for_oi, is_technician_role
-from ..models import OI, Bancada, User
+from ..models import OI, Bancada, BancadaMedidor, OICodeTotal, User
 from ..schemas import (
     OICreate,
     OIRead,
@@ -22,17 +28,28 @@ from ..schemas import (
     BancadaCreate,
     BancadaRead,
     BancadaUpdate,
+    BancadaBatchRead,
+    BancadaBatchUpdate,
+    BancadaDelta,
     OIListResponse,
     OIListSummary,
     NumerationType,
 )
-from ..services.excel_service import generate_excel as build_excel_file
+from ..services.excel_service import generate_excel as build_excel_file, template_fingerprint
+from ..services.export_cache import get_export_cache, make_key as make_export_key
 from ..services.rules_service import pma_to_pressure
+from ..services import medidor_counters, medidor_index
+from ..services.excel_batch import ExcelBatchJob, iter_excel_zip
+from ..core.settings import get_settings
+from ..oi_tools.services.cancel_manager import cancel_manager
+from ..oi_tools.services.progress_manager import progress_manager
 from pydantic import BaseModel
-from .auth import _SESSIONS, get_full_name_by_tech_number
+from .auth import _SESSIONS, get_full_name_by_tech_number, preload_full_names
 
 router = APIRouter()
 
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
 LOCK_EXPIRATION_MINUTES = 60
 LOCK_EXPIRATION_DELTA = timedelta(minutes=LOCK_EXPIRATION_MINUTES)
 DRAFT_CREATED_AT_MAX_AGE = timedelta(hours=48)
@@ -197,9 +214,46 @@ def _get_lock_state(
     - locked_by_user_id / locked_by_full_name solo se devuelven si el lock estЁ activo.
     - read_only_for_current_user: True si el admin ve un lock activo de un tЁ©cnico distinto.
     """
+    owner = session.get(User, oi.locked_by_user_id) if oi.locked_by_user_id else None
+    return _lock_state_for_owner(oi, owner, current_sess, datetime.utcnow())
+
+
+def _get_lock_states(
+    ois: Sequence[OI],
+    session: Session,
+    current_sess: dict | None = None,
+) -> dict[int, dict]:
+    """
+    Igual que _get_lock_state para una página de OIs: los dueños de todos los
+    locks se cargan en una sola consulta IN (cantidad de queries constante).
+    """
+    owner_ids = {oi.locked_by_user_id for oi in ois if oi.locked_by_user_id}
+    owners: dict[int, User] = {}
+    if owner_ids:
+        user_id_col: ColumnElement = cast(ColumnElement, User.id)
+        owners = {
+            cast(int, u.id): u
+            for u in session.exec(select(User).where(user_id_col.in_(list(owner_ids))))
+        }
     now = datetime.utcnow()
+    return {
+        cast(int, oi.id): _lock_state_for_owner(
+            oi,
+            owners.get(oi.locked_by_user_id) if oi.locked_by_user_id else None,
+            current_sess,
+            now,
+        )
+        for oi in ois
+    }
+
+
+def _lock_state_for_owner(
+    oi: OI,
+    owner: User | None,
+    current_sess: dict | None,
+    now: datetime,
+) -> dict:
     active = _is_lock_active(oi, now)
-    owner = session.get(User, oi.locked_by_user_id) if oi.locked_by_user_id else None
     locked_by_full_name = None
     owner_role = None
     if owner:
@@ -389,82 +443,27 @@ def _build_oi_filters(
         if oi_id is not None:
             code_ids.add(int(oi_id))
 
+    # Búsqueda por medidor sobre el índice normalizado (bancada_medidor),
+    # sin deserializar rows_data de cada bancada.
     medidor_ids: set[int] = set()
-    search_lc = search.lower()
+    medidor_col: ColumnElement = cast(ColumnElement, BancadaMedidor.medidor)
     medidor_stmt = (
-        select(Bancada.oi_id, Bancada.medidor, Bancada.rows_data)
-        .join(OI, _oi_bancada_onclause())
+        select(BancadaMedidor.oi_id)
+        .join(OI, cast(ColumnElement, BancadaMedidor.oi_id == OI.id))
+        .where(BancadaMedidor.searchable == True)  # noqa: E712
+        .where(medidor_col.like(medidor_index.like_pattern(search), escape="\\"))
+        .distinct()
     )
     if conditions:
         medidor_stmt = medidor_stmt.where(*conditions)
-    for oi_id, medidor, rows_data in session.exec(medidor_stmt).all():
-        if oi_id is None:
-            continue
-        if _medidor_matches(search_lc, medidor, rows_data):
+    for oi_id in session.exec(medidor_stmt).all():
+        if oi_id is not None:
             medidor_ids.add(int(oi_id))
 
     matched_ids = code_ids | medidor_ids
     return conditions, matched_ids
 
 
-def _row_medidor_value(row: object) -> str:
-    if row is None:
-        return ""
-    if isinstance(row, dict):
-        value = row.get("medidor")
-    else:
-        value = getattr(row, "medidor", None)
-    if value is None:
-        return ""
-    return str(value).strip()
-
-
-def _medidor_matches(search_lc: str, medidor: str | None, rows_data: Sequence[object] | None) -> bool:
-    if medidor:
-        if search_lc in str(medidor).strip().lower():
-            return True
-    if not rows_data:
-        return False
-    for row in rows_data:
-        value = _row_medidor_value(row)
-        if value and search_lc in value.lower():
-            return True
-    return False
-
-
-_MEDIDOR_SUFFIX_RE = re.compile(r"^(.*?)(\d+)$")
-
-def _normalize_medidor_value(value: object) -> str:
-    if value is None:
-        return ""
-    return str(value).strip().upper()
-
-
-def _split_medidor_suffix(value: str) -> tuple[str, int, int] | None:
-    match = _MEDIDOR_SUFFIX_RE.match(value)
-    if not match:
-        return None
-    prefix, num_str = match.group(1), match.group(2)
-    try:
-        number = int(num_str)
-    except ValueError:
-        return None
-    return prefix, number, len(num_str)
-
-
-def _expand_correlativo_by_count(base: str, count: int) -> list[str]:
-    if count <= 1:
-        return [base]
-    parsed = _split_medidor_suffix(base)
-    if not parsed:
-        raise HTTPException(
-            status_code=400,
-            detail="Serie de medidor correlativa invalida; debe terminar en numeros.",
-        )
-    prefix, number, width = parsed
-    return [f"{prefix}{str(number + offset).zfill(width)}" for offset in range(count)]
-
-
 class DuplicateMedidoresError(Exception):
     def __init__(self, message: str, duplicates: list[dict]):
         super().__init__(message)
@@ -478,25 +477,10 @@ def _bancada_to_medidor_set(
     rows: int | None,
     numeration_type: NumerationType,
 ) -> set[str]:
-    values: list[str] = []
-    if rows_data:
-        for row in rows_data:
-            normalized = _normalize_medidor_value(_row_medidor_value(row))
-            if normalized:
-                values.append(normalized)
-    if values:
-        return set(values)
-
-    base = _normalize_medidor_value(medidor)
-    if not base:
-        return set()
-
-    count = int(rows or 0)
-    if count <= 1:
-        return {base}
-    if numeration_type == NumerationType.correlativo:
-        return set(_expand_correlativo_by_count(base, count))
-    return {base}
+    try:
+        return medidor_index.bancada_medidor_set(rows_data, medidor, rows, numeration_type)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
 
 def _validate_no_duplicate_medidores(
@@ -504,46 +488,41 @@ def _validate_no_duplicate_medidores(
     oi: OI,
     new_set: set[str],
     exclude_bancada_id: int | None = None,
+    exclude_bancada_ids: Sequence[int] = (),
+    also_found: Sequence[tuple[str, int | None, int | None]] = (),
 ) -> None:
-    if not new_set or oi.id is None:
+    if (not new_set and not also_found) or oi.id is None:
         return
-    numeration_type = _normalize_numeration_type(
-        oi.numeration_type.value if isinstance(oi.numeration_type, NumerationType) else str(oi.numeration_type)
-    )
-    stmt = select(Bancada).where(Bancada.oi_id == oi.id)
-    if exclude_bancada_id is not None:
-        stmt = stmt.where(Bancada.id != exclude_bancada_id)
+    # Consulta acotada a los medidores nuevos sobre el índice bancada_medidor
+    # (no se cargan ni expanden las demás bancadas de la OI).
+    found = list(also_found)
+    if new_set:
+        found.extend(
+            medidor_index.find_overlaps(
+                session,
+                oi.id,
+                new_set,
+                exclude_bancada_id=exclude_bancada_id,
+                exclude_bancada_ids=exclude_bancada_ids,
+            )
+        )
     duplicates: dict[str, set[str]] = {}
     duplicates_entries: list[dict] = []
-    duplicates_seen: set[tuple[str, int | None]] = set()
     duplicates_limit = 50
-    for existing in session.exec(stmt).all():
-        existing_set = _bancada_to_medidor_set(
-            existing.rows_data,
-            existing.medidor,
-            existing.rows,
-            numeration_type,
-        )
-        overlap = new_set & existing_set
-        if not overlap:
-            continue
-        label = f"#{existing.item}" if existing.item else (f"id {existing.id}" if existing.id else "")
-        for medidor in overlap:
-            if medidor not in duplicates:
-                duplicates[medidor] = set()
-            if label:
-                duplicates[medidor].add(label)
-            if len(duplicates_entries) < duplicates_limit:
-                key = (medidor, existing.id)
-                if key not in duplicates_seen:
-                    duplicates_seen.add(key)
-                    duplicates_entries.append(
-                        {
-                            "medidor": medidor,
-                            "bancada_id": existing.id,
-                            "bancada_item": existing.item,
-                        }
-                    )
+    for medidor, bancada_id, bancada_item in found:
+        label = f"#{bancada_item}" if bancada_item else (f"id {bancada_id}" if bancada_id else "")
+        if medidor not in duplicates:
+            duplicates[medidor] = set()
+        if label:
+            duplicates[medidor].add(label)
+        if len(duplicates_entries) < duplicates_limit:
+            duplicates_entries.append(
+                {
+                    "medidor": medidor,
+                    "bancada_id": bancada_id,
+                    "bancada_item": bancada_item,
+                }
+            )
 
     if not duplicates:
         return
@@ -644,6 +623,7 @@ def create_oi(
     )
     session.add(oi)
     session.commit()
+    _invalidate_list_summary_cache()
     session.refresh(oi)
     return _build_oi_read(oi, session, sess)
 
@@ -690,6 +670,7 @@ def update_oi(
                 status_code=422,
                 detail="Código OI inválido (formato OI-####-YYYY).",
             )
+        medidor_counters.move_code(session, oi, oi.code, code_payload)
         oi.code = code_payload
 
     presion = pma_to_pressure(payload.pma)
@@ -698,6 +679,7 @@ def update_oi(
     numeration_type = _normalize_numeration_type(payload.numeration_type)
 
     now = datetime.utcnow()
+    numeration_changed = _normalize_numeration_type(oi.numeration_type) != numeration_type
     oi.q3 = payload.q3
     oi.alcance = payload.alcance
     oi.pma = payload.pma
@@ -706,7 +688,11 @@ def update_oi(
     oi.updated_at = now
     _touch_or_take_lock(oi, sess, lock_state)
     session.add(oi)
+    if numeration_changed and oi.id is not None:
+        # El conjunto de medidores para duplicados depende del tipo de numeración
+        medidor_index.sync_oi_medidores(session, oi.id, numeration_type)
     session.commit()
+    _invalidate_list_summary_cache()
     session.refresh(oi)
     return _build_oi_read(oi, session, sess)
 
@@ -737,11 +723,13 @@ def update_oi_code(
 
     if code_payload != oi.code:
         now = datetime.utcnow()
+        medidor_counters.move_code(session, oi, oi.code, code_payload)
         oi.code = code_payload
         oi.updated_at = now
         _touch_or_take_lock(oi, sess, lock_state)
         session.add(oi)
         session.commit()
+        _invalidate_list_summary_cache()
         session.refresh(oi)
 
     return _build_oi_read(oi, session, sess)
@@ -762,17 +750,8 @@ def get_oi(
     if _clear_expired_lock(oi, session):
         session.commit()
         session.refresh(oi)
-    medidores_usuario_raw = session.exec(
-        select(func.coalesce(func.sum(Bancada.rows), 0)).where(Bancada.oi_id == oi_id)
-    ).one()
-    medidores_usuario = int(medidores_usuario_raw or 0)
-    medidores_total_code_raw = session.exec(
-        select(func.coalesce(func.sum(Bancada.rows), 0))
-        .select_from(OI)
-        .join(Bancada, _oi_bancada_onclause(), isouter=True)
-        .where(OI.code == oi.code)
-    ).one()
-    medidores_total_code = int(medidores_total_code_raw or 0)
+    medidores_usuario = int(oi.medidores_usuario or 0)
+    medidores_total_code = medidor_counters.code_total(session, oi.code)
     return _build_oi_read(
         oi,
         session,
@@ -946,6 +925,7 @@ def update_oi_saved_at(
     oi.updated_at = datetime.utcnow()
     session.add(oi)
     session.commit()
+    _invalidate_list_summary_cache()
     session.refresh(oi)
     return _build_oi_read(oi, session, sess)
 
@@ -975,6 +955,7 @@ def restore_oi_updated_at(
     oi.updated_at = payload.restore_updated_at
     session.add(oi)
     session.commit()
+    _invalidate_list_summary_cache()
     session.refresh(oi)
     return _build_oi_read(oi, session, sess)
 
@@ -1016,6 +997,80 @@ def list_responsables(
     return out
 
 
+# Caché corto del resumen del listado: al paginar no se recalcula.
+# Clave: filtros + alcance del usuario. Se invalida ante escrituras de OI/bancadas.
+_LIST_SUMMARY_TTL_SECONDS = 15.0
+_LIST_SUMMARY_CACHE_MAX = 256
+_LIST_SUMMARY_CACHE: dict[tuple, tuple[float, int, OIListSummary]] = {}
+_LIST_SUMMARY_LOCK = threading.Lock()
+
+
+def _invalidate_list_summary_cache() -> None:
+    with _LIST_SUMMARY_LOCK:
+        _LIST_SUMMARY_CACHE.clear()
+
+
+def _list_summary_cache_key(
+    sess: dict,
+    q: str | None,
+    date_from: str | None,
+    date_to: str | None,
+    responsable_tech_number: int | None,
+) -> tuple:
+    scope = ("admin",) if _is_admin(sess) else ("user", sess.get("techNumber"), sess.get("bancoId"))
+    return (scope, (q or "").strip(), date_from or "", date_to or "", responsable_tech_number)
+
+
+def _compute_list_summary(session: Session, conditions: list[ColumnElement]) -> tuple[int, OIListSummary]:
+    """
+    total, medidores_resultado, oi_unicas y medidores_total_oi_unicas en una sola consulta
+    sobre los contadores desnormalizados: filtered (OIs filtradas) → codes (distintos)
+    → oi_code_total (total de cada código, incluye OIs fuera del filtro).
+    """
+    oi_code_col: ColumnElement = cast(ColumnElement, OI.code)
+    medidores_col: ColumnElement = cast(ColumnElement, OI.medidores_usuario)
+    code_total_code_col: ColumnElement = cast(ColumnElement, OICodeTotal.code)
+
+    filtered_stmt = select(oi_code_col.label("code"), medidores_col.label("medidores")).select_from(OI)
+    if conditions:
+        filtered_stmt = filtered_stmt.where(*conditions)
+    filtered = filtered_stmt.cte("filtered")
+    codes = select(filtered.c.code).distinct().cte("codes")
+    stmt = select(
+        select(func.count()).select_from(filtered).scalar_subquery(),
+        select(func.coalesce(func.sum(filtered.c.medidores), 0)).scalar_subquery(),
+        select(func.count()).select_from(codes).scalar_subquery(),
+        select(func.coalesce(func.sum(OICodeTotal.medidores_total), 0))
+        .where(code_total_code_col.in_(select(codes.c.code)))
+        .scalar_subquery(),
+    )
+    total, medidores_resultado, oi_unicas, medidores_total_oi_unicas = session.exec(stmt).one()
+    return int(total or 0), OIListSummary(
+        medidores_resultado=int(medidores_resultado or 0),
+        oi_unicas=int(oi_unicas or 0),
+        medidores_total_oi_unicas=int(medidores_total_oi_unicas or 0),
+    )
+
+
+def _get_list_summary(
+    session: Session,
+    conditions: list[ColumnElement],
+    cache_key: tuple,
+) -> tuple[int, OIListSummary]:
+    now = time.monotonic()
+    with _LIST_SUMMARY_LOCK:
+        cached = _LIST_SUMMARY_CACHE.get(cache_key)
+    if cached and cached[0] > now:
+        return cached[1], cached[2].model_copy()
+
+    total, summary = _compute_list_summary(session, conditions)
+    with _LIST_SUMMARY_LOCK:
+        if len(_LIST_SUMMARY_CACHE) >= _LIST_SUMMARY_CACHE_MAX:
+            _LIST_SUMMARY_CACHE.clear()
+        _LIST_SUMMARY_CACHE[cache_key] = (now + _LIST_SUMMARY_TTL_SECONDS, total, summary)
+    return total, summary.model_copy()
+
+
 @router.get("", response_model=OIListResponse)
 def list_oi(
     q: str | None = None,
@@ -1024,6 +1079,7 @@ def list_oi(
     limit: int = 20,
     offset: int = 0,
     responsable_tech_number: int | None = None,
+    cursor: str | None = None,
     session: Session = Depends(get_session),
     authorization: str | None = Header(default=None),
 ):
@@ -1036,6 +1092,8 @@ def list_oi(
     - date_from, date_to: rango de fechas (creación) en formato YYYY-MM-DD
     Paginación:
     - limit / offset, devolviendo también el total de registros.
+    - cursor (opcional): si se envía (vacío = primera página) se ignora offset y se
+      busca directo por (sort_at, id); la respuesta trae next_cursor.
     """
     sess = _get_session_from_header(authorization)
     is_admin = _is_admin(sess)
@@ -1047,8 +1105,6 @@ def list_oi(
         limit = 100
 
     oi_id_col: ColumnElement = cast(ColumnElement, OI.id)
-    oi_code_col: ColumnElement = cast(ColumnElement, OI.code)
-    bancada_oi_id_col: ColumnElement = cast(ColumnElement, Bancada.oi_id)
     conditions, matched_ids = _build_oi_filters(
         session,
         sess,
@@ -1073,93 +1129,45 @@ def list_oi(
     if conditions:
         base_stmt = base_stmt.where(*conditions)
 
-    # Total para la paginación
-    count_stmt = select(func.count()).select_from(OI)
-    if conditions:
-        count_stmt = count_stmt.where(*conditions)
-    total = session.exec(count_stmt).one()
-
-    sum_stmt = select(func.coalesce(func.sum(Bancada.rows), 0)).select_from(OI).join(
-        Bancada, _oi_bancada_onclause(), isouter=True
-    )
-    if conditions:
-        sum_stmt = sum_stmt.where(*conditions)
-    medidores_resultado_raw = session.exec(sum_stmt).one()
-    medidores_resultado = int(medidores_resultado_raw or 0)
-
-    distinct_stmt = select(func.count(func.distinct(OI.code))).select_from(OI)
-    if conditions:
-        distinct_stmt = distinct_stmt.where(*conditions)
-    oi_unicas_raw = session.exec(distinct_stmt).one()
-    oi_unicas = int(oi_unicas_raw or 0)
-
-    totals_by_code = (
-        select(
-            oi_code_col.label("code"),
-            func.coalesce(func.sum(Bancada.rows), 0).label("total_medidores"),
-        )
-        .select_from(OI)
-        .join(Bancada, _oi_bancada_onclause(), isouter=True)
-        .group_by(oi_code_col)
-        .subquery()
-    )
-    filtered_codes = select(func.distinct(oi_code_col).label("code")).select_from(OI)
-    if conditions:
-        filtered_codes = filtered_codes.where(*conditions)
-    filtered_codes = filtered_codes.subquery()
-    sum_totals_stmt = select(func.coalesce(func.sum(totals_by_code.c.total_medidores), 0)).select_from(
-        totals_by_code.join(filtered_codes, totals_by_code.c.code == filtered_codes.c.code)
-    )
-    medidores_total_oi_unicas_raw = session.exec(sum_totals_stmt).one()
-    medidores_total_oi_unicas = int(medidores_total_oi_unicas_raw or 0)
-    summary = OIListSummary(
-        medidores_resultado=medidores_resultado,
-        oi_unicas=oi_unicas,
-        medidores_total_oi_unicas=medidores_total_oi_unicas,
+    # Total + resumen (una consulta; en caché al paginar con los mismos filtros)
+    total, summary = _get_list_summary(
+        session,
+        conditions,
+        _list_summary_cache_key(sess, q, date_from, date_to, responsable_tech_number),
     )
 
     # Ordenar por "más reciente":
-    # usamos coalesce(updated_at, created_at) para considerar última modificación
-    sort_expr = func.coalesce(OI.updated_at, OI.created_at).desc()
-    data_stmt = (
-        base_stmt
-        .order_by(sort_expr, desc(oi_id_col))
-        .limit(limit)
-        .offset(offset)
-    )
-
-    rows = session.exec(data_stmt).all()
-    page_oi_ids = [cast(int, oi.id) for oi in rows if oi.id is not None]
+    # sort_at = coalesce(updated_at, created_at) persistido, con índice (sort_at, id)
+    sort_col: ColumnElement = cast(ColumnElement, OI.sort_at)
+    data_stmt = base_stmt.order_by(sort_col.desc(), desc(oi_id_col))
+    if cursor:
+        try:
+            data_stmt = data_stmt.where(seek_after(sort_col, oi_id_col, cursor))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if cursor is None:
+        data_stmt = data_stmt.offset(offset)
+    # Una fila extra para saber si hay página siguiente
+    rows = list(session.exec(data_stmt.limit(limit + 1)).all())
+    next_page = next_cursor(rows, limit, "sort_at")
+    rows = rows[:limit]
     page_codes = list({oi.code for oi in rows if oi.code})
 
-    medidores_usuario_by_id: dict[int, int] = {}
-    if page_oi_ids:
-        user_stmt = (
-            select(Bancada.oi_id, func.coalesce(func.sum(Bancada.rows), 0))
-            .where(bancada_oi_id_col.in_(page_oi_ids))
-            .group_by(bancada_oi_id_col)
-        )
-        for oi_id, total_rows in session.exec(user_stmt).all():
-            medidores_usuario_by_id[int(oi_id)] = int(total_rows or 0)
-
-    medidores_total_by_code: dict[str, int] = {}
-    if page_codes:
-        total_stmt = (
-            select(OI.code, func.coalesce(func.sum(Bancada.rows), 0))
-            .select_from(OI)
-            .join(Bancada, _oi_bancada_onclause(), isouter=True)
-            .where(oi_code_col.in_(page_codes))
-            .group_by(oi_code_col)
-        )
-        for code, total_rows in session.exec(total_stmt).all():
-            medidores_total_by_code[str(code)] = int(total_rows or 0)
+    # Contadores desnormalizados: lectura directa (OI.medidores_usuario / oi_code_total)
+    medidores_total_by_code = medidor_counters.code_totals(session, page_codes)
+
+    # Nombres de responsables de la página en una sola consulta (queda en caché)
+    preload_full_names(oi.tech_number for oi in rows)
+    # Dueños de los locks de la página: una sola consulta IN
+    lock_states = _get_lock_states(rows, session, sess)
 
     items = [
         _build_oi_read(
             oi,
             session,
             sess,
-            medidores_usuario=medidores_usuario_by_id.get(cast(int, oi.id), 0),
+            lock_states.get(cast(int, oi.id)),
+            medidores_usuario=int(oi.medidores_usuario or 0),
             medidores_total_code=medidores_total_by_code.get(oi.code, 0),
         )
         for oi in rows
@@ -1169,11 +1177,112 @@ def list_oi(
         items=items,
         total=total,
         limit=limit,
-        offset=offset,
+        offset=offset if cursor is None else 0,
+        next_cursor=next_page,
         summary=summary,
     )
 
 
+OI_CSV_HEADER = [
+    "ID",
+    "OI",
+    "Medidores",
+    "Q3",
+    "Alcance",
+    "PMA",
+    "Banco",
+    "Técnico",
+    "Responsable",
+    "Creación",
+    "Guardado",
+    "Últ. mod.",
+]
+# OIs por página del export (keyset); acota memoria por chunk
+OI_CSV_CHUNK_SIZE = 500
+
+
+def _format_csv_dt(value: datetime | None) -> str:
+    if not value:
+        return ""
+    return value.strftime("%d/%m/%Y %H:%M")
+
+
+def _iter_oi_csv(
+    conditions: list[ColumnElement] | None,
+    chunk_size: int = OI_CSV_CHUNK_SIZE,
+):
+    """
+    Genera el CSV del listado por chunks (bytes utf-8 con BOM al inicio).
+    Pagina con keyset sobre (sort_at, id) desc (índice idx_oi_sort_at_id) y
+    calcula los agregados de medidores por chunk. conditions=None → solo cabecera.
+    """
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+
+    def _flush() -> str:
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return text
+
+    writer.writerow(OI_CSV_HEADER)
+    yield _flush().encode("utf-8-sig")
+    if conditions is None:
+        return
+
+    oi_id_col: ColumnElement = cast(ColumnElement, OI.id)
+    sort_col: ColumnElement = cast(ColumnElement, OI.sort_at)
+
+    last_key: tuple[datetime, int] | None = None
+    # Sesión propia: la del Depends ya se cerró cuando empieza el streaming
+    with Session(engine) as session:
+        while True:
+            stmt = select(OI)
+            if conditions:
+                stmt = stmt.where(*conditions)
+            if last_key is not None:
+                last_sort, last_id = last_key
+                stmt = stmt.where(
+                    (sort_col < last_sort) | ((sort_col == last_sort) & (oi_id_col < last_id))
+                )
+            stmt = stmt.order_by(sort_col.desc(), desc(oi_id_col)).limit(chunk_size)
+            rows = list(session.exec(stmt).all())
+            if not rows:
+                break
+            last_key = (cast(datetime, rows[-1].sort_at), cast(int, rows[-1].id))
+
+            medidores_total_by_code = medidor_counters.code_totals(session, (oi.code for oi in rows))
+
+            full_names = preload_full_names(oi.tech_number for oi in rows)
+
+            for oi in rows:
+                medidores_usuario = int(oi.medidores_usuario or 0)
+                medidores_total = medidores_total_by_code.get(oi.code, 0)
+                medidores_display = f"{medidores_usuario} / {medidores_total}"
+                responsable = full_names.get(oi.tech_number) or ""
+                writer.writerow(
+                    [
+                        oi.id or "",
+                        oi.code or "",
+                        medidores_display,
+                        oi.q3 or "",
+                        oi.alcance or "",
+                        oi.pma or "",
+                        oi.banco_id or "",
+                        oi.tech_number or "",
+                        responsable,
+                        _format_csv_dt(oi.created_at),
+                        _format_csv_dt(oi.saved_at),
+                        _format_csv_dt(oi.updated_at),
+                    ]
+                )
+            yield _flush().encode("utf-8")
+            # Liberar objetos ORM del chunk (memoria constante)
+            session.expunge_all()
+            if len(rows) < chunk_size:
+                break
+
+
 @router.get("/export/csv")
 def export_oi_csv(
     q: str | None = None,
@@ -1187,14 +1296,7 @@ def export_oi_csv(
     if not _is_admin(sess):
         raise HTTPException(status_code=403, detail="No autorizado")
 
-    def format_dt(value: datetime | None) -> str:
-        if not value:
-            return ""
-        return value.strftime("%d/%m/%Y %H:%M")
-
     oi_id_col: ColumnElement = cast(ColumnElement, OI.id)
-    oi_code_col: ColumnElement = cast(ColumnElement, OI.code)
-    bancada_oi_id_col: ColumnElement = cast(ColumnElement, Bancada.oi_id)
 
     conditions, matched_ids = _build_oi_filters(
         session,
@@ -1204,118 +1306,18 @@ def export_oi_csv(
         date_to,
         responsable_tech_number,
     )
+    export_conditions: list[ColumnElement] | None = conditions
     if matched_ids is not None:
         if not matched_ids:
-            output = StringIO()
-            writer = csv.writer(output)
-            writer.writerow(
-                [
-                    "ID",
-                    "OI",
-                    "Medidores",
-                    "Q3",
-                    "Alcance",
-                    "PMA",
-                    "Banco",
-                    "Técnico",
-                    "Responsable",
-                    "Creación",
-                    "Guardado",
-                    "Últ. mod.",
-                ]
-            )
-            csv_bytes = output.getvalue().encode("utf-8-sig")
-            output.close()
-            headers = {
-                "Content-Disposition": f'attachment; filename="oi_list_{datetime.utcnow().strftime("%Y%m%d_%H%M")}.csv"'
-            }
-            return StreamingResponse(
-                BytesIO(csv_bytes),
-                media_type="text/csv; charset=utf-8",
-                headers=headers,
-            )
-        conditions = conditions + [oi_id_col.in_(list(matched_ids))]
-
-    base_stmt = select(OI)
-    if conditions:
-        base_stmt = base_stmt.where(*conditions)
-
-    sort_expr = func.coalesce(OI.updated_at, OI.created_at).desc()
-    data_stmt = base_stmt.order_by(sort_expr, desc(oi_id_col))
-    rows = session.exec(data_stmt).all()
-
-    oi_ids = [cast(int, oi.id) for oi in rows if oi.id is not None]
-    codes = list({oi.code for oi in rows if oi.code})
-
-    medidores_usuario_by_id: dict[int, int] = {}
-    if oi_ids:
-        user_stmt = (
-            select(Bancada.oi_id, func.coalesce(func.sum(Bancada.rows), 0))
-            .where(bancada_oi_id_col.in_(oi_ids))
-            .group_by(bancada_oi_id_col)
-        )
-        for oi_id, total_rows in session.exec(user_stmt).all():
-            medidores_usuario_by_id[int(oi_id)] = int(total_rows or 0)
-
-    medidores_total_by_code: dict[str, int] = {}
-    if codes:
-        total_stmt = (
-            select(OI.code, func.coalesce(func.sum(Bancada.rows), 0))
-            .select_from(OI)
-            .join(Bancada, _oi_bancada_onclause(), isouter=True)
-            .where(oi_code_col.in_(codes))
-            .group_by(oi_code_col)
-        )
-        for code, total_rows in session.exec(total_stmt).all():
-            medidores_total_by_code[str(code)] = int(total_rows or 0)
-
-    output = StringIO()
-    writer = csv.writer(output)
-    writer.writerow(
-        [
-            "ID",
-            "OI",
-            "Medidores",
-            "Q3",
-            "Alcance",
-            "PMA",
-            "Banco",
-            "Técnico",
-            "Responsable",
-            "Creación",
-            "Guardado",
-            "Últ. mod.",
-        ]
-    )
-    for oi in rows:
-        medidores_usuario = medidores_usuario_by_id.get(cast(int, oi.id), 0)
-        medidores_total = medidores_total_by_code.get(oi.code, 0)
-        medidores_display = f"{medidores_usuario} / {medidores_total}"
-        responsable = get_full_name_by_tech_number(oi.tech_number) or ""
-        writer.writerow(
-            [
-                oi.id or "",
-                oi.code or "",
-                medidores_display,
-                oi.q3 or "",
-                oi.alcance or "",
-                oi.pma or "",
-                oi.banco_id or "",
-                oi.tech_number or "",
-                responsable,
-                format_dt(oi.created_at),
-                format_dt(oi.saved_at),
-                format_dt(oi.updated_at),
-            ]
-        )
-    csv_bytes = output.getvalue().encode("utf-8-sig")
-    output.close()
+            export_conditions = None
+        else:
+            export_conditions = conditions + [oi_id_col.in_(list(matched_ids))]
 
     headers = {
         "Content-Disposition": f'attachment; filename="oi_list_{datetime.utcnow().strftime("%Y%m%d_%H%M")}.csv"'
     }
     return StreamingResponse(
-        BytesIO(csv_bytes),
+        _iter_oi_csv(export_conditions),
         media_type="text/csv; charset=utf-8",
         headers=headers,
     )
@@ -1338,17 +1340,32 @@ def delete_oi(
     if not oi:
         raise HTTPException(status_code=404, detail="OI no encontrada")
     
-    # Borrar bancadas asociadas primero (bulk delete correcto)
+    # Borrar índice de medidores y bancadas asociadas primero (bulk delete correcto)
+    medidor_index.delete_oi_medidores(session, oi_id)
+    medidor_counters.remove_oi(session, oi)
     stmt = delete(Bancada).where(Bancada.oi_id == oi_id)  # type: ignore[arg-type]  # Pylance ve bool, pero es una expresión SQL
     session.exec(stmt)
     session.delete(oi)
     session.commit()
+    _invalidate_list_summary_cache()
     return {"ok": True}
 
 
 class ExcelRequest(BaseModel):
     password: str
 
+class ExcelBatchRequest(BaseModel):
+    password: str
+    # Lista explícita de OIs; si es None se usan los mismos filtros del listado
+    oi_ids: Optional[List[int]] = None
+    q: str | None = None
+    date_from: str | None = None
+    date_to: str | None = None
+    responsable_tech_number: int | None = None
+    operation_id: str | None = None
+
+EXCEL_BATCH_CHUNK_SIZE = 50
+
 def _dump_rows_data(rows):
     if rows is None:
         return None
@@ -1391,6 +1408,8 @@ def add_bancada(
     try:
         _validate_no_duplicate_medidores(session, oi, new_set)
     except DuplicateMedidoresError as exc:
+        # Descarta lo ya aplicado en la sesión (p. ej. el lock expirado liberado)
+        session.rollback()
         return JSONResponse(status_code=400, content={"detail": exc.message, "duplicates": exc.duplicates})
     now = datetime.utcnow()
     created_at = _resolve_bancada_created_at(payload.draft_created_at)
@@ -1412,8 +1431,11 @@ def add_bancada(
     _touch_or_take_lock(oi, sess, lock_state)
     session.add(oi)
     session.flush()
+    medidor_index.sync_bancada_medidores(session, b, oi.numeration_type)
+    medidor_counters.apply_rows_delta(session, oi, int(b.rows or 0))
     _recalc_oi_saved_at(session, oi)
     session.commit()
+    _invalidate_list_summary_cache()
     session.refresh(b)
     return BancadaRead.model_validate(b)
 
@@ -1435,17 +1457,8 @@ def get_oi_with_bancadas(
     lock_state = _get_lock_state(oi, session, sess)
     rows = list(session.exec(select(Bancada).where(Bancada.oi_id == oi_id)))
     rows.sort(key=lambda x: (x.item or 0))
-    medidores_usuario_raw = session.exec(
-        select(func.coalesce(func.sum(Bancada.rows), 0)).where(Bancada.oi_id == oi_id)
-    ).one()
-    medidores_usuario = int(medidores_usuario_raw or 0)
-    medidores_total_code_raw = session.exec(
-        select(func.coalesce(func.sum(Bancada.rows), 0))
-        .select_from(OI)
-        .join(Bancada, _oi_bancada_onclause(), isouter=True)
-        .where(OI.code == oi.code)
-    ).one()
-    medidores_total_code = int(medidores_total_code_raw or 0)
+    medidores_usuario = int(oi.medidores_usuario or 0)
+    medidores_total_code = medidor_counters.code_total(session, oi.code)
     base = _build_oi_read(
         oi,
         session,
@@ -1507,10 +1520,13 @@ def update_bancada(
     try:
         _validate_no_duplicate_medidores(session, oi, new_set, exclude_bancada_id=b.id)
     except DuplicateMedidoresError as exc:
+        # Descarta lo ya aplicado en la sesión (p. ej. el lock expirado liberado)
+        session.rollback()
         return JSONResponse(status_code=400, content={"detail": exc.message, "duplicates": exc.duplicates})
 
     now = datetime.utcnow()
     saved_at_was_null = b.saved_at is None
+    previous_rows = int(b.rows or 0)
     b.medidor = payload.medidor
     b.estado = payload.estado or 0
     b.rows = payload.rows
@@ -1528,12 +1544,150 @@ def update_bancada(
     _touch_or_take_lock(oi, sess, lock_state)
     session.add(oi)
     session.flush()
+    medidor_index.sync_bancada_medidores(session, b, oi.numeration_type)
+    medidor_counters.apply_rows_delta(session, oi, int(b.rows or 0) - previous_rows)
     if saved_at_was_null:
         _recalc_oi_saved_at(session, oi)
     session.commit()
+    _invalidate_list_summary_cache()
     session.refresh(b)
     return BancadaRead.model_validate(b)
 
+def _apply_bancada_delta(b: Bancada, delta: BancadaDelta) -> bool:
+    """
+    Aplica a `b` los campos enviados en `delta` (sin commit). Devuelve True si
+    cambió algo que afecta a los medidores (medidor, rows o el grid).
+    """
+    sent = delta.model_fields_set
+    medidores_changed = False
+    if "medidor" in sent:
+        b.medidor = delta.medidor
+        medidores_changed = True
+    if "estado" in sent:
+        b.estado = delta.estado or 0
+    if "rows" in sent and delta.rows is not None:
+        b.rows = delta.rows
+        medidores_changed = True
+    if "rows_data" in sent:
+        b.rows_data = _dump_rows_data(delta.rows_data)
+        medidores_changed = True
+    shrinks = "rows" in sent and len(b.rows_data or []) > int(b.rows or 0)
+    if delta.rows_patch or shrinks:
+        # Lista nueva (no in-place) para que el ORM detecte el cambio del JSON
+        grid = list(b.rows_data or [])
+        for patch in delta.rows_patch or []:
+            while len(grid) <= patch.index:
+                grid.append({"estado": 0})
+            grid[patch.index] = patch.row.model_dump(exclude_none=True)
+        # El grid no puede tener más filas que la bancada
+        b.rows_data = grid[: b.rows] if b.rows else grid
+        medidores_changed = True
+    return medidores_changed
+
+
+@router.patch("/{oi_id:int}/bancadas", response_model=BancadaBatchRead)
+def update_bancadas_batch(
+    oi_id: int,
+    payload: BancadaBatchUpdate,
+    session: Session = Depends(get_session),
+    authorization: str | None = Header(default=None),
+):
+    """
+    Guardado por lote (autosave del grid): varias bancadas de una OI en una sola
+    transacción. Cada delta trae solo los campos cambiados y, para el grid, las
+    filas modificadas (rows_patch) que se combinan con rows_data en el servidor.
+    Acceso, lock y duplicados se validan una vez para todo el lote; si una
+    bancada falla (409/400/404) no se guarda ninguna.
+    """
+    oi = session.get(OI, oi_id)
+    if not oi:
+        raise HTTPException(status_code=404, detail="OI no encontrada")
+
+    sess = _get_session_from_header(authorization)
+    _ensure_oi_access(oi, sess)
+    lock_state = _ensure_lock_allows_write(oi, sess, session)
+
+    ids = [d.id for d in payload.items]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail="Bancada repetida en el lote")
+    by_id = {
+        b.id: b
+        for b in session.exec(
+            select(Bancada).where(Bancada.oi_id == oi_id).where(Bancada.id.in_(ids))  # type: ignore[union-attr]
+        ).all()
+    }
+    missing = [i for i in ids if i not in by_id]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Bancada no encontrada en la OI: {missing[0]}")
+
+    for delta in payload.items:
+        b = by_id[delta.id]
+        current_version = _normalize_dt(b.updated_at or b.created_at)
+        if current_version is not None and _normalize_dt(delta.updated_at) != current_version:
+            # Control optimista por bancada (actividad 19.1.6)
+            raise HTTPException(
+                status_code=409,
+                detail=f"La bancada #{b.item} fue modificada por otro usuario. Recargue la OI y vuelva a intentar.",
+            )
+
+    numeration_type = _normalize_numeration_type(
+        oi.numeration_type.value if isinstance(oi.numeration_type, NumerationType) else str(oi.numeration_type)
+    )
+    now = datetime.utcnow()
+    rows_delta = 0
+    any_saved_at_was_null = False
+    reindex: list[Bancada] = []
+    for delta in payload.items:
+        b = by_id[delta.id]
+        previous_rows = int(b.rows or 0)
+        if _apply_bancada_delta(b, delta):
+            reindex.append(b)
+        rows_delta += int(b.rows or 0) - previous_rows
+        b.updated_at = now
+        if b.saved_at is None:
+            b.saved_at = now
+            any_saved_at_was_null = True
+        session.add(b)
+
+    # Duplicados: contra el índice (excluyendo las bancadas recalculadas) y dentro del lote
+    new_sets = {b.id: _bancada_to_medidor_set(b.rows_data, b.medidor, b.rows, numeration_type) for b in reindex}
+    owners: dict[str, list[Bancada]] = defaultdict(list)
+    for b in reindex:
+        for medidor in new_sets[b.id]:
+            owners[medidor].append(b)
+    in_batch = [
+        (medidor, other.id, other.item)
+        for medidor, bs in owners.items()
+        if len(bs) > 1
+        for other in bs
+    ]
+    try:
+        _validate_no_duplicate_medidores(
+            session,
+            oi,
+            set(owners),
+            exclude_bancada_ids=[b.id for b in reindex if b.id is not None],
+            also_found=in_batch,
+        )
+    except DuplicateMedidoresError as exc:
+        session.rollback()
+        return JSONResponse(status_code=400, content={"detail": exc.message, "duplicates": exc.duplicates})
+
+    oi.updated_at = now
+    _touch_or_take_lock(oi, sess, lock_state)
+    session.add(oi)
+    session.flush()
+    for b in reindex:
+        medidor_index.sync_bancada_medidores(session, b, oi.numeration_type)
+    medidor_counters.apply_rows_delta(session, oi, rows_delta)
+    if any_saved_at_was_null:
+        _recalc_oi_saved_at(session, oi)
+    items = [BancadaRead.model_validate(by_id[i]) for i in ids]
+    session.commit()
+    _invalidate_list_summary_cache()
+    return BancadaBatchRead(items=items)
+
+
 @router.patch("/bancadas/{bancada_id}/saved_at", response_model=BancadaRead)
 def update_bancada_saved_at(
     bancada_id: int,
@@ -1596,6 +1750,7 @@ def restore_bancada(
             detail="La bancada fue modificada por otro usuario. Recargue la OI y vuelva a intentar.",
         )
 
+    previous_rows = int(b.rows or 0)
     b.medidor = payload.medidor
     b.estado = payload.estado or 0
     b.rows = payload.rows
@@ -1604,9 +1759,12 @@ def restore_bancada(
     b.saved_at = payload.restore_saved_at
     session.add(b)
     session.flush()
+    medidor_index.sync_bancada_medidores(session, b, oi.numeration_type)
+    medidor_counters.apply_rows_delta(session, oi, int(b.rows or 0) - previous_rows)
     _recalc_oi_saved_at(session, oi)
     session.add(oi)
     session.commit()
+    _invalidate_list_summary_cache()
     session.refresh(b)
     return BancadaRead.model_validate(b)
 
@@ -1627,6 +1785,9 @@ def delete_bancada(
     _ensure_oi_access(oi, sess)
     lock_state = _ensure_lock_allows_write(oi, sess, session)
     now = datetime.utcnow()
+    if b.id is not None:
+        medidor_index.delete_bancada_medidores(session, b.id)
+    medidor_counters.apply_rows_delta(session, oi, -int(b.rows or 0))
     session.delete(b)
     oi.updated_at = now
     _touch_or_take_lock(oi, sess, lock_state)
@@ -1634,6 +1795,7 @@ def delete_bancada(
     session.flush()
     _recalc_oi_saved_at(session, oi)
     session.commit()
+    _invalidate_list_summary_cache()
     return {"ok": True}
 
 @router.post("/{oi_id:int}/excel")
@@ -1642,6 +1804,7 @@ def export_excel(
     req: ExcelRequest,
     session: Session = Depends(get_session),
     authorization: str | None = Header(default=None),
+    if_none_match: str | None = Header(default=None),
 ):
     oi = session.get(OI, oi_id)
     if not oi:
@@ -1649,37 +1812,237 @@ def export_excel(
 
     sess = _get_session_from_header(authorization)
     _ensure_oi_access(oi, sess)
+    work_dt = oi.saved_at or oi.created_at or datetime.utcnow()
+    # Nombre y apellido del técnico (creador del OI) usando el helper existente
+    full_name = get_full_name_by_tech_number(oi.tech_number) or ""
+    filename = _excel_download_name(oi, work_dt, full_name)
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+    # Caché por contenido: misma versión de OI/bancadas/plantilla/contraseña => mismo archivo
+    cache = get_export_cache()
+    cache_key = _excel_cache_key(session, oi, req.password) if cache.enabled else None
+    if cache_key:
+        etag = f'"{cache_key}"'
+        headers["ETag"] = etag
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return FileResponse(cached, media_type=XLSX_MEDIA_TYPE, headers=headers)
+
     bancadas = list(session.exec(select(Bancada).where(Bancada.oi_id == oi_id)))
     bancadas.sort(key=lambda x: (x.item or 0))
     # Si la plantilla no encuentra coincidencias exactas en E4/O4, devolver 422 (no 500)
-    work_dt = oi.saved_at or oi.created_at or datetime.utcnow()
     try:
         data, _ = build_excel_file(oi, bancadas, password=req.password, work_dt=work_dt)
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
 
-    # ----- Construcción del nombre de archivo según 18.1.4 -----
-    # Patrón: OI-####-YYYY-nombre-apellido-YYYY-MM-DD.xlsx
-    # La fecha corresponde a la fecha operativa de la OI (saved_at);
-    # si aún no tiene saved_at, se usa created_at.
+    if cache_key:
+        cache.put(cache_key, data)
+    return StreamingResponse(
+        BytesIO(data),
+        media_type=XLSX_MEDIA_TYPE,
+        headers=headers,
+    )
+
+def _excel_cache_key(session: Session, oi: OI, password: str | None) -> str | None:
+    """
+    Clave de caché del Excel de una OI: versión de la OI (timestamps y campos de
+    cabecera), agregado de sus bancadas (una sola query), hash de plantilla,
+    motor y hash de la contraseña (nunca en claro). None si no hay plantilla.
+    """
+    template_hash = template_fingerprint()
+    if template_hash is None:
+        return None
+    bancada_ts: ColumnElement = cast(ColumnElement, func.coalesce(Bancada.updated_at, Bancada.created_at))
+    agg = session.exec(
+        select(
+            func.count(),
+            func.max(bancada_ts),
+            func.max(Bancada.id),
+            func.sum(Bancada.rows),
+            func.sum(Bancada.estado),
+            func.sum(Bancada.item),
+        ).where(Bancada.oi_id == oi.id)
+    ).one()
+    settings = get_settings()
+    return make_export_key((
+        "oi_excel",
+        oi.id, oi.code, oi.q3, oi.alcance, oi.pma, oi.banco_id, oi.tech_number,
+        str(oi.numeration_type), oi.created_at, oi.updated_at, oi.saved_at,
+        tuple(agg),
+        template_hash,
+        settings.excel_engine,
+        hashlib.sha256((settings.cells_protection_password or "").encode("utf-8")).hexdigest(),
+        hashlib.sha256((password or "").encode("utf-8")).hexdigest() if password else None,
+    ))
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate in ("*", etag):
+            return True
+    return False
+
+def _excel_download_name(oi: OI, work_dt: datetime, full_name: str | None) -> str:
+    """
+    Construcción del nombre de archivo según 18.1.4.
+    Patrón: OI-####-YYYY-nombre-apellido-YYYY-MM-DD.xlsx
+    La fecha corresponde a la fecha operativa de la OI (saved_at);
+    si aún no tiene saved_at, se usa created_at.
+    """
     if work_dt.tzinfo is None:
         dt_utc = work_dt.replace(tzinfo=timezone.utc)
     else:
         dt_utc = work_dt.astimezone(timezone.utc)
     dt_pe = dt_utc.astimezone(ZoneInfo("America/Lima"))
     date_str = dt_pe.strftime("%Y-%m-%d")
+    name_for_file = _format_name_for_filename(full_name or "")
+    return f"{oi.code}-{name_for_file}-{date_str}.xlsx"
+
+def _iter_excel_batch_jobs(
+    oi_ids: list[int],
+    password: str | None,
+    chunk_size: int = EXCEL_BATCH_CHUNK_SIZE,
+) -> Iterator[ExcelBatchJob]:
+    """
+    Carga las OIs del lote por chunks (una query de OI y una de bancadas por chunk)
+    y produce los payloads planos para el pool de procesos. Abre su propia sesión:
+    se consume durante el streaming, después de cerrar la sesión del request.
+    """
+    oi_id_col: ColumnElement = cast(ColumnElement, OI.id)
+    bancada_oi_col: ColumnElement = cast(ColumnElement, Bancada.oi_id)
+    for start in range(0, len(oi_ids), chunk_size):
+        chunk = oi_ids[start:start + chunk_size]
+        with Session(engine) as session:
+            ois = {oi.id: oi for oi in session.exec(select(OI).where(oi_id_col.in_(chunk)))}
+            bancadas_by_oi: dict[int, list[Bancada]] = defaultdict(list)
+            for b in session.exec(select(Bancada).where(bancada_oi_col.in_(chunk))):
+                bancadas_by_oi[b.oi_id].append(b)
+            full_names = preload_full_names(oi.tech_number for oi in ois.values())
+            for oi_id in chunk:
+                oi = ois.get(oi_id)
+                if oi is None or oi.id is None:
+                    continue  # eliminada mientras corría el lote
+                bancadas = sorted(bancadas_by_oi.get(oi_id, []), key=lambda x: (x.item or 0))
+                work_dt = oi.saved_at or oi.created_at or datetime.utcnow()
+                yield ExcelBatchJob(
+                    oi_id=oi.id,
+                    code=oi.code,
+                    filename=_excel_download_name(oi, work_dt, full_names.get(oi.tech_number)),
+                    oi=oi.model_dump(),
+                    bancadas=tuple(b.model_dump() for b in bancadas),
+                    password=password,
+                    work_dt=work_dt,
+                )
+
+@router.post("/excel/batch")
+def export_excel_batch(
+    req: ExcelBatchRequest,
+    session: Session = Depends(get_session),
+    authorization: str | None = Header(default=None),
+):
+    """
+    Exporta varias OIs en un ZIP (un Excel por OI), generado en un pool de procesos
+    y entregado por streaming a medida que termina cada libro.
+    - oi_ids: lista explícita (se valida acceso a cada OI)
+    - sin oi_ids: mismos filtros y visibilidad que el listado (q, fechas, responsable)
+    Progreso: GET /oi/excel/batch/progress/{operation_id}; cancelar: POST /oi/excel/batch/cancel/{operation_id}
+    """
+    sess = _get_session_from_header(authorization)
+    oi_id_col: ColumnElement = cast(ColumnElement, OI.id)
 
-    # Nombre y apellido del técnico (creador del OI) usando el helper existente
-    full_name = get_full_name_by_tech_number(oi.tech_number) or ""
-    name_for_file = _format_name_for_filename(full_name)
-
-    filename = f"{oi.code}-{name_for_file}-{date_str}.xlsx"
+    if req.oi_ids is not None:
+        wanted = list(dict.fromkeys(int(x) for x in req.oi_ids))
+        found = {oi.id: oi for oi in session.exec(select(OI).where(oi_id_col.in_(wanted)))} if wanted else {}
+        missing = [x for x in wanted if x not in found]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"OI no encontrada: {missing[0]}")
+        for oi in found.values():
+            _ensure_oi_access(oi, sess)
+        oi_ids = wanted
+    else:
+        conditions, matched_ids = _build_oi_filters(
+            session,
+            sess,
+            req.q,
+            req.date_from,
+            req.date_to,
+            req.responsable_tech_number,
+        )
+        if matched_ids is not None:
+            conditions = conditions + [oi_id_col.in_(list(matched_ids) or [-1])]
+        stmt = select(OI.id).order_by(oi_id_col)
+        if conditions:
+            stmt = stmt.where(*conditions)
+        oi_ids = [int(x) for x in session.exec(stmt).all() if x is not None]
+
+    if not oi_ids:
+        raise HTTPException(status_code=400, detail="No hay OIs para exportar")
+    max_oi = get_settings().excel_batch_max_oi
+    if len(oi_ids) > max_oi:
+        raise HTTPException(status_code=422, detail=f"Demasiadas OIs para una exportación ({len(oi_ids)}); máximo {max_oi}")
+
+    operation_id = req.operation_id or uuid.uuid4().hex
+    cancel_token = cancel_manager.create(operation_id, owner_user_id=sess.get("userId"))
+    progress_manager.ensure(operation_id)
+
+    filename = f"OI_excel_{datetime.utcnow().strftime('%Y%m%d_%H%M')}.zip"
     return StreamingResponse(
-        BytesIO(data),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        iter_excel_zip(
+            _iter_excel_batch_jobs(oi_ids, req.password),
+            len(oi_ids),
+            operation_id=operation_id,
+            cancel_token=cancel_token,
+        ),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Operation-Id": operation_id,
+        },
     )
 
+@router.get("/excel/batch/progress/{operation_id}")
+async def export_excel_batch_progress(
+    operation_id: str,
+    authorization: str | None = Header(default=None),
+):
+    _get_session_from_header(authorization)
+    channel, history = progress_manager.subscribe(operation_id)
+
+    async def event_stream():
+        try:
+            if history:
+                yield progress_manager.encode_events(history)
+            async for batch in progress_manager.follow(channel, history):
+                yield progress_manager.encode_events(batch)
+        finally:
+            progress_manager.unsubscribe(operation_id)
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+@router.post("/excel/batch/cancel/{operation_id}")
+def cancel_excel_batch(
+    operation_id: str,
+    authorization: str | None = Header(default=None),
+):
+    sess = _get_session_from_header(authorization)
+    found, owner_user_id = cancel_manager.owner(operation_id)
+    if not found:
+        raise HTTPException(status_code=404, detail="Operación no encontrada")
+    # Igual que la exportación individual: solo quien la inició o un admin
+    if not _is_admin(sess) and owner_user_id != sess.get("userId"):
+        raise HTTPException(status_code=403, detail="No puede cancelar la exportación de otro usuario")
+    # El stream del ZIP detecta el token, cierra el archivo con lo generado y emite "cancelled"
+    if not cancel_manager.cancel(operation_id):
+        raise HTTPException(status_code=404, detail="Operación no encontrada")
+    return {"ok": True}
+
 @router.get("/{oi_id:int}/bancadas-list", response_model=List[BancadaRead])
 def list_bancadas(
     oi_id: int,
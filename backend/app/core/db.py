@@ -1,17 +1,29 @@
-from typing import Any
+from typing import Any, Callable, Iterator, Sequence
 from pathlib import Path
 from sqlmodel import SQLModel, create_engine, Session, select
-from sqlalchemy import inspect
+from sqlalchemy import func, inspect, text
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+import logging
 import os
 import sys
 import json
 import re
+import time
 
 from app.core.settings import get_settings
 from sqlalchemy.engine.url import make_url
+from app.core.sqlite_tuning import (
+    WriterQueue,
+    build_sqlite_pragmas,
+    install_single_writer,
+    install_sqlite_pragmas,
+    pool_stats,
+    read_sqlite_pragmas,
+)
 from app.models import Log01Run
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
 # Ruta física de la BD (compartida entre versiones)
 DB_PATH: Path = settings.data_dir / settings.database_filename
@@ -50,7 +62,9 @@ Notas de robustez y backup de vi.db
 -----------------------------------
 - La base de datos principal está en data/vi.db (DB_PATH), en el directorio raíz
   de la aplicación (por ejemplo, Y:\...\REGISTRO_VI_APP\data\vi.db).
-- El engine usa un timeout ampliado para reducir errores "database is locked".
+- El engine usa un timeout ampliado para reducir errores "database is locked";
+  cada conexión del pool recibe los PRAGMAs del perfil VI_SQLITE_* y las
+  escrituras del proceso pasan por una cola única (ver core/sqlite_tuning).
 - Se recomienda programar un backup periódico de data/vi.db hacia un
   repositorio seguro (por ejemplo, un share SMB con snapshots). La copia puede
   hacerse con herramientas de sistema (robocopy, rsync, tarea programada) o
@@ -68,7 +82,7 @@ _engine_kwargs: dict[str, Any] = {"echo": False}
 if IS_SQLITE:
     _engine_kwargs["connect_args"] = {
         "check_same_thread": False,
-        "timeout": 5.0,
+        "timeout": max(settings.sqlite_busy_timeout_ms, 0) / 1000,
     }
 else:
     _engine_kwargs.update(
@@ -78,8 +92,36 @@ else:
         }
     )
 
+# SQLite en memoria usa SingletonThreadPool (no acepta overflow/timeout)
+if not (IS_SQLITE and _url.database in (None, "", ":memory:")):
+    _engine_kwargs.update(
+        {
+            "pool_size": settings.db_pool_size,
+            "max_overflow": settings.db_max_overflow,
+            "pool_timeout": settings.db_pool_timeout_s,
+        }
+    )
+
 engine = create_engine(DATABASE_URL, **_engine_kwargs)
 
+SQLITE_PRAGMAS: list[tuple[str, Any]] = build_sqlite_pragmas(settings) if IS_SQLITE else []
+WRITER_QUEUE: WriterQueue | None = None
+
+if IS_SQLITE:
+    install_sqlite_pragmas(engine, SQLITE_PRAGMAS)
+    if settings.sqlite_single_writer:
+        WRITER_QUEUE = WriterQueue()
+        install_single_writer(engine, WRITER_QUEUE, timeout_s=max(settings.sqlite_busy_timeout_ms, 0) / 1000)
+
+
+def db_diagnostics() -> dict[str, Any]:
+    """Backend, estado del pool, PRAGMAs efectivos y cola de escritura (SQLite)."""
+    info: dict[str, Any] = {"backend": _url.get_backend_name(), "pool": pool_stats(engine)}
+    if IS_SQLITE:
+        info["pragmas"] = read_sqlite_pragmas(engine, ["journal_mode"] + [name for name, _ in SQLITE_PRAGMAS])
+        info["writer_queue"] = WRITER_QUEUE.stats() if WRITER_QUEUE is not None else None
+    return info
+
 def _seed_default_users_portable() -> None:
     """
     Inserta usuarios base solo si no existen.
@@ -91,6 +133,9 @@ def _seed_default_users_portable() -> None:
     from app.models import User
 
     with Session(engine) as session:
+        # Una sola consulta para saber cuáles ya existen
+        wanted = [u[1] for u in DEFAULT_USERS]
+        existing = set(session.exec(select(User.username).where(User.username.in_(wanted))).all())  # type: ignore[attr-defined]
         for (
             id_,
             username,
@@ -101,8 +146,7 @@ def _seed_default_users_portable() -> None:
             role,
             is_active,
        ) in DEFAULT_USERS:
-            exists = session.exec(select(User).where(User.username == username)).first()
-            if exists:
+            if username in existing:
                 continue
 
             session.add(
@@ -121,20 +165,13 @@ def _seed_default_users_portable() -> None:
 
 def _configure_sqlite_pragmas() -> None:
     """
-    Ajusta PRAGMAs globales de SQLite para uso multiusuario:
-    - journal_mode = WAL (mejor concurrente en red).
-    - synchronous = NORMAL (equilibrio entre seguridad y rendimiento).
-    - busy_timeout = 5000 ms (espera hasta 5s antes de lanzar "database is locked").
-
-    Se ejecuta una vez al iniciar la aplicación; WAL queda persistente en el
-    archivo de la BD, mientras que el timeout se aplica a la conexión actual
-    (en este caso, al pool de SQLAlchemy).
+    journal_mode = WAL (mejor concurrencia en red). Se ejecuta una vez al iniciar
+    la aplicación y queda persistente en el archivo de la BD; los PRAGMAs por
+    conexión (synchronous, busy_timeout, cache_size, ...) se aplican en el
+    evento "connect" del pool (ver SQLITE_PRAGMAS).
     """
     with engine.begin() as conn:
         conn.exec_driver_sql("PRAGMA journal_mode=WAL;")
-        conn.exec_driver_sql("PRAGMA synchronous=NORMAL;")
-        # Además del timeout de conexión, reforzamos el valor con PRAGMA.
-        conn.exec_driver_sql("PRAGMA busy_timeout = 5000;")
 
 
 def _get_mysql_columns(table_name: str) -> set[str]:
@@ -365,123 +402,296 @@ def _ensure_log01_run_series_columns() -> None:
             # Evitar romper startup si ya existe (o permisos)
             pass
 
-def _backfill_log01_run_series(session: Session) -> None:
+def _ensure_bancada_medidor_columns() -> bool:
     """
-    Backfill para corridas antiguas:
-    - intenta tomar serie_ini/serie_fin desde summary_json
-    - si no existe, intenta parsear output_name: BD_<INI>_AL_<FIN>
-    - rellena también serie_ini_num/serie_fin_num
-    - si summary_json existe y no tiene keys, las agrega (para UI)
+    Agrega searchable/dup_check a bancada_medidor (índice de medidores).
+    Devuelve True si faltaba alguna: las entradas existentes no tienen los
+    flags correctos y hay que reconstruir el índice.
     """
-    runs = session.exec(select(Log01Run)).all()
-    changed = False
+    if IS_SQLITE:
+        with engine.begin() as conn:
+            cols = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(bancada_medidor)").all()}
+            if not cols:
+                return False
+            missing = False
+            if "searchable" not in cols:
+                conn.exec_driver_sql("ALTER TABLE bancada_medidor ADD COLUMN searchable BOOLEAN NOT NULL DEFAULT 1")
+                missing = True
+            if "dup_check" not in cols:
+                conn.exec_driver_sql("ALTER TABLE bancada_medidor ADD COLUMN dup_check BOOLEAN NOT NULL DEFAULT 0")
+                missing = True
+            if missing:
+                conn.exec_driver_sql("DELETE FROM bancada_medidor")
+        return missing
+
+    cols = _get_mysql_columns("bancada_medidor")
+    if not cols:
+        return False
+    with engine.begin() as conn:
+        missing = False
+        if "searchable" not in cols:
+            conn.exec_driver_sql("ALTER TABLE bancada_medidor ADD COLUMN searchable TINYINT(1) NOT NULL DEFAULT 1")
+            missing = True
+        if "dup_check" not in cols:
+            conn.exec_driver_sql("ALTER TABLE bancada_medidor ADD COLUMN dup_check TINYINT(1) NOT NULL DEFAULT 0")
+            missing = True
+        if missing:
+            conn.exec_driver_sql("DELETE FROM bancada_medidor")
+    return missing
+
+
+def _ensure_oi_medidores_usuario_column() -> None:
+    """Agrega oi.medidores_usuario (contador desnormalizado de medidores por OI)."""
+    if IS_SQLITE:
+        with engine.begin() as conn:
+            cols = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(oi)").all()}
+            if not cols:
+                return
+            if "medidores_usuario" not in cols:
+                conn.exec_driver_sql("ALTER TABLE oi ADD COLUMN medidores_usuario INTEGER NOT NULL DEFAULT 0")
+        return
 
-    def _to_int(s: Any) -> int | None:
-        if s is None:
-            return None
-        if isinstance(s, int):
-            return s
-        if isinstance(s, str):
-            t = s.strip()
-            if t.isdigit():
-                try:
-                    return int(t)
-                except Exception:
-                    return None
-        return None
+    cols = _get_mysql_columns("oi")
+    if not cols:
+        return
+    if "medidores_usuario" not in cols:
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ALTER TABLE oi ADD COLUMN medidores_usuario INT NOT NULL DEFAULT 0")
 
-    for r in runs:
-        if r.serie_ini and r.serie_fin and r.serie_ini_num is not None and r.serie_fin_num is not None:
-            continue
 
-        ini = r.serie_ini
-        fin = r.serie_fin
+def _ensure_log01_job_lease_column() -> None:
+    """Agrega log01_job.lease_until (lease del proceso que ejecuta el job)."""
+    if IS_SQLITE:
+        with engine.begin() as conn:
+            cols = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(log01_job)").all()}
+            if cols and "lease_until" not in cols:
+                conn.exec_driver_sql("ALTER TABLE log01_job ADD COLUMN lease_until DATETIME")
+        return
+
+    cols = _get_mysql_columns("log01_job")
+    if cols and "lease_until" not in cols:
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ALTER TABLE log01_job ADD COLUMN lease_until DATETIME NULL")
+
+
+def _ensure_oi_sort_at_column() -> None:
+    """Agrega oi.sort_at (= coalesce(updated_at, created_at), orden del listado /oi)."""
+    if IS_SQLITE:
+        with engine.begin() as conn:
+            cols = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(oi)").all()}
+            if cols and "sort_at" not in cols:
+                conn.exec_driver_sql("ALTER TABLE oi ADD COLUMN sort_at DATETIME")
+        return
+
+    cols = _get_mysql_columns("oi")
+    if cols and "sort_at" not in cols:
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ALTER TABLE oi ADD COLUMN sort_at DATETIME NULL")
 
-        s = r.summary_json if isinstance(r.summary_json, dict) else None
-        if s:
-            ini = ini or s.get("serie_ini")
-            fin = fin or s.get("serie_fin")
 
-        if (not ini or not fin) and r.output_name:
-            m = re.search(r"BD_(\d+)_AL_(\d+)", r.output_name)
-            if m:
-                ini = ini or m.group(1)
-                fin = fin or m.group(2)
+def _create_index_if_missing(table: str, name: str, columns: Sequence[str]) -> None:
+    """CREATE INDEX idempotente (SQLite: IF NOT EXISTS; MySQL: se consulta el inspector)."""
+    cols_sql = ", ".join(columns)
+    if IS_SQLITE:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({cols_sql})")
+        return
+    if name in _get_mysql_indexes(table):
+        return
+    try:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"CREATE INDEX {name} ON {table} ({cols_sql})")
+    except Exception:
+        # Evitar romper startup si ya existe (o permisos)
+        pass
 
-        ini_num = _to_int(ini)
-        fin_num = _to_int(fin)
 
-        # Solo actualizamos si encontramos algo consistente
-        if ini and fin:
-            if r.serie_ini != ini:
-                r.serie_ini = ini
-                changed = True
-            if r.serie_fin != fin:
-                r.serie_fin = fin
-                changed = True
-            if r.serie_ini_num != ini_num:
-                r.serie_ini_num = ini_num
-                changed = True
-            if r.serie_fin_num != fin_num:
-                r.serie_fin_num = fin_num
-                changed = True
+def _ensure_history_keyset_indexes() -> None:
+    """Índices (created_at, id) de los historiales LOG-01 y Formato AC (paginación por cursor)."""
+    _create_index_if_missing("log01_run", "idx_log01_run_created_at_id", ("created_at", "id"))
+    _create_index_if_missing("formato_ac_run", "idx_formato_ac_run_created_at_id", ("created_at", "id"))
 
-            # Mantener summary_json con keys para UI
-            if s is not None:
-                if s.get("serie_ini") != ini or s.get("serie_fin") != fin:
-                    s["serie_ini"] = ini
-                    s["serie_fin"] = fin
-                    r.summary_json = s
-                    changed = True
 
-    if changed:
-        session.commit()
+BACKFILL_BATCH_SIZE = 500
 
-            
- 
 
-def _patch_allowed_modules_future_logistica_to_logistica(session: Session) -> None:
-    from app.models import User
+def _iter_batches(session: Session, model: Any, batch_size: int = BACKFILL_BATCH_SIZE) -> Iterator[list[Any]]:
+    """Recorre una tabla por id en lotes (keyset); el llamador hace commit por lote."""
+    id_col = model.id
+    last_id = 0
+    while True:
+        rows = list(session.exec(select(model).where(id_col > last_id).order_by(id_col).limit(batch_size)).all())
+        if not rows:
+            return
+        last_id = rows[-1].id
+        yield rows
 
-    changed = False
-    users = session.exec(select(User)).all()
-    for user in users:
-        raw = user.allowed_modules
-        if not raw:
-            continue
 
-        mods: list[str] | None = None
-        if isinstance(raw, list):
-            mods = [str(m) for m in raw if m]
-        elif isinstance(raw, str):
+def _backfill_oi_sort_at(batch_size: int = BACKFILL_BATCH_SIZE) -> None:
+    """
+    Rellena oi.sort_at de las OIs existentes por lotes de id (commit por lote);
+    solo toca filas en NULL, así que si se corta se retoma donde quedó.
+    """
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            ids = [
+                int(row[0])
+                for row in conn.execute(
+                    text("SELECT id FROM oi WHERE id > :last_id AND sort_at IS NULL ORDER BY id LIMIT :n"),
+                    {"last_id": last_id, "n": batch_size},
+                ).all()
+            ]
+            if not ids:
+                return
+            conn.execute(
+                text(
+                    "UPDATE oi SET sort_at = COALESCE(updated_at, created_at) "
+                    "WHERE sort_at IS NULL AND id BETWEEN :first AND :last"
+                ),
+                {"first": ids[0], "last": ids[-1]},
+            )
+        last_id = ids[-1]
+
+
+def _backfill_medidor_counters(session: Session) -> None:
+    """Recalcula contadores de medidores si oi_code_total aún no se ha poblado."""
+    from app.services.medidor_counters import counters_need_rebuild, rebuild_counters
+
+    if counters_need_rebuild(session):
+        rebuild_counters(session)
+
+
+def _backfill_bancada_medidor(session: Session) -> None:
+    """Indexa en bancada_medidor las bancadas existentes que aún no tienen entradas."""
+    from app.services.medidor_index import backfill_bancada_medidor
+
+    backfill_bancada_medidor(session)
+
+
+def _serie_to_int(s: Any) -> int | None:
+    if s is None:
+        return None
+    if isinstance(s, int):
+        return s
+    if isinstance(s, str):
+        t = s.strip()
+        if t.isdigit():
             try:
-                parsed = json.loads(raw)
+                return int(t)
             except Exception:
-                continue
-            if isinstance(parsed, list):
-                mods = [str(m) for m in parsed if m]
+                return None
+    return None
 
-        if not mods or "future_logistica" not in mods:
-            continue
 
-        updated = ["logistica" if m == "future_logistica" else m for m in mods]
-        seen: set[str] = set()
-        cleaned: list[str] = []
-        for m in updated:
-            if not m or m in seen:
-                continue
-            seen.add(m)
-            cleaned.append(m)
+def _backfill_log01_run_series(session: Session) -> None:
+    """
+    Backfill para corridas antiguas:
+    - intenta tomar serie_ini/serie_fin desde summary_json
+    - si no existe, intenta parsear output_name: BD_<INI>_AL_<FIN>
+    - rellena también serie_ini_num/serie_fin_num
+    - si summary_json existe y no tiene keys, las agrega (para UI)
+    Recorre la tabla por lotes (commit por lote).
+    """
+    for runs in _iter_batches(session, Log01Run):
+        changed = False
+        for r in runs:
+            changed = _backfill_log01_run_series_row(r) or changed
+        if changed:
+            session.commit()
 
-        if cleaned != mods:
-            user.allowed_modules = cleaned
+
+def _backfill_log01_run_series_row(r: Log01Run) -> bool:
+    if r.serie_ini and r.serie_fin and r.serie_ini_num is not None and r.serie_fin_num is not None:
+        return False
+
+    changed = False
+    ini = r.serie_ini
+    fin = r.serie_fin
+
+    s = r.summary_json if isinstance(r.summary_json, dict) else None
+    if s:
+        ini = ini or s.get("serie_ini")
+        fin = fin or s.get("serie_fin")
+
+    if (not ini or not fin) and r.output_name:
+        m = re.search(r"BD_(\d+)_AL_(\d+)", r.output_name)
+        if m:
+            ini = ini or m.group(1)
+            fin = fin or m.group(2)
+
+    ini_num = _serie_to_int(ini)
+    fin_num = _serie_to_int(fin)
+
+    # Solo actualizamos si encontramos algo consistente
+    if ini and fin:
+        if r.serie_ini != ini:
+            r.serie_ini = ini
+            changed = True
+        if r.serie_fin != fin:
+            r.serie_fin = fin
+            changed = True
+        if r.serie_ini_num != ini_num:
+            r.serie_ini_num = ini_num
+            changed = True
+        if r.serie_fin_num != fin_num:
+            r.serie_fin_num = fin_num
             changed = True
 
-    if changed:
-        session.commit()
+        # Mantener summary_json con keys para UI
+        if s is not None:
+            if s.get("serie_ini") != ini or s.get("serie_fin") != fin:
+                s["serie_ini"] = ini
+                s["serie_fin"] = fin
+                r.summary_json = s
+                changed = True
 
+    return changed
 
 
+def _patch_allowed_modules_future_logistica_to_logistica(session: Session) -> None:
+    from app.models import User
+
+    for users in _iter_batches(session, User):
+        changed = False
+        for user in users:
+            changed = _patch_user_future_logistica(user) or changed
+        if changed:
+            session.commit()
+
+
+def _patch_user_future_logistica(user: Any) -> bool:
+    raw = user.allowed_modules
+    if not raw:
+        return False
+
+    mods: list[str] | None = None
+    if isinstance(raw, list):
+        mods = [str(m) for m in raw if m]
+    elif isinstance(raw, str):
+        try:
+            parsed = json.loads(raw)
+        except Exception:
+            return False
+        if isinstance(parsed, list):
+            mods = [str(m) for m in parsed if m]
+
+    if not mods or "future_logistica" not in mods:
+        return False
+
+    updated = ["logistica" if m == "future_logistica" else m for m in mods]
+    seen: set[str] = set()
+    cleaned: list[str] = []
+    for m in updated:
+        if not m or m in seen:
+            continue
+        seen.add(m)
+        cleaned.append(m)
+
+    if cleaned != mods:
+        user.allowed_modules = cleaned
+        return True
+    return False
 
 
 DEFAULT_USERS = [
@@ -539,25 +749,215 @@ def _seed_default_users() -> None:
         )
 
 
-def init_db() -> None:
+# ------------------------------------------------------------
+# Migraciones versionadas
+# ------------------------------------------------------------
+# Cada paso se aplica una sola vez y queda registrado en schema_version.
+# Los pasos deben ser idempotentes (una BD nueva ya trae los índices por create_all).
+
+HOT_PATH_INDEXES: list[tuple[str, str, tuple[str, ...]]] = [
+    # Listado /oi de técnicos: tech_number + banco_id (+ filtro de fecha de creación)
+    ("oi", "idx_oi_tech_banco_created", ("tech_number", "banco_id", "created_at")),
+    # Bancadas de una OI ordenadas por item (detalle, Excel)
+    ("bancada", "idx_bancada_oi_item", ("oi_id", "item")),
+    # max(saved_at) por OI (_recalc_oi_saved_at)
+    ("bancada", "idx_bancada_oi_saved_at", ("oi_id", "saved_at")),
+    # Historial LOG-01 (deleted_at IS NULL + rango/orden por created_at) y filtro por serie
+    ("log01_run", "idx_log01_run_deleted_created", ("deleted_at", "created_at")),
+    ("log01_run", "idx_log01_run_serie_range", ("serie_ini_num", "serie_fin_num")),
+    # Historial Formato AC filtrado por origen
+    ("formato_ac_run", "idx_formato_ac_run_origin_created", ("origin", "created_at")),
+]
+
+
+def _migration_001_hot_path_indexes() -> None:
+    for table, name, columns in HOT_PATH_INDEXES:
+        _create_index_if_missing(table, name, columns)
+
+
+def _migration_002_backfill_log01_run_series() -> None:
+    with Session(engine) as session:
+        _backfill_log01_run_series(session)
+
+
+def _migration_003_patch_future_logistica() -> None:
+    with Session(engine) as session:
+        _patch_allowed_modules_future_logistica_to_logistica(session)
+
+
+def _migration_004_backfill_bancada_medidor() -> None:
+    with Session(engine) as session:
+        _backfill_bancada_medidor(session)
+
+
+def _migration_005_backfill_medidor_counters() -> None:
+    with Session(engine) as session:
+        _backfill_medidor_counters(session)
+
+
+def _migration_006_convert_rows_data() -> None:
+    """Pasa rows_data existentes a la codificación configurada (VI_ROWS_DATA_ENCODING)."""
+    from app.core.rows_codec import convert_stored_rows, current_encoding
+
+    if current_encoding() != "compact":
+        # Con "json" no hay nada que convertir: ambos formatos se leen igual
+        return
+    with Session(engine) as session:
+        logger.info("init_db: rows_data convertidas a compact: %s", convert_stored_rows(session, "compact"))
+
+
+def _migration_007_log01_job_table() -> None:
+    _create_all()
+
+
+def _migration_008_job_relay_table() -> None:
+    _create_all()
+
+
+def _migration_009_log01_job_lease() -> None:
+    _ensure_log01_job_lease_column()
+
+
+def _migration_010_bancada_medidor_search_index() -> None:
+    _create_index_if_missing("bancada_medidor", "idx_bancada_medidor_search", ("searchable", "medidor", "oi_id"))
+
+
+def _migration_011_bancada_medidor_flags() -> None:
+    """searchable/dup_check; si faltaban, el índice se vació y se vuelve a poblar."""
+    if _ensure_bancada_medidor_columns():
+        with Session(engine) as session:
+            _backfill_bancada_medidor(session)
+
+
+def _migration_012_oi_medidores_usuario() -> None:
+    """Columna del contador por OI; se recalcula (con la columna recién creada todo vale 0)."""
+    from app.services.medidor_counters import rebuild_counters
+
+    _ensure_oi_medidores_usuario_column()
+    with Session(engine) as session:
+        rebuild_counters(session)
+
+
+def _migration_013_oi_sort_at() -> None:
+    _ensure_oi_sort_at_column()
+    _backfill_oi_sort_at()
+    _create_index_if_missing("oi", "idx_oi_sort_at_id", ("sort_at", "id"))
+
+
+def _migration_014_history_keyset_indexes() -> None:
+    _ensure_history_keyset_indexes()
+
+
+# Para agregar una tabla nueva: crear un paso que llame a _create_all();
+# para columnas/índices, un paso con su ALTER/_create_index_if_missing.
+# Se aplican en el orden de la lista (no por número): una columna va antes de
+# los pasos que la leen, para que una BD sin versión (v0) llegue a ellos con el
+# esquema completo; una BD ya versionada solo corre los números que le faltan.
+MIGRATIONS: list[tuple[int, str, Callable[[], None]]] = [
+    (1, "hot_path_indexes", _migration_001_hot_path_indexes),
+    (2, "backfill_log01_run_series", _migration_002_backfill_log01_run_series),
+    (3, "patch_future_logistica", _migration_003_patch_future_logistica),
+    (11, "bancada_medidor_flags", _migration_011_bancada_medidor_flags),
+    (4, "backfill_bancada_medidor", _migration_004_backfill_bancada_medidor),
+    (12, "oi_medidores_usuario", _migration_012_oi_medidores_usuario),
+    (5, "backfill_medidor_counters", _migration_005_backfill_medidor_counters),
+    (6, "convert_rows_data", _migration_006_convert_rows_data),
+    (7, "log01_job_table", _migration_007_log01_job_table),
+    (8, "job_relay_table", _migration_008_job_relay_table),
+    (9, "log01_job_lease", _migration_009_log01_job_lease),
+    (10, "bancada_medidor_search_index", _migration_010_bancada_medidor_search_index),
+    (13, "oi_sort_at", _migration_013_oi_sort_at),
+    (14, "history_keyset_indexes", _migration_014_history_keyset_indexes),
+]
+LATEST_SCHEMA_VERSION = max(version for version, _, _ in MIGRATIONS)
+
+
+def _create_all() -> None:
     SQLModel.metadata.create_all(engine)
-    _ensure_log01_run_series_columns()
-    _ensure_oi_saved_at_column()
-    _ensure_bancada_saved_at_column()
+
+
+def _legacy_schema_steps() -> list[tuple[str, Callable[[], None]]]:
+    """
+    Pasos _ensure_* históricos (idempotentes, inspeccionan el esquema). Solo se
+    ejecutan en una BD sin versión registrada: instalaciones anteriores al
+    versionado o BD nuevas.
+    """
+    steps: list[tuple[str, Callable[[], None]]] = [
+        ("ensure_log01_run_series_columns", _ensure_log01_run_series_columns),
+        ("ensure_oi_saved_at_column", _ensure_oi_saved_at_column),
+        ("ensure_bancada_saved_at_column", _ensure_bancada_saved_at_column),
+    ]
     if IS_SQLITE:
-        _configure_sqlite_pragmas()
-        _ensure_updated_at_column()
-        _ensure_oi_lock_columns()
-        _ensure_bancada_updated_at_column()
-        _ensure_oi_constraints()
-        _ensure_user_role_column()
-        _ensure_user_is_active_column()
-        _ensure_user_allowed_modules_column()
+        steps += [
+            ("ensure_updated_at_column", _ensure_updated_at_column),
+            ("ensure_oi_lock_columns", _ensure_oi_lock_columns),
+            ("ensure_bancada_updated_at_column", _ensure_bancada_updated_at_column),
+            ("ensure_oi_constraints", _ensure_oi_constraints),
+            ("ensure_user_role_column", _ensure_user_role_column),
+            ("ensure_user_is_active_column", _ensure_user_is_active_column),
+            ("ensure_user_allowed_modules_column", _ensure_user_allowed_modules_column),
+        ]
+    return steps
+
+
+def _timed_step(name: str, step: Callable[[], Any]) -> Any:
+    t0 = time.perf_counter()
+    try:
+        return step()
+    finally:
+        logger.info("init_db: %s (%.1f ms)", name, (time.perf_counter() - t0) * 1000)
+
+
+def get_schema_version() -> int:
+    """Última versión aplicada (0 si no hay ninguna o la tabla aún no existe)."""
+    from app.models import SchemaVersion
+
+    try:
         with Session(engine) as session:
-            _patch_allowed_modules_future_logistica_to_logistica(session)
+            current = session.exec(select(func.max(SchemaVersion.version))).one()
+    except (OperationalError, ProgrammingError):
+        return 0
+    return int(current or 0)
+
+
+def _apply_migrations() -> None:
+    from app.models import SchemaVersion
 
-    # Backfill LOG01 (SQLite y MySQL)
     with Session(engine) as session:
-        _backfill_log01_run_series(session)
+        applied = set(session.exec(select(SchemaVersion.version)).all())
+    for version, name, step in MIGRATIONS:
+        if version in applied:
+            continue
+        _timed_step(f"migración {version:03d} {name}", step)
+        try:
+            with Session(engine) as session:
+                session.add(SchemaVersion(version=version, name=name))
+                session.commit()
+        except IntegrityError:
+            # Otro proceso (worker) registró el mismo paso en paralelo
+            pass
+
 
-    _seed_default_users()
+def init_db() -> None:
+    """
+    Prepara la BD al arrancar. Si schema_version ya está en la última versión,
+    solo se hace una consulta (más PRAGMAs y seed de usuarios): no se inspecciona
+    el esquema ni se recorren tablas. Los tiempos de cada paso quedan en el log.
+    """
+    t0 = time.perf_counter()
+    current = _timed_step("schema_version", get_schema_version)
+    if current < LATEST_SCHEMA_VERSION:
+        _timed_step("create_all", _create_all)
+        if current == 0:
+            for name, step in _legacy_schema_steps():
+                _timed_step(name, step)
+        _apply_migrations()
+    if IS_SQLITE:
+        _timed_step("sqlite_pragmas", _configure_sqlite_pragmas)
+    _timed_step("seed_default_users", _seed_default_users)
+    logger.info(
+        "init_db: esquema v%s -> v%s en %.1f ms",
+        current,
+        LATEST_SCHEMA_VERSION,
+        (time.perf_counter() - t0) * 1000,
+    )
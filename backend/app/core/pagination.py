@@ -0,0 +1,53 @@
+"""
+Paginación por cursor (keyset) para listados ordenados por (fecha DESC, id DESC).
+
+El cursor es opaco para el cliente: codifica (sort_key, id) de la última fila
+de la página. La siguiente página se busca con
+    sort_key < s OR (sort_key = s AND id < i)
+que el índice compuesto (sort_key, id) resuelve sin recorrer las filas
+anteriores, a diferencia de OFFSET.
+"""
+
+from __future__ import annotations
+
+import base64
+from datetime import datetime
+from typing import Any, Optional, Sequence
+
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(sort_key: datetime, row_id: int) -> str:
+    raw = f"{sort_key.isoformat()}|{int(row_id)}".encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Devuelve (sort_key, id). ValueError si el cursor no es válido."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("ascii")
+        sort_text, id_text = raw.rsplit("|", 1)
+        return datetime.fromisoformat(sort_text), int(id_text)
+    except Exception as exc:
+        raise ValueError("Cursor inválido") from exc
+
+
+def seek_after(sort_col: Any, id_col: Any, cursor: str) -> Any:
+    """Condición WHERE para la página siguiente en orden (sort_col DESC, id_col DESC)."""
+    sort_key, row_id = decode_cursor(cursor)
+    return or_(sort_col < sort_key, and_(sort_col == sort_key, id_col < row_id))
+
+
+def next_cursor(rows: Sequence[Any], limit: int, sort_attr: str, id_attr: str = "id") -> Optional[str]:
+    """
+    Cursor de la página siguiente a partir de las filas leídas con LIMIT limit + 1
+    (None si no hay más). Recorta `rows` a `limit` fuera de esta función.
+    """
+    if len(rows) <= limit or limit <= 0:
+        return None
+    last = rows[limit - 1]
+    sort_key = getattr(last, sort_attr)
+    if sort_key is None:
+        return None
+    return encode_cursor(sort_key, getattr(last, id_attr))
@@ -0,0 +1,190 @@
+"""
+Codificación compacta de Bancada.rows_data (grid de la bancada).
+
+rows_data es una lista de filas (dicts) con las mismas claves repetidas en cada
+fila (medidor, estado, q3/q2/q1 con c1..c7, c7_seconds, ...). Con
+VI_ROWS_DATA_ENCODING=compact se guarda como un sobre JSON
+
+    {"fmt": "rows-z1", "n": <filas>, "data": <base64(zlib(columnas))>}
+
+donde "columnas" es un arreglo por ruta de clave (q3.c1, medidor, ...) en vez de
+un dict por fila. Las rutas conocidas usan un esquema fijo (índice numérico) y
+las demás viajan en un diccionario de claves dentro del mismo sobre; las celdas
+ausentes se marcan con una máscara por columna (ausente != null).
+
+RowsDataType (TypeDecorator sobre JSON) hace la conversión en la capa del
+modelo: al leer siempre se obtiene la lista de dicts, venga en formato
+compacto o en el JSON histórico, así que ambos formatos conviven en la misma
+tabla y el cambio de VI_ROWS_DATA_ENCODING no requiere migrar para funcionar.
+"""
+
+import base64
+import json
+import zlib
+from typing import Any, Optional
+
+from sqlalchemy import column, select, table, update
+from sqlalchemy.types import JSON, Integer, TypeDecorator
+
+from .settings import get_settings
+
+COMPACT_FORMAT = "rows-z1"
+ENCODINGS = ("json", "compact")
+
+_Q_FIELDS = ("c1", "c2", "c3", "c4", "c5", "c6", "c7", "c7_seconds", "caudal", "error")
+# Esquema fijo v1: rutas de clave conocidas (no se guardan en cada sobre)
+FIXED_PATHS: tuple[tuple[str, ...], ...] = (
+    ("medidor",),
+    ("estado",),
+    ("conformidad",),
+    *((block, field) for block in ("q3", "q2", "q1") for field in _Q_FIELDS),
+)
+_FIXED_INDEX = {path: i for i, path in enumerate(FIXED_PATHS)}
+
+
+def _flatten(value: dict, prefix: tuple[str, ...], out: dict[tuple[str, ...], Any]) -> None:
+    for key, item in value.items():
+        path = prefix + (str(key),)
+        # Dict vacío se guarda como valor (no hay hojas que lo representen)
+        if isinstance(item, dict) and item:
+            _flatten(item, path, out)
+        else:
+            out[path] = item
+
+
+def _mask(present: list[bool]) -> str:
+    bits = 0
+    for i, flag in enumerate(present):
+        if flag:
+            bits |= 1 << i
+    return format(bits, "x")
+
+
+def _unmask(mask: str, n: int) -> list[bool]:
+    bits = int(mask, 16)
+    return [bool(bits >> i & 1) for i in range(n)]
+
+
+def encode_rows(rows: list[Any]) -> dict:
+    """Lista de filas -> sobre compacto. ValueError si alguna fila no es dict."""
+    flat_rows: list[dict[tuple[str, ...], Any]] = []
+    order: dict[tuple[str, ...], None] = {}
+    for row in rows:
+        if not isinstance(row, dict):
+            raise ValueError("rows_data compacto requiere filas dict")
+        flat: dict[tuple[str, ...], Any] = {}
+        _flatten(row, (), flat)
+        flat_rows.append(flat)
+        for path in flat:
+            order.setdefault(path, None)
+
+    extras: list[list[str]] = []
+    columns: list[list[Any]] = []
+    n = len(flat_rows)
+    for path in order:
+        if path in _FIXED_INDEX:
+            ref: Any = _FIXED_INDEX[path]
+        else:
+            ref = -1 - len(extras)
+            extras.append(list(path))
+        present = [path in flat for flat in flat_rows]
+        values = [flat[path] for flat in flat_rows if path in flat]
+        columns.append([ref, values, None if all(present) else _mask(present)])
+
+    payload = json.dumps({"x": extras, "c": columns}, separators=(",", ":"), ensure_ascii=False)
+    data = zlib.compress(payload.encode("utf-8"), 6)
+    return {"fmt": COMPACT_FORMAT, "n": n, "data": base64.b64encode(data).decode("ascii")}
+
+
+def is_compact(value: Any) -> bool:
+    return isinstance(value, dict) and value.get("fmt") == COMPACT_FORMAT
+
+
+def decode_rows(envelope: dict) -> list[dict]:
+    """Sobre compacto -> lista de filas (dicts anidados como en el JSON original)."""
+    n = int(envelope.get("n") or 0)
+    payload = json.loads(zlib.decompress(base64.b64decode(envelope["data"])).decode("utf-8"))
+    extras = [tuple(p) for p in payload.get("x", [])]
+    rows: list[dict] = [{} for _ in range(n)]
+    for ref, values, mask in payload.get("c", []):
+        path = FIXED_PATHS[ref] if ref >= 0 else extras[-1 - ref]
+        targets = range(n) if mask is None else [i for i, ok in enumerate(_unmask(mask, n)) if ok]
+        head, leaf = path[:-1], path[-1]
+        for i, value in zip(targets, values):
+            node = rows[i]
+            for key in head:
+                node = node.setdefault(key, {})
+            node[leaf] = value
+    return rows
+
+
+def current_encoding() -> str:
+    encoding = (get_settings().rows_data_encoding or "json").strip().lower()
+    return encoding if encoding in ENCODINGS else "json"
+
+
+def to_storage(rows: Optional[list], encoding: Optional[str] = None) -> Any:
+    """Valor a persistir según la codificación (por defecto la configurada)."""
+    if rows is None or is_compact(rows):
+        return rows
+    if (encoding or current_encoding()) != "compact" or not isinstance(rows, list):
+        return rows
+    try:
+        return encode_rows(rows)
+    except ValueError:
+        # Filas no-dict (datos legacy): se guardan tal cual
+        return rows
+
+
+def from_storage(value: Any) -> Any:
+    return decode_rows(value) if is_compact(value) else value
+
+
+class RowsDataType(TypeDecorator):
+    """JSON con (de)codificación transparente de rows_data (ver módulo)."""
+
+    impl = JSON
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return to_storage(value)
+
+    def process_result_value(self, value, dialect):
+        return from_storage(value)
+
+
+# Vista "cruda" de bancada.rows_data (sin RowsDataType) para convertir en lote
+_RAW_BANCADA = table("bancada", column("id", Integer), column("rows_data", JSON))
+
+
+def convert_stored_rows(session, encoding: Optional[str] = None, batch_size: int = 500) -> int:
+    """
+    Reescribe bancada.rows_data en la codificación indicada (por defecto la
+    configurada). Solo actualiza filas cuyo formato cambia; commit por lote.
+    Devuelve la cantidad de bancadas convertidas.
+    """
+    target = encoding or current_encoding()
+    if target not in ENCODINGS:
+        raise ValueError(f"Codificación no soportada: {target}")
+    converted = 0
+    last_id = 0
+    while True:
+        batch = session.execute(
+            select(_RAW_BANCADA.c.id, _RAW_BANCADA.c.rows_data)
+            .where(_RAW_BANCADA.c.id > last_id)
+            .order_by(_RAW_BANCADA.c.id)
+            .limit(batch_size)
+        ).all()
+        if not batch:
+            return converted
+        last_id = batch[-1][0]
+        for bancada_id, raw in batch:
+            if raw is None or is_compact(raw) == (target == "compact"):
+                continue
+            value = to_storage(from_storage(raw), target)
+            if is_compact(value) != (target == "compact"):
+                # Filas legacy no-dict: se quedan en JSON
+                continue
+            session.execute(update(_RAW_BANCADA).where(_RAW_BANCADA.c.id == bancada_id).values(rows_data=value))
+            converted += 1
+        session.commit()
@@ -0,0 +1,207 @@
+"""
+Almacén de sesiones de login (token -> dict de sesión).
+
+Backends (VI_SESSION_BACKEND):
+- "memory": dict del proceso (comportamiento histórico; un solo worker).
+- "db": tabla auth_session en la misma BD de la app (SQLite/MySQL), con caché
+  LRU de lectura. Permite correr varios workers de uvicorn: un login hecho en
+  un worker es visible de inmediato en los demás (los misses siempre van a la
+  BD); un logout/cambio en otro worker se ve a más tardar en
+  VI_SESSION_CACHE_TTL_S segundos.
+
+Ambos respetan el contrato de dict que usan auth/oi/admin: get, [token] = sess,
+pop, values, items. Las sesiones modificadas in-place (p.ej. set_banco) deben
+volver a asignarse con store[token] = sess para persistir.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Iterator, Optional
+
+from sqlalchemy import delete
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from ..models import AuthSession
+from .settings import get_settings
+
+_DT_KEYS = "__datetimes__"
+
+
+class MemorySessionStore(dict):
+    """Sesiones en memoria del proceso."""
+
+    def purge_expired(self, now: datetime) -> None:
+        expired = [k for k, v in self.items() if v["expiresAt"] < now]
+        for k in expired:
+            del self[k]
+
+
+def _encode(sess: dict) -> dict:
+    data: dict[str, Any] = {}
+    dt_keys = []
+    for key, value in sess.items():
+        if isinstance(value, datetime):
+            dt_keys.append(key)
+            value = value.isoformat()
+        data[key] = value
+    data[_DT_KEYS] = dt_keys
+    return data
+
+
+def _decode(data: dict) -> dict:
+    sess = dict(data)
+    for key in sess.pop(_DT_KEYS, []):
+        if isinstance(sess.get(key), str):
+            sess[key] = datetime.fromisoformat(sess[key])
+    return sess
+
+
+class DbSessionStore:
+    """Sesiones en la tabla auth_session con caché LRU (read-through) por proceso."""
+
+    def __init__(
+        self,
+        engine: Optional[Engine] = None,
+        *,
+        cache_size: int = 1024,
+        cache_ttl_s: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._engine = engine
+        self._cache_size = max(0, cache_size)
+        self._cache_ttl_s = cache_ttl_s
+        self._clock = clock
+        self._cache: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def engine(self) -> Engine:
+        if self._engine is None:
+            from .db import engine  # import diferido: db importa settings/models al cargarse
+
+            self._engine = engine
+        return self._engine
+
+    # --- caché ---
+    def _cache_get(self, token: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._cache.get(token)
+            if entry is None:
+                return None
+            loaded_at, sess = entry
+            if self._clock() - loaded_at > self._cache_ttl_s:
+                del self._cache[token]
+                return None
+            self._cache.move_to_end(token)
+            return sess
+
+    def _cache_put(self, token: str, sess: dict) -> None:
+        if not self._cache_size:
+            return
+        with self._lock:
+            self._cache[token] = (self._clock(), sess)
+            self._cache.move_to_end(token)
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+
+    def _cache_drop(self, token: str) -> None:
+        with self._lock:
+            self._cache.pop(token, None)
+
+    def clear_cache(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    # --- contrato dict ---
+    def get(self, token: str, default: Optional[dict] = None) -> Optional[dict]:
+        if not token:
+            return default
+        sess = self._cache_get(token)
+        if sess is not None:
+            return sess
+        with Session(self.engine) as session:
+            row = session.get(AuthSession, token)
+            if row is None:
+                return default
+            sess = _decode(row.data)
+        self._cache_put(token, sess)
+        return sess
+
+    def __getitem__(self, token: str) -> dict:
+        sess = self.get(token)
+        if sess is None:
+            raise KeyError(token)
+        return sess
+
+    def __contains__(self, token: object) -> bool:
+        return isinstance(token, str) and self.get(token) is not None
+
+    def __setitem__(self, token: str, sess: dict) -> None:
+        with Session(self.engine) as session:
+            row = session.get(AuthSession, token)
+            if row is None:
+                row = AuthSession(token=token)
+            row.user_id = sess.get("userId")
+            row.data = _encode(sess)
+            row.expires_at = sess["expiresAt"]
+            session.add(row)
+            session.commit()
+        self._cache_put(token, sess)
+
+    def __delitem__(self, token: str) -> None:
+        if self.pop(token, None) is None:
+            raise KeyError(token)
+
+    def pop(self, token: str, default: Optional[dict] = None) -> Optional[dict]:
+        self._cache_drop(token)
+        with Session(self.engine) as session:
+            row = session.get(AuthSession, token)
+            if row is None:
+                return default
+            sess = _decode(row.data)
+            session.delete(row)
+            session.commit()
+        return sess
+
+    def items(self) -> Iterator[tuple[str, dict]]:
+        with Session(self.engine) as session:
+            rows = session.exec(select(AuthSession)).all()
+            pairs = [(row.token, _decode(row.data)) for row in rows]
+        return iter(pairs)
+
+    def keys(self) -> Iterator[str]:
+        return (token for token, _ in self.items())
+
+    def values(self) -> Iterator[dict]:
+        return (sess for _, sess in self.items())
+
+    def __iter__(self) -> Iterator[str]:
+        return self.keys()
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.items())
+
+    def purge_expired(self, now: datetime) -> None:
+        with Session(self.engine) as session:
+            session.exec(delete(AuthSession).where(AuthSession.expires_at < now))  # type: ignore[call-overload,arg-type]
+            session.commit()
+        with self._lock:
+            expired = [k for k, (_, v) in self._cache.items() if v["expiresAt"] < now]
+            for k in expired:
+                del self._cache[k]
+
+
+def create_session_store() -> "MemorySessionStore | DbSessionStore":
+    settings = get_settings()
+    backend = (getattr(settings, "session_backend", "memory") or "memory").strip().lower()
+    if backend == "db":
+        return DbSessionStore(
+            cache_size=int(settings.session_cache_size),
+            cache_ttl_s=float(settings.session_cache_ttl_s),
+        )
+    if backend != "memory":
+        raise ValueError(f"VI_SESSION_BACKEND inválido: {backend!r} (use 'memory' o 'db')")
+    return MemorySessionStore()
@@ -63,8 +63,51 @@ class Settings(BaseSettings):
     # Nota: el template vive en app/data/templates/vi/
     data_template_path: str = "data/templates/vi/PLANTILLA_VI.xlsx"
 
+    # Motor de exportación Formato VI:
+    # - "openpyxl": flujo clásico (celda por celda con openpyxl)
+    # - "ooxml": parchea directamente el XML de la hoja "ERROR FINAL" (más rápido en OIs grandes);
+    #   si la plantilla no es compatible se usa openpyxl automáticamente.
+    # Se puede sobreescribir con VI_EXCEL_ENGINE
+    excel_engine: str = "openpyxl"
+
+    # Exportación masiva (POST /oi/excel/batch):
+    # procesos del pool (0 = núcleos de la máquina) y máximo de OIs por ZIP.
+    excel_batch_workers: int = 0
+    excel_batch_max_oi: int = 500
+
+    # Caché en disco de Excel exportados (data/export_cache), LRU por tamaño total.
+    # 0 = deshabilitada. Se puede sobreescribir con VI_EXPORT_CACHE_MAX_MB
+    export_cache_max_mb: int = 256
+
+    # Almacenamiento de Bancada.rows_data (ver core/rows_codec):
+    # - "json": lista de dicts (formato histórico)
+    # - "compact": columnas comprimidas (zlib) con esquema fijo de claves
+    # Ambos formatos se leen siempre; solo cambia cómo se escriben.
+    # Se puede sobreescribir con VI_ROWS_DATA_ENCODING
+    rows_data_encoding: str = "json"
+
+    # Streams de progreso (NDJSON): ventana en ms en la que eventos "progress"/"status"
+    # seguidos se fusionan (solo se envía el último por etapa). 0 = sin fusión.
+    # Se puede sobreescribir con VI_PROGRESS_COALESCE_MS
+    progress_coalesce_ms: int = 250
+
     # Plantilla LOG-01 (Logística)
     log01_template_path: str = "data/templates/logistica/LOG01_PLANTILLA_SALIDA.xlsx"
+    # Motor de escritura de la salida LOG-01:
+    # - "ooxml": genera el XML de la hoja BD en streaming (memoria plana en nº de series);
+    #   si la plantilla no es compatible se usa openpyxl automáticamente.
+    # - "openpyxl": carga la plantilla y escribe celda por celda
+    # Se puede sobreescribir con VI_LOG01_EXCEL_ENGINE
+    log01_excel_engine: str = "ooxml"
+    # Procesos para leer los archivos de entrada LOG-01 en paralelo
+    # (0 = núcleos de la máquina, 1 = secuencial). Se puede sobreescribir con VI_LOG01_PARSE_WORKERS
+    log01_parse_workers: int = 0
+    # Caché de archivos de entrada ya leídos (data/log01_parse_cache), por contenido y
+    # LRU por tamaño total. 0 = deshabilitada. Se puede sobreescribir con VI_LOG01_PARSE_CACHE_MAX_MB
+    log01_parse_cache_max_mb: int = 128
+    # Reanudar al arrancar los jobs LOG-01 (/start) que quedaron en cola o a medias,
+    # desde el último archivo con checkpoint. Se puede sobreescribir con VI_LOG01_RESUME_JOBS
+    log01_resume_jobs: bool = True
 
 
     # Nombre del archivo de base de datos
@@ -73,10 +116,53 @@ class Settings(BaseSettings):
     # URL opcional para BD (ej: MySQL). Se lee desde VI_DATABASE_URL
     database_url: str | None = None
 
+    # Pool de conexiones (SQLite en archivo y MySQL)
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout_s: float = 30.0
+
+    # Perfil SQLite (BD en carpeta compartida). Se aplica a cada conexión del pool.
+    # - busy_timeout: espera máxima ante un lock antes de "database is locked"
+    # - cache_size: caché de páginas por conexión, en KiB
+    # - mmap_size: 0 = deshabilitado (recomendado si vi.db está en un share SMB)
+    # - temp_store: DEFAULT | FILE | MEMORY
+    # - single_writer: serializa las escrituras del proceso en una cola FIFO
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_cache_size_kb: int = 16384
+    sqlite_mmap_size_mb: int = 0
+    sqlite_temp_store: str = "MEMORY"
+    sqlite_single_writer: bool = True
+
     # Contraseña interna para proteger celdas bloqueadas y estructura del libro.
     # No se expone en la UI. Se puede sobreescribir con VI_CELLS_PROTECTION_PASSWORD
     cells_protection_password: str = "OI2025"
 
+    # Sesiones de login (ver core/session_store):
+    # - "memory": en el proceso (un solo worker)
+    # - "db": tabla auth_session; requerido si server_workers > 1
+    # Se puede sobreescribir con VI_SESSION_BACKEND
+    session_backend: str = "memory"
+    # Caché LRU de lectura del backend "db": entradas y antigüedad máxima (s)
+    session_cache_size: int = 1024
+    session_cache_ttl_s: float = 5.0
+
+    # Progreso y cancelación de jobs largos (ver oi_tools/services/job_relay):
+    # - "memory": en el proceso (un solo worker)
+    # - "db": tabla job_relay; requerido si server_workers > 1
+    # Se puede sobreescribir con VI_JOB_STATE_BACKEND
+    job_state_backend: str = "memory"
+    # Cada cuánto (s) se publican/copian eventos y cancelaciones entre workers
+    job_relay_interval_s: float = 0.5
+
+    # Caché de nombres de técnico (api/auth): antigüedad máxima (s); acota lo
+    # que otro worker tarda en ver un usuario creado/editado
+    full_name_cache_ttl_s: float = 60.0
+
+    # Workers de uvicorn al lanzar desde vi_tray_app (VI_SERVER_WORKERS).
+    # Con más de 1 se fuerzan session_backend="db" y job_state_backend="db".
+    server_workers: int = 1
+
     class Config:
         env_prefix = "VI_"
         env_file = ".env"
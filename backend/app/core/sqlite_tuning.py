@@ -0,0 +1,209 @@
+"""
+Perfil de SQLite para la BD en carpeta compartida (SMB) y diagnóstico del pool.
+
+- PRAGMAs por conexión: se aplican en el evento "connect" del engine, es decir,
+  a cada conexión nueva del pool (antes solo se ajustaba la conexión usada al
+  arrancar). Valores configurables con VI_SQLITE_* (ver core/settings).
+- Cola de escritura única (WriterQueue): las transacciones de escritura de una
+  Session se serializan en orden de llegada dentro del proceso. Así los
+  escritores esperan en la cola en lugar de chocar en el lock de SQLite y
+  reintentar hasta busy_timeout ("database is locked"). Entre procesos/workers
+  sigue mandando el busy_timeout de SQLite.
+- pool_stats(): estado del pool de conexiones para /admin/diagnostics/db.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+logger = logging.getLogger(__name__)
+
+_SYNCHRONOUS = {"OFF", "NORMAL", "FULL", "EXTRA"}
+_TEMP_STORE = {"DEFAULT", "FILE", "MEMORY"}
+
+
+def _choice(value: str, allowed: set[str], default: str, name: str) -> str:
+    val = (value or "").strip().upper()
+    if val in allowed:
+        return val
+    logger.warning("Valor inválido para %s (%r); se usa %s", name, value, default)
+    return default
+
+
+def build_sqlite_pragmas(settings: Any) -> list[tuple[str, Any]]:
+    """PRAGMAs por conexión a partir de los settings (valores ya validados)."""
+    return [
+        ("busy_timeout", max(0, int(settings.sqlite_busy_timeout_ms))),
+        ("synchronous", _choice(settings.sqlite_synchronous, _SYNCHRONOUS, "NORMAL", "VI_SQLITE_SYNCHRONOUS")),
+        # Negativo = tamaño en KiB (positivo serían páginas)
+        ("cache_size", -max(0, int(settings.sqlite_cache_size_kb))),
+        ("mmap_size", max(0, int(settings.sqlite_mmap_size_mb)) * 1024 * 1024),
+        ("temp_store", _choice(settings.sqlite_temp_store, _TEMP_STORE, "MEMORY", "VI_SQLITE_TEMP_STORE")),
+    ]
+
+
+def install_sqlite_pragmas(engine: Engine, pragmas: list[tuple[str, Any]]) -> None:
+    """Aplica `pragmas` a cada conexión nueva que abre el pool de `engine`."""
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, connection_record):
+        cursor = dbapi_conn.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
+
+
+def read_sqlite_pragmas(engine: Engine, names: list[str]) -> dict[str, Any]:
+    """Valores efectivos de los PRAGMAs en una conexión del pool."""
+    out: dict[str, Any] = {}
+    with engine.connect() as conn:
+        for name in names:
+            row = conn.exec_driver_sql(f"PRAGMA {name}").first()
+            out[name] = row[0] if row else None
+    return out
+
+
+class _Ticket:
+    """Turno en la cola; lo libera quien lo tenga, desde cualquier hilo."""
+
+    __slots__ = ()
+
+
+class WriterQueue:
+    """
+    Lock FIFO (por orden de llegada) para serializar escrituras. La propiedad
+    es del turno (ticket) que devuelve `acquire`, no del hilo: FastAPI puede
+    cerrar la Session en otro hilo del threadpool y los endpoints async
+    comparten el hilo del event loop. `acquire` con timeout: si se agota,
+    devuelve None, se sigue sin el lock y SQLite resuelve con su busy_timeout
+    (la cola nunca bloquea indefinidamente).
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._waiting: deque[_Ticket] = deque()
+        self._owner: Optional[_Ticket] = None
+        self._acquired_at = 0.0
+        self.acquisitions = 0
+        self.timeouts = 0
+        self.total_wait_s = 0.0
+        self.max_wait_s = 0.0
+        self.max_hold_s = 0.0
+
+    def acquire(self, timeout: Optional[float] = None) -> Optional[_Ticket]:
+        ticket = _Ticket()
+        with self._cond:
+            t0 = time.monotonic()
+            deadline = None if timeout is None else t0 + timeout
+            self._waiting.append(ticket)
+            try:
+                while self._owner is not None or self._waiting[0] is not ticket:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self.timeouts += 1
+                        return None
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting.remove(ticket)
+                # El siguiente en la cola puede haber quedado primero
+                self._cond.notify_all()
+            waited = time.monotonic() - t0
+            self._owner = ticket
+            self._acquired_at = time.monotonic()
+            self.acquisitions += 1
+            self.total_wait_s += waited
+            self.max_wait_s = max(self.max_wait_s, waited)
+            return ticket
+
+    def release(self, ticket: _Ticket) -> None:
+        """Libera el turno `ticket` (no-op si ya no es el dueño)."""
+        with self._cond:
+            if self._owner is not ticket:
+                return
+            self.max_hold_s = max(self.max_hold_s, time.monotonic() - self._acquired_at)
+            self._owner = None
+            self._cond.notify_all()
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            return {
+                "busy": self._owner is not None,
+                "waiting": len(self._waiting),
+                "acquisitions": self.acquisitions,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait_s * 1000 / self.acquisitions, 2) if self.acquisitions else 0.0,
+                "max_wait_ms": round(self.max_wait_s * 1000, 2),
+                "max_hold_ms": round(self.max_hold_s * 1000, 2),
+            }
+
+
+_HELD = "_writer_queue_held"
+
+
+def install_single_writer(engine: Engine, queue: WriterQueue, timeout_s: float) -> None:
+    """
+    Serializa las transacciones de escritura de las Session ligadas a `engine`:
+    el lock se toma en el primer flush (o UPDATE/DELETE/INSERT directo), se
+    guarda en `session.info` y se libera al terminar la transacción raíz
+    (commit, rollback o close), sea cual sea el hilo que la termine.
+    """
+
+    def _take(session: Session) -> None:
+        if session.info.get(_HELD) or session.bind is not engine:
+            return
+        ticket = queue.acquire(timeout=timeout_s)
+        if ticket is not None:
+            session.info[_HELD] = (queue, ticket)
+        else:
+            logger.warning("Cola de escritura SQLite: timeout de %.1fs; se continúa sin serializar", timeout_s)
+
+    def _release(session: Session) -> None:
+        held = session.info.get(_HELD)
+        if held is not None and held[0] is queue:
+            del session.info[_HELD]
+            queue.release(held[1])
+
+    @event.listens_for(Session, "before_flush")
+    def _before_flush(session, flush_context, instances):
+        _take(session)
+
+    @event.listens_for(Session, "do_orm_execute")
+    def _on_execute(orm_execute_state):
+        st = orm_execute_state
+        if st.is_insert or st.is_update or st.is_delete:
+            _take(st.session)
+
+    @event.listens_for(Session, "after_transaction_end")
+    def _after_transaction_end(session, transaction):
+        if transaction.parent is None:
+            _release(session)
+
+    @event.listens_for(Session, "after_rollback")
+    def _after_rollback(session):
+        # Rollback de la BD (también el implícito de close): no hay nada que proteger
+        _release(session)
+
+
+def pool_stats(engine: Engine) -> dict[str, Any]:
+    """Estado del pool de conexiones (campos según la clase de pool)."""
+    pool = engine.pool
+    stats: dict[str, Any] = {"pool_class": type(pool).__name__, "status": pool.status()}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        fn = getattr(pool, name, None)
+        if callable(fn):
+            try:
+                stats[name] = fn()
+            except Exception:
+                pass
+    timeout = getattr(pool, "timeout", None)
+    if callable(timeout):
+        stats["timeout_s"] = timeout()
+    return stats
@@ -1,9 +1,7 @@
 from __future__ import annotations
 
-import asyncio
 import logging
 import os
-import queue
 import shutil
 import tempfile
 import threading
@@ -18,9 +16,15 @@ from fastapi.responses import FileResponse, JSONResponse, Response, StreamingRes
 
 
 from app.api.auth import get_current_user_session
-from app.oi_tools.services.progress_manager import progress_manager, SENTINEL
+from app.oi_tools.services.progress_manager import progress_manager
 from app.oi_tools.services.cancel_manager import cancel_manager
-from app.logistica.services.log01_consolidate import process_log01_files, Log01InputFile, Log01Cancelled
+from app.logistica.services.log01_consolidate import (
+    process_log01_files,
+    Log01InputFile,
+    Log01Cancelled,
+    Log01ProcessResult,
+)
+from app.logistica.services import log01_jobs
 
 from datetime import datetime, timezone
 from zoneinfo import ZoneInfo
@@ -30,6 +34,7 @@ from sqlmodel import Session, select
 from app.core.db import engine
 from app.core.settings import get_settings
 from app.core.rbac import can_manage_users
+from app.core.pagination import next_cursor, seek_after
 from app.models import Log01Run, Log01Artifact
 from app.schemas import (
     Log01RunListResponse,
@@ -66,16 +71,37 @@ class Log01Job:
     manifest_path: Optional[str] = None
     source: SourceLiteral = "AUTO"
 
+    @classmethod
+    def from_record(cls, record: Any) -> "Log01Job":
+        return cls(
+            operation_id=record.operation_id,
+            created_at=record.created_at.replace(tzinfo=timezone.utc).timestamp(),
+            status=record.status,
+            work_dir=record.work_dir,
+            output_name=record.output_name,
+            result_path=record.result_path,
+            error=record.error,
+            no_conforme_path=record.no_conforme_path,
+            manifest_path=record.manifest_path,
+            source=cast(SourceLiteral, record.source),
+        )
+
 
 
 LOG01_JOBS: Dict[str, Log01Job] = {}
 LOG01_JOBS_LOCK = threading.Lock()
 LOG01_TTL_SECONDS = 60 * 30
+# Estados en los que el job aún no termina (no se limpia por TTL)
+_ACTIVE_STATUSES = log01_jobs.ACTIVE_STATUSES
 
                 
 def _cleanup_log01_job_files(job: Log01Job) -> None:
     if job.work_dir and os.path.isdir(job.work_dir):
         shutil.rmtree(job.work_dir, ignore_errors=True)
+    try:
+        log01_jobs.delete_job(job.operation_id)
+    except Exception:
+        logger.exception("LOG01 job record cleanup failed operation_id=%s", job.operation_id)
 
 
 def _cleanup_log01_jobs() -> None:
@@ -83,7 +109,7 @@ def _cleanup_log01_jobs() -> None:
     stale: List[Log01Job] = []
     with LOG01_JOBS_LOCK:
         for operation_id, job in list(LOG01_JOBS.items()):
-            if job.status == "running":
+            if job.status in _ACTIVE_STATUSES:
                 continue
             if now - job.created_at < LOG01_TTL_SECONDS:
                 continue
@@ -93,6 +119,29 @@ def _cleanup_log01_jobs() -> None:
         _cleanup_log01_job_files(job)
 
 
+def _get_log01_job(operation_id: str) -> Optional[Log01Job]:
+    """
+    Job en memoria o, si lo ejecuta otro worker o hubo un reinicio, el que quedó
+    en log01_job (solo los terminados se guardan en memoria).
+    """
+    with LOG01_JOBS_LOCK:
+        job = LOG01_JOBS.get(operation_id)
+    if job is not None:
+        return job
+    try:
+        record = log01_jobs.get_job(operation_id)
+    except Exception:
+        logger.exception("LOG01 job record lookup failed operation_id=%s", operation_id)
+        return None
+    if record is None:
+        return None
+    job = Log01Job.from_record(record)
+    if record.status != "complete":
+        return job
+    with LOG01_JOBS_LOCK:
+        return LOG01_JOBS.setdefault(operation_id, job)
+
+
 def _persist_upload_files(files: List[UploadFile], work_dir: str) -> List[Log01InputFile]:
     items: List[Log01InputFile] = []
     for idx, up in enumerate(files, start=1):
@@ -135,6 +184,135 @@ def _infer_log01_run_source(job_source: str, summary: Dict[str, Any]) -> str:
     return job_source
 
 
+def _save_job_state(operation_id: str, **fields: Any) -> None:
+    """Refleja el estado en log01_job; un fallo de BD no debe tumbar el job."""
+    try:
+        log01_jobs.update_job(operation_id, **fields)
+    except Exception:
+        logger.exception("LOG01 job record update failed operation_id=%s", operation_id)
+
+
+def _log01_run_exists(operation_id: str) -> bool:
+    # Un job reanudado pudo haber registrado su corrida antes del reinicio
+    with Session(engine) as session:
+        return session.exec(select(Log01Run.id).where(Log01Run.operation_id == operation_id)).first() is not None
+
+
+def _persist_log01_run(
+    operation_id: str,
+    run_source: str,
+    res: Log01ProcessResult,
+    sess_snapshot: Dict[str, Any]
+) -> None:
+    """Registra la corrida y sus artefactos en una sola transacción."""
+    if _log01_run_exists(operation_id):
+        logger.info("LOG01 run already persisted operation_id=%s", operation_id)
+        return
+
+    xlsx_bytes = res.xlsx_bytes
+    out_name = res.out_name
+    _summary = res.summary
+    settings = get_settings()
+
+    def _write_persistent(run_id: int, filename: str, content: bytes) -> tuple[str, int]:
+        base_dir = settings.data_dir / "logistica" / "log01_runs" / str(run_id)
+        base_dir.mkdir(parents=True, exist_ok=True)
+        abs_path = base_dir / filename
+        abs_path.write_bytes(content)
+        rel_path = str(abs_path.relative_to(settings.data_dir))
+        return rel_path, abs_path.stat().st_size
+
+    with Session(engine) as session:
+        serie_ini = None
+        serie_fin = None
+        try:
+            if isinstance(_summary, dict):
+                serie_ini = _summary.get("serie_ini")
+                serie_fin = _summary.get("serie_fin")
+        except Exception:
+            serie_ini = None
+            serie_fin = None
+
+        def _to_int(s: Any) -> Optional[int]:
+            if s is None:
+                return None
+            if isinstance(s, int):
+                return s
+            if isinstance(s, str):
+                t = s.strip()
+                if t.isdigit():
+                    try:
+                        return int(t)
+                    except Exception:
+                        return None
+            return None
+
+        run = Log01Run(
+            operation_id=operation_id,
+            source=run_source,
+            output_name=out_name,
+            status="COMPLETADO",
+            created_at=datetime.utcnow(),
+            completed_at=datetime.utcnow(),
+            created_by_user_id=sess_snapshot["userId"],
+            created_by_username=(sess_snapshot.get("username") or "").strip() or "desconocido",
+            created_by_full_name=sess_snapshot.get("fullName"),
+            created_by_banco_id=sess_snapshot.get("bancoId"),
+            summary_json=_summary,
+            serie_ini=serie_ini,
+            serie_fin=serie_fin,
+            serie_ini_num=_to_int(serie_ini),
+            serie_fin_num=_to_int(serie_fin),
+        )
+        session.add(run)
+        # flush (no commit) para obtener el id: corrida y artefactos se confirman juntos
+        session.flush()
+        run_id = run.id
+        if run_id is None:
+            raise RuntimeError("LOG01 persistence failed: run.id is None")
+        run_id = cast(int, run_id)
+
+        base = Path(out_name or f"LOG01_{operation_id}").stem
+
+        # Excel
+        excel_filename = out_name or f"{base}.xlsx"
+        excel_rel, excel_size = _write_persistent(run_id, excel_filename, xlsx_bytes)
+        session.add(Log01Artifact(
+            run_id=run_id,
+            kind="EXCEL_FINAL",
+            filename=excel_filename,
+            storage_rel_path=excel_rel,
+            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            size_bytes=excel_size,
+        ))
+
+        # NO CONFORME FINAL JSON
+        nc_filename = f"{base}__NO_CONFORME_FINAL.json"
+        nc_rel, nc_size = _write_persistent(run_id, nc_filename, res.no_conforme_json)
+        session.add(Log01Artifact(
+            run_id=run_id,
+            kind="JSON_NO_CONFORME_FINAL",
+            filename=nc_filename,
+            storage_rel_path=nc_rel,
+            content_type="application/json",
+            size_bytes=nc_size,
+        ))
+
+        # MANIFIESTO JSON
+        man_filename = f"{base}__MANIFIESTO.json"
+        man_rel, man_size = _write_persistent(run_id, man_filename, res.manifest_json)
+        session.add(Log01Artifact(
+            run_id=run_id,
+            kind="JSON_MANIFIESTO",
+            filename=man_filename,
+            storage_rel_path=man_rel,
+            content_type="application/json",
+            size_bytes=man_size
+        ))
+
+        session.commit()
+
+
 def _run_log01_job(
     job: Log01Job,
     file_items: List[Log01InputFile],
@@ -143,6 +321,16 @@ def _run_log01_job(
 ) -> None:
     operation_id = job.operation_id
     cancel_token = cancel_manager.get(operation_id)
+    with LOG01_JOBS_LOCK:
+        if job.status == "queued":
+            job.status = "running"
+    try:
+        log01_jobs.mark_running(operation_id)
+    except Exception:
+        logger.exception("LOG01 job record update failed operation_id=%s", operation_id)
+    # Mientras corre, el lease impide que otro proceso lo reanude
+    lease = log01_jobs.LeaseKeeper(operation_id)
+    lease.start()
     try:
         res = process_log01_files(
             file_items=file_items,
@@ -150,11 +338,12 @@ def _run_log01_job(
             output_filename=output_filename,
             cancel_token=cancel_token,
             source=job.source,
+            checkpoint_dir=os.path.join(job.work_dir, "checkpoints"),
+            on_checkpoint=lambda n: _save_job_state(
+                operation_id, files_done=n, lease_until=log01_jobs.lease_deadline()
+            ),
         )
-        xlsx_bytes = res.xlsx_bytes
-        out_name = res.out_name
-        _summary = res.summary
-        run_source = _infer_log01_run_source(job.source, _summary)
+        run_source = _infer_log01_run_source(job.source, res.summary)
 
         # 1) Excel final (CONFORME)
         result_path = os.path.join(job.work_dir, "result.xlsx")
@@ -172,105 +361,7 @@ def _run_log01_job(
             out_f.write(res.manifest_json)
 
         try:
-            settings = get_settings()
-
-            def _write_persistent(run_id: int, filename: str, content: bytes) -> tuple[str, int]:
-                base_dir = settings.data_dir / "logistica" / "log01_runs" / str(run_id)
-                base_dir.mkdir(parents=True, exist_ok=True)
-                abs_path = base_dir / filename
-                abs_path.write_bytes(content)
-                rel_path = str(abs_path.relative_to(settings.data_dir))
-                return rel_path, abs_path.stat().st_size
-            
-            with Session(engine) as session:
-                serie_ini = None
-                serie_fin = None
-                try:
-                    if isinstance(_summary, dict):
-                        serie_ini = _summary.get("serie_ini")
-                        serie_fin = _summary.get("serie_fin")
-                except Exception:
-                    serie_ini = None
-                    serie_fin = None
-
-                def _to_int(s: Any) -> Optional[int]:
-                    if s is None:
-                        return None
-                    if isinstance(s, int):
-                        return s
-                    if isinstance(s, str):
-                        t = s.strip()
-                        if t.isdigit():
-                            try:
-                                return int(t)
-                            except Exception:
-                                return None
-                    return None
-                
-                run = Log01Run(
-                    operation_id=operation_id,
-                    source=run_source,
-                    output_name=out_name,
-                    status="COMPLETADO",
-                    created_at=datetime.utcnow(),
-                    completed_at=datetime.utcnow(),
-                    created_by_user_id=sess_snapshot["userId"],
-                    created_by_username=(sess_snapshot.get("username") or "").strip() or "desconocido",
-                    created_by_full_name=sess_snapshot.get("fullName"),
-                    created_by_banco_id=sess_snapshot.get("bancoId"),
-                    summary_json=_summary,
-                    serie_ini=serie_ini,
-                    serie_fin=serie_fin,
-                    serie_ini_num=_to_int(serie_ini),
-                    serie_fin_num=_to_int(serie_fin),
-                )
-                session.add(run)
-                session.commit()
-                session.refresh(run)
-                run_id = run.id
-                if run_id is None:
-                    raise RuntimeError("LOG01 persistence failed: run.id is None")
-                run_id = cast(int, run_id)
-
-                base = Path(out_name or f"LOG01_{operation_id}").stem
-
-                # Excel
-                excel_filename = out_name or f"{base}.xlsx"
-                excel_rel, excel_size = _write_persistent(run_id, excel_filename, xlsx_bytes)
-                session.add(Log01Artifact(
-                    run_id=run_id,
-                    kind="EXCEL_FINAL",
-                    filename=excel_filename,
-                    storage_rel_path=excel_rel,
-                    content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    size_bytes=excel_size,
-                ))
-
-                # NO CONFORME FINAL JSON
-                nc_filename = f"{base}__NO_CONFORME_FINAL.json"
-                nc_rel, nc_size = _write_persistent(run_id, nc_filename, res.no_conforme_json)
-                session.add(Log01Artifact(
-                    run_id=run_id,
-                    kind="JSON_NO_CONFORME_FINAL",
-                    filename=nc_filename,
-                    storage_rel_path=nc_rel,
-                    content_type="application/json",
-                    size_bytes=nc_size,
-                ))
-
-                # MANIFIESTO JSON
-                man_filename = f"{base}__MANIFIESTO.json"
-                man_rel, man_size = _write_persistent(run_id, man_filename, res.manifest_json)
-                session.add(Log01Artifact(
-                    run_id=run_id,
-                    kind="JSON_MANIFIESTO",
-                    filename=man_filename,
-                    storage_rel_path=man_rel,
-                    content_type="application/json",
-                    size_bytes=man_size
-                ))
-
-                session.commit()
+            _persist_log01_run(operation_id, run_source, res, sess_snapshot)
         except Exception:
             logger.exception("LOG01 persistence failed operation_id=%s", operation_id)
 
@@ -282,6 +373,15 @@ def _run_log01_job(
                 current.result_path = result_path
                 current.no_conforme_path = no_conforme_path
                 current.manifest_path = manifest_path
+        _save_job_state(
+            operation_id,
+            status="complete",
+            output_name=res.out_name,
+            result_path=result_path,
+            no_conforme_path=no_conforme_path,
+            manifest_path=manifest_path,
+            finished_at=datetime.utcnow(),
+        )
 
 
     except Log01Cancelled:
@@ -303,6 +403,7 @@ def _run_log01_job(
                 current.status = "error"
                 current.error = str(exc)
     finally:
+        lease.stop()
         cancel_manager.remove(operation_id)
         # Cleanup inmediato para jobs cancelados o con error.
         # Importante: hacerlo AQUÍ (cuando el thread termina), para no borrar work_dir prematuramente.
@@ -316,6 +417,89 @@ def _run_log01_job(
 
 
 
+# ----------------------------
+# Reanudación al arrancar
+# ----------------------------
+def _resume_log01_record(record: Any) -> None:
+    operation_id = record.operation_id
+    files = record.files_json or []
+    file_items = [Log01InputFile(name=f.get("name") or "", path=f.get("path")) for f in files]
+    missing = [it.name for it in file_items if not it.path or not os.path.exists(it.path)]
+    if not file_items or missing:
+        logger.warning(
+            "LOG01 job not resumable operation_id=%s missing_files=%s", operation_id, missing[:5]
+        )
+        _save_job_state(operation_id, status="error", error="Archivos de entrada no disponibles para reanudar.")
+        _cleanup_log01_job_files(Log01Job.from_record(record))
+        return
+
+    job = Log01Job.from_record(record)
+    job.status = "queued"
+    with LOG01_JOBS_LOCK:
+        if operation_id in LOG01_JOBS:
+            return
+        LOG01_JOBS[operation_id] = job
+    cancel_manager.create(operation_id)
+    progress_manager.ensure(operation_id)
+    logger.info(
+        "LOG01 job resumed operation_id=%s attempt=%s checkpoints=%s/%s",
+        operation_id,
+        (record.attempts or 0) + 1,
+        record.files_done,
+        record.files_total,
+    )
+    _run_log01_job(job, file_items, record.output_filename, record.session_json or {})
+
+
+def _claim_interrupted() -> List[Any]:
+    return [r for r in log01_jobs.list_interrupted() if log01_jobs.claim_job(r)]
+
+
+def _resume_log01_jobs_worker(records: List[Any]) -> None:
+    # De a uno, en orden de creación: al arrancar no se lanzan N consolidaciones a la vez.
+    # Luego espera a que venzan los leases de otros procesos: si su dueño murió
+    # (p.ej. reinicio rápido de un worker) el job se toma aquí.
+    while True:
+        for record in records:
+            try:
+                _resume_log01_record(record)
+            except Exception:
+                logger.exception("LOG01 job resume failed operation_id=%s", record.operation_id)
+        try:
+            expiry = log01_jobs.next_lease_expiry()
+            if expiry is None:
+                return
+            time.sleep(max(0.0, (expiry - datetime.utcnow()).total_seconds()) + 0.05)
+            records = _claim_interrupted()
+        except Exception:
+            logger.exception("LOG01 job resume scan failed")
+            return
+
+
+def resume_log01_jobs() -> Optional[threading.Thread]:
+    """
+    Al arrancar: limpia los jobs terminados vencidos y reanuda (en un hilo) los que
+    quedaron en cola o a medias, desde el último archivo con checkpoint. Los que
+    otro proceso vivo sigue ejecutando (lease vigente) no se tocan.
+    """
+    if not get_settings().log01_resume_jobs:
+        return None
+    try:
+        for record in log01_jobs.list_expired(LOG01_TTL_SECONDS):
+            _cleanup_log01_job_files(Log01Job.from_record(record))
+        claimed = _claim_interrupted()
+        waiting = log01_jobs.next_lease_expiry() is not None
+    except Exception:
+        logger.exception("LOG01 job resume scan failed")
+        return None
+    if not claimed and not waiting:
+        return None
+    logger.info("LOG01 resuming %s interrupted job(s); leased by other processes: %s", len(claimed), waiting)
+    thread = threading.Thread(target=_resume_log01_jobs_worker, args=(claimed,), daemon=True)
+    thread.start()
+    return thread
+
+
 # ----------------------------
 # Progreso (NDJSON stream)
 # ----------------------------
@@ -325,7 +509,6 @@ async def log01_progress_stream(operation_id: str):
     channel, history = progress_manager.subscribe(operation_id)
 
     async def event_stream():
-        last_heartbeat = time.monotonic()
         try:
             # Primer evento JSON para handshake; evita carrera entre stream y start.
             hello_event = {
@@ -340,34 +523,22 @@ async def log01_progress_stream(operation_id: str):
                 }
             )
             logger.info("LOG01 progress hello sent operation_id=%s", operation_id)
-            for event in history:
-                logger.debug(
-                    "LOG01 progress yield operation_id=%s type=%s stage=%s",
-                    operation_id,
-                    event.get("type"),
-                    event.get("stage"),
-                )
-                yield progress_manager.encode_event(event)
-            while True:
-                try:
-                    item = channel.queue.get_nowait()
-                except queue.Empty:
-                    now = time.monotonic()
-                    if now - last_heartbeat >= 0.8:
-                        yield b"\n"
-                        last_heartbeat = now
-                    await asyncio.sleep(0.1)
+            if history:
+                logger.debug("LOG01 progress history operation_id=%s events=%s", operation_id, len(history))
+                yield progress_manager.encode_events(history)
+            async for batch in progress_manager.follow(channel, history, heartbeat_s=0.8):
+                if batch is None:
+                    # Sin eventos en 0.8 s: heartbeat para mantener vivo el stream
+                    yield b"\n"
                     continue
-                if item is SENTINEL:
-                    break
                 logger.debug(
-                    "LOG01 progress yield operation_id=%s type=%s stage=%s",
+                    "LOG01 progress yield operation_id=%s events=%s last_type=%s stage=%s",
                     operation_id,
-                    item.get("type"),
-                    item.get("stage"),
+                    len(batch),
+                    batch[-1].get("type"),
+                    batch[-1].get("stage"),
                 )
-                yield progress_manager.encode_event(item)
-                last_heartbeat = time.monotonic()
+                yield progress_manager.encode_events(batch)
         finally:
             logger.info("LOG01 progress client disconnected operation_id=%s", operation_id)
             progress_manager.unsubscribe(operation_id)
@@ -417,10 +588,10 @@ def log01_poll(operation_id: str, cursor: int = -1):
 
 @router.post("/cancel/{operation_id}")
 def log01_cancel(operation_id: str):
+    with LOG01_JOBS_LOCK:
+        job = LOG01_JOBS.get(operation_id)
     if not cancel_manager.cancel(operation_id):
-        with LOG01_JOBS_LOCK:
-            job = LOG01_JOBS.get(operation_id)
-        if job is None or job.status != "running":
+        if job is None or job.status not in _ACTIVE_STATUSES:
             raise HTTPException(
                 status_code=404,
                 detail="Operacion no encontrada.",
@@ -429,10 +600,13 @@ def log01_cancel(operation_id: str):
         # Token ausente (condición anómala): crear y cancelar para que el worker lo detecte.
         tok = cancel_manager.create(operation_id)
         tok.cancel()
+    elif job is None:
+        # Job de otro worker: su proceso emite "cancelled" y cierra el canal
+        return {"ok": True}
     # Reflejar estado cancelado de inmediato (el cleanup real ocurre al finalizar el worker).
     with LOG01_JOBS_LOCK:
         job = LOG01_JOBS.get(operation_id)
-        if job and job.status == "running":
+        if job and job.status in _ACTIVE_STATUSES:
             job.status = "cancelled"
             job.error = "Cancelado por el usuario"
     _emit(operation_id, {"type": "status", "stage": "cancelled", "message": "Cancelado por el usuario"})
@@ -466,11 +640,11 @@ def log01_start(
 
     src = cast(SourceLiteral, src)
 
-    with LOG01_JOBS_LOCK:
-        if op_id in LOG01_JOBS:
-            raise HTTPException(status_code=409, detail="Operacion ya existe.")
+    if _get_log01_job(op_id) is not None:
+        raise HTTPException(status_code=409, detail="Operacion ya existe.")
 
-    work_dir = tempfile.mkdtemp(prefix=f"log01_{op_id}_")
+    # Carpeta persistente (no %TEMP%): el job se puede reanudar tras un reinicio
+    work_dir = tempfile.mkdtemp(prefix=f"log01_{op_id}_", dir=str(log01_jobs.jobs_root()))
     try:
         file_items = _persist_upload_files(files, work_dir)
     except Exception:
@@ -498,6 +672,18 @@ def log01_start(
         "bancoId": sess.get("bancoId"),
     
     }
+    try:
+        log01_jobs.create_job(
+            op_id,
+            src,
+            output_filename,
+            work_dir,
+            [{"name": it.name, "path": it.path} for it in file_items],
+            sess_snapshot,
+        )
+    except Exception:
+        # Sin registro el job corre igual, solo que no se podrá reanudar
+        logger.exception("LOG01 job record create failed operation_id=%s", op_id)
 
     thread = threading.Thread(
         target=_run_log01_job,
@@ -511,13 +697,12 @@ def log01_start(
 @router.get("/result/{operation_id}")
 def log01_result(operation_id: str):
     _cleanup_log01_jobs()
-    with LOG01_JOBS_LOCK:
-        job = LOG01_JOBS.get(operation_id)
+    job = _get_log01_job(operation_id)
 
     if job is None:
         raise HTTPException(status_code=404, detail="Resultado no encontrado.")
 
-    if job.status == "running":
+    if job.status in _ACTIVE_STATUSES:
         return JSONResponse(status_code=202, content={"status": "processing"})
 
     if job.status == "cancelled":
@@ -543,11 +728,10 @@ def log01_result(operation_id: str):
 @router.get("/result/{operation_id}/no-conforme")
 def log01_result_no_conforme(operation_id: str):
     _cleanup_log01_jobs()
-    with LOG01_JOBS_LOCK:
-        job = LOG01_JOBS.get(operation_id)
+    job = _get_log01_job(operation_id)
     if not job:
         raise HTTPException(status_code=404, detail="Operacion no encontrada.")
-    if job.status in ("started", "running"):
+    if job.status in ("started", *_ACTIVE_STATUSES):
         raise HTTPException(status_code=202, detail="Aun procesando. Intenta nuevamente.")
     if job.status != "complete" or not job.no_conforme_path or not os.path.exists(job.no_conforme_path):
         raise HTTPException(status_code=404, detail="No hay archivo NO CONFORME final disponible.")
@@ -560,11 +744,10 @@ def log01_result_no_conforme(operation_id: str):
 @router.get("/result/{operation_id}/manifest")
 def log01_result_manifest(operation_id: str):
     _cleanup_log01_jobs()
-    with LOG01_JOBS_LOCK:
-        job = LOG01_JOBS.get(operation_id)
+    job = _get_log01_job(operation_id)
     if not job:
         raise HTTPException(status_code=404, detail="Operacion no encontrada.")
-    if job.status in ("started", "running"):
+    if job.status in ("started", *_ACTIVE_STATUSES):
         raise HTTPException(status_code=202, detail="Aun procesando. Intenta nuevamente.")
     if job.status != "complete" or not job.manifest_path or not os.path.exists(job.manifest_path):
         raise HTTPException(status_code=404, detail="No hay manifiesto disponible.")
@@ -625,9 +808,18 @@ def log01_history_list(
     dateTo: Optional[str] = None,
     source: Optional[str] = None,
     status: Optional[str] = None,
+    cursor: Optional[str] = None,
 ):
     deleted_at_col = cast(Any, Log01Run.deleted_at)
     created_at_col = cast(Any, Log01Run.created_at)
+    id_col = cast(Any, Log01Run.id)
+    # Paginación por cursor (opcional): reemplaza a offset
+    seek = None
+    if cursor:
+        try:
+            seek = seek_after(created_at_col, id_col, cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     where = []
     if not include_deleted:
         where.append(deleted_at_col.is_(None))
@@ -678,13 +870,14 @@ def log01_history_list(
 
     with Session(engine) as session:
         total = session.exec(select(func.count()).select_from(Log01Run).where(*where)).one()
-        runs = session.exec(
-            select(Log01Run)
-            .where(*where)
-            .order_by(created_at_col.desc())
-            .offset(offset)
-            .limit(limit)
-        ).all()
+        stmt = select(Log01Run).where(*where).order_by(created_at_col.desc(), id_col.desc())
+        if seek is not None:
+            stmt = stmt.where(seek)
+        if cursor is None:
+            stmt = stmt.offset(offset)
+        runs = list(session.exec(stmt.limit(limit + 1)).all())
+        next_page = next_cursor(runs, limit, "created_at")
+        runs = runs[:limit]
 
         items = [
             Log01RunListItem(
@@ -703,7 +896,13 @@ def log01_history_list(
             )
             for r in runs
         ]
-        return Log01RunListResponse(items=items, total=total, limit=limit, offset=offset)
+        return Log01RunListResponse(
+            items=items,
+            total=total,
+            limit=limit,
+            offset=offset if cursor is None else 0,
+            next_cursor=next_page,
+        )
 
 
 @router.get("/history/{run_id}", response_model=Log01RunDetail)
@@ -8,7 +8,6 @@ import io
 import re
 import unicodedata
 import tempfile
-import queue
 import threading
 import uuid
 import time
@@ -29,7 +28,7 @@ from app.core.settings import get_settings
 from sqlmodel import Session, select
 from app.core.db import engine
 from app.models import Log01Artifact
-from app.oi_tools.services.progress_manager import progress_manager, SENTINEL as PM_SENTINEL
+from app.oi_tools.services.progress_manager import progress_manager
 from app.oi_tools.services.cancel_manager import cancel_manager, CancelToken
 
 
@@ -2552,37 +2551,19 @@ def _ndjson_stream(operation_id: str):
             }
         )
         # enviar historial primero
-        for ev in history:
-            yield progress_manager.encode_event(ev)
+        if history:
+            yield progress_manager.encode_events(history)
 
         # Empujón inicial para que el navegador "abra" el stream (y evitar buffering por chunks pequeños)
         yield b"\n"
 
         # luego stream en vivo
-        while True:
-            try:
-                item = channel.queue.get(timeout=1.0)
-            except queue.Empty:
+        for batch in progress_manager.follow_sync(channel, history, heartbeat_s=1.0):
+            if batch is None:
                 # heartbeat: fuerza flush/chunks en Chrome y mantiene viva la conexión
                 yield progress_manager.encode_event({"type": "ping", "ts": time.time()})
                 continue
-            
-            if item is PM_SENTINEL:
-                break
-            if isinstance(item, dict):
-                yield progress_manager.encode_event(item)
-
-            try:
-                item = channel.queue.get(timeout=1.0)
-            except queue.Empty:
-                # Heartbeat: mantiene viva la conexión y fuerza flush continuo.
-                yield progress_manager.encode_event({"type": "ping", "ts": time.time()})
-                continue
-
-            if item is PM_SENTINEL:
-                break
-            if isinstance(item, dict):
-                yield progress_manager.encode_event(item)
+            yield progress_manager.encode_events(batch)
     finally:
         try:
             progress_manager.unsubscribe(operation_id)
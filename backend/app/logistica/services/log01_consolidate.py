@@ -1,17 +1,25 @@
 from __future__ import annotations
 
+import atexit
+import hashlib
 import json
 import logging
 import os
 import re
+import threading
 import time
 import unicodedata
+import zlib
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
 from copy import copy
-from dataclasses import dataclass
-from datetime import date, datetime
+from dataclasses import dataclass, field, fields
+from datetime import date, datetime, time as dt_time, timedelta
 from io import BytesIO
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple, cast, Literal
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple, cast, Literal
 from typing import TypedDict
 
 from openpyxl import load_workbook
@@ -21,9 +29,12 @@ from openpyxl.utils.datetime import WINDOWS_EPOCH, from_excel
 from openpyxl.worksheet.worksheet import Worksheet
 
 from app.core.settings import get_settings
+from app.services.export_cache import ExportCache, make_key
 from app.oi_tools.services.progress_manager import progress_manager, _SENTINEL as SENTINEL
 from app.oi_tools.services.cancel_manager import CancelToken
 
+from .log01_series import Log01SeriesStore
+
 logger = logging.getLogger(__name__)
 
 
@@ -180,14 +191,6 @@ def _find_item_header_cell(ws: Worksheet) -> Optional[tuple[int, int]]:
     return None
 
 
-@dataclass
-class SerieInfo:
-    oi_num: int
-    oi_year: int
-    estado: str  # CONFORME / NO CONFORME
-    values: Dict[str, Any]
-
-
 _OUTPUT_KEYS = [
     "medidor",
     "q3",
@@ -383,571 +386,41 @@ def _normalize_input_date(v: Any, epoch: date) -> Optional[date]:
     return None
 
 
-def _read_input_bytes(item: Log01InputFile) -> bytes:
-    if item.data is not None:
-        return item.data
-    if item.path:
-        with open(item.path, "rb") as f:
-            return f.read()
-    return b""
-
-
-def process_log01_files(
-    file_items: List[Log01InputFile],
-    operation_id: Optional[str],
-    output_filename: Optional[str],
-    cancel_token: Optional["CancelToken"],
-    source: Literal["AUTO","BASES", "GASELAG"] = "AUTO",
-) -> Log01ProcessResult:
-    cancel_emitted = False
-
-    def _raise_cancelled() -> None:
-        nonlocal cancel_emitted
-        if cancel_token and cancel_token.is_cancelled():
-            if not cancel_emitted:
-                _emit(
-                    operation_id,
-                    {"type": "status", "stage": "cancelled", "message": "Cancelado por el usuario"},
-                )
-                cancel_emitted = True
-            raise Log01Cancelled()
-
-    _emit(operation_id, {"type": "status", "stage": "received", "message": "Archivos recibidos", "progress": 0})
-
-    # 1) Consolidar serie -> (estado final por OI mayor; CONFORME prevalece si existe)
-    series: Dict[str, SerieInfo] = {}
-    series_meta: Dict[str, Dict[str, Any]] = {}
-    total_files = len(file_items)
-    ok_files = 0
-    bad_files = 0
-    rows_total_read = 0
-
-    # Auditoría "de origen" (por archivo/OI), NO depende del dedupe
-    audit_by_oi: List[Dict[str, Any]] = []
-    files_rejected: List[Dict[str, Any]] = []
-    input_conformes_total = 0
-    input_no_conformes_total = 0
-
-    def _new_source_bucket() ->  Dict[str, Any]:
-        return {
-            "files_total": 0,
-            "files_ok": 0,
-            "files_error": 0,
-            "rows_read": 0,
-            "conformes": 0,
-            "no_conformes": 0,
-            "rows_ignored_invalid_estado": 0, 
-        }
-    
-    # Auditoría agregada por tipo de origen
-    by_source: Dict[str, Dict[str, Any]] = {
-        "BASES": _new_source_bucket(),
-        "GASELAG": _new_source_bucket(),
-    }
-
-    for idx, item in enumerate(file_items, start=1):
-        _raise_cancelled()
-
-        fname = item.name or f"archivo_{idx}.xlsx"
-        bases_filename = bool(_BASES_FILENAME_RE.search(fname or ""))
-        _emit(
-            operation_id,
-            {
-                "type": "status",
-                "stage": "file",
-                "message": f"Procesando {fname}",
-                "file": fname,
-                "index": idx,
-                "total": total_files,
-                "progress": float((idx - 1) * 100 / max(total_files, 1)),
-            },
-        )
-
-        oi_num: Optional[int] = None
-        oi_year: Optional[int] = None
-        oi_tag: Optional[str] = None
-        source_type: str = "AUTO"
-        try:
-            data = _read_input_bytes(item)
-            if not data:
-                raise ValueError("El archivo está vacío o no se pudo leer.")
-
-            wb = load_workbook(filename=BytesIO(data), data_only=True, read_only=True)
-            ws = wb.worksheets[0]
-
-            item_pos = _find_item_header_cell(ws)
-            if not item_pos:
-                raise ValueError(
-                    "No se encontró la cabecera 'Item' (normalizada) en la hoja."
-                )
-            header_row, _item_col = item_pos
-            header_row_idx: int = header_row
-
-            input_header_map: Dict[str, int] = {}
-            for c in range(1, ws.max_column + 1):
-                name = _norm_header(ws.cell(row=header_row, column=c).value)
-                if name and name not in input_header_map:
-                    input_header_map[name] = c
-
-            def _peek_col_value(col: Optional[int], max_scan: int = 25) -> Optional[str]:
-                if not col:
-                    return None
-                max_row = min(ws.max_row or 0, header_row_idx + max_scan)
-                for row in ws.iter_rows(
-                    min_row=header_row_idx + 1,
-                    max_row=max_row,
-                    min_col=col,
-                    max_col=col,
-                    values_only=True,
-                ):
-                    v = row[0] if row else None
-                    if v is None:
-                        continue
-                    if isinstance(v, str) and not v.strip():
-                        continue
-                    return _norm_str(v)
-                return None
-
-            # AUTO / BASES / GASELAG: se resuelve por archivo en source_type
-
-            def _make_find_input_col(aliases: Dict[str, List[str]]):
-                def find_input_col(key: str) -> Optional[int]:
-                    col = input_header_map.get(_norm_header(key))
-                    if col:
-                        return col
-                    for alias in aliases.get(key, []):
-                        col2 = input_header_map.get(_norm_header(alias))
-                        if col2:
-                            return col2
-                    return None
-                return find_input_col
-
-            find_bases = _make_find_input_col(_INPUT_HEADER_ALIASES_BASES)
-            missing_bases = [k for k in _REQUIRED_INPUT_KEYS_BASES if not find_bases(k)]
-
-            find_gaselag = _make_find_input_col(_INPUT_HEADER_ALIASES_GASELAG)
-            missing_gaselag_v2 = [k for k in _REQUIRED_INPUT_KEYS_GASELAG_V2 if not find_gaselag(k)]
-            missing_gaselag_v1 = [k for k in _REQUIRED_INPUT_KEYS_GASELAG_V1 if not find_gaselag(k)]
-
-            gaselag_variant: str | None = None
-
-            if source == "BASES":
-                if missing_bases:
-                    raise ValueError("Faltan cabeceras requeridas (BASES): " + ", ".join(missing_bases))
-                source_type = "BASES"
-                find_input_col = find_bases
-            elif source == "GASELAG":
-                if not missing_gaselag_v2:
-                    source_type = "GASELAG"
-                    gaselag_variant = "V2"
-                    find_input_col = find_gaselag
-                elif not missing_gaselag_v1:
-                    source_type = "GASELAG"
-                    gaselag_variant = "V1"
-                    find_input_col = find_gaselag
-                else:
-                    # reporta el más cercano (útil en soporte)
-                    miss = missing_gaselag_v2 if len(missing_gaselag_v2) <= len(missing_gaselag_v1) else missing_gaselag_v1
-                    raise ValueError("Faltan cabeceras requeridas (GASELAG): " + ", ".join(miss))
-            else:
-                # AUTO: detectar por cabeceras + nombre Base Comercial + organismo
-                if bases_filename:
-                    source_type = "BASES"
-                    find_input_col = find_bases
-                elif (not missing_bases) and (not missing_gaselag_v2):
-                    org_col = find_gaselag("organismo") or find_bases("organismo")
-                    org_val = _peek_col_value(org_col)
-                    org_norm = (org_val or "").strip().upper()
-                    if org_norm == "OI-066":
-                        source_type = "GASELAG"
-                        gaselag_variant = "V2"
-                        find_input_col = find_gaselag
-                    elif org_norm == "OI-040":
-                        source_type = "BASES"
-                        find_input_col = find_bases
-                    else:
-                        source_type = "GASELAG"
-                        gaselag_variant = "V2"
-                        find_input_col = find_gaselag
-                elif not missing_gaselag_v2:
-                    source_type = "GASELAG"
-                    gaselag_variant = "V2"
-                    find_input_col = find_gaselag
-                elif not missing_gaselag_v1:
-                    source_type = "GASELAG"
-                    gaselag_variant = "V1"
-                    find_input_col = find_gaselag
-                elif not missing_bases:
-                    source_type = "BASES"
-                    find_input_col = find_bases
-                else:
-                    # Reportar el set "más cercano" para debugging
-                    if len(missing_bases) <= min(len(missing_gaselag_v2), len(missing_gaselag_v1)):
-                        raise ValueError("Faltan cabeceras requeridas (BASES): " + ", ".join(missing_bases))
-                    miss = missing_gaselag_v2 if len(missing_gaselag_v2) <= len(missing_gaselag_v1) else missing_gaselag_v1
-                    raise ValueError("Faltan cabeceras requeridas (GASELAG): " + ", ".join(miss))
-
-            # Validación por nombre SOLO para BASES
-            if source_type == "BASES":
-                oi_num, oi_year = _parse_oi_parts_from_filename(fname)
-                oi_tag = _parse_oi_tag_from_filename(fname)
-            else:
-                oi_num = 0
-                oi_year = 0
-                oi_tag = "GASELAG"
-
-            if source_type == "BASES":
-                required_keys = _REQUIRED_INPUT_KEYS_BASES
-            else:
-                required_keys = (
-                    _REQUIRED_INPUT_KEYS_GASELAG_V2
-                    if gaselag_variant == "V2"
-                    else _REQUIRED_INPUT_KEYS_GASELAG_V1
-                )
-
-            file_conformes = 0
-            file_no_conformes = 0
-            file_no_conforme_series: list[str] = []
-            extracted = 0
-            ignored_invalid_estado = 0
-            invalid_estado_exmples: list[str] = []
-
-            # Construcción de columnas solo de las requeridas del modo
-            col_by_key = {key: find_input_col(key) for key in required_keys}
-            missing = [key for key, col in col_by_key.items() if not col]
-            if missing:
-                raise ValueError(
-                    "Faltan cabeceras requeridas: " + ", ".join(missing)
-                )
-
-            serie_col = col_by_key["medidor"]
-            estado_col = col_by_key["estado"]
-            relevant_cols = [col for col in col_by_key.values() if col]
-            max_col = max(relevant_cols) if relevant_cols else 1
-
-            def _row_value(row: tuple[Any, ...], col: Optional[int]) -> Any:
-                if not col:
-                    return None
-                idx = col - 1
-                if idx < 0 or idx >= len(row):
-                    return None
-                return row[idx]
-
-            def _is_blank_row(row: tuple[Any, ...], cols: list[int]) -> bool:
-                for c in cols:
-                    v = _row_value(row, c)
-                    if v is None:
-                        continue
-                    if isinstance(v, str) and not v.strip():
-                        continue
-                    return False
-                return True
-
-            # lectura desde la fila siguiente al header "Item", hasta fila completamente vacia
-            start_row = header_row + 1
-            for r, row in enumerate(
-                ws.iter_rows(
-                    min_row=start_row,
-                    max_row=ws.max_row,
-                    min_col=1,
-                    max_col=max_col,
-                    values_only=True,
-                ),
-                start=start_row,
-            ):
-                _raise_cancelled()
-
-                if _is_blank_row(row, relevant_cols):
-                    if extracted == 0:
-                        continue
-                    break
-
-                serie = _norm_str(_row_value(row, serie_col))
-                if not serie:
-                    continue
-
-                raw_estado = _row_value(row, estado_col)
-                estado = _normalize_estado_literal(raw_estado)
-                if not estado:
-                    ignored_invalid_estado += 1
-                    if raw_estado is not None and str(raw_estado).strip():
-                        if len(invalid_estado_exmples) < 5:
-                            invalid_estado_exmples.append(str(raw_estado)[:80])
-                    continue
-                    
-
-                if estado == "CONFORME":
-                    file_conformes += 1
-                else:
-                    file_no_conformes += 1
-                    file_no_conforme_series.append(serie)
-
-                # construir values para salida
-                row_values: Dict[str, Any] = {}
-                # inicializar todos los campos esperados en salida
-                for key in _OUTPUT_KEYS:
-                    if key == "estado":
-                        row_values[key] = estado
-                        continue
-                    if source_type == "GASELAG" and key == "organismo":
-                        col_org = find_input_col("organismo") # Opcional en V1, requerido en V2
-                        if col_org:
-                            row_values[key] = _row_value(row, col_org)
-                        else:
-                            row_values[key] = "OI-066"
-                        continue
-                    col = col_by_key.get(key)
-                    val = _row_value(row, col)
-                    if key == "fecha":
-                        row_values[key] = _normalize_input_date(val, epoch=wb.epoch)
-                    else:
-                        row_values[key] = val
-
-                extracted += 1
-                prev = series.get(serie)
-                if source_type == "BASES":
-                    # Dedupe por serie:
-                    # - Se queda con la OI mayor dentro del mismo estado.
-                    # - Si existe CONFORME en alguna OI, prevalece sobre NO CONFORME.
-                    oi_key = _oi_compare_key(oi_year, oi_num)
-                    meta = series_meta.setdefault(
-                        serie,
-                        {
-                            "has_conforme": False,
-                            "has_no_conforme": False,
-                            "latest_key": None,
-                            "latest_estado": None,
-                            "latest_oi_year": None,
-                            "latest_oi_num": None,
-                            "best_conforme_key": None,
-                            "best_conforme_oi_year": None,
-                            "best_conforme_oi_num": None,
-                            "best_no_conforme_key": None,
-                            "best_no_conforme_oi_year": None,
-                            "best_no_conforme_oi_num": None,
-                        },
-                    )
-
-                    # track latest overall (para auditoría)
-                    if meta["latest_key"] is None or oi_key > meta["latest_key"]:
-                        meta["latest_key"] = oi_key
-                        meta["latest_estado"] = estado
-                        meta["latest_oi_year"] = oi_year or 0
-                        meta["latest_oi_num"] = oi_num or 0
-
-                    if estado == "CONFORME":
-                        meta["has_conforme"] = True
-                        if meta["best_conforme_key"] is None or oi_key > meta["best_conforme_key"]:
-                            meta["best_conforme_key"] = oi_key
-                            meta["best_conforme_oi_year"] = oi_year or 0
-                            meta["best_conforme_oi_num"] = oi_num or 0
-                            series[serie] = SerieInfo(
-                                oi_num=oi_num or 0,
-                                oi_year=oi_year or 0,
-                                estado=estado,
-                                values=row_values,
-                            )
-                    else:
-                        meta["has_no_conforme"] = True
-                        if meta["best_no_conforme_key"] is None or oi_key > meta["best_no_conforme_key"]:
-                            meta["best_no_conforme_key"] = oi_key
-                            meta["best_no_conforme_oi_year"] = oi_year or 0
-                            meta["best_no_conforme_oi_num"] = oi_num or 0
-                            # Solo se usa NO CONFORME si no existe CONFORME.
-                            if not meta["has_conforme"]:
-                                series[serie] = SerieInfo(
-                                    oi_num=oi_num or 0,
-                                    oi_year=oi_year or 0,
-                                    estado=estado,
-                                    values=row_values,
-                                )
-                else:
-                    # GASELAG: no hay OI real; mantenemos oi_num=0 para no inventar OI-XXXX
-                    if prev is None or (prev.oi_num == 0 and prev.oi_year == 0):
-                        # baseline: solo registrar si no existe un registro BASES (oi_num>0)
-                        series[serie] = SerieInfo(
-                            oi_num=0,
-                            oi_year=0,
-                            estado=estado,
-                            values=row_values,
-                        )
-
-            file_no_conforme_series = sorted(set(file_no_conforme_series), key=_natural_key)
-            rows_total_read += extracted
-            if source_type not in ("BASES", "GASELAG"):
-                raise ValueError("No se pudo clasificar el archivo por cabeceras.")
-            ok_files += 1
-
-            # Agregado por tipo
-            b= by_source.setdefault(source_type, _new_source_bucket())
-            b["files_ok"] += 1
-            b["rows_read"] += extracted
-            b["conformes"] += file_conformes
-            b["no_conformes"] += file_no_conformes
-            b["rows_ignored_invalid_estado"] += ignored_invalid_estado
-
-            input_conformes_total += file_conformes
-            input_no_conformes_total += file_no_conformes
-            audit_by_oi.append(
-                {
-                    "filename": fname,
-                    "oi_num": oi_num if source_type == "BASES" else 0,
-                    "oi_year": oi_year if source_type == "BASES" else 0,
-                    "oi_tag": oi_tag,
-                    "source": source_type,
-                    "status": "OK",
-                    "rows_read": extracted,
-                    "conformes": file_conformes,
-                    "no_conformes": file_no_conformes,
-                    "rows_ignored_invalid_estado": ignored_invalid_estado,
-                    "invalid_estado_examples": invalid_estado_exmples,
-                    "series_no_conforme_origen": file_no_conforme_series,
-                    "error": None,
-                }
-            )
-            _emit(
-                operation_id,
-                {
-                    "type": "status",
-                    "stage": "file_done",
-                    "message": f"{fname} | Leidos: {extracted} | Conformes: {file_conformes} | No conformes: {file_no_conformes} | Ignorados(estado): {ignored_invalid_estado}",
-                    "file": fname,
-                    "rows_read": extracted,
-                    "conformes": file_conformes,
-                    "no_conformes": file_no_conformes,
-                    "rows_ignored_invalid_estado": ignored_invalid_estado,
-                },
-            )
-
-        except Exception as e:
-            bad_files += 1
-            raw = str(e) or "Error no especificado"
-            err_code, err_detail = _split_error_code_detail(raw)
-            err_code = err_code or _classify_file_error(raw)
-            if not err_detail:
-                err_detail = "Error no especificado"
-            # En errores debemos registrar el tipo REAL del archivo si ya fue detectado
-            # Si aún no se detectó, mantener AUTO e intentar inferir por el texto
-            err_source = source_type or "AUTO"
-            if err_code == "INVALID_OI_FILENAME":
-                err_source = "BASES"
-            elif err_source == "AUTO":
-                up = raw.upper()
-                if "(BASES)" in up:
-                    err_source = "BASES"
-                elif "(GASELAG)" in up:
-                    err_source = "GASELAG"
-                else:
-                    # Heurística por filename: si parece Base Comercial (OI-####-YYYY) => BASES
-                    if _parse_oi_tag_from_filename(fname):
-                        err_source = "BASES"
-                    else:
-                        err_source = "AUTO"
-            
-            # Si es BASES y el error NO es por filename inválido, intenta extraer oi_num/oi_tag
-            if err_source == "BASES" and err_code != "INVALID_OI_FILENAME":
-                if (
-                    not isinstance(oi_num, int)
-                    or oi_num <= 0
-                    or not isinstance(oi_year, int)
-                    or oi_year <= 0
-                ):
-                    try:
-                        oi_num, oi_year = _parse_oi_parts_from_filename(fname)
-                    except Exception:
-                        pass
-                if not isinstance(oi_tag, str) or not oi_tag:
-                    oi_tag = _parse_oi_tag_from_filename(fname)
-            elif err_source == "GASELAG":
-                oi_num = 0
-                oi_year = 0
-                oi_tag = "GASELAG"
-
-            # Agregado por tipo
-            if err_source != "AUTO":
-                b= by_source.setdefault(err_source, _new_source_bucket())
-                b["files_error"] += 1
-
-            audit_by_oi.append(
-                {
-                    "filename": fname,
-                    "oi_num": (oi_num if err_source == "BASES" else 0),
-                    "oi_year": (oi_year if err_source == "BASES" else 0),
-                    "oi_tag": oi_tag,
-                    "source": err_source,
-                    "status": "ERROR",
-                    "rows_read": 0,
-                    "conformes": 0,
-                    "no_conformes": 0,
-                    "error": raw,
-                }
-            )
-            files_rejected.append(
-                {
-                    "filename": fname,
-                    "oi_num": (oi_num if err_source == "BASES" else 0),
-                    "oi_year": (oi_year if err_source == "BASES" else 0),
-                    "oi_tag": oi_tag,
-                    "code": err_code,
-                    "detail": err_detail,
-                    "source": err_source,
-                }
-            )
-            _emit(
-                operation_id,
-                {
-                    "type": "status",
-                    "stage": "file_error",
-                    "message": f"{fname} | ERROR: {err_code} | {err_detail}",
-                    "file": fname,
-                    "code": err_code,
-                    "detail": err_detail,
-                },
-            )
-
-    _raise_cancelled()
-
-    # 2) Resultado final: solo CONFORMES (orden natural por serie)
-    conformes = [s for s, info in series.items() if info.estado == "CONFORME"]
-    conformes.sort(key=_natural_key)
+# ----------------------------
+# Salida (plantilla LOG01, hoja BD)
+# ----------------------------
 
-    series_total_dedup = len(series)
-    series_conformes = len(conformes)
-    series_no_conformes_final = series_total_dedup - series_conformes
-    series_duplicates_eliminated = max(rows_total_read - series_total_dedup, 0)
+# Aliases mínimos de cabecera en plantilla (por si usan nombres distintos)
+# Clave: key interno; valores: posibles headers en plantilla
+_TEMPLATE_ALIASES: Dict[str, List[str]] = {
+    "item": ["item"],
+    "medidor": ["medidor", "serie", "nro serie", "nro. serie", "nro de serie", "numero de serie", "número de serie"],
+    "q3": ["q3"],
+    "error_q3": ["error q3", "error q3 (%)", "error q3 %"],
+    "q2": ["q2"],
+    "error_q2": ["error q2", "error q2 (%)", "error q2 %"],
+    "q1": ["q1"],
+    "error_q1": ["error q1", "error q1 (%)", "error q1 %"],
+    "estado_pe": ["estado pe", "ensayo de presion estatica", "resultado p estatica", "resultado de p estatica"],
+    "fecha": ["fecha", "fecha de ejecucion", "fecha de ejecución"],
+    "certificado": ["certificado", "numero de certificado", "número de certificado"],
+    "estado": ["estado", "conclusion", "conclusión"],
+    "precinto": ["precinto"],
+    "banco_numero": ["banco numero", "numero de banco", "número de banco", "numero de banco de ensayo"],
+    "certificado_banco": ["certificado banco", "numero de certificado del banco", "número de certificado del banco"],
+    "organismo": ["organismo", "organismo de inspeccion", "organismo de inspección"],
+}
 
-    # Auditoría: series con NO CONFORME más reciente que una CONFORME
-    conflict_series: List[Dict[str, Any]] = []
-    for serie, meta in series_meta.items():
-        if (
-            meta.get("has_conforme")
-            and meta.get("has_no_conforme")
-            and meta.get("latest_estado") == "NO CONFORME"
-        ):
-            conflict_series.append(
-                {
-                    "serie": serie,
-                    "latest_oi_year": meta.get("latest_oi_year"),
-                    "latest_oi_num": meta.get("latest_oi_num"),
-                    "latest_estado": meta.get("latest_estado"),
-                    "best_conforme_oi_year": meta.get("best_conforme_oi_year"),
-                    "best_conforme_oi_num": meta.get("best_conforme_oi_num"),
-                    "best_no_conforme_oi_year": meta.get("best_no_conforme_oi_year"),
-                    "best_no_conforme_oi_num": meta.get("best_no_conforme_oi_num"),
-                }
-            )
-    conflict_series.sort(key=lambda x: _natural_key(x.get("serie") or ""))
 
-    # 3) Render a plantilla LOG01 (fila 2+, item desde 1)
-    st = get_settings()
-    template_path = getattr(st, "log01_template_abs_path", None)
-    if not template_path:
-        template_path = str((st.data_dir / "templates" / "logistica" / "LOG01_PLANTILLA_SALIDA.xlsx").resolve())
+def _output_sheet(wb_out: Any) -> Worksheet:
+    return next((w for w in wb_out.worksheets if w.title.strip().upper() == "BD"), wb_out.worksheets[0])
 
-    wb_out = load_workbook(template_path)
-    ws_out = next((w for w in wb_out.worksheets if w.title.strip().upper() == "BD"), wb_out.worksheets[0])
 
-    # --- Render por cabeceras (robusto ante cambios de plantilla) ---
+def _find_output_columns(ws_out: Worksheet) -> Tuple[int, int, Dict[str, int]]:
+    """
+    Render por cabeceras (robusto ante cambios de plantilla).
+    Devuelve (fila de cabecera, columna Item, key -> columna).
+    """
     # 1) Encontrar fila de cabecera: buscamos "item" en las primeras 30 filas
     header_row = None
     max_scan_rows = min(30, ws_out.max_row or 30)
@@ -962,8 +435,6 @@ def process_log01_files(
     if not header_row:
         raise ValueError("No se encontró la cabecera 'Item' en la hoja BD de la plantilla.")
 
-    data_start_row = header_row + 1
-
     # 2) Construir mapa cabecera->columna según plantilla
     header_map: Dict[str, int] = {}
     for c in range(1, (ws_out.max_column or max_scan_cols) + 1):
@@ -971,32 +442,11 @@ def process_log01_files(
         if h and h not in header_map:
             header_map[h] = c
 
-    # Aliases mínimos de cabecera en plantilla (por si usan nombres distintos)
-    # Clave: key interno; valores: posibles headers en plantilla
-    template_aliases: Dict[str, List[str]] = {
-        "item": ["item"],
-        "medidor": ["medidor", "serie", "nro serie", "nro. serie", "nro de serie", "numero de serie", "número de serie"],
-        "q3": ["q3"],
-        "error_q3": ["error q3", "error q3 (%)", "error q3 %"],
-        "q2": ["q2"],
-        "error_q2": ["error q2", "error q2 (%)", "error q2 %"],
-        "q1": ["q1"],
-        "error_q1": ["error q1", "error q1 (%)", "error q1 %"],
-        "estado_pe": ["estado pe", "ensayo de presion estatica", "resultado p estatica", "resultado de p estatica"],        
-        "fecha": ["fecha", "fecha de ejecucion", "fecha de ejecución"],
-        "certificado": ["certificado", "numero de certificado", "número de certificado"],
-        "estado": ["estado", "conclusion", "conclusión"],
-        "precinto": ["precinto"],
-        "banco_numero": ["banco numero", "numero de banco", "número de banco", "numero de banco de ensayo"],
-        "certificado_banco": ["certificado banco", "numero de certificado del banco", "número de certificado del banco"],
-        "organismo": ["organismo", "organismo de inspeccion", "organismo de inspección"],
-    }
-
     def _find_out_col(key: str) -> Optional[int]:
         col = header_map.get(_norm_header(key))
         if col:
             return col
-        for alias in template_aliases.get(key, []):
+        for alias in _TEMPLATE_ALIASES.get(key, []):
             col = header_map.get(_norm_header(alias))
             if col:
                 return col
@@ -1017,6 +467,32 @@ def process_log01_files(
         raise ValueError(
             "La plantilla BD no contiene cabeceras requeridas: " + ", ".join(sorted(critical.intersection(set(missing_out))))
         )
+    return header_row, col_item, out_cols
+
+
+def _output_value(key: str, v: Any) -> Any:
+    """Valor de salida de una columna (fecha normalizada, caudales y errores redondeados)."""
+    if key == "fecha":
+        return _normalize_output_date(v)
+    if isinstance(v, float) and abs(v) < 1e-9:
+        v = 0.0
+    if key in ("q3", "q2", "q1") and isinstance(v, (int, float)) and not isinstance(v, bool):
+        v = round(float(v), 2)
+    elif key in ("error_q3", "error_q2", "error_q1") and isinstance(v, (int, float)) and not isinstance(v, bool):
+        v = round(float(v), 1)
+    return v
+
+
+def _render_output_openpyxl(
+    template_path: str,
+    rows: Iterable[Dict[str, Any]],
+    on_row: Callable[[int], None],
+) -> bytes:
+    """Escribe las series en la plantilla celda por celda con openpyxl (motor clásico)."""
+    wb_out = load_workbook(template_path)
+    ws_out = _output_sheet(wb_out)
+    header_row, col_item, out_cols = _find_output_columns(ws_out)
+    data_start_row = header_row + 1
 
     # 3) Limpiar filas de datos previas (solo en columnas relevantes)
     # Usar fila modelo = primera fila de datos (data_start_row) para copiar estilo
@@ -1031,11 +507,7 @@ def process_log01_files(
     # 4) Escribir datos
     out_row = data_start_row
     item_counter = 1
-    for i, serie in enumerate(conformes, start=1):
-        _raise_cancelled()
-        info = series[serie]
-        vals = info.values
-
+    for i, vals in enumerate(rows, start=1):
         # copiar estilo desde model_row a la nueva fila (si la fila ya existe o se expande)
         if out_row != model_row:
             for c in cols_to_clear:
@@ -1050,30 +522,886 @@ def process_log01_files(
         _apply_output_format(ws_out, out_row, col_item, "item")
 
         for key, col in out_cols.items():
-            v = vals.get(key)
+            cell = _writable_cell(ws_out, out_row, col)
+            cell.value = _output_value(key, vals.get(key))
             if key == "fecha":
-                v = _normalize_output_date(v)
-                cell = _writable_cell(ws_out, out_row, col)
-                cell.value = v
                 # asegurar formato dd/mm/yyyy si la celda existe
                 try:
                     cell.number_format = "dd/mm/yyyy"
                 except Exception:
                     pass
-            else:
-                if isinstance(v, float) and abs(v) < 1e-9:
-                    v = 0.0
-                if key in ("q3", "q2", "q1") and isinstance(v, (int, float)) and not isinstance(v, bool):
-                    v = round(float(v), 2)
-                elif key in ("error_q3", "error_q2", "error_q1") and isinstance(v, (int, float)) and not isinstance(v, bool):
-                    v = round(float(v), 1)
-                cell = _writable_cell(ws_out, out_row, col)
-                cell.value = v
             _apply_output_format(ws_out, out_row, col, key)
 
         out_row += 1
         item_counter += 1
+        on_row(i)
+
+    # serializar xlsx
+    out_buf = BytesIO()
+    wb_out.save(out_buf)
+    return out_buf.getvalue()
+
+
+def _read_input_bytes(item: Log01InputFile) -> bytes:
+    if item.data is not None:
+        return item.data
+    if item.path:
+        with open(item.path, "rb") as f:
+            return f.read()
+    return b""
+
+
+@dataclass
+class Log01ParsedFile:
+    """Resultado de leer un archivo de entrada (picklable para el pool; no depende de otros archivos).
+
+    rows: (serie, estado, values) en el orden del archivo. Si status == "ERROR",
+    rows conserva lo extraído antes del error (el merge lo aplica igual que antes).
+    """
+
+    filename: str
+    status: str = "OK"  # OK | ERROR
+    source_type: str = "AUTO"
+    gaselag_variant: Optional[str] = None
+    oi_num: Optional[int] = None
+    oi_year: Optional[int] = None
+    oi_tag: Optional[str] = None
+    rows: List[Tuple[str, str, Dict[str, Any]]] = field(default_factory=list)
+    conformes: int = 0
+    no_conformes: int = 0
+    ignored_invalid_estado: int = 0
+    invalid_estado_examples: List[str] = field(default_factory=list)
+    series_no_conforme_origen: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+def parse_log01_file(item: Log01InputFile, source: str = "AUTO", index: int = 1) -> Log01ParsedFile:
+    """
+    Fase de lectura de un archivo (función pura): detecta origen y cabeceras y
+    extrae las filas con estado válido. No emite progreso ni toca el dedupe, por
+    eso puede ejecutarse en otro proceso.
+    """
+    fname = item.name or f"archivo_{index}.xlsx"
+    bases_filename = bool(_BASES_FILENAME_RE.search(fname or ""))
+    parsed = Log01ParsedFile(filename=fname)
+    try:
+        data = _read_input_bytes(item)
+        if not data:
+            raise ValueError("El archivo está vacío o no se pudo leer.")
+
+        wb = load_workbook(filename=BytesIO(data), data_only=True, read_only=True)
+        ws = wb.worksheets[0]
+
+        item_pos = _find_item_header_cell(ws)
+        if not item_pos:
+            raise ValueError(
+                "No se encontró la cabecera 'Item' (normalizada) en la hoja."
+            )
+        header_row, _item_col = item_pos
+        header_row_idx: int = header_row
+
+        input_header_map: Dict[str, int] = {}
+        for c in range(1, ws.max_column + 1):
+            name = _norm_header(ws.cell(row=header_row, column=c).value)
+            if name and name not in input_header_map:
+                input_header_map[name] = c
+
+        def _peek_col_value(col: Optional[int], max_scan: int = 25) -> Optional[str]:
+            if not col:
+                return None
+            max_row = min(ws.max_row or 0, header_row_idx + max_scan)
+            for row in ws.iter_rows(
+                min_row=header_row_idx + 1,
+                max_row=max_row,
+                min_col=col,
+                max_col=col,
+                values_only=True,
+            ):
+                v = row[0] if row else None
+                if v is None:
+                    continue
+                if isinstance(v, str) and not v.strip():
+                    continue
+                return _norm_str(v)
+            return None
+
+        # AUTO / BASES / GASELAG: se resuelve por archivo en source_type
+
+        def _make_find_input_col(aliases: Dict[str, List[str]]):
+            def find_input_col(key: str) -> Optional[int]:
+                col = input_header_map.get(_norm_header(key))
+                if col:
+                    return col
+                for alias in aliases.get(key, []):
+                    col2 = input_header_map.get(_norm_header(alias))
+                    if col2:
+                        return col2
+                return None
+            return find_input_col
+
+        find_bases = _make_find_input_col(_INPUT_HEADER_ALIASES_BASES)
+        missing_bases = [k for k in _REQUIRED_INPUT_KEYS_BASES if not find_bases(k)]
+
+        find_gaselag = _make_find_input_col(_INPUT_HEADER_ALIASES_GASELAG)
+        missing_gaselag_v2 = [k for k in _REQUIRED_INPUT_KEYS_GASELAG_V2 if not find_gaselag(k)]
+        missing_gaselag_v1 = [k for k in _REQUIRED_INPUT_KEYS_GASELAG_V1 if not find_gaselag(k)]
+
+        gaselag_variant: str | None = None
+
+        if source == "BASES":
+            if missing_bases:
+                raise ValueError("Faltan cabeceras requeridas (BASES): " + ", ".join(missing_bases))
+            parsed.source_type = "BASES"
+            find_input_col = find_bases
+        elif source == "GASELAG":
+            if not missing_gaselag_v2:
+                parsed.source_type = "GASELAG"
+                gaselag_variant = "V2"
+                find_input_col = find_gaselag
+            elif not missing_gaselag_v1:
+                parsed.source_type = "GASELAG"
+                gaselag_variant = "V1"
+                find_input_col = find_gaselag
+            else:
+                # reporta el más cercano (útil en soporte)
+                miss = missing_gaselag_v2 if len(missing_gaselag_v2) <= len(missing_gaselag_v1) else missing_gaselag_v1
+                raise ValueError("Faltan cabeceras requeridas (GASELAG): " + ", ".join(miss))
+        else:
+            # AUTO: detectar por cabeceras + nombre Base Comercial + organismo
+            if bases_filename:
+                parsed.source_type = "BASES"
+                find_input_col = find_bases
+            elif (not missing_bases) and (not missing_gaselag_v2):
+                org_col = find_gaselag("organismo") or find_bases("organismo")
+                org_val = _peek_col_value(org_col)
+                org_norm = (org_val or "").strip().upper()
+                if org_norm == "OI-066":
+                    parsed.source_type = "GASELAG"
+                    gaselag_variant = "V2"
+                    find_input_col = find_gaselag
+                elif org_norm == "OI-040":
+                    parsed.source_type = "BASES"
+                    find_input_col = find_bases
+                else:
+                    parsed.source_type = "GASELAG"
+                    gaselag_variant = "V2"
+                    find_input_col = find_gaselag
+            elif not missing_gaselag_v2:
+                parsed.source_type = "GASELAG"
+                gaselag_variant = "V2"
+                find_input_col = find_gaselag
+            elif not missing_gaselag_v1:
+                parsed.source_type = "GASELAG"
+                gaselag_variant = "V1"
+                find_input_col = find_gaselag
+            elif not missing_bases:
+                parsed.source_type = "BASES"
+                find_input_col = find_bases
+            else:
+                # Reportar el set "más cercano" para debugging
+                if len(missing_bases) <= min(len(missing_gaselag_v2), len(missing_gaselag_v1)):
+                    raise ValueError("Faltan cabeceras requeridas (BASES): " + ", ".join(missing_bases))
+                miss = missing_gaselag_v2 if len(missing_gaselag_v2) <= len(missing_gaselag_v1) else missing_gaselag_v1
+                raise ValueError("Faltan cabeceras requeridas (GASELAG): " + ", ".join(miss))
+        source_type = parsed.source_type
+        parsed.gaselag_variant = gaselag_variant
+
+        # Validación por nombre SOLO para BASES
+        if source_type == "BASES":
+            parsed.oi_num, parsed.oi_year = _parse_oi_parts_from_filename(fname)
+            parsed.oi_tag = _parse_oi_tag_from_filename(fname)
+        else:
+            parsed.oi_num = 0
+            parsed.oi_year = 0
+            parsed.oi_tag = "GASELAG"
+
+        if source_type == "BASES":
+            required_keys = _REQUIRED_INPUT_KEYS_BASES
+        else:
+            required_keys = (
+                _REQUIRED_INPUT_KEYS_GASELAG_V2
+                if gaselag_variant == "V2"
+                else _REQUIRED_INPUT_KEYS_GASELAG_V1
+            )
+
+        # Construcción de columnas solo de las requeridas del modo
+        col_by_key = {key: find_input_col(key) for key in required_keys}
+        missing = [key for key, col in col_by_key.items() if not col]
+        if missing:
+            raise ValueError(
+                "Faltan cabeceras requeridas: " + ", ".join(missing)
+            )
+
+        serie_col = col_by_key["medidor"]
+        estado_col = col_by_key["estado"]
+        relevant_cols = [col for col in col_by_key.values() if col]
+        max_col = max(relevant_cols) if relevant_cols else 1
+        # Organismo: opcional en GASELAG V1 (fijo OI-066), requerido en V2
+        gaselag_org_col = find_input_col("organismo") if source_type == "GASELAG" else None
+
+        def _row_value(row: tuple[Any, ...], col: Optional[int]) -> Any:
+            if not col:
+                return None
+            idx = col - 1
+            if idx < 0 or idx >= len(row):
+                return None
+            return row[idx]
+
+        def _is_blank_row(row: tuple[Any, ...], cols: list[int]) -> bool:
+            for c in cols:
+                v = _row_value(row, c)
+                if v is None:
+                    continue
+                if isinstance(v, str) and not v.strip():
+                    continue
+                return False
+            return True
+
+        no_conforme_series: list[str] = []
+
+        # lectura desde la fila siguiente al header "Item", hasta fila completamente vacia
+        start_row = header_row + 1
+        for row in ws.iter_rows(
+            min_row=start_row,
+            max_row=ws.max_row,
+            min_col=1,
+            max_col=max_col,
+            values_only=True,
+        ):
+            if _is_blank_row(row, relevant_cols):
+                if not parsed.rows:
+                    continue
+                break
+
+            serie = _norm_str(_row_value(row, serie_col))
+            if not serie:
+                continue
+
+            raw_estado = _row_value(row, estado_col)
+            estado = _normalize_estado_literal(raw_estado)
+            if not estado:
+                parsed.ignored_invalid_estado += 1
+                if raw_estado is not None and str(raw_estado).strip():
+                    if len(parsed.invalid_estado_examples) < 5:
+                        parsed.invalid_estado_examples.append(str(raw_estado)[:80])
+                continue
+
+            if estado == "CONFORME":
+                parsed.conformes += 1
+            else:
+                parsed.no_conformes += 1
+                no_conforme_series.append(serie)
+
+            # construir values para salida
+            row_values: Dict[str, Any] = {}
+            # inicializar todos los campos esperados en salida
+            for key in _OUTPUT_KEYS:
+                if key == "estado":
+                    row_values[key] = estado
+                    continue
+                if source_type == "GASELAG" and key == "organismo":
+                    row_values[key] = _row_value(row, gaselag_org_col) if gaselag_org_col else "OI-066"
+                    continue
+                val = _row_value(row, col_by_key.get(key))
+                if key == "fecha":
+                    row_values[key] = _normalize_input_date(val, epoch=wb.epoch)
+                else:
+                    row_values[key] = val
+
+            parsed.rows.append((serie, estado, row_values))
+
+        parsed.series_no_conforme_origen = sorted(set(no_conforme_series), key=_natural_key)
+        if source_type not in ("BASES", "GASELAG"):
+            raise ValueError("No se pudo clasificar el archivo por cabeceras.")
+    except Exception as e:
+        parsed.status = "ERROR"
+        parsed.error = str(e)
+    return parsed
+
+
+def _new_source_bucket() -> Dict[str, Any]:
+    return {
+        "files_total": 0,
+        "files_ok": 0,
+        "files_error": 0,
+        "rows_read": 0,
+        "conformes": 0,
+        "no_conformes": 0,
+        "rows_ignored_invalid_estado": 0,
+    }
+
+
+class _Log01Merge:
+    """
+    Fase de consolidación (un solo hilo, en el orden de los archivos de entrada):
+    dedupe por serie y auditoría de origen. El orden importa (en empates gana el
+    primer archivo), por eso los resultados del pool se aplican en orden.
+    """
+
+    def __init__(self) -> None:
+        # serie -> (estado final por OI mayor; CONFORME prevalece si existe), columnar
+        self.series = Log01SeriesStore(_OUTPUT_KEYS, _natural_key)
+        self.ok_files = 0
+        self.bad_files = 0
+        self.rows_total_read = 0
+        # Auditoría "de origen" (por archivo/OI), NO depende del dedupe
+        self.audit_by_oi: List[Dict[str, Any]] = []
+        self.files_rejected: List[Dict[str, Any]] = []
+        self.input_conformes_total = 0
+        self.input_no_conformes_total = 0
+        # Auditoría agregada por tipo de origen
+        self.by_source: Dict[str, Dict[str, Any]] = {
+            "BASES": _new_source_bucket(),
+            "GASELAG": _new_source_bucket(),
+        }
+
+    def add(self, parsed: Log01ParsedFile) -> Dict[str, Any]:
+        """Aplica un archivo y devuelve el evento de progreso (file_done / file_error)."""
+        self.series.add_file(parsed.rows, parsed.source_type, parsed.oi_year, parsed.oi_num)
+        if parsed.status == "OK":
+            return self._add_ok(parsed)
+        return self._add_error(parsed)
+
+    def _add_ok(self, parsed: Log01ParsedFile) -> Dict[str, Any]:
+        fname = parsed.filename
+        source_type = parsed.source_type
+        extracted = len(parsed.rows)
+        self.rows_total_read += extracted
+        self.ok_files += 1
+
+        # Agregado por tipo
+        b = self.by_source.setdefault(source_type, _new_source_bucket())
+        b["files_ok"] += 1
+        b["rows_read"] += extracted
+        b["conformes"] += parsed.conformes
+        b["no_conformes"] += parsed.no_conformes
+        b["rows_ignored_invalid_estado"] += parsed.ignored_invalid_estado
+
+        self.input_conformes_total += parsed.conformes
+        self.input_no_conformes_total += parsed.no_conformes
+        self.audit_by_oi.append(
+            {
+                "filename": fname,
+                "oi_num": parsed.oi_num if source_type == "BASES" else 0,
+                "oi_year": parsed.oi_year if source_type == "BASES" else 0,
+                "oi_tag": parsed.oi_tag,
+                "source": source_type,
+                "status": "OK",
+                "rows_read": extracted,
+                "conformes": parsed.conformes,
+                "no_conformes": parsed.no_conformes,
+                "rows_ignored_invalid_estado": parsed.ignored_invalid_estado,
+                "invalid_estado_examples": list(parsed.invalid_estado_examples),
+                "series_no_conforme_origen": list(parsed.series_no_conforme_origen),
+                "error": None,
+            }
+        )
+        return {
+            "type": "status",
+            "stage": "file_done",
+            "message": f"{fname} | Leidos: {extracted} | Conformes: {parsed.conformes} | No conformes: {parsed.no_conformes} | Ignorados(estado): {parsed.ignored_invalid_estado}",
+            "file": fname,
+            "rows_read": extracted,
+            "conformes": parsed.conformes,
+            "no_conformes": parsed.no_conformes,
+            "rows_ignored_invalid_estado": parsed.ignored_invalid_estado,
+        }
+
+    def _add_error(self, parsed: Log01ParsedFile) -> Dict[str, Any]:
+        fname = parsed.filename
+        oi_num = parsed.oi_num
+        oi_year = parsed.oi_year
+        oi_tag = parsed.oi_tag
+        self.bad_files += 1
+        raw = parsed.error or "Error no especificado"
+        err_code, err_detail = _split_error_code_detail(raw)
+        err_code = err_code or _classify_file_error(raw)
+        if not err_detail:
+            err_detail = "Error no especificado"
+        # En errores debemos registrar el tipo REAL del archivo si ya fue detectado
+        # Si aún no se detectó, mantener AUTO e intentar inferir por el texto
+        err_source = parsed.source_type or "AUTO"
+        if err_code == "INVALID_OI_FILENAME":
+            err_source = "BASES"
+        elif err_source == "AUTO":
+            up = raw.upper()
+            if "(BASES)" in up:
+                err_source = "BASES"
+            elif "(GASELAG)" in up:
+                err_source = "GASELAG"
+            else:
+                # Heurística por filename: si parece Base Comercial (OI-####-YYYY) => BASES
+                if _parse_oi_tag_from_filename(fname):
+                    err_source = "BASES"
+                else:
+                    err_source = "AUTO"
+
+        # Si es BASES y el error NO es por filename inválido, intenta extraer oi_num/oi_tag
+        if err_source == "BASES" and err_code != "INVALID_OI_FILENAME":
+            if (
+                not isinstance(oi_num, int)
+                or oi_num <= 0
+                or not isinstance(oi_year, int)
+                or oi_year <= 0
+            ):
+                try:
+                    oi_num, oi_year = _parse_oi_parts_from_filename(fname)
+                except Exception:
+                    pass
+            if not isinstance(oi_tag, str) or not oi_tag:
+                oi_tag = _parse_oi_tag_from_filename(fname)
+        elif err_source == "GASELAG":
+            oi_num = 0
+            oi_year = 0
+            oi_tag = "GASELAG"
 
+        # Agregado por tipo
+        if err_source != "AUTO":
+            b = self.by_source.setdefault(err_source, _new_source_bucket())
+            b["files_error"] += 1
+
+        self.audit_by_oi.append(
+            {
+                "filename": fname,
+                "oi_num": (oi_num if err_source == "BASES" else 0),
+                "oi_year": (oi_year if err_source == "BASES" else 0),
+                "oi_tag": oi_tag,
+                "source": err_source,
+                "status": "ERROR",
+                "rows_read": 0,
+                "conformes": 0,
+                "no_conformes": 0,
+                "error": raw,
+            }
+        )
+        self.files_rejected.append(
+            {
+                "filename": fname,
+                "oi_num": (oi_num if err_source == "BASES" else 0),
+                "oi_year": (oi_year if err_source == "BASES" else 0),
+                "oi_tag": oi_tag,
+                "code": err_code,
+                "detail": err_detail,
+                "source": err_source,
+            }
+        )
+        return {
+            "type": "status",
+            "stage": "file_error",
+            "message": f"{fname} | ERROR: {err_code} | {err_detail}",
+            "file": fname,
+            "code": err_code,
+            "detail": err_detail,
+        }
+
+
+# ----------------------------
+# Pool de lectura (fase de parseo)
+# ----------------------------
+_PARSE_POOL_LOCK = threading.Lock()
+_PARSE_POOL: Optional[ProcessPoolExecutor] = None
+
+
+def parse_pool_size() -> int:
+    configured = int(getattr(get_settings(), "log01_parse_workers", 0) or 0)
+    return max(1, configured or os.cpu_count() or 1)
+
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    """Pool compartido (se crea al primer uso; los procesos se reutilizan entre corridas)."""
+    global _PARSE_POOL
+    with _PARSE_POOL_LOCK:
+        if _PARSE_POOL is None:
+            _PARSE_POOL = ProcessPoolExecutor(max_workers=parse_pool_size())
+        return _PARSE_POOL
+
+
+def shutdown_parse_pool() -> None:
+    global _PARSE_POOL
+    with _PARSE_POOL_LOCK:
+        pool, _PARSE_POOL = _PARSE_POOL, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(shutdown_parse_pool)
+
+
+# ----------------------------
+# Caché de archivos leídos (data/log01_parse_cache)
+# ----------------------------
+# Subir al cambiar parse_log01_file o Log01ParsedFile: invalida la caché completa.
+LOG01_PARSER_VERSION = 2
+
+# Caché y checkpoints se guardan como JSON (zlib), nunca pickle: viven bajo
+# data_dir, que es compartido y escribible por los usuarios, y deserializar un
+# pickle de ahí permitiría ejecutar código.
+PARSED_FILE_SUFFIX = ".json.z"
+
+_PARSE_CACHE_LOCK = threading.Lock()
+_PARSE_CACHE: Optional[ExportCache] = None
+
+
+def get_parse_cache() -> ExportCache:
+    """Caché compartida de Log01ParsedFile (tamaño: VI_LOG01_PARSE_CACHE_MAX_MB)."""
+    global _PARSE_CACHE
+    with _PARSE_CACHE_LOCK:
+        if _PARSE_CACHE is None:
+            settings = get_settings()
+            max_mb = int(getattr(settings, "log01_parse_cache_max_mb", 0) or 0)
+            root = Path(settings.data_dir) / "log01_parse_cache"
+            # Entradas pickle de versiones anteriores: no se leen, se liberan
+            for stale in root.glob("*.pkl"):
+                stale.unlink(missing_ok=True)
+            _PARSE_CACHE = ExportCache(root, max_mb * 1024 * 1024, suffix=PARSED_FILE_SUFFIX)
+        return _PARSE_CACHE
+
+
+def _json_default(value: Any) -> Any:
+    # datetime antes que date (es subclase)
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"$d": value.isoformat()}
+    if isinstance(value, dt_time):
+        return {"$t": value.isoformat()}
+    if isinstance(value, timedelta):
+        return {"$td": value.total_seconds()}
+    raise TypeError(f"Valor no serializable en LOG01: {type(value).__name__}")
+
+
+_JSON_TAGS: Dict[str, Callable[[Any], Any]] = {
+    "$dt": datetime.fromisoformat,
+    "$d": date.fromisoformat,
+    "$t": dt_time.fromisoformat,
+    "$td": lambda secs: timedelta(seconds=secs),
+}
+
+
+def _json_hook(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1:
+        tag, value = next(iter(obj.items()))
+        decode = _JSON_TAGS.get(tag)
+        if decode is not None:
+            return decode(value)
+    return obj
+
+
+def encode_parsed_file(key: str, parsed: Log01ParsedFile) -> bytes:
+    """Log01ParsedFile + su clave -> JSON comprimido (fechas/horas etiquetadas)."""
+    payload = {"key": key, "parsed": {f.name: getattr(parsed, f.name) for f in fields(parsed)}}
+    raw = json.dumps(payload, default=_json_default, ensure_ascii=False, separators=(",", ":"))
+    return zlib.compress(raw.encode("utf-8"), 1)
+
+
+def decode_parsed_file(blob: bytes) -> Tuple[Optional[str], Log01ParsedFile]:
+    """Inverso de encode_parsed_file. ValueError/TypeError/KeyError si el contenido no es válido."""
+    payload = json.loads(zlib.decompress(blob).decode("utf-8"), object_hook=_json_hook)
+    data = dict(payload["parsed"])
+    data["rows"] = [(serie, estado, values) for serie, estado, values in data.get("rows") or []]
+    return payload.get("key"), Log01ParsedFile(**data)
+
+
+def _input_digest(item: Log01InputFile) -> Optional[str]:
+    digest = hashlib.sha256()
+    try:
+        if item.data is not None:
+            digest.update(item.data)
+        elif item.path:
+            with open(item.path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+        else:
+            return None
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def parse_cache_key(item: Log01InputFile, source: str, index: int = 1) -> Optional[str]:
+    """
+    Clave del archivo leído: SHA-256 del contenido + versión del parser. También
+    entran el modo y el nombre, porque la detección BASES/GASELAG y la OI
+    (Base Comercial OI-####-YYYY) dependen de ellos.
+    """
+    digest = _input_digest(item)
+    if digest is None:
+        return None
+    fname = item.name or f"archivo_{index}.xlsx"
+    return make_key(("log01-parse", LOG01_PARSER_VERSION, digest, source, fname))
+
+
+def _load_cached(cache: ExportCache, key: Optional[str]) -> Optional[Log01ParsedFile]:
+    if not key:
+        return None
+    path = cache.get(key)
+    if path is None:
+        return None
+    try:
+        saved_key, parsed = decode_parsed_file(path.read_bytes())
+    except Exception:
+        logger.warning("LOG01: entrada de caché ilegible (%s); se vuelve a leer el archivo", path.name)
+        return None
+    return parsed if saved_key == key else None
+
+
+def _store_cached(cache: ExportCache, key: Optional[str], parsed: Log01ParsedFile) -> None:
+    if not key:
+        return
+    try:
+        blob = encode_parsed_file(key, parsed)
+    except (TypeError, ValueError):
+        logger.warning("LOG01: %s no se guarda en caché (valor no serializable)", parsed.filename, exc_info=True)
+        return
+    cache.put(key, blob)
+
+
+class Log01Checkpoints:
+    """
+    Checkpoints por archivo de un job (<carpeta>/<índice>.json.z): el archivo ya leído
+    junto con su clave de contenido. A diferencia de la caché compartida no tiene
+    límite ni expulsión, así que un job reanudado no vuelve a leer lo que ya leyó.
+    """
+
+    def __init__(self, root: Any) -> None:
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, idx: int) -> Path:
+        return self.root / f"{idx:05d}{PARSED_FILE_SUFFIX}"
+
+    def load(self, idx: int, key: Optional[str]) -> Optional[Log01ParsedFile]:
+        path = self._path(idx)
+        if not key or not path.exists():
+            return None
+        try:
+            saved_key, parsed = decode_parsed_file(path.read_bytes())
+        except Exception:
+            logger.warning("LOG01: checkpoint ilegible (%s); se vuelve a leer el archivo", path)
+            return None
+        # Otro contenido en la misma posición: el checkpoint no aplica
+        if saved_key != key:
+            return None
+        return parsed
+
+    def save(self, idx: int, key: Optional[str], parsed: Log01ParsedFile) -> None:
+        if not key:
+            return
+        path = self._path(idx)
+        tmp = path.with_name(f"{path.name}.tmp")
+        try:
+            tmp.write_bytes(encode_parsed_file(key, parsed))
+            os.replace(tmp, path)
+        except (OSError, TypeError, ValueError):
+            logger.warning("LOG01: no se pudo escribir el checkpoint %s", path, exc_info=True)
+            tmp.unlink(missing_ok=True)
+
+    def count(self) -> int:
+        return sum(1 for _ in self.root.glob(f"*{PARSED_FILE_SUFFIX}"))
+
+
+def iter_parsed_files(
+    file_items: List[Log01InputFile],
+    source: str,
+    check_cancel: Callable[[], None],
+    executor: Optional[Executor] = None,
+    cache: Optional[ExportCache] = None,
+    checkpoints: Optional[Log01Checkpoints] = None,
+    on_file: Optional[Callable[[int, str], None]] = None,
+) -> Iterator[Log01ParsedFile]:
+    """
+    Entrega los archivos leídos en el orden de entrada. Los que ya están en los
+    checkpoints del job o en la caché (mismo contenido) no se vuelven a leer; el
+    resto se parsea en el pool si hay más de uno y más de un worker. La ventana de
+    envíos es acotada para no tener en memoria todos los resultados a la vez.
+    Con `checkpoints`, cada archivo queda guardado antes de entregarse.
+    `on_file(idx, nombre)` se llama al empezar cada archivo en orden de entrada
+    (antes de leerlo o de esperar su resultado del pool).
+    """
+    cache = get_parse_cache() if cache is None else cache
+    total = len(file_items)
+    hits = 0
+    resumed = 0
+
+    def _lookup(idx: int, item: Log01InputFile) -> Tuple[Optional[str], Optional[Log01ParsedFile]]:
+        nonlocal resumed
+        if not cache.enabled and checkpoints is None:
+            return None, None
+        key = parse_cache_key(item, source, idx)
+        if checkpoints is not None:
+            parsed = checkpoints.load(idx, key)
+            if parsed is not None:
+                resumed += 1
+                return key, parsed
+            parsed = _load_cached(cache, key) if cache.enabled else None
+            if parsed is not None:
+                checkpoints.save(idx, key, parsed)
+            return key, parsed
+        return key, _load_cached(cache, key)
+
+    def _store(idx: int, key: Optional[str], parsed: Log01ParsedFile) -> None:
+        _store_cached(cache, key, parsed)
+        if checkpoints is not None:
+            checkpoints.save(idx, key, parsed)
+
+    def _started(idx: int, item: Log01InputFile) -> None:
+        if on_file is not None:
+            on_file(idx, item.name or f"archivo_{idx}.xlsx")
+
+    workers = parse_pool_size() if executor is None else max(1, getattr(executor, "_max_workers", 1) or 1)
+    if total <= 1 or workers <= 1:
+        for idx, item in enumerate(file_items, start=1):
+            check_cancel()
+            _started(idx, item)
+            key, parsed = _lookup(idx, item)
+            if parsed is None:
+                parsed = parse_log01_file(item, source, idx)
+                _store(idx, key, parsed)
+            else:
+                hits += 1
+            yield parsed
+        if hits:
+            logger.info("LOG01: %d/%d archivos tomados de la caché (%d de checkpoints)", hits, total, resumed)
+        return
+
+    pool = executor or get_parse_pool()
+    max_in_flight = workers * 2
+    # (idx, item, clave de caché, resultado cacheado | None, future | None)
+    pending: Deque[Tuple[int, Log01InputFile, Optional[str], Optional[Log01ParsedFile], Optional[Future]]] = deque()
+    in_flight = 0
+    next_idx = 0
+    try:
+        while next_idx < total or pending:
+            while next_idx < total and in_flight < max_in_flight and len(pending) < max_in_flight * 2:
+                item = file_items[next_idx]
+                next_idx += 1
+                key, cached = _lookup(next_idx, item)
+                if cached is not None:
+                    hits += 1
+                    pending.append((next_idx, item, key, cached, None))
+                    continue
+                pending.append((next_idx, item, key, None, pool.submit(parse_log01_file, item, source, next_idx)))
+                in_flight += 1
+            idx, item, key, parsed, fut = pending.popleft()
+            _started(idx, item)
+            if fut is not None:
+                in_flight -= 1
+                while True:
+                    check_cancel()
+                    try:
+                        parsed = fut.result(timeout=0.25)
+                        break
+                    except FutureTimeoutError:
+                        continue
+                    except BrokenProcessPool:
+                        logger.exception("LOG01: pool de lectura caído; se lee %s en el proceso actual", item.name)
+                        if executor is None:
+                            shutdown_parse_pool()
+                        parsed = parse_log01_file(item, source, idx)
+                        break
+                _store(idx, key, cast(Log01ParsedFile, parsed))
+            else:
+                check_cancel()
+            yield cast(Log01ParsedFile, parsed)
+    finally:
+        for *_, fut in pending:
+            if fut is not None:
+                fut.cancel()
+    if hits:
+        logger.info("LOG01: %d/%d archivos tomados de la caché (%d de checkpoints)", hits, total, resumed)
+
+
+def process_log01_files(
+    file_items: List[Log01InputFile],
+    operation_id: Optional[str],
+    output_filename: Optional[str],
+    cancel_token: Optional["CancelToken"],
+    source: Literal["AUTO","BASES", "GASELAG"] = "AUTO",
+    executor: Optional[Executor] = None,
+    checkpoint_dir: Optional[str] = None,
+    on_checkpoint: Optional[Callable[[int], None]] = None,
+) -> Log01ProcessResult:
+    """
+    Consolida los archivos LOG-01. Con `checkpoint_dir` cada archivo leído queda
+    guardado ahí (ver Log01Checkpoints) y `on_checkpoint(n)` se llama con los
+    archivos ya guardados; al repetir el proceso con la misma carpeta (job
+    reanudado) solo se leen los archivos que faltan.
+    """
+    cancel_emitted = False
+
+    def _raise_cancelled() -> None:
+        nonlocal cancel_emitted
+        if cancel_token and cancel_token.is_cancelled():
+            if not cancel_emitted:
+                _emit(
+                    operation_id,
+                    {"type": "status", "stage": "cancelled", "message": "Cancelado por el usuario"},
+                )
+                cancel_emitted = True
+            raise Log01Cancelled()
+
+    _emit(operation_id, {"type": "status", "stage": "received", "message": "Archivos recibidos", "progress": 0})
+
+    # 1) Leer archivos (pool de procesos) y consolidar en orden de entrada
+    total_files = len(file_items)
+    merge = _Log01Merge()
+    checkpoints = Log01Checkpoints(checkpoint_dir) if checkpoint_dir else None
+
+    def _file_started(idx: int, fname: str) -> None:
+        # Como en la lectura secuencial: "file" antes de leer el archivo, "file_done"/"file_error" después
+        _emit(
+            operation_id,
+            {
+                "type": "status",
+                "stage": "file",
+                "message": f"Procesando {fname}",
+                "file": fname,
+                "index": idx,
+                "total": total_files,
+                "progress": float((idx - 1) * 100 / max(total_files, 1)),
+            },
+        )
+
+    parsed_files = iter_parsed_files(
+        file_items, source, _raise_cancelled, executor, checkpoints=checkpoints, on_file=_file_started
+    )
+    for idx, parsed in enumerate(parsed_files, start=1):
+        _emit(operation_id, merge.add(parsed))
+        if on_checkpoint is not None:
+            on_checkpoint(idx)
+
+    _raise_cancelled()
+
+    series = merge.series
+    ok_files = merge.ok_files
+    bad_files = merge.bad_files
+    rows_total_read = merge.rows_total_read
+    audit_by_oi = merge.audit_by_oi
+    files_rejected = merge.files_rejected
+    input_conformes_total = merge.input_conformes_total
+    input_no_conformes_total = merge.input_no_conformes_total
+    by_source = merge.by_source
+
+    # 2) Resultado final: solo CONFORMES (orden natural por serie)
+    conforme_ids = series.ids("CONFORME")
+    conformes = [series.names[sid] for sid in conforme_ids.tolist()]
+
+    series_total_dedup = len(series)
+    series_conformes = len(conformes)
+    series_no_conformes_final = series_total_dedup - series_conformes
+    series_duplicates_eliminated = max(rows_total_read - series_total_dedup, 0)
+
+    # Auditoría: series con NO CONFORME más reciente que una CONFORME
+    conflict_series: List[Dict[str, Any]] = series.conflicts()
+
+    # 3) Render a plantilla LOG01 (fila 2+, item desde 1)
+    st = get_settings()
+    template_path = getattr(st, "log01_template_abs_path", None)
+    if not template_path:
+        template_path = str((st.data_dir / "templates" / "logistica" / "LOG01_PLANTILLA_SALIDA.xlsx").resolve())
+
+    def _on_row(i: int) -> None:
+        _raise_cancelled()
         # progreso
         if i % 50 == 0 or i == len(conformes):
             _emit(
@@ -1086,10 +1414,15 @@ def process_log01_files(
                 },
             )
 
-    # serializar xlsx
-    out_buf = BytesIO()
-    wb_out.save(out_buf)
-    xlsx_bytes = out_buf.getvalue()
+    _raise_cancelled()
+    out_rows = series.output_rows(conforme_ids)
+    xlsx_bytes: Optional[bytes] = None
+    if str(getattr(st, "log01_excel_engine", "ooxml") or "").strip().lower() == "ooxml":
+        from .log01_ooxml import render_log01_ooxml
+
+        xlsx_bytes = render_log01_ooxml(template_path, out_rows, _on_row)
+    if xlsx_bytes is None:
+        xlsx_bytes = _render_output_openpyxl(template_path, out_rows, _on_row)
 
     # nombre sugerido
     if output_filename and output_filename.strip():
@@ -1172,48 +1505,48 @@ def process_log01_files(
         return f"OI-{oi_num:04d}"
 
     # NO CONFORME final (post-dedupe)
-    no_conforme_series = [s for s, info in series.items() if info.estado == "NO CONFORME"]
-    no_conforme_series.sort(key=_natural_key)
+    no_conforme_series = series.ids("NO CONFORME").tolist()
+    no_conforme_items = []
+    for sid in no_conforme_series:
+        oi_year, oi_num = series.oi(sid)
+        no_conforme_items.append(
+            {
+                "oi": _tag_for(oi_year, oi_num),
+                "oi_num": oi_num,
+                "oi_year": oi_year,
+                "serie": series.names[sid],
+            }
+        )
 
     no_conforme_payload = {
         "operation_id": operation_id,
         "generated_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
         "total_no_conforme_final": len(no_conforme_series),
-        "items": [
-            {
-                "oi": _tag_for(series[s].oi_year, series[s].oi_num),
-                "oi_num": series[s].oi_num,
-                "oi_year": series[s].oi_year,
-                "serie": s,
-            }
-            for s in no_conforme_series
-        ],
+        "items": no_conforme_items,
     }
     no_conforme_json = json.dumps(no_conforme_payload, ensure_ascii=False, indent=2).encode("utf-8")
 
-    # Manifiesto por OI (listas para LOG-02)
+    # Manifiesto por OI (listas para LOG-02); se recorre en orden natural, así
+    # cada lista queda ordenada sin volver a ordenar
     by_oi: Dict[tuple[int, int], Dict[str, Any]] = {}
-    for serie, info in series.items():
-        oi_key = (info.oi_year, info.oi_num)
-        bucket = by_oi.setdefault(
-            oi_key,
-            {
-                "oi": _tag_for(info.oi_year, info.oi_num),
-                "oi_num": info.oi_num,
-                "oi_year": info.oi_year,
+    for sid in series.ids().tolist():
+        oi_year, oi_num = series.oi(sid)
+        bucket = by_oi.get((oi_year, oi_num))
+        if bucket is None:
+            bucket = by_oi[(oi_year, oi_num)] = {
+                "oi": _tag_for(oi_year, oi_num),
+                "oi_num": oi_num,
+                "oi_year": oi_year,
                 "series_no_conforme": [],
                 "series_conforme": [],
-            },
-        )
-        if info.estado == "NO CONFORME":
-            bucket["series_no_conforme"].append(serie)
+            }
+        if series.estado_of(sid) == "NO CONFORME":
+            bucket["series_no_conforme"].append(series.names[sid])
         else:
-            bucket["series_conforme"].append(serie)
+            bucket["series_conforme"].append(series.names[sid])
 
     for bucket in by_oi.values():
-        bucket["series_no_conforme"].sort(key=_natural_key)
         bucket["total_no_conforme"] = len(bucket["series_no_conforme"])
-        bucket["series_conforme"].sort(key=_natural_key)
         bucket["total_conforme"] = len(bucket["series_conforme"])
         bucket["total_series"] = bucket["total_no_conforme"] + bucket["total_conforme"]
 
@@ -0,0 +1,216 @@
+"""
+Persistencia de los jobs async LOG-01 (tabla log01_job).
+
+El job en memoria (routers/log01.LOG01_JOBS) sigue siendo la fuente para el
+progreso; esta tabla guarda lo necesario para reanudarlo tras un reinicio: la
+carpeta del job (entradas + checkpoints por archivo), el orden de los archivos,
+el snapshot de sesión y el estado (queued -> running -> complete/error/cancelled).
+
+Lease: el proceso que ejecuta un job renueva lease_until mientras corre (en cada
+checkpoint y con un latido, ver LeaseKeeper). Otro proceso solo lo puede tomar
+cuando el lease venció, es decir, cuando su dueño ya no está vivo.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, or_, update
+from sqlmodel import Session, select
+
+from app.core.db import engine
+from app.core.settings import get_settings
+from app.models import Log01JobRecord
+
+logger = logging.getLogger(__name__)
+
+# Identifica a este proceso como dueño de los jobs que ejecuta
+RUNNER_ID = uuid.uuid4().hex
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# Vigencia del lease; el latido lo renueva cada LEASE_SECONDS / 3
+LEASE_SECONDS = 120.0
+
+
+def lease_deadline() -> datetime:
+    return datetime.utcnow() + timedelta(seconds=LEASE_SECONDS)
+
+
+def jobs_root() -> Path:
+    """Carpeta de trabajo de los jobs (data/logistica/log01_jobs), persistente entre reinicios."""
+    root = get_settings().data_dir / "logistica" / "log01_jobs"
+    root.mkdir(parents=True, exist_ok=True)
+    return root
+
+
+def create_job(
+    operation_id: str,
+    source: str,
+    output_filename: Optional[str],
+    work_dir: str,
+    files: List[Dict[str, Any]],
+    session_snapshot: Dict[str, Any],
+) -> None:
+    with Session(engine) as session:
+        session.add(
+            Log01JobRecord(
+                operation_id=operation_id,
+                status="queued",
+                source=source,
+                output_filename=output_filename,
+                work_dir=work_dir,
+                files_json=files,
+                session_json=session_snapshot,
+                files_total=len(files),
+                runner_id=RUNNER_ID,
+                lease_until=lease_deadline(),
+            )
+        )
+        session.commit()
+
+
+def get_job(operation_id: str) -> Optional[Log01JobRecord]:
+    with Session(engine) as session:
+        return session.exec(select(Log01JobRecord).where(Log01JobRecord.operation_id == operation_id)).first()
+
+
+def update_job(operation_id: str, **fields: Any) -> None:
+    fields["updated_at"] = datetime.utcnow()
+    with Session(engine) as session:
+        session.exec(  # type: ignore[call-overload]
+            update(Log01JobRecord).where(Log01JobRecord.operation_id == operation_id).values(**fields)
+        )
+        session.commit()
+
+
+def mark_running(operation_id: str) -> None:
+    update_job(
+        operation_id,
+        status="running",
+        runner_id=RUNNER_ID,
+        lease_until=lease_deadline(),
+        attempts=Log01JobRecord.attempts + 1,
+    )
+
+
+def renew_lease(operation_id: str) -> None:
+    update_job(operation_id, lease_until=lease_deadline())
+
+
+class LeaseKeeper:
+    """Latido: renueva el lease del job cada LEASE_SECONDS / 3 mientras dura el bloque."""
+
+    def __init__(self, operation_id: str) -> None:
+        self.operation_id = operation_id
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"log01-lease-{operation_id}", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(LEASE_SECONDS / 3):
+            try:
+                renew_lease(self.operation_id)
+            except Exception:
+                logger.exception("LOG01 job lease renew failed operation_id=%s", self.operation_id)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> "LeaseKeeper":
+        self.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+
+def delete_job(operation_id: str) -> None:
+    with Session(engine) as session:
+        record = session.exec(select(Log01JobRecord).where(Log01JobRecord.operation_id == operation_id)).first()
+        if record is not None:
+            session.delete(record)
+            session.commit()
+
+
+def _lease_expired(now: datetime):
+    return or_(Log01JobRecord.lease_until.is_(None), Log01JobRecord.lease_until < now)  # type: ignore[union-attr,operator]
+
+
+def _other_runner():
+    return or_(Log01JobRecord.runner_id.is_(None), Log01JobRecord.runner_id != RUNNER_ID)  # type: ignore[union-attr]
+
+
+def claim_job(record: Log01JobRecord) -> bool:
+    """
+    Toma un job interrumpido para este proceso (UPDATE condicionado al dueño
+    anterior y a que su lease haya vencido): si otro proceso lo tomó primero o
+    su dueño sigue renovando el lease, devuelve False.
+    """
+    owner_col = Log01JobRecord.runner_id
+    same_owner = owner_col.is_(None) if record.runner_id is None else owner_col == record.runner_id  # type: ignore[union-attr]
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        result = session.exec(  # type: ignore[call-overload]
+            update(Log01JobRecord)
+            .where(
+                Log01JobRecord.id == record.id,
+                Log01JobRecord.status.in_(ACTIVE_STATUSES),  # type: ignore[attr-defined]
+                same_owner,
+                _lease_expired(now),
+            )
+            .values(runner_id=RUNNER_ID, status="queued", lease_until=lease_deadline(), updated_at=now)
+        )
+        session.commit()
+        return bool(result.rowcount)
+
+
+def list_interrupted() -> List[Log01JobRecord]:
+    """Jobs en cola o a medias de otros procesos con el lease vencido, del más antiguo al más nuevo."""
+    with Session(engine) as session:
+        return list(
+            session.exec(
+                select(Log01JobRecord)
+                .where(
+                    Log01JobRecord.status.in_(ACTIVE_STATUSES),  # type: ignore[attr-defined]
+                    _other_runner(),
+                    _lease_expired(datetime.utcnow()),
+                )
+                .order_by(Log01JobRecord.created_at, Log01JobRecord.id)  # type: ignore[arg-type]
+            ).all()
+        )
+
+
+def next_lease_expiry() -> Optional[datetime]:
+    """Vencimiento más próximo entre los jobs activos que otro proceso tiene con lease vigente."""
+    with Session(engine) as session:
+        return session.exec(
+            select(func.min(Log01JobRecord.lease_until)).where(
+                Log01JobRecord.status.in_(ACTIVE_STATUSES),  # type: ignore[attr-defined]
+                _other_runner(),
+                Log01JobRecord.lease_until >= datetime.utcnow(),  # type: ignore[operator]
+            )
+        ).one()
+
+
+def list_expired(ttl_seconds: float) -> List[Log01JobRecord]:
+    """Jobs terminados hace más de ttl_seconds (sus archivos ya se pueden borrar)."""
+    limit = datetime.utcnow() - timedelta(seconds=ttl_seconds)
+    with Session(engine) as session:
+        return list(
+            session.exec(
+                select(Log01JobRecord).where(
+                    Log01JobRecord.status.not_in(ACTIVE_STATUSES),  # type: ignore[attr-defined]
+                    Log01JobRecord.updated_at < limit,
+                )
+            ).all()
+        )
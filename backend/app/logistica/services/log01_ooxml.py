@@ -0,0 +1,306 @@
+"""
+Motor OOXML de la salida LOG-01 (hoja BD de LOG01_PLANTILLA_SALIDA.xlsx).
+
+En vez de cargar la plantilla con openpyxl y escribir celda por celda, se compila
+una vez por versión de plantilla (SHA-256) un plan con:
+- el XML de la hoja partido en cabecera (hasta </sheetData>) y cola,
+- las columnas de salida resueltas por cabecera (igual que el motor openpyxl),
+- los estilos de las celdas de datos (Arial 8, centrado, formato por columna) ya
+  agregados a styles.xml.
+
+Por corrida solo se generan las filas y se escriben en streaming a la entrada del
+zip, por lotes: no se arma ningún objeto por celda y la memoria no crece con el
+número de series (más allá del xlsx comprimido). El resultado es equivalente celda por celda al de
+_render_output_openpyxl (valores y formato), no idéntico byte a byte.
+Si la plantilla no es compatible (p. ej. ya trae filas de datos), render_log01_ooxml
+devuelve None y se usa openpyxl.
+"""
+
+import hashlib
+import logging
+import re
+import threading
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from io import BytesIO
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, Optional, Sequence, Tuple
+from xml.etree import ElementTree as ET
+from xml.sax.saxutils import escape, unescape
+from zipfile import ZipFile, ZipInfo, ZIP_DEFLATED
+
+from openpyxl import load_workbook
+from openpyxl.cell.cell import ERROR_CODES, TIME_FORMATS, TIME_TYPES, get_time_format
+from openpyxl.styles.numbers import BUILTIN_FORMATS_REVERSE, FORMAT_GENERAL, is_date_format
+from openpyxl.utils.cell import column_index_from_string, get_column_letter
+from openpyxl.utils.datetime import to_excel
+
+from app.services.excel_ooxml import (
+    STYLES_XML_PATH,
+    WORKBOOK_RELS_PATH,
+    _ROW_RE,
+    _cell_xml,
+    _resolve_sheet_path,
+    _set_attr,
+)
+from app.services.excel_service import WORKBOOK_XML_PATH
+
+from .log01_consolidate import _find_output_columns, _output_sheet, _output_value
+
+logger = logging.getLogger(__name__)
+
+_FONT_RE = re.compile(r"<font\b[^>]*?/>|<font\b[^>]*>.*?</font>", re.S)
+_NUM_FMT_RE = re.compile(r'<numFmt\b[^>]*?numFmtId="(\d+)"[^>]*?formatCode="([^"]*)"[^>]*?/>')
+_DIMENSION_RE = re.compile(r'<dimension ref="([A-Z]+\d+)(?::([A-Z]+)(\d+))?"\s*/>')
+
+# Formatos que puede terminar teniendo una celda de datos en el motor openpyxl:
+# General, dd/mm/yyyy (fecha) y los que openpyxl fija al asignar fechas/horas.
+_DATA_FORMATS = (FORMAT_GENERAL, "dd/mm/yyyy", *dict.fromkeys(TIME_FORMATS.values()))
+# Filas por escritura al zip
+_FLUSH_ROWS = 512
+
+
+@dataclass(frozen=True)
+class _Log01Plan:
+    """Plantilla LOG-01 compilada para escritura directa del XML (por SHA-256)."""
+    sha256: str
+    entries: tuple[tuple[ZipInfo, Optional[bytes]], ...]  # partes en orden; None = hoja (por corrida)
+    head: tuple[str, str]                # XML hasta </sheetData>, partido en <dimension> ("" si no hay)
+    tail: str                            # desde </sheetData>
+    dimension: Optional[tuple[str, int, int]]  # celda inicial, última columna y última fila de la plantilla
+    data_start_row: int
+    columns: tuple[tuple[int, str], ...]         # (columna, letra) de las celdas escritas, en orden
+    assignments: tuple[tuple[str, int], ...]     # (key, columna) en el orden del motor openpyxl
+    xf_by_format: Dict[str, int]         # formato de número -> s
+    epoch: datetime
+
+
+_PLAN_LOCK = threading.Lock()
+_PLAN_CACHE: dict[str, Optional[_Log01Plan]] = {}
+
+
+def _patch_styles(xml: str) -> Tuple[str, Dict[str, int]]:
+    """Agrega la fuente Arial 8 y un xf por formato de _DATA_FORMATS."""
+    fonts = re.search(r"(<fonts\b[^>]*>)(.*?)</fonts>", xml, re.S)
+    xfs = re.search(r"(<cellXfs\b[^>]*>)(.*?)</cellXfs>", xml, re.S)
+    if fonts is None or xfs is None:
+        raise ValueError("styles.xml sin fonts/cellXfs")
+
+    font_items = _FONT_RE.findall(fonts.group(2))
+    font_items.append('<font><sz val="8"/><name val="Arial"/></font>')
+    font_id = len(font_items) - 1
+
+    custom = {unescape(code, {"&quot;": '"'}): int(num_id) for num_id, code in _NUM_FMT_RE.findall(xml)}
+    next_id = max([163, *custom.values()]) + 1
+    new_fmts: list[str] = []
+    xf_items = [m.group(0) for m in re.finditer(r"<xf\b[^>]*?/>|<xf\b[^>]*>.*?</xf>", xfs.group(2), re.S)]
+    xf_by_format: Dict[str, int] = {}
+    for code in _DATA_FORMATS:
+        num_id = BUILTIN_FORMATS_REVERSE.get(code, custom.get(code))
+        if num_id is None:
+            num_id = custom[code] = next_id
+            next_id += 1
+            new_fmts.append(f'<numFmt numFmtId="{num_id}" formatCode={_quote(code)}/>')
+        apply_fmt = ' applyNumberFormat="1"' if num_id else ""
+        xf_items.append(
+            f'<xf numFmtId="{num_id}" fontId="{font_id}" fillId="0" borderId="0" xfId="0"{apply_fmt}'
+            ' applyFont="1" applyAlignment="1"><alignment horizontal="center" vertical="center" wrapText="1"/></xf>'
+        )
+        xf_by_format[code] = len(xf_items) - 1
+
+    def section(tag: str, items: list[str]) -> Callable[[re.Match], str]:
+        def repl(match: re.Match) -> str:
+            return _set_attr(match.group(1), "count", str(len(items))) + "".join(items) + f"</{tag}>"
+        return repl
+
+    xml = re.sub(r"(<fonts\b[^>]*>).*?</fonts>", section("fonts", font_items), xml, count=1, flags=re.S)
+    xml = re.sub(r"(<cellXfs\b[^>]*>).*?</cellXfs>", section("cellXfs", xf_items), xml, count=1, flags=re.S)
+    if new_fmts:
+        num_fmts = re.search(r"(<numFmts\b[^>]*>)(.*?)</numFmts>", xml, re.S)
+        if num_fmts is not None:
+            items = _NUM_FMT_RE.findall(num_fmts.group(2))
+            open_tag = _set_attr(num_fmts.group(1), "count", str(len(items) + len(new_fmts)))
+            xml = xml[:num_fmts.start()] + open_tag + num_fmts.group(2) + "".join(new_fmts) + xml[num_fmts.end() - len("</numFmts>"):]
+        else:
+            # <numFmts> es el primer hijo de <styleSheet>
+            at = xml.index(">", xml.index("<styleSheet")) + 1
+            xml = xml[:at] + f'<numFmts count="{len(new_fmts)}">' + "".join(new_fmts) + "</numFmts>" + xml[at:]
+    return xml, xf_by_format
+
+
+def _quote(value: str) -> str:
+    return '"' + escape(value, {'"': "&quot;"}) + '"'
+
+
+def _compile_plan(template_bytes: bytes, sha256: str) -> Optional[_Log01Plan]:
+    wb = load_workbook(BytesIO(template_bytes))
+    ws = _output_sheet(wb)
+    header_row, col_item, out_cols = _find_output_columns(ws)
+    data_start_row = header_row + 1
+    if ws.max_row >= data_start_row or any(rng.max_row >= data_start_row for rng in ws.merged_cells.ranges):
+        return None  # filas de datos previas: el motor openpyxl las limpia/reusa como modelo
+
+    with ZipFile(BytesIO(template_bytes)) as zin:
+        names = set(zin.namelist())
+        if WORKBOOK_XML_PATH not in names or WORKBOOK_RELS_PATH not in names or STYLES_XML_PATH not in names:
+            return None
+        sheet_path, _calc_chain = _resolve_sheet_path(
+            zin.read(WORKBOOK_XML_PATH), zin.read(WORKBOOK_RELS_PATH), ws.title
+        )
+        if sheet_path is None or sheet_path not in names:
+            return None
+        sheet_xml = zin.read(sheet_path).decode("utf-8")
+        styles_xml, xf_by_format = _patch_styles(zin.read(STYLES_XML_PATH).decode("utf-8"))
+        entries: list[tuple[ZipInfo, Optional[bytes]]] = []
+        for info in zin.infolist():
+            if info.filename == sheet_path:
+                entries.append((info, None))
+            elif info.filename == STYLES_XML_PATH:
+                entries.append((info, styles_xml.encode("utf-8")))
+            else:
+                entries.append((info, zin.read(info.filename)))
+
+    sheet_data_end = sheet_xml.find("</sheetData>")
+    if sheet_data_end == -1:
+        return None
+    for match in _ROW_RE.finditer(sheet_xml, 0, sheet_data_end):
+        if int(match.group(1)) >= data_start_row:
+            return None
+    head_xml = sheet_xml[:sheet_data_end]
+    dimension = _DIMENSION_RE.search(head_xml)
+    if dimension is not None:
+        end_col = dimension.group(2) or re.match(r"[A-Z]+", dimension.group(1)).group(0)  # type: ignore[union-attr]
+        end_row = dimension.group(3) or re.search(r"\d+", dimension.group(1)).group(0)  # type: ignore[union-attr]
+        dim = (dimension.group(1), column_index_from_string(end_col), int(end_row))
+        head = (head_xml[:dimension.start()], head_xml[dimension.end():])
+    else:
+        dim = None
+        head = (head_xml, "")
+
+    cols = sorted({col_item, *out_cols.values()})
+    return _Log01Plan(
+        sha256=sha256,
+        entries=tuple(entries),
+        head=head,
+        tail=sheet_xml[sheet_data_end:],
+        dimension=dim,
+        data_start_row=data_start_row,
+        columns=tuple((c, get_column_letter(c)) for c in cols),
+        assignments=(("item", col_item), *out_cols.items()),
+        xf_by_format=xf_by_format,
+        epoch=wb.epoch,
+    )
+
+
+def _get_plan(template_path: Path) -> Optional[_Log01Plan]:
+    """Plan compilado para la versión vigente de la plantilla (None si no es compatible)."""
+    template_bytes = template_path.read_bytes()
+    sha256 = hashlib.sha256(template_bytes).hexdigest()
+    with _PLAN_LOCK:
+        if sha256 in _PLAN_CACHE:
+            return _PLAN_CACHE[sha256]
+        try:
+            plan = _compile_plan(template_bytes, sha256)
+        except (ValueError, IndexError, KeyError, ET.ParseError):
+            logger.warning("Plantilla LOG01 no compatible con el motor OOXML; se usa openpyxl", exc_info=True)
+            plan = None
+        # Solo la versión vigente: al cambiar la plantilla se descarta la anterior
+        _PLAN_CACHE.clear()
+        _PLAN_CACHE[sha256] = plan
+        return plan
+
+
+def _data_cell_xml(ref: str, style: int, value: Any, row: int, epoch: datetime) -> str:
+    """_cell_xml más los casos de Cell._bind_value que el motor VI no necesita."""
+    if isinstance(value, str):
+        value = value[:32767]
+        if value in ERROR_CODES:
+            return f'<c r="{ref}" s="{style}" t="e"><v>{value}</v></c>'
+    elif isinstance(value, (time, timedelta)):
+        # _cell_xml solo convierte date/datetime; horas y duraciones van como número (igual que openpyxl)
+        value = to_excel(value, epoch)
+    return _cell_xml(ref, style, value, row, epoch)
+
+
+def _column_formats(plan: _Log01Plan, rows: Sequence[Dict[str, Any]]) -> Dict[int, str]:
+    """
+    Formato de número final por columna. El motor openpyxl asigna a cada fila el
+    mismo StyleArray de la fila modelo (dst._style = src._style), así que el formato
+    que fija Cell._bind_value en cualquier fila (fechas/horas en una columna sin
+    formato de fecha) termina aplicando a toda la columna.
+    """
+    formats = {col: FORMAT_GENERAL for col, _ in plan.columns}
+    for vals in rows:
+        for key, col in plan.assignments:
+            if key == "fecha":
+                formats[col] = "dd/mm/yyyy"
+            elif key != "item":
+                v = vals.get(key)
+                if isinstance(v, TIME_TYPES) and not is_date_format(formats[col]):
+                    formats[col] = get_time_format(type(v))
+    return formats
+
+
+def _write_sheet(
+    fh: IO[bytes],
+    plan: _Log01Plan,
+    rows: Sequence[Dict[str, Any]],
+    on_row: Callable[[int], None],
+) -> None:
+    total = len(rows)
+    fh.write(plan.head[0].encode("utf-8"))
+    if plan.dimension is not None:
+        start, end_col, end_row = plan.dimension
+        if total:
+            end_col = max(end_col, plan.columns[-1][0])
+        last_row = max(end_row, plan.data_start_row + total - 1)
+        fh.write(f'<dimension ref="{start}:{get_column_letter(end_col)}{last_row}"/>'.encode("utf-8"))
+    fh.write(plan.head[1].encode("utf-8"))
+
+    formats = _column_formats(plan, rows)
+    styles = [(col, letter, plan.xf_by_format[formats[col]]) for col, letter in plan.columns]
+    chunk: list[str] = []
+    for i, vals in enumerate(rows, start=1):
+        r = plan.data_start_row + i - 1
+        values: Dict[int, Any] = {}
+        for key, col in plan.assignments:
+            values[col] = i if key == "item" else _output_value(key, vals.get(key))
+
+        chunk.append(f'<row r="{r}">')
+        for col, letter, style in styles:
+            chunk.append(_data_cell_xml(f"{letter}{r}", style, values.get(col), r, plan.epoch))
+        chunk.append("</row>")
+        if i % _FLUSH_ROWS == 0:
+            fh.write("".join(chunk).encode("utf-8"))
+            chunk.clear()
+        on_row(i)
+    fh.write("".join(chunk).encode("utf-8"))
+    fh.write(plan.tail.encode("utf-8"))
+
+
+def render_log01_ooxml(
+    template_path: str,
+    rows: Sequence[Dict[str, Any]],
+    on_row: Callable[[int], None],
+) -> Optional[bytes]:
+    """
+    Misma salida que _render_output_openpyxl escribiendo el XML directamente.
+    Devuelve None si la plantilla no es compatible (el llamador usa openpyxl).
+    """
+    plan = _get_plan(Path(template_path))
+    if plan is None:
+        return None
+
+    buf = BytesIO()
+    with ZipFile(buf, "w", ZIP_DEFLATED) as zout:
+        for info, data in plan.entries:
+            # ZipInfo nuevo por corrida: ZipFile completa tamaños/CRC sobre el objeto
+            part = ZipInfo(info.filename, info.date_time)
+            part.compress_type = ZIP_DEFLATED
+            part.external_attr = info.external_attr
+            if data is not None:
+                zout.writestr(part, data)
+                continue
+            with zout.open(part, "w") as fh:
+                _write_sheet(fh, plan, rows, on_row)
+    return buf.getvalue()
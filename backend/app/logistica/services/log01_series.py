@@ -0,0 +1,318 @@
+"""
+Almacén columnar de series LOG-01 (dedupe de la consolidación).
+
+Cada serie recibe un id entero (interning) y su estado vive en columnas NumPy
+indexadas por ese id, en lugar de un objeto + un dict de metadatos por serie.
+Los valores de salida se guardan como tuplas en el orden de las claves de salida.
+
+Las claves de OI (año, número) se empaquetan en un int64: (año << 32) | número,
+así que comparar claves empaquetadas equivale a comparar las tuplas. -1 = sin dato.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_NO_KEY = -1
+_CONFORME = 1
+_NO_CONFORME = 0
+_ESTADOS = {_CONFORME: "CONFORME", _NO_CONFORME: "NO CONFORME"}
+
+
+@dataclass
+class SerieInfo:
+    oi_num: int
+    oi_year: int
+    estado: str  # CONFORME / NO CONFORME
+    values: Dict[str, Any]
+
+
+def _pack_key(oi_year: Optional[int], oi_num: Optional[int]) -> int:
+    return (int(oi_year or 0) << 32) | int(oi_num or 0)
+
+
+def _unpack_key(key: int) -> Tuple[int, int]:
+    """(oi_year, oi_num) de una clave empaquetada."""
+    return key >> 32, key & 0xFFFFFFFF
+
+
+def _first_index(ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Ids únicos y posición de su primera aparición (np.unique ordena estable)."""
+    return np.unique(ids, return_index=True)
+
+
+class Log01SeriesStore:
+    """
+    Series deduplicadas con las reglas de LOG-01 (ver `add_file`).
+
+    Columnas por id de serie:
+    - cur_key/estado: registro vigente (OI y estado de la fila que quedó en salida)
+    - latest_key/latest_estado: fila BASES de OI mayor (auditoría de conflictos)
+    - best_c_key/best_nc_key: OI mayor vista como CONFORME / NO CONFORME
+    - bases_seq: orden de la primera fila BASES (desempate de la auditoría)
+    """
+
+    __slots__ = (
+        "value_keys",
+        "sort_key",
+        "names",
+        "values",
+        "_ids",
+        "_size",
+        "cur_key",
+        "estado",
+        "latest_key",
+        "latest_estado",
+        "best_c_key",
+        "best_nc_key",
+        "bases_seq",
+        "_bases_seen",
+        "_group",
+    )
+
+    def __init__(self, value_keys: Sequence[str], sort_key: Callable[[str], Any], capacity: int = 1024) -> None:
+        self.value_keys: Tuple[str, ...] = tuple(value_keys)
+        self.sort_key = sort_key
+        self.names: List[str] = []
+        self.values: List[Optional[tuple]] = []
+        self._ids: Dict[str, int] = {}
+        self._size = 0
+        capacity = max(int(capacity), 1)
+        self.cur_key = np.full(capacity, _NO_KEY, dtype=np.int64)
+        self.estado = np.full(capacity, _NO_CONFORME, dtype=np.int8)
+        self.latest_key = np.full(capacity, _NO_KEY, dtype=np.int64)
+        self.latest_estado = np.full(capacity, _NO_CONFORME, dtype=np.int8)
+        self.best_c_key = np.full(capacity, _NO_KEY, dtype=np.int64)
+        self.best_nc_key = np.full(capacity, _NO_KEY, dtype=np.int64)
+        self.bases_seq = np.full(capacity, _NO_KEY, dtype=np.int64)
+        self._bases_seen = 0
+        self._group: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, serie: object) -> bool:
+        return serie in self._ids
+
+    # ----------------------------
+    # Carga
+    # ----------------------------
+
+    def _grow(self, size: int) -> None:
+        capacity = len(self.cur_key)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        for name in ("cur_key", "latest_key", "best_c_key", "best_nc_key", "bases_seq", "estado", "latest_estado"):
+            old = getattr(self, name)
+            fill = _NO_KEY if old.dtype == np.int64 else _NO_CONFORME
+            new = np.full(capacity, fill, dtype=old.dtype)
+            new[: len(old)] = old
+            setattr(self, name, new)
+
+    def _intern(self, serie: str) -> int:
+        sid = self._ids.get(serie)
+        if sid is None:
+            sid = len(self.names)
+            self._ids[serie] = sid
+            self.names.append(serie)
+            self.values.append(None)
+        return sid
+
+    def _assign(
+        self,
+        sids: np.ndarray,
+        rows_idx: np.ndarray,
+        key: int,
+        estados: np.ndarray,
+        rows: Sequence[Tuple[str, str, Dict[str, Any]]],
+    ) -> None:
+        if not len(sids):
+            return
+        self.cur_key[sids] = key
+        self.estado[sids] = estados
+        keys = self.value_keys
+        values = self.values
+        for sid, r in zip(sids.tolist(), rows_idx.tolist()):
+            row_values = rows[r][2]
+            values[sid] = tuple(row_values.get(k) for k in keys)
+
+    def add_file(
+        self,
+        rows: Sequence[Tuple[str, str, Dict[str, Any]]],
+        source_type: str,
+        oi_year: Optional[int],
+        oi_num: Optional[int],
+    ) -> None:
+        """
+        Aplica las filas (serie, estado, values) de un archivo, en orden de entrada.
+
+        Todas las filas de un archivo comparten origen y OI, así que el dedupe se
+        resuelve por archivo con operaciones vectorizadas (primera/última aparición
+        de cada serie), con el mismo resultado que aplicar fila por fila:
+        - BASES: se queda con la OI mayor dentro del mismo estado; si existe
+          CONFORME en alguna OI, prevalece sobre NO CONFORME. En empates gana la
+          primera fila.
+        - GASELAG: no hay OI real (oi 0); solo reemplaza registros sin OI y, dentro
+          del archivo, gana la última fila.
+        """
+        n = len(rows)
+        if not n:
+            return
+        self._group = None
+        sids = np.fromiter((self._intern(serie) for serie, _, _ in rows), dtype=np.int64, count=n)
+        self._size = len(self.names)
+        self._grow(self._size)
+        conf = np.fromiter((estado == "CONFORME" for _, estado, _ in rows), dtype=bool, count=n)
+
+        if source_type != "BASES":
+            # Última aparición de cada serie en el archivo
+            uniq, last_rev = _first_index(sids[::-1])
+            last = (n - 1) - last_rev
+            write = self.cur_key[uniq] <= 0
+            self._assign(uniq[write], last[write], 0, conf[last[write]].astype(np.int8), rows)
+            return
+
+        key = _pack_key(oi_year, oi_num)
+
+        # Auditoría: fila BASES de OI mayor (primera del archivo para cada serie)
+        uniq, first = _first_index(sids)
+        unseen = self.latest_key[uniq] == _NO_KEY
+        new_ids = uniq[unseen][np.argsort(first[unseen], kind="stable")]
+        self.bases_seq[new_ids] = np.arange(self._bases_seen, self._bases_seen + len(new_ids))
+        self._bases_seen += len(new_ids)
+        newer = self.latest_key[uniq] < key
+        self.latest_key[uniq[newer]] = key
+        self.latest_estado[uniq[newer]] = conf[first[newer]]
+
+        c_rows = np.flatnonzero(conf)
+        c_ids, c_first = _first_index(sids[c_rows])
+        c_rows = c_rows[c_first]
+        nc_rows = np.flatnonzero(~conf)
+        nc_ids, nc_first = _first_index(sids[nc_rows])
+        nc_rows = nc_rows[nc_first]
+
+        c_write = self.best_c_key[c_ids] < key
+        nc_better = self.best_nc_key[nc_ids] < key
+        # NO CONFORME solo se usa si no existía CONFORME antes del archivo; si el
+        # archivo trae CONFORME para la serie, esa escritura lo reemplaza abajo.
+        nc_write = nc_better & (self.best_c_key[nc_ids] == _NO_KEY)
+
+        self.best_nc_key[nc_ids[nc_better]] = key
+        self.best_c_key[c_ids[c_write]] = key
+        self._assign(nc_ids[nc_write], nc_rows[nc_write], key, np.int8(_NO_CONFORME), rows)
+        self._assign(c_ids[c_write], c_rows[c_write], key, np.int8(_CONFORME), rows)
+
+    # ----------------------------
+    # Consulta
+    # ----------------------------
+
+    def _natural_group(self) -> np.ndarray:
+        """
+        Grupo de orden natural de cada id (sort_key precomputado una sola vez; series
+        con la misma clave, p. ej. "M01" y "m1", comparten grupo).
+        """
+        if self._group is None:
+            sort_key = self.sort_key
+            keys = [tuple(sort_key(s)) for s in self.names]
+            order = sorted(range(self._size), key=keys.__getitem__)
+            group = np.empty(self._size, dtype=np.int64)
+            g, prev = -1, None
+            for sid in order:
+                if g < 0 or keys[sid] != prev:
+                    g += 1
+                    prev = keys[sid]
+                group[sid] = g
+            self._group = group
+        return self._group
+
+    def _natural_sort(self, sids: np.ndarray) -> np.ndarray:
+        """Orden natural estable: los empates conservan el orden de `sids`."""
+        return sids[np.argsort(self._natural_group()[sids], kind="stable")]
+
+    def ids(self, estado: Optional[str] = None) -> np.ndarray:
+        """Ids (opcionalmente de un estado final) en orden natural de serie."""
+        sids = np.arange(self._size, dtype=np.int64)
+        if estado is not None:
+            code = _CONFORME if estado == "CONFORME" else _NO_CONFORME
+            sids = sids[self.estado[: self._size] == code]
+        return self._natural_sort(sids)
+
+    def oi(self, sid: int) -> Tuple[int, int]:
+        """(oi_year, oi_num) del registro vigente."""
+        return _unpack_key(int(self.cur_key[sid]))
+
+    def estado_of(self, sid: int) -> str:
+        return _ESTADOS[int(self.estado[sid])]
+
+    def values_of(self, sid: int) -> Dict[str, Any]:
+        return dict(zip(self.value_keys, self.values[sid] or ()))
+
+    def get(self, serie: str) -> Optional[SerieInfo]:
+        sid = self._ids.get(serie)
+        if sid is None:
+            return None
+        oi_year, oi_num = self.oi(sid)
+        return SerieInfo(oi_num=oi_num, oi_year=oi_year, estado=self.estado_of(sid), values=self.values_of(sid))
+
+    def records(self) -> Iterator[Tuple[str, SerieInfo]]:
+        """(serie, SerieInfo) en orden de primera aparición (diagnóstico/tests)."""
+        for sid, serie in enumerate(self.names):
+            oi_year, oi_num = self.oi(sid)
+            yield serie, SerieInfo(
+                oi_num=oi_num, oi_year=oi_year, estado=self.estado_of(sid), values=self.values_of(sid)
+            )
+
+    def conflicts(self) -> List[Dict[str, Any]]:
+        """Series con NO CONFORME más reciente que una CONFORME, en orden natural."""
+        n = self._size
+        mask = (
+            (self.best_c_key[:n] != _NO_KEY)
+            & (self.best_nc_key[:n] != _NO_KEY)
+            & (self.latest_estado[:n] == _NO_CONFORME)
+        )
+        sids = np.flatnonzero(mask)
+        sids = self._natural_sort(sids[np.argsort(self.bases_seq[sids], kind="stable")])
+        out: List[Dict[str, Any]] = []
+        for sid in sids.tolist():
+            latest_oi_year, latest_oi_num = _unpack_key(int(self.latest_key[sid]))
+            best_c_year, best_c_num = _unpack_key(int(self.best_c_key[sid]))
+            best_nc_year, best_nc_num = _unpack_key(int(self.best_nc_key[sid]))
+            out.append(
+                {
+                    "serie": self.names[sid],
+                    "latest_oi_year": latest_oi_year,
+                    "latest_oi_num": latest_oi_num,
+                    "latest_estado": "NO CONFORME",
+                    "best_conforme_oi_year": best_c_year,
+                    "best_conforme_oi_num": best_c_num,
+                    "best_no_conforme_oi_year": best_nc_year,
+                    "best_no_conforme_oi_num": best_nc_num,
+                }
+            )
+        return out
+
+    def output_rows(self, sids: np.ndarray) -> "Log01OutputRows":
+        return Log01OutputRows(self, sids)
+
+
+class Log01OutputRows(Sequence):
+    """Vista de filas de salida: arma el dict de cada serie al leerla (sin copia total)."""
+
+    __slots__ = ("_store", "_sids")
+
+    def __init__(self, store: Log01SeriesStore, sids: np.ndarray) -> None:
+        self._store = store
+        self._sids = sids.tolist()
+
+    def __len__(self) -> int:
+        return len(self._sids)
+
+    def __getitem__(self, i):  # type: ignore[override]
+        if isinstance(i, slice):
+            return [self._store.values_of(sid) for sid in self._sids[i]]
+        return self._store.values_of(self._sids[i])
@@ -19,6 +19,7 @@ from app.oi_tools.routers import oi_merge as oi_merge
 from app.oi_tools.routers import excel as oi_excel
 from app.oi_tools.routers import files as oi_files
 from app.oi_tools.routers import formato_ac_history as formato_ac_history_router
+from app.oi_tools.services.job_relay import start_job_relay
 from app.logistica.routers import log01 as log01_router
 from app.logistica.routers import log02 as log02_router
 
@@ -72,6 +73,8 @@ app.include_router(log02_router.router)
 @app.on_event("startup")
 def _startup() -> None:
     init_db()
+    start_job_relay()
+    log01_router.resume_log01_jobs()
 
 
 # --- FRONTEND BUILD (Vite) + SOPORTE EXE ---
@@ -1,9 +1,10 @@
 from datetime import datetime
 from typing import Optional, List, ClassVar
 from sqlmodel import SQLModel, Field, Relationship
-from sqlalchemy import Column, CheckConstraint, Enum as SAEnum, event, BigInteger
+from sqlalchemy import Column, CheckConstraint, Enum as SAEnum, event, BigInteger, Index
 from sqlalchemy.types import JSON
 from .schemas import NumerationType
+from .core.rows_codec import RowsDataType
 
 class User(SQLModel, table=True):
     """Usuario del sistema OI.
@@ -27,6 +28,10 @@ class OI(SQLModel, table=True):
             "numeration_type in ('correlativo','no correlativo')",
             name="ck_oi_numeration_type",
         ),
+        # Orden del listado /oi (paginación por cursor)
+        Index("idx_oi_sort_at_id", "sort_at", "id"),
+        # Listado de técnicos: tech_number + banco_id (+ rango de fechas)
+        Index("idx_oi_tech_banco_created", "tech_number", "banco_id", "created_at"),
     )
  
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -58,10 +63,19 @@ class OI(SQLModel, table=True):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: Optional[datetime] = None
     saved_at: Optional[datetime] = None
+    # coalesce(updated_at, created_at) persistido (se mantiene al guardar)
+    sort_at: Optional[datetime] = None
+    # Contador desnormalizado: sum(Bancada.rows) de esta OI
+    medidores_usuario: int = Field(default=0)
 
     bancadas: List["Bancada"] = Relationship(back_populates="oi")
 
 class Bancada(SQLModel, table=True):
+    __table_args__ = (
+        Index("idx_bancada_oi_item", "oi_id", "item"),
+        Index("idx_bancada_oi_saved_at", "oi_id", "saved_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     oi_id: int = Field(foreign_key="oi.id")
     item: int                       # autonum (1..n)
@@ -70,10 +84,11 @@ class Bancada(SQLModel, table=True):
     estado: int = Field(default=0, ge=0, le=5)  # 0..5 (editable; default 0)
     rows: int = Field(default=15, ge=1)
     # Grid de filas de la bancada (cada elemento representa una fila del modal/Excel).
-    # Se almacena como JSON (lista de dicts) para conservar la mini-planilla completa.
+    # Se almacena como JSON (lista de dicts) para conservar la mini-planilla completa;
+    # con VI_ROWS_DATA_ENCODING=compact se guarda comprimido (ver core/rows_codec).
     rows_data: Optional[List[dict]] = Field(
         default=None,
-        sa_column=Column(JSON)
+        sa_column=Column(RowsDataType)
     )
 
     # Auditoría de la bancada
@@ -83,8 +98,77 @@ class Bancada(SQLModel, table=True):
 
     oi: Optional[OI] = Relationship(back_populates="bancadas")
 
+class BancadaMedidor(SQLModel, table=True):
+    """Índice normalizado de medidores por bancada (búsqueda q= en /oi).
+
+    Se mantiene al guardar/restaurar/eliminar bancadas; el valor se guarda
+    con strip + mayúsculas para búsquedas case-insensitive.
+    - searchable: medidor de cabecera o del grid (búsqueda en listado)
+    - dup_check: forma parte del conjunto usado para validar duplicados
+      (grid, o serie expandida según numeration_type)
+    """
+    __tablename__: ClassVar[str] = "bancada_medidor"
+    __table_args__ = (
+        Index("idx_bancada_medidor_medidor_oi", "medidor", "oi_id"),
+        # Búsqueda q= (LIKE '%texto%'): se recorre solo este índice, sin leer la tabla
+        Index("idx_bancada_medidor_search", "searchable", "medidor", "oi_id"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    oi_id: int = Field(foreign_key="oi.id", index=True)
+    bancada_id: int = Field(foreign_key="bancada.id", index=True)
+    medidor: str
+    searchable: bool = Field(default=True)
+    dup_check: bool = Field(default=False)
+
+class OICodeTotal(SQLModel, table=True):
+    """Total de medidores por código de OI (suma de OI.medidores_usuario del código)."""
+    __tablename__: ClassVar[str] = "oi_code_total"
+
+    code: str = Field(primary_key=True)
+    medidores_total: int = Field(default=0)
+
+class AuthSession(SQLModel, table=True):
+    """Sesión de login persistida (backend "db" de core/session_store)."""
+    __tablename__: ClassVar[str] = "auth_session"
+
+    token: str = Field(primary_key=True)
+    user_id: Optional[int] = Field(default=None, index=True)
+    # Mismo dict que devuelve /auth/login (fechas en ISO)
+    data: dict = Field(sa_column=Column(JSON, nullable=False))
+    expires_at: datetime = Field(index=True)
+
+class JobRelayRecord(SQLModel, table=True):
+    """Progreso y cancelación de un job compartidos entre workers (ver oi_tools/services/job_relay)."""
+    __tablename__: ClassVar[str] = "job_relay"
+
+    operation_id: str = Field(primary_key=True)
+    # Proceso (worker) que ejecuta el job
+    worker_id: str
+    # Usuario que inició la operación (para validar quién puede cancelarla)
+    owner_user_id: Optional[int] = None
+    cancel_requested: bool = Field(default=False)
+    closed: bool = Field(default=False)
+    # Últimos eventos del canal, con su "cursor" original
+    events: Optional[list] = Field(default=None, sa_column=Column(JSON))
+    last_cursor: int = -1
+    updated_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+class SchemaVersion(SQLModel, table=True):
+    """Migraciones versionadas ya aplicadas (ver core/db.MIGRATIONS)."""
+    __tablename__: ClassVar[str] = "schema_version"
+
+    version: int = Field(primary_key=True)
+    name: str
+    applied_at: datetime = Field(default_factory=datetime.utcnow)
+
 class Log01Run(SQLModel, table=True):
     __tablename__: ClassVar[str] = "log01_run"
+    __table_args__ = (
+        Index("idx_log01_run_created_at_id", "created_at", "id"),
+        Index("idx_log01_run_deleted_created", "deleted_at", "created_at"),
+        Index("idx_log01_run_serie_range", "serie_ini_num", "serie_fin_num"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
 
@@ -145,8 +229,55 @@ class Log01Artifact(SQLModel, table=True):
     run: Optional[Log01Run] = Relationship(back_populates="artifacts")
 
 
+class Log01JobRecord(SQLModel, table=True):
+    """Job async de /logistica/log01/start (sobrevive a reinicios; ver routers/log01)."""
+    __tablename__: ClassVar[str] = "log01_job"
+    __table_args__ = (
+        Index("idx_log01_job_status_updated", "status", "updated_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    operation_id: str = Field(index=True, unique=True)
+
+    # queued | running | complete | error | cancelled (mismos estados que el job en memoria)
+    status: str = Field(default="queued")
+    source: str = Field(default="AUTO")
+    output_filename: Optional[str] = None
+
+    # Carpeta del job (entradas subidas, checkpoints por archivo y resultados)
+    work_dir: str
+    # [{"name": ..., "path": ...}] en el orden de entrada
+    files_json: Optional[list] = Field(default=None, sa_column=Column(JSON))
+    # Snapshot de sesión del usuario que inició el job (auditoría en log01_run)
+    session_json: Optional[dict] = Field(default=None, sa_column=Column(JSON))
+
+    files_total: int = 0
+    # Archivos leídos con checkpoint en disco
+    files_done: int = 0
+    # Veces que se inició (1 = sin reanudar)
+    attempts: int = 0
+    # Proceso que lo está ejecutando (evita que dos procesos lo reanuden a la vez)
+    runner_id: Optional[str] = None
+    # Lease del runner, renovado mientras corre; otro proceso solo lo toma vencido
+    lease_until: Optional[datetime] = None
+
+    output_name: Optional[str] = None
+    result_path: Optional[str] = None
+    no_conforme_path: Optional[str] = None
+    manifest_path: Optional[str] = None
+    error: Optional[str] = None
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+
+
 class FormatoAcRun(SQLModel, table=True):
     __tablename__: ClassVar[str] = "formato_ac_run"
+    __table_args__ = (
+        Index("idx_formato_ac_run_created_at_id", "created_at", "id"),
+        Index("idx_formato_ac_run_origin_created", "origin", "created_at"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
 
@@ -205,3 +336,10 @@ def _normalize_numeration_type(mapper, connection, target: OI):
             enum_val = NumerationType.correlativo
     # Guardamos siempre como string oficial (con espacio)
     target.numeration_type = enum_val
+
+
+@event.listens_for(OI, "before_insert")
+@event.listens_for(OI, "before_update")
+def _sync_sort_at(mapper, connection, target: OI):
+    """Mantiene oi.sort_at = coalesce(updated_at, created_at) en cada escritura."""
+    target.sort_at = target.updated_at or target.created_at
@@ -11,6 +11,7 @@ from sqlmodel import Session, select
 
 from app.api.auth import get_current_user_session
 from app.core.db import engine
+from app.core.pagination import next_cursor, seek_after
 from app.core.settings import get_settings
 from app.models import FormatoAcRun, FormatoAcArtifact
 from app.schemas import FormatoAcRunListItem, FormatoAcRunListResponse
@@ -62,8 +63,17 @@ def formato_ac_history_list(
     dateFrom: Optional[str] = None,
     dateTo: Optional[str] = None,
     origin: Optional[str] = None,
+    cursor: Optional[str] = None,
 ):
     created_at_col = cast(Any, FormatoAcRun.created_at)
+    id_col = cast(Any, FormatoAcRun.id)
+    # Paginación por cursor (opcional): reemplaza a offset
+    seek = None
+    if cursor:
+        try:
+            seek = seek_after(created_at_col, id_col, cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     where = []
 
     q_clean = (q or "").strip()
@@ -91,13 +101,14 @@ def formato_ac_history_list(
 
     with Session(engine) as session:
         total = session.exec(select(func.count()).select_from(FormatoAcRun).where(*where)).one()
-        runs = session.exec(
-            select(FormatoAcRun)
-            .where(*where)
-            .order_by(created_at_col.desc())
-            .offset(offset)
-            .limit(limit)
-        ).all()
+        stmt = select(FormatoAcRun).where(*where).order_by(created_at_col.desc(), id_col.desc())
+        if seek is not None:
+            stmt = stmt.where(seek)
+        if cursor is None:
+            stmt = stmt.offset(offset)
+        runs = list(session.exec(stmt.limit(limit + 1)).all())
+        next_page = next_cursor(runs, limit, "created_at")
+        runs = runs[:limit]
 
         items = [
             FormatoAcRunListItem(
@@ -114,7 +125,13 @@ def formato_ac_history_list(
             )
             for r in runs
         ]
-        return FormatoAcRunListResponse(items=items, total=total, limit=limit, offset=offset)
+        return FormatoAcRunListResponse(
+            items=items,
+            total=total,
+            limit=limit,
+            offset=offset if cursor is None else 0,
+            next_cursor=next_page,
+        )
 
 
 @router.get("/history/{run_id}/artifact")
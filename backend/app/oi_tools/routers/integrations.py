@@ -1,7 +1,5 @@
 ﻿from __future__ import annotations
-import asyncio
 import json
-import queue
 import uuid
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends
 from pydantic import BaseModel, Field
@@ -17,7 +15,7 @@ from app.oi_tools.services.excel_password import (
 from time import perf_counter
 import re
 from app.oi_tools.services.excel_io import close_workbook_safe
-from app.oi_tools.services.progress_manager import progress_manager, SENTINEL
+from app.oi_tools.services.progress_manager import progress_manager
 from app.oi_tools.services.integrations.vima_to_lista import (
     VimaToListaConfig,
     map_vima_to_lista,
@@ -56,17 +54,10 @@ async def vima_progress_stream(operation_id: str):
 
     async def event_stream():
         try:
-            for event in history:
-                yield progress_manager.encode_event(event)
-            while True:
-                try:
-                    item = channel.queue.get_nowait()
-                except queue.Empty:
-                    await asyncio.sleep(0.05)
-                    continue
-                if item is SENTINEL:
-                    break
-                yield progress_manager.encode_event(item)
+            if history:
+                yield progress_manager.encode_events(history)
+            async for batch in progress_manager.follow(channel, history):
+                yield progress_manager.encode_events(batch)
         finally:
             progress_manager.unsubscribe(operation_id)
 
@@ -3,6 +3,7 @@ from __future__ import annotations
 from typing import List, Optional
 
 from fastapi import APIRouter, File, UploadFile, Query, Depends, Form, HTTPException
+from starlette.concurrency import run_in_threadpool
 
 # Reutilizamos la logica probada del mini-servicio oi_merge_b
 from app.api.auth import get_current_user_session
@@ -46,9 +47,14 @@ async def cancel_merge(operation_id: str):
     """
     Solicita cancelación cooperativa para una operación de consolidación en curso.
     """
-    ok = cancel_manager.cancel(operation_id)
+    local = cancel_manager.get(operation_id) is not None
+    # Si el job es de otro worker, cancel() escribe en la BD
+    ok = await run_in_threadpool(cancel_manager.cancel, operation_id)
     if not ok:
         raise HTTPException(status_code=404, detail="Operación no encontrada")
+    if not local:
+        # Lo emite el worker que ejecuta la consolidación al ver el token
+        return {"ok": True}
 
     # Emitir y cerrar el stream para que el frontend pare rápidamente.
     progress_manager.emit(
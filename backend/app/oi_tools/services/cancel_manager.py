@@ -1,12 +1,17 @@
 from __future__ import annotations
 
+import logging
 import threading
-from typing import Dict, Optional
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
 
 
 class CancelToken:
-    def __init__(self) -> None:
+    def __init__(self, owner_user_id: Optional[int] = None) -> None:
         self._event = threading.Event()
+        # Usuario que inició la operación (None: sin dueño registrado)
+        self.owner_user_id = owner_user_id
 
     def cancel(self) -> None:
         self._event.set()
@@ -19,21 +24,44 @@ class CancelManager:
     def __init__(self) -> None:
         self._lock = threading.Lock()
         self._tokens: Dict[str, CancelToken] = {}
+        # job_relay.JobRelay con VI_JOB_STATE_BACKEND=db (cancelar desde otro worker)
+        self.remote: Optional[Any] = None
 
-    def create(self, operation_id: str) -> CancelToken:
+    def create(self, operation_id: str, owner_user_id: Optional[int] = None) -> CancelToken:
         with self._lock:
-            token = CancelToken()
+            token = CancelToken(owner_user_id)
             self._tokens[operation_id] = token
-            return token
+        if self.remote is not None:
+            try:
+                self.remote.register(operation_id, owner_user_id)
+            except Exception:
+                # El job corre igual; solo no se podrá cancelar desde otro worker
+                logger.exception("Cancel register failed operation_id=%s", operation_id)
+        return token
 
     def get(self, operation_id: str) -> Optional[CancelToken]:
         with self._lock:
             return self._tokens.get(operation_id)
 
+    def owner(self, operation_id: str) -> Tuple[bool, Optional[int]]:
+        """(existe, owner_user_id) de una operación activa, local o de otro worker."""
+        token = self.get(operation_id)
+        if token is not None:
+            return True, token.owner_user_id
+        if self.remote is not None:
+            return self.remote.owner(operation_id)
+        return False, None
+
+    def pending(self) -> Dict[str, CancelToken]:
+        """Tokens locales aún no cancelados."""
+        with self._lock:
+            return {op: tok for op, tok in self._tokens.items() if not tok.is_cancelled()}
+
     def cancel(self, operation_id: str) -> bool:
         token = self.get(operation_id)
         if token is None:
-            return False
+            # Job de otro worker: se pide por BD y su proceso cancela el token
+            return self.remote is not None and self.remote.request_cancel(operation_id)
         token.cancel()
         return True
 
@@ -0,0 +1,249 @@
+"""
+Progreso y cancelación de jobs compartidos entre workers (tabla job_relay).
+
+Con varios workers de uvicorn (VI_SERVER_WORKERS > 1) el job corre en el worker
+que recibió el inicio, pero el stream/poll de progreso y el cancel pueden caer
+en cualquier otro. Con VI_JOB_STATE_BACKEND=db cada proceso corre un JobRelay
+que cada VI_JOB_RELAY_INTERVAL_S:
+- publica en job_relay los últimos eventos (REPLAY_SIZE) de los canales que
+  emite este proceso y si ya cerraron;
+- copia a los canales locales sin emisor (suscriptores de un job de otro
+  worker) los eventos nuevos de su fila, con el mismo cursor;
+- cancela los CancelToken locales cuya cancelación se pidió desde otro worker.
+
+Con "memory" (default, un solo worker) no se instala: progreso y cancelación
+quedan en el proceso como siempre.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, update
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from app.core.settings import get_settings
+from app.models import JobRelayRecord
+from app.oi_tools.services.cancel_manager import CancelManager, cancel_manager
+from app.oi_tools.services.progress_manager import (
+    REPLAY_SIZE,
+    ProgressChannel,
+    ProgressManager,
+    progress_manager,
+)
+
+logger = logging.getLogger(__name__)
+
+# Canales sin suscriptores que se siguen copiando tras su último uso (poll)
+MIRROR_IDLE_S = 60.0
+# Filas sin cambios más antiguas que esto se borran
+RELAY_TTL_S = 6 * 3600
+PURGE_INTERVAL_S = 300.0
+
+
+class JobRelay:
+    def __init__(
+        self,
+        engine: Optional[Engine] = None,
+        *,
+        progress: ProgressManager = progress_manager,
+        cancels: CancelManager = cancel_manager,
+        interval_s: float = 0.5,
+        worker_id: Optional[str] = None,
+    ) -> None:
+        self._engine = engine
+        self.progress = progress
+        self.cancels = cancels
+        self.interval_s = max(0.05, interval_s)
+        self.worker_id = worker_id or uuid.uuid4().hex
+        # operation_id -> [canal emitido aquí, último cursor publicado, cerrado publicado]
+        self._tracked: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_purge = 0.0
+
+    @property
+    def engine(self) -> Engine:
+        if self._engine is None:
+            from app.core.db import engine
+
+            self._engine = engine
+        return self._engine
+
+    # --- hooks de ProgressManager / CancelManager ---
+    def track(self, operation_id: str, channel: ProgressChannel) -> None:
+        with self._lock:
+            if operation_id not in self._tracked:
+                self._tracked[operation_id] = [channel, None, False]
+
+    def register(self, operation_id: str, owner_user_id: Optional[int] = None) -> None:
+        with Session(self.engine) as session:
+            row = session.get(JobRelayRecord, operation_id) or JobRelayRecord(
+                operation_id=operation_id, worker_id=self.worker_id
+            )
+            row.worker_id = self.worker_id
+            row.owner_user_id = owner_user_id
+            row.cancel_requested = False
+            row.closed = False
+            row.events = []
+            row.last_cursor = -1
+            row.updated_at = datetime.utcnow()
+            session.add(row)
+            session.commit()
+
+    def request_cancel(self, operation_id: str) -> bool:
+        with Session(self.engine) as session:
+            result = session.exec(  # type: ignore[call-overload]
+                update(JobRelayRecord)
+                .where(
+                    JobRelayRecord.operation_id == operation_id,
+                    JobRelayRecord.closed == False,  # noqa: E712
+                )
+                .values(cancel_requested=True, updated_at=datetime.utcnow())
+            )
+            session.commit()
+            return bool(result.rowcount)
+
+    def owner(self, operation_id: str) -> Tuple[bool, Optional[int]]:
+        with Session(self.engine) as session:
+            row = session.get(JobRelayRecord, operation_id)
+            if row is None or row.closed:
+                return False, None
+            return True, row.owner_user_id
+
+    # --- sincronización ---
+    def sync(self) -> None:
+        """Una pasada: publica, recibe cancelaciones y copia eventos de otros workers."""
+        self._publish()
+        self._pull_cancels()
+        self._mirror()
+        now = time.monotonic()
+        if now - self._last_purge >= PURGE_INTERVAL_S:
+            self._last_purge = now
+            self._purge()
+
+    def _publish(self) -> None:
+        with self._lock:
+            tracked = list(self._tracked.items())
+        changed = []
+        for operation_id, state in tracked:
+            channel = state[0]
+            events, last_cursor = channel.snapshot(REPLAY_SIZE)
+            closed = channel.closed
+            if last_cursor != state[1] or closed != state[2]:
+                changed.append((operation_id, state, events, last_cursor, closed))
+        if not changed:
+            return
+        with Session(self.engine) as session:
+            for operation_id, _, events, last_cursor, closed in changed:
+                row = session.get(JobRelayRecord, operation_id) or JobRelayRecord(
+                    operation_id=operation_id, worker_id=self.worker_id
+                )
+                row.worker_id = self.worker_id
+                row.events = events
+                row.last_cursor = last_cursor
+                row.closed = closed
+                row.updated_at = datetime.utcnow()
+                session.add(row)
+            session.commit()
+        with self._lock:
+            for operation_id, state, _, last_cursor, closed in changed:
+                state[1], state[2] = last_cursor, closed
+                if closed:
+                    self._tracked.pop(operation_id, None)
+
+    def _pull_cancels(self) -> None:
+        pending = self.cancels.pending()
+        if not pending:
+            return
+        with Session(self.engine) as session:
+            cancelled = session.exec(
+                select(JobRelayRecord.operation_id).where(
+                    JobRelayRecord.operation_id.in_(list(pending)),  # type: ignore[attr-defined]
+                    JobRelayRecord.cancel_requested == True,  # noqa: E712
+                )
+            ).all()
+        for operation_id in cancelled:
+            logger.info("Job relay cancel operation_id=%s", operation_id)
+            pending[operation_id].cancel()
+
+    def _mirror(self) -> None:
+        now = time.time()
+        with self._lock:
+            local = set(self._tracked)
+        wanted: Dict[str, ProgressChannel] = {}
+        for operation_id, channel in self.progress.channels():
+            if operation_id in local or channel.closed:
+                continue
+            if channel.subscribers == 0 and now - channel.last_touch > MIRROR_IDLE_S:
+                continue
+            wanted[operation_id] = channel
+        if not wanted:
+            return
+        with Session(self.engine) as session:
+            rows: List[JobRelayRecord] = list(
+                session.exec(
+                    select(JobRelayRecord).where(
+                        JobRelayRecord.operation_id.in_(list(wanted)),  # type: ignore[attr-defined]
+                        JobRelayRecord.worker_id != self.worker_id,
+                    )
+                ).all()
+            )
+        for row in rows:
+            channel = wanted[row.operation_id]
+            if row.last_cursor > channel.last_cursor or row.closed:
+                channel.mirror(row.events or [], closed=row.closed)
+
+    def _purge(self) -> None:
+        limit = datetime.utcnow() - timedelta(seconds=RELAY_TTL_S)
+        with Session(self.engine) as session:
+            session.exec(delete(JobRelayRecord).where(JobRelayRecord.updated_at < limit))  # type: ignore[call-overload,arg-type]
+            session.commit()
+
+    # --- hilo ---
+    def install(self) -> None:
+        """Conecta el relay a los managers (sin hilo; ver start)."""
+        self.progress.relay = self
+        self.cancels.remote = self
+
+    def start(self) -> None:
+        self.install()
+        self._thread = threading.Thread(target=self._run, name="job-relay", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self.progress.relay is self:
+            self.progress.relay = None
+        if self.cancels.remote is self:
+            self.cancels.remote = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.sync()
+            except Exception:
+                logger.exception("Job relay sync failed")
+
+
+def start_job_relay() -> Optional[JobRelay]:
+    """Instala el relay si VI_JOB_STATE_BACKEND=db (None con "memory")."""
+    settings = get_settings()
+    backend = (settings.job_state_backend or "memory").strip().lower()
+    if backend == "memory":
+        return None
+    if backend != "db":
+        raise ValueError(f"VI_JOB_STATE_BACKEND inválido: {backend!r} (use 'memory' o 'db')")
+    relay = JobRelay(interval_s=float(settings.job_relay_interval_s))
+    relay.start()
+    logger.info("Job relay iniciado worker_id=%s", relay.worker_id)
+    return relay
@@ -1,85 +1,289 @@
-﻿import json
+﻿import asyncio
+import json
 import logging
 import threading
-import queue
-from time import time
-from typing import Any, Dict, List, Optional, Tuple
+from collections import deque
+from itertools import islice
+from time import monotonic, time
+from typing import Any, AsyncIterator, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.core.settings import get_settings
 
 _SENTINEL = object()
 
 logger = logging.getLogger(__name__)
 
+# Eventos que conserva cada canal (ring buffer). Un suscriptor que se atrasa más
+# que esto salta a los más recientes (los eventos de progreso son "snapshots").
+RING_SIZE = 1024
+# Eventos que se reenvían al suscribirse (historial inicial del stream)
+REPLAY_SIZE = 50
+# Intervalo mínimo entre logs DEBUG de emit por operación
+EMIT_LOG_INTERVAL_S = 1.0
+# Tipos de evento que se pueden fusionar (solo importa el último de cada etapa)
+COALESCE_TYPES = frozenset({"progress", "status"})
+# Tamaño mínimo de cada chunk NDJSON (anti-buffering, ver encode_event)
+MIN_CHUNK = 1024
+
+
+def _coalesce_window_s() -> float:
+    return max(0, get_settings().progress_coalesce_ms) / 1000.0
+
+
 class ProgressChannel:
-    __slots__ = ("queue", "history", "closed", "subscribers", "last_touch", "seq")
+    """Canal de progreso de una operación.
 
-    def __init__(self) -> None:
-        self.queue: "queue.Queue[Any]" = queue.Queue()
-        self.history: List[Dict[str, Any]] = []
+    Los eventos quedan en un ring buffer (deque con maxlen) numerados con "cursor".
+    Cada suscriptor lleva su propio cursor y espera eventos nuevos sin sondear:
+    - hilos: threading.Condition (wait)
+    - corrutinas: futures del event loop, despertados con call_soon_threadsafe (wait_async)
+
+    Eventos "progress"/"status" seguidos se fusionan: se publica el primero y, durante
+    `coalesce_s`, solo se guarda el último por (tipo, etapa). Lo acumulado se publica al
+    vencer la ventana (en el siguiente emit o en la espera de un suscriptor), antes de
+    cualquier otro tipo de evento y al cerrar el canal, así que el orden se mantiene.
+    """
+
+    __slots__ = (
+        "history",
+        "closed",
+        "subscribers",
+        "last_touch",
+        "last_log",
+        "seq",
+        "coalesce_s",
+        "coalesced",
+        "_pending",
+        "_last_flush",
+        "_cond",
+        "_async_waiters",
+    )
+
+    def __init__(self, ring_size: int = RING_SIZE, coalesce_s: Optional[float] = None) -> None:
+        self.history: Deque[Dict[str, Any]] = deque(maxlen=ring_size)
         self.closed: bool = False
         self.subscribers: int = 0
         self.last_touch: float = time()
+        self.last_log: float = 0.0
         self.seq: int = 0
+        self.coalesce_s: float = _coalesce_window_s() if coalesce_s is None else coalesce_s
+        # Eventos descartados por fusión (para diagnóstico/benchmark)
+        self.coalesced: int = 0
+        self._pending: Dict[Tuple[Any, Any], Dict[str, Any]] = {}
+        self._last_flush: float = float("-inf")
+        self._cond = threading.Condition(threading.Lock())
+        self._async_waiters: List[Tuple[asyncio.AbstractEventLoop, "asyncio.Future[None]"]] = []
+
+    @property
+    def last_cursor(self) -> int:
+        return self.seq - 1
 
     def add(self, event: Dict[str, Any]) -> None:
-        if self.closed:
-            return
-        self.last_touch = time()
-        if len(self.history) >= 50:
-            self.history.pop(0)
+        with self._cond:
+            if self.closed:
+                return
+            self.last_touch = time()
+            if event.get("type") in COALESCE_TYPES:
+                key = (event.get("type"), event.get("stage"))
+                # Reemplaza al anterior de la misma etapa y pasa al final (orden de llegada)
+                if self._pending.pop(key, None) is not None:
+                    self.coalesced += 1
+                self._pending[key] = event
+                self._flush_pending_locked(force=False)
+                return
+            self._flush_pending_locked(force=True)
+            self._publish_locked(event)
+            self._notify_locked()
+
+    def mirror(self, events: Iterable[Dict[str, Any]], closed: bool = False) -> None:
+        """Agrega eventos emitidos en otro proceso (job_relay) conservando su "cursor"."""
+        with self._cond:
+            if self.closed:
+                return
+            added = False
+            for event in events:
+                cursor = int(event.get("cursor", -1))
+                if cursor < self.seq:
+                    continue
+                self.history.append(dict(event))
+                self.seq = cursor + 1
+                added = True
+            if closed:
+                self.closed = True
+            if added or closed:
+                self.last_touch = time()
+                self._notify_locked()
+
+    def flush(self) -> None:
+        """Publica los eventos fusionados cuya ventana ya venció."""
+        with self._cond:
+            self._flush_pending_locked(force=False)
+
+    def close(self) -> None:
+        with self._cond:
+            if self.closed:
+                return
+            self._flush_pending_locked(force=True)
+            self.closed = True
+            self._notify_locked()
+
+    def _publish_locked(self, event: Dict[str, Any]) -> None:
         event_with_cursor = dict(event)
         event_with_cursor["cursor"] = self.seq
         self.seq += 1
         self.history.append(event_with_cursor)
-        self.queue.put(event_with_cursor)
 
-    def close(self) -> None:
-        if not self.closed:
-            self.closed = True
-            self.queue.put(_SENTINEL)
+    def _flush_pending_locked(self, force: bool) -> bool:
+        if not self._pending:
+            return False
+        now = monotonic()
+        if not force and now - self._last_flush < self.coalesce_s:
+            return False
+        for event in self._pending.values():
+            self._publish_locked(event)
+        self._pending.clear()
+        self._last_flush = now
+        self._notify_locked()
+        return True
+
+    def _flush_due_in_locked(self) -> Optional[float]:
+        if not self._pending:
+            return None
+        return max(0.0, self._last_flush + self.coalesce_s - monotonic())
+
+    def _notify_locked(self) -> None:
+        self._cond.notify_all()
+        waiters, self._async_waiters = self._async_waiters, []
+        for loop, fut in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake_future, fut)
+            except RuntimeError:
+                # Event loop ya cerrado (cliente desconectado durante el apagado)
+                pass
+
+    def _ready_locked(self, cursor: int) -> bool:
+        return self.seq - 1 > cursor or self.closed
+
+    def _wait_s_locked(self, deadline: Optional[float]) -> Optional[float]:
+        """Espera máxima: hasta `deadline` o hasta que venza la ventana de fusión."""
+        waits = [w for w in (self._flush_due_in_locked(),) if w is not None]
+        if deadline is not None:
+            waits.append(max(0.0, deadline - monotonic()))
+        return min(waits) if waits else None
+
+    def snapshot(self, limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """Últimos `limit` eventos (todos si None) y el cursor del último evento emitido."""
+        with self._cond:
+            self._flush_pending_locked(force=False)
+            size = len(self.history)
+            start = 0 if limit is None else max(0, size - limit)
+            return list(islice(self.history, start, None)), self.seq - 1
+
+    def events_after(self, cursor: int) -> List[Dict[str, Any]]:
+        """Eventos con cursor > `cursor` que siguen en el ring buffer."""
+        with self._cond:
+            self._flush_pending_locked(force=False)
+            return self._events_after_locked(cursor)
+
+    def _events_after_locked(self, cursor: int) -> List[Dict[str, Any]]:
+        if not self.history or self.seq - 1 <= cursor:
+            return []
+        first = self.history[0]["cursor"]
+        return list(islice(self.history, max(0, cursor + 1 - first), None))
+
+    def wait(self, cursor: int, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Bloquea (hilo) hasta que haya eventos después de `cursor`, se cierre el canal o venza timeout."""
+        deadline = None if timeout is None else monotonic() + timeout
+        with self._cond:
+            while True:
+                self._flush_pending_locked(force=False)
+                if self._ready_locked(cursor):
+                    return self._events_after_locked(cursor)
+                wait_s = self._wait_s_locked(deadline)
+                if deadline is not None and monotonic() >= deadline:
+                    return []
+                self._cond.wait(wait_s)
+
+    async def wait_async(self, cursor: int, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Como wait(), pero sin bloquear el event loop."""
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else monotonic() + timeout
+        while True:
+            fut: "asyncio.Future[None]" = loop.create_future()
+            waiter = (loop, fut)
+            with self._cond:
+                self._flush_pending_locked(force=False)
+                if self._ready_locked(cursor):
+                    return self._events_after_locked(cursor)
+                if deadline is not None and monotonic() >= deadline:
+                    return []
+                wait_s = self._wait_s_locked(deadline)
+                self._async_waiters.append(waiter)
+            try:
+                await asyncio.wait_for(fut, wait_s)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._cond:
+                    try:
+                        self._async_waiters.remove(waiter)
+                    except ValueError:
+                        pass
+
+
+def _wake_future(fut: "asyncio.Future[None]") -> None:
+    if not fut.done():
+        fut.set_result(None)
 
 
 class ProgressManager:
     def __init__(self) -> None:
         self._channels: Dict[str, ProgressChannel] = {}
         self._lock = threading.Lock()
+        # job_relay.JobRelay con VI_JOB_STATE_BACKEND=db (canales compartidos entre workers)
+        self.relay: Optional[Any] = None
 
-    def ensure(self, operation_id: str) -> ProgressChannel:
-        created = False
+    def _get_or_create(self, operation_id: str) -> Tuple[ProgressChannel, bool]:
         with self._lock:
             channel = self._channels.get(operation_id)
+            created = channel is None
             if channel is None:
                 channel = ProgressChannel()
                 self._channels[operation_id] = channel
-                created = True
             channel.last_touch = time()
-        logger.info(
-            "Progress ensure operation_id=%s created=%s history=%s",
-            operation_id,
-            created,
-            len(channel.history),
-        )
+        return channel, created
+
+    def ensure(self, operation_id: str) -> ProgressChannel:
+        channel, created = self._get_or_create(operation_id)
+        if created:
+            logger.info("Progress ensure operation_id=%s created=True", operation_id)
         return channel
 
     def get_channel(self, operation_id: str) -> Optional[ProgressChannel]:
         with self._lock:
             return self._channels.get(operation_id)
 
+    def channels(self) -> List[Tuple[str, ProgressChannel]]:
+        with self._lock:
+            return list(self._channels.items())
+
     def emit(self, operation_id: Optional[str], event: Dict[str, Any]) -> None:
         if not operation_id:
             return
-        channel = self.ensure(operation_id)
+        channel, _ = self._get_or_create(operation_id)
         channel.add(event)
-        try:
-            queue_size = channel.queue.qsize()
-        except Exception:
-            queue_size = -1
-        logger.info(
-            "Progress emit operation_id=%s history=%s queue=%s ts=%s",
-            operation_id,
-            len(channel.history),
-            queue_size,
-            time(),
-        )
+        if self.relay is not None:
+            self.relay.track(operation_id, channel)
+        if logger.isEnabledFor(logging.DEBUG):
+            now = monotonic()
+            if now - channel.last_log >= EMIT_LOG_INTERVAL_S:
+                channel.last_log = now
+                logger.debug(
+                    "Progress emit operation_id=%s seq=%s subscribers=%s",
+                    operation_id,
+                    channel.seq,
+                    channel.subscribers,
+                )
 
     def finish(self, operation_id: Optional[str]) -> None:
         if not operation_id:
@@ -87,34 +291,26 @@ class ProgressManager:
         with self._lock:
             channel = self._channels.get(operation_id)
         if channel is not None:
-            try:
-                queue_size = channel.queue.qsize()
-            except Exception:
-                queue_size = -1
+            if self.relay is not None:
+                self.relay.track(operation_id, channel)
             logger.info(
-                "Progress finish operation_id=%s history=%s queue=%s ts=%s",
+                "Progress finish operation_id=%s events=%s subscribers=%s",
                 operation_id,
-                len(channel.history),
-                queue_size,
-                time(),
+                channel.seq,
+                channel.subscribers,
             )
             channel.close()
 
     def subscribe(self, operation_id: str) -> Tuple[ProgressChannel, List[Dict[str, Any]]]:
         channel = self.ensure(operation_id)
-        channel.subscribers += 1
-        history = list(channel.history)
-        try:
-            queue_size = channel.queue.qsize()
-        except Exception:
-            queue_size = -1
+        with self._lock:
+            channel.subscribers += 1
+        history, _ = channel.snapshot(REPLAY_SIZE)
         logger.info(
-            "Progress subscribe operation_id=%s history=%s queue=%s subscribers=%s ts=%s",
+            "Progress subscribe operation_id=%s history=%s subscribers=%s",
             operation_id,
             len(history),
-            queue_size,
             channel.subscribers,
-            time(),
         )
         return channel, history
 
@@ -126,18 +322,12 @@ class ProgressManager:
             if channel is None:
                 return None
             channel.subscribers += 1
-            history = list(channel.history)
-        try:
-            queue_size = channel.queue.qsize()
-        except Exception:
-            queue_size = -1
+        history, _ = channel.snapshot(REPLAY_SIZE)
         logger.info(
-            "Progress subscribe_existing operation_id=%s history=%s queue=%s subscribers=%s ts=%s",
+            "Progress subscribe_existing operation_id=%s history=%s subscribers=%s",
             operation_id,
             len(history),
-            queue_size,
             channel.subscribers,
-            time(),
         )
         return channel, history
 
@@ -145,26 +335,59 @@ class ProgressManager:
         self, operation_id: str, cursor: int
     ) -> Tuple[ProgressChannel, List[Dict[str, Any]], int]:
         channel = self.ensure(operation_id)
-        history = list(channel.history)
-        events = [
-            ev
-            for ev in history
-            if isinstance(ev.get("cursor"), int) and ev["cursor"] > cursor
-        ]
+        events = channel.events_after(cursor)
         cursor_next = events[-1]["cursor"] if events else cursor
-        try:
-            queue_size = channel.queue.qsize()
-        except Exception:
-            queue_size = -1
-        logger.info(
-            "Progress poll operation_id=%s cursor=%s history=%s queue=%s",
+        logger.debug(
+            "Progress poll operation_id=%s cursor=%s events=%s",
             operation_id,
             cursor,
-            len(history),
-            queue_size,
+            len(events),
         )
         return channel, events, cursor_next
 
+    async def follow(
+        self,
+        channel: ProgressChannel,
+        history: List[Dict[str, Any]],
+        heartbeat_s: Optional[float] = None,
+    ) -> AsyncIterator[Optional[List[Dict[str, Any]]]]:
+        """Lotes de eventos en vivo posteriores a `history` (lo devuelto por subscribe).
+
+        Cada lote es lo publicado desde la última entrega (se envía como un solo
+        chunk con encode_events). Termina cuando el canal se cierra y no quedan
+        eventos. Si pasan `heartbeat_s` segundos sin eventos se entrega None.
+        """
+        cursor = history[-1]["cursor"] if history else -1
+        while True:
+            events = await channel.wait_async(cursor, heartbeat_s)
+            if not events:
+                if channel.closed and not channel.events_after(cursor):
+                    return
+                if heartbeat_s is not None:
+                    yield None
+                continue
+            yield events
+            cursor = events[-1]["cursor"]
+
+    def follow_sync(
+        self,
+        channel: ProgressChannel,
+        history: List[Dict[str, Any]],
+        heartbeat_s: Optional[float] = None,
+    ) -> Iterator[Optional[List[Dict[str, Any]]]]:
+        """Versión bloqueante de follow() para generadores síncronos (threadpool)."""
+        cursor = history[-1]["cursor"] if history else -1
+        while True:
+            events = channel.wait(cursor, heartbeat_s)
+            if not events:
+                if channel.closed and not channel.events_after(cursor):
+                    return
+                if heartbeat_s is not None:
+                    yield None
+                continue
+            yield events
+            cursor = events[-1]["cursor"]
+
     def unsubscribe(self, operation_id: str) -> None:
         with self._lock:
             channel = self._channels.get(operation_id)
@@ -190,15 +413,23 @@ class ProgressManager:
         navegador no reciba chunks pequeños en tiempo real. Para forzar flush temprano, se
         rellena cada línea a un tamaño mínimo (solo en el wire; el dict del evento NO cambia).
         """
-        s = json.dumps(event, ensure_ascii=False)
-
-        # Padding anti-buffering (<= mínimo típico de GZipMiddleware: 500bytes)
-        MIN_CHUNK = 1024
-        if len(s) < MIN_CHUNK:
-            s = s + (" " * (MIN_CHUNK - len(s)))
+        return ProgressManager.encode_events([event])
 
-        return (s + "\n").encode("utf-8")
+    @staticmethod
+    def encode_events(events: Iterable[Dict[str, Any]]) -> bytes:
+        """Codifica varios eventos como un solo chunk NDJSON (una línea por evento).
 
+        El padding anti-buffering se agrega una vez por chunk (a la última línea),
+        no a cada evento.
+        """
+        lines = [json.dumps(event, ensure_ascii=False) for event in events]
+        if not lines:
+            return b""
+        # Padding anti-buffering (<= mínimo típico de GZipMiddleware: 500bytes)
+        size = sum(len(line) + 1 for line in lines)
+        if size < MIN_CHUNK:
+            lines[-1] += " " * (MIN_CHUNK - size)
+        return ("\n".join(lines) + "\n").encode("utf-8")
 
 progress_manager = ProgressManager()
 
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel, Session, create_engine
+
+
+@pytest.fixture
+def empty_engine():
+    """SQLite en memoria sin tablas (una sola conexión, usable desde otros hilos)."""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def engine(empty_engine):
+    """empty_engine con el esquema de los modelos."""
+    SQLModel.metadata.create_all(empty_engine)
+    return empty_engine
+
+
+@pytest.fixture
+def session(engine):
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture
+def oi_engine(engine, monkeypatch):
+    """engine con la API de OI y auth apuntando a él y sus cachés de proceso vacías."""
+    import app.api.auth as auth_api
+    import app.api.oi as oi_api
+
+    monkeypatch.setattr(oi_api, "engine", engine)
+    monkeypatch.setattr(auth_api, "engine", engine)
+    auth_api.invalidate_full_name_cache()
+    oi_api._invalidate_list_summary_cache()
+    yield engine
+    auth_api.invalidate_full_name_cache()
+    oi_api._invalidate_list_summary_cache()
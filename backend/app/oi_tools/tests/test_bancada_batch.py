@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+from sqlmodel import Session, select
+
+import app.api.oi as oi_api
+from app.core.session_store import MemorySessionStore
+from app.models import OI, Bancada, BancadaMedidor
+from app.schemas import BancadaBatchUpdate, BancadaCreate, BancadaUpdate
+
+
+def _setup(monkeypatch, engine):
+    monkeypatch.setattr(oi_api, "_SESSIONS", MemorySessionStore({"t": {
+        "userId": 5, "username": "tec", "role": "technician", "techNumber": 3, "bancoId": 2,
+        "expiresAt": datetime.utcnow() + timedelta(hours=1),
+    }}))
+    with Session(engine) as session:
+        oi = OI(code="OI-0001-2025", q3=2.5, alcance=100, pma=16, presion_bar=25.6, banco_id=2, tech_number=3)
+        session.add(oi)
+        session.commit()
+        oi_id = oi.id
+    bancadas = []
+    for item in range(3):
+        grid = [{"medidor": f"M{item}{r}"} for r in range(3)]
+        with Session(engine) as session:
+            bancadas.append(oi_api.add_bancada(
+                oi_id, BancadaCreate(rows=3, rows_data=grid), session=session, authorization="Bearer t"
+            ))
+    return oi_id, bancadas
+
+
+def _batch(engine, oi_id, items):
+    with Session(engine) as session:
+        return oi_api.update_bancadas_batch(
+            oi_id, BancadaBatchUpdate.model_validate({"items": items}), session=session, authorization="Bearer t"
+        )
+
+
+def test_batch_merges_row_patches_in_one_commit(monkeypatch, oi_engine):
+    oi_id, (b1, b2, b3) = _setup(monkeypatch, oi_engine)
+    commits = []
+    event.listen(oi_engine, "commit", lambda conn: commits.append(1))
+
+    result = _batch(oi_engine, oi_id, [
+        {"id": b1.id, "updated_at": b1.updated_at.isoformat(),
+         "rows_patch": [{"index": 1, "row": {"medidor": "N11", "estado": 2}}]},
+        # Reduce filas (recorta el grid) y cambia estado sin tocar filas
+        {"id": b2.id, "updated_at": b2.updated_at.isoformat(), "rows": 2, "estado": 4},
+    ])
+    assert len(commits) == 1
+    assert [item.id for item in result.items] == [b1.id, b2.id]
+
+    with Session(oi_engine) as session:
+        g1 = session.get(Bancada, b1.id)
+        assert [r["medidor"] for r in g1.rows_data] == ["M00", "N11", "M02"]
+        assert g1.rows_data[1]["estado"] == 2
+        g2 = session.get(Bancada, b2.id)
+        assert g2.estado == 4 and g2.rows == 2 and len(g2.rows_data) == 2
+        assert session.get(Bancada, b3.id).updated_at == b3.updated_at
+        oi = session.get(OI, oi_id)
+        assert oi.medidores_usuario == 8
+        indexed = set(session.exec(select(BancadaMedidor.medidor).where(BancadaMedidor.bancada_id == b1.id)).all())
+        assert indexed == {"M00", "N11", "M02"}
+
+
+def test_batch_is_all_or_nothing(monkeypatch, oi_engine):
+    oi_id, (b1, b2, b3) = _setup(monkeypatch, oi_engine)
+
+    # Duplicado dentro del lote
+    response = _batch(oi_engine, oi_id, [
+        {"id": b1.id, "updated_at": b1.updated_at.isoformat(), "rows_patch": [{"index": 0, "row": {"medidor": "X9"}}]},
+        {"id": b2.id, "updated_at": b2.updated_at.isoformat(), "rows_patch": [{"index": 0, "row": {"medidor": "x9"}}]},
+    ])
+    assert response.status_code == 400
+    # Duplicado contra una bancada fuera del lote
+    response = _batch(oi_engine, oi_id, [
+        {"id": b1.id, "updated_at": b1.updated_at.isoformat(), "rows_patch": [{"index": 2, "row": {"medidor": "M21"}}]},
+    ])
+    assert response.status_code == 400
+
+    # Versión desactualizada en una de las bancadas
+    with pytest.raises(HTTPException) as exc:
+        _batch(oi_engine, oi_id, [
+            {"id": b1.id, "updated_at": b1.updated_at.isoformat(), "estado": 3},
+            {"id": b2.id, "updated_at": (b2.updated_at - timedelta(seconds=1)).isoformat(), "estado": 3},
+        ])
+    assert exc.value.status_code == 409
+
+    with Session(oi_engine) as session:
+        for b in (b1, b2):
+            row = session.get(Bancada, b.id)
+            assert row.estado == 0 and row.updated_at == b.updated_at
+            assert [r["medidor"] for r in row.rows_data] == [r.medidor for r in b.rows_data]
+
+
+def test_duplicate_rejection_leaves_no_pending_writes(monkeypatch, oi_engine):
+    oi_id, (b1, b2, _) = _setup(monkeypatch, oi_engine)
+    expired = datetime.utcnow() - oi_api.LOCK_EXPIRATION_DELTA - timedelta(minutes=1)
+    with Session(oi_engine) as session:
+        oi = session.get(OI, oi_id)
+        oi.locked_by_user_id, oi.locked_at = 99, expired
+        session.add(oi)
+        session.commit()
+
+    with Session(oi_engine) as session:
+        response = oi_api.add_bancada(
+            oi_id, BancadaCreate(rows=1, rows_data=[{"medidor": "M10"}]), session=session, authorization="Bearer t"
+        )
+        assert response.status_code == 400
+        response = oi_api.update_bancada(
+            b2.id,
+            BancadaUpdate(rows=1, rows_data=[{"medidor": "M00"}], updated_at=b2.updated_at),
+            session=session,
+            authorization="Bearer t",
+        )
+        assert response.status_code == 400
+        # Un commit posterior de la misma sesión no arrastra la liberación del lock
+        assert not session.dirty and not session.new
+        session.commit()
+
+    with Session(oi_engine) as session:
+        oi = session.get(OI, oi_id)
+        assert oi.locked_by_user_id == 99
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlmodel import Session, select
+
+import app.api.oi as oi_api
+import app.core.db as db
+import app.logistica.routers.log01 as log01_router
+import app.oi_tools.routers.formato_ac_history as formato_ac_history
+from app.core.session_store import MemorySessionStore
+from app.models import OI, Bancada, SchemaVersion
+
+
+def _engine(monkeypatch, engine):
+    """Apunta también las migraciones y los historiales al engine de prueba."""
+    for module in (db, log01_router, formato_ac_history):
+        monkeypatch.setattr(module, "engine", engine)
+    return engine
+
+
+def _index_names(engine) -> set[str]:
+    with engine.connect() as conn:
+        return {row[0] for row in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+
+def test_migrations_create_hot_path_indexes_once(monkeypatch, oi_engine):
+    engine = _engine(monkeypatch, oi_engine)
+    # BD "antigua": sin los índices compuestos
+    with engine.begin() as conn:
+        for _, name, _ in db.HOT_PATH_INDEXES:
+            conn.exec_driver_sql(f"DROP INDEX {name}")
+
+    db._apply_migrations()
+    assert {name for _, name, _ in db.HOT_PATH_INDEXES} <= _index_names(engine)
+    assert db.get_schema_version() == db.LATEST_SCHEMA_VERSION
+
+    calls = []
+    monkeypatch.setattr(db, "MIGRATIONS", [(v, n, lambda: calls.append(v)) for v, n, _ in db.MIGRATIONS])
+    db._apply_migrations()
+    assert calls == []
+    with Session(engine) as session:
+        assert len(session.exec(select(SchemaVersion)).all()) == len(db.MIGRATIONS)
+
+
+def test_list_and_history_queries_use_composite_indexes(monkeypatch, oi_engine):
+    engine = _engine(monkeypatch, oi_engine)
+    monkeypatch.setattr(oi_api, "_SESSIONS", MemorySessionStore({"t": {
+        "userId": 5, "username": "tec", "role": "technician", "techNumber": 3, "bancoId": 2,
+        "expiresAt": datetime.utcnow() + timedelta(hours=1),
+    }}))
+
+    statements = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", _capture)
+
+    def plan_for(run) -> str:
+        statements.clear()
+        run()
+        with engine.connect() as conn:
+            return " | ".join(
+                row[-1]
+                for statement, params in statements
+                for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, params).all()
+            )
+
+    def list_oi():
+        with Session(engine) as session:
+            oi_api.list_oi(date_from="2025-01-01", session=session, authorization="Bearer t")
+
+    def bancadas():
+        with Session(engine) as session:
+            session.exec(select(Bancada).where(Bancada.oi_id == 1).order_by(Bancada.item)).all()
+
+    def recalc_saved_at():
+        with Session(engine) as session:
+            oi_api._recalc_oi_saved_at(session, OI(id=1, code="OI-0001-2025", q3=2.5, alcance=100, pma=16,
+                                                    presion_bar=25.6, banco_id=2, tech_number=3))
+
+    assert "idx_oi_tech_banco_created" in plan_for(list_oi)
+    assert "idx_bancada_oi_item" in plan_for(bancadas)
+    assert "idx_bancada_oi_saved_at" in plan_for(recalc_saved_at)
+    assert "idx_log01_run_deleted_created" in plan_for(lambda: log01_router.log01_history_list())
+    assert "idx_formato_ac_run_origin_created" in plan_for(
+        lambda: formato_ac_history.formato_ac_history_list(origin="VIMA_LISTA")
+    )
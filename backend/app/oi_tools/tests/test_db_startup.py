@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from sqlalchemy import event
+from sqlmodel import Session, select
+
+import app.core.db as db
+from app.models import Log01Run, SchemaVersion
+
+
+def test_init_db_skips_schema_inspection_once_versioned(monkeypatch, empty_engine):
+    monkeypatch.setattr(db, "engine", empty_engine)
+
+    db.init_db()
+    assert db.get_schema_version() == db.LATEST_SCHEMA_VERSION
+    with Session(empty_engine) as session:
+        assert [v.name for v in session.exec(select(SchemaVersion).order_by(SchemaVersion.version))] == [
+            name for _, name, _ in sorted(db.MIGRATIONS)
+        ]
+
+    statements: list[str] = []
+    event.listen(empty_engine, "before_cursor_execute", lambda conn, cur, st, *a: statements.append(st))
+    db.init_db()
+    assert not any("table_info" in st.lower() or "sqlite_master" in st.lower() for st in statements)
+    assert not any("log01_run" in st.lower() or "bancada" in st.lower() for st in statements)
+
+
+def test_backfill_runs_in_batches(monkeypatch, empty_engine):
+    monkeypatch.setattr(db, "engine", empty_engine)
+    db._create_all()
+    with Session(empty_engine) as session:
+        for i in range(5):
+            session.add(Log01Run(operation_id=f"op{i}", source="X", created_by_username="tec",
+                                 output_name=f"BD_{100 + i}_AL_{200 + i}.xlsx"))
+        session.commit()
+
+    with Session(empty_engine) as session:
+        sizes = [len(batch) for batch in db._iter_batches(session, Log01Run, batch_size=2)]
+        db._backfill_log01_run_series(session)
+    assert sizes == [2, 2, 1]
+    with Session(empty_engine) as session:
+        runs = session.exec(select(Log01Run).order_by(Log01Run.id)).all()
+        assert [(r.serie_ini_num, r.serie_fin_num) for r in runs] == [(100 + i, 200 + i) for i in range(5)]
+
+
+def test_versioned_db_gets_columns_added_after_its_version(monkeypatch, empty_engine):
+    monkeypatch.setattr(db, "engine", empty_engine)
+    db._create_all()
+    # BD registrada hasta v10 antes de que existieran oi.sort_at / oi.medidores_usuario
+    with empty_engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX idx_oi_sort_at_id")
+        conn.exec_driver_sql("ALTER TABLE oi DROP COLUMN sort_at")
+        conn.exec_driver_sql("ALTER TABLE oi DROP COLUMN medidores_usuario")
+        conn.exec_driver_sql("DROP INDEX idx_log01_run_created_at_id")
+        conn.exec_driver_sql(
+            "INSERT INTO oi (code, q3, alcance, pma, presion_bar, banco_id, tech_number, numeration_type, created_at)"
+            " VALUES ('OI-0001-2025', 2.5, 100, 16, 25.6, 1, 7, 'correlativo', '2025-01-02 03:04:05')"
+        )
+        oi_id = conn.exec_driver_sql("SELECT id FROM oi").scalar()
+        conn.exec_driver_sql(
+            f"INSERT INTO bancada (oi_id, item, rows, estado, created_at) VALUES ({oi_id}, 1, 3, 0, '2025-01-02')"
+        )
+    with Session(empty_engine) as session:
+        for version, name, _ in db.MIGRATIONS:
+            if version <= 10:
+                session.add(SchemaVersion(version=version, name=name))
+        session.commit()
+
+    db.init_db()
+    assert db.get_schema_version() == db.LATEST_SCHEMA_VERSION
+    with empty_engine.connect() as conn:
+        sort_at, medidores = conn.exec_driver_sql("SELECT sort_at, medidores_usuario FROM oi").one()
+        indexes = {row[0] for row in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert str(sort_at).startswith("2025-01-02 03:04:05") and medidores == 3
+    assert {"idx_oi_sort_at_id", "idx_log01_run_created_at_id"} <= indexes
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from io import BytesIO
+
+import pytest
+from fastapi import HTTPException
+from sqlmodel import Session
+
+import app.api.oi as oi_api
+from app.core.settings import get_settings
+from app.models import OI, Bancada, User
+from app.oi_tools.services.cancel_manager import cancel_manager
+from app.oi_tools.services.progress_manager import progress_manager
+from app.services import excel_batch
+
+
+def _setup(engine):
+    ids = []
+    with Session(engine) as session:
+        session.add(User(username="tec", first_name="Ana", last_name="Pérez", password_hash="x", tech_number=7))
+        # La 3ra OI tiene un Q3 fuera de la lista de la plantilla → va a ERRORES.txt
+        for idx, q3 in enumerate([2.5, 2.5, 999.0]):
+            oi = OI(code="OI-0001-2025", q3=q3, alcance=100, pma=16, presion_bar=25.6, banco_id=1,
+                    tech_number=7, saved_at=datetime(2025, 3, 1, 15, 0))
+            session.add(oi)
+            session.flush()
+            session.add(Bancada(oi_id=oi.id, item=1, rows=2, medidor=f"M{idx}"))
+            ids.append(oi.id)
+        session.commit()
+    return ids
+
+
+def test_batch_zip_streams_excels_from_process_pool(monkeypatch, oi_engine):
+    ids = _setup(oi_engine)
+    jobs = list(oi_api._iter_excel_batch_jobs(ids, "clave", chunk_size=2))
+    assert [job.oi_id for job in jobs] == ids
+    assert jobs[0].filename == "OI-0001-2025-ANA PÉREZ-2025-03-01.xlsx"
+
+    op_id = "test-excel-batch"
+    token = cancel_manager.create(op_id)
+    # Sin fusión de eventos: se verifica cada progreso
+    monkeypatch.setattr(get_settings(), "progress_coalesce_ms", 0)
+    channel, _ = progress_manager.subscribe(op_id)
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        chunks = list(excel_batch.iter_excel_zip(jobs, len(jobs), operation_id=op_id, cancel_token=token, executor=pool))
+    progress_manager.unsubscribe(op_id)
+
+    archive = zipfile.ZipFile(BytesIO(b"".join(chunks)))
+    names = sorted(archive.namelist())
+    # Mismo código/técnico/fecha → nombres desambiguados
+    assert names == [
+        "ERRORES.txt",
+        "OI-0001-2025-ANA PÉREZ-2025-03-01 (2).xlsx",
+        "OI-0001-2025-ANA PÉREZ-2025-03-01.xlsx",
+    ]
+    assert "Q3 no coincide" in archive.read("ERRORES.txt").decode("utf-8")
+    assert archive.read(names[1])[:2] == b"PK"
+
+    events = [ev for ev in channel.history if ev.get("type") in ("progress", "complete")]
+    assert [ev.get("current") for ev in events if ev["type"] == "progress"] == [1, 2, 3]
+    assert events[-1]["result"] == {"total": 3, "generados": 2, "errores": 1}
+    assert channel.closed
+    assert cancel_manager.get(op_id) is None
+
+
+def test_batch_zip_cancelled_is_still_valid(oi_engine):
+    ids = _setup(oi_engine)
+    jobs = oi_api._iter_excel_batch_jobs(ids, "clave")
+    op_id = "test-excel-batch-cancel"
+    token = cancel_manager.create(op_id)
+    token.cancel()
+    channel, _ = progress_manager.subscribe(op_id)
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        data = b"".join(excel_batch.iter_excel_zip(jobs, len(ids), operation_id=op_id, cancel_token=token, executor=pool))
+    progress_manager.unsubscribe(op_id)
+
+    assert zipfile.ZipFile(BytesIO(data)).namelist() == []
+    assert channel.history[-1]["stage"] == "cancelled"
+
+
+def test_batch_cancel_only_by_owner_or_admin(monkeypatch):
+    op_id = "test-excel-batch-owner"
+    token = cancel_manager.create(op_id, owner_user_id=7)
+    sessions = {
+        "otro": {"userId": 8, "username": "otro", "role": "technician"},
+        "dueno": {"userId": 7, "username": "tec", "role": "technician"},
+    }
+    current = {"sess": sessions["otro"]}
+    monkeypatch.setattr(oi_api, "_get_session_from_header", lambda *a, **k: current["sess"])
+
+    with pytest.raises(HTTPException) as exc:
+        oi_api.cancel_excel_batch(op_id)
+    assert exc.value.status_code == 403 and not token.is_cancelled()
+    with pytest.raises(HTTPException) as exc:
+        oi_api.cancel_excel_batch("no-existe")
+    assert exc.value.status_code == 404
+
+    current["sess"] = sessions["dueno"]
+    assert oi_api.cancel_excel_batch(op_id) == {"ok": True}
+    assert token.is_cancelled()
+
+    admin_token = cancel_manager.create("test-excel-batch-admin", owner_user_id=7)
+    current["sess"] = {"userId": 1, "username": "admin", "role": "admin"}
+    assert oi_api.cancel_excel_batch("test-excel-batch-admin") == {"ok": True}
+    assert admin_token.is_cancelled()
+    cancel_manager.remove(op_id)
+    cancel_manager.remove("test-excel-batch-admin")
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import re
+import zipfile
+from datetime import datetime
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from openpyxl import load_workbook
+from openpyxl.formula.translate import Translator
+
+from app.models import OI, Bancada
+from app.services import excel_ooxml, excel_service
+
+
+def test_compiled_formula_matches_translator():
+    formulas = [
+        '=IF(I9>=1,"NO CONFORME",IF(BK9="SIGDIFERENTES",BC9,BL9))',
+        '=IF(AR9<$AH$6,"error",IF(AR9>$AH$6*1.1,"error","aceptable"))',
+        "=SUM(A8:B9)+'Hoja 1'!C9+SUM(9:10)+COUNT(A:A)+$B9+C$9",
+    ]
+    for formula in formulas:
+        compiled = excel_ooxml._compile_formula(formula, 9)
+        for row in (9, 10, 137):
+            expected = Translator(formula, origin="A9").translate_formula(f"A{row}")
+            # El plan guarda la fórmula ya escapada para XML
+            assert "=" + compiled.render(row) == escape(expected)
+
+
+def _sheet_snapshot(data: bytes) -> dict:
+    wb = load_workbook(BytesIO(data))
+    ws = wb[excel_service.SHEET_NAME]
+    cells = {}
+    for row in ws.iter_rows():
+        for c in row:
+            cells[c.coordinate] = (
+                c.value, c.number_format, repr(c.font), repr(c.fill),
+                repr(c.border), repr(c.alignment), repr(c.protection),
+            )
+    return {
+        "dims": ws.dimensions,
+        "cells": cells,
+        "sheet_protected": (ws.protection.sheet, ws.protection.password),
+        "workbook_protection": (wb.security.lockStructure, wb.security.workbookPassword),
+    }
+
+
+def test_ooxml_engine_matches_openpyxl():
+    oi = OI(id=1, code="OI-0001-2025", q3=2.5, alcance=100, pma=16, presion_bar=25.6, banco_id=3, tech_number=7)
+    rows = [
+        {
+            "medidor": f"A{i:03d}",
+            "estado": i % 3,
+            "q3": {"c1": 20, "c2": 1.2, "c3": "1,5", "c4": 10.5, "c5": "" if i == 0 else 20.1, "c7": "00:30"},
+            "q2": {"c1": 19.5, "c4": "x", "c7": ""} if i % 2 else None,
+            "q1": {"c4": "7,5", "c5": 8, "c6": "abc", "c7": " 01:00"},
+        }
+        for i in range(3)
+    ]
+    bancadas = [
+        Bancada(id=1, oi_id=1, item=2, medidor="B001", rows=3, estado=1, rows_data=rows),
+        Bancada(id=2, oi_id=1, item=1, medidor="B002", rows=2, estado=None),
+    ]
+    work_dt = datetime(2025, 1, 1, 12, 0)
+
+    legacy, name = excel_service.generate_excel(oi, bancadas, password="clave", work_dt=work_dt)
+    result = excel_ooxml.generate_excel_ooxml(oi, bancadas, password="clave", work_dt=work_dt)
+    assert result is not None
+    direct, direct_name = result
+    assert direct_name == name
+
+    assert _sheet_snapshot(direct) == _sheet_snapshot(legacy)
+
+    # fileSharing inyectado en la misma pasada del zip
+    for data in (legacy, direct):
+        workbook_xml = zipfile.ZipFile(BytesIO(data)).read("xl/workbook.xml").decode("utf-8")
+        assert re.search(r'<fileSharing reservationPassword="[0-9A-F]+" userName="Banco03"', workbook_xml)
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import os
+import pickle
+
+from openpyxl import Workbook
+
+from app.services import excel_service
+
+
+def _write_template(path, q3_values):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = excel_service.SHEET_NAME
+    for idx, value in enumerate(q3_values):
+        ws.cell(row=2, column=51 + idx, value=value)  # AY2..
+    ws["AY1"] = 100
+    wb.save(path)
+
+
+def test_template_snapshot_invalidates_on_change(tmp_path):
+    tpl = tmp_path / "PLANTILLA_VI.xlsx"
+    _write_template(tpl, [1.6, 2.5, 4, 6.3])
+
+    first = excel_service._get_template_snapshot(tpl)
+    assert first is not None
+    assert first.q3_values == ("1,6", "2,5", "4", "6,3")
+    assert excel_service._get_template_snapshot(tpl) is first
+
+    # Copia por request independiente del snapshot
+    wb = pickle.loads(first.blob)
+    wb[excel_service.SHEET_NAME]["A1"] = "cambio"
+    assert pickle.loads(first.blob)[excel_service.SHEET_NAME]["A1"].value is None
+
+    # Solo cambia el mtime: mismo hash, no se vuelve a parsear
+    st = tpl.stat()
+    os.utime(tpl, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    touched = excel_service._get_template_snapshot(tpl)
+    assert touched is not first
+    assert touched.blob is first.blob
+
+    # Contenido nuevo: nueva versión y listas recalculadas
+    _write_template(tpl, [10, 16])
+    os.utime(tpl, ns=(st.st_atime_ns, st.st_mtime_ns + 2_000_000_000))
+    changed = excel_service._get_template_snapshot(tpl)
+    assert changed.sha256 != first.sha256
+    assert changed.q3_values[:2] == ("10", "16")
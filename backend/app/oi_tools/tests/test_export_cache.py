@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import os
+from datetime import datetime
+
+from sqlmodel import Session, select
+
+import app.api.oi as oi_api
+from app.models import OI, Bancada, User
+from app.services.export_cache import ExportCache
+
+
+def test_export_cache_lru_eviction_by_size(tmp_path):
+    cache = ExportCache(tmp_path, max_bytes=25)
+    cache.put("a", b"x" * 10)
+    cache.put("b", b"y" * 10)
+    assert cache.get("a") is not None  # "a" pasa a ser el más reciente
+    cache.put("c", b"z" * 10)
+
+    assert cache.get("b") is None
+    assert cache.get("a").read_bytes() == b"x" * 10
+    assert cache.total_bytes() == 20
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.xlsx", "c.xlsx"]
+
+    # Tras reiniciar el índice se reconstruye desde disco respetando el orden de uso
+    os.utime(tmp_path / "a.xlsx", ns=(1, 1))
+    reopened = ExportCache(tmp_path, max_bytes=25)
+    reopened.put("d", b"w" * 10)
+    assert reopened.get("a") is None
+    assert reopened.get("c") is not None
+
+    assert ExportCache(tmp_path / "off", max_bytes=0).get("c") is None
+
+
+def test_export_excel_uses_cache_and_etag(monkeypatch, tmp_path, oi_engine):
+    cache = ExportCache(tmp_path, max_bytes=10 * 1024 * 1024)
+    monkeypatch.setattr(oi_api, "get_export_cache", lambda: cache)
+    monkeypatch.setattr(oi_api, "_get_session_from_header", lambda *a, **k: {"username": "admin", "role": "admin"})
+
+    with Session(oi_engine) as session:
+        session.add(User(username="tec", first_name="Ana", last_name="Pérez", password_hash="x", tech_number=7))
+        oi = OI(code="OI-0001-2025", q3=2.5, alcance=100, pma=16, presion_bar=25.6, banco_id=1,
+                tech_number=7, saved_at=datetime(2025, 3, 1, 15, 0))
+        session.add(oi)
+        session.flush()
+        session.add(Bancada(oi_id=oi.id, item=1, rows=2, medidor="M1"))
+        session.commit()
+        oi_id = oi.id
+
+    def export(password="clave", if_none_match=None):
+        with Session(oi_engine) as session:
+            return oi_api.export_excel(
+                oi_id, oi_api.ExcelRequest(password=password), session=session,
+                authorization="Bearer x", if_none_match=if_none_match,
+            )
+
+    first = export()
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and len(list(tmp_path.glob("*.xlsx"))) == 1
+
+    hit = export()
+    assert hit.headers["etag"] == etag
+    assert str(getattr(hit, "path", "")).endswith(".xlsx")  # servido desde disco
+    assert "OI-0001-2025-ANA PÉREZ-2025-03-01.xlsx" in hit.headers["content-disposition"]
+
+    assert export(if_none_match=f"W/{etag}").status_code == 304
+    # Otra contraseña => otro archivo
+    assert export(password="otra").headers["etag"] != etag
+
+    # Editar una bancada cambia la clave
+    with Session(oi_engine) as session:
+        b = session.exec(select(Bancada)).one()
+        b.rows = 3
+        b.updated_at = datetime(2025, 3, 2)
+        session.add(b)
+        session.commit()
+    assert export().headers["etag"] != etag
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from app.oi_tools.services.cancel_manager import CancelManager
+from app.oi_tools.services.job_relay import JobRelay
+from app.oi_tools.services.progress_manager import ProgressManager
+
+
+def _worker(engine, worker_id: str) -> JobRelay:
+    relay = JobRelay(engine, progress=ProgressManager(), cancels=CancelManager(), worker_id=worker_id)
+    relay.install()
+    return relay
+
+
+def test_progress_and_cancel_are_shared_between_workers(engine):
+    a, b = _worker(engine, "a"), _worker(engine, "b")
+
+    # El job corre en A; el cliente se suscribe en B antes de que haya eventos
+    token = a.cancels.create("op", owner_user_id=7)
+    channel_b, history = b.progress.subscribe("op")
+    assert history == []
+    a.progress.emit("op", {"type": "file", "index": 1})
+    a.progress.emit("op", {"type": "file", "index": 2})
+    a.sync()
+    b.sync()
+    local = a.progress.get_channel("op").events_after(-1)
+    assert channel_b.events_after(-1) == local and [e["cursor"] for e in local] == [0, 1]
+
+    # B conoce al dueño para validar el cancel
+    assert b.cancels.owner("op") == (True, 7) and b.cancels.owner("otro") == (False, None)
+    # Cancelar desde B llega al token de A en su siguiente pasada
+    assert b.cancels.cancel("op") is True
+    assert not token.is_cancelled()
+    a.sync()
+    assert token.is_cancelled()
+    assert b.cancels.cancel("otro") is False
+
+    a.progress.emit("op", {"type": "cancelled"})
+    a.progress.finish("op")
+    a.sync()
+    b.sync()
+    assert channel_b.closed and channel_b.events_after(1) == [{"type": "cancelled", "cursor": 2}]
+    # Ya cerrado: no hay nada que cancelar
+    assert b.cancels.cancel("op") is False
+    assert b.cancels.owner("op") == (False, None)
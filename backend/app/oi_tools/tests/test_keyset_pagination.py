@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlmodel import Session, select
+
+import app.api.oi as oi_api
+import app.oi_tools.routers.formato_ac_history as formato_ac_history
+from app.core.session_store import MemorySessionStore
+from app.models import OI, FormatoAcRun
+
+
+def test_list_oi_cursor_pages_match_offset_order(monkeypatch, oi_engine):
+    base = datetime(2025, 1, 1)
+    monkeypatch.setattr(oi_api, "_SESSIONS", MemorySessionStore({"t": {
+        "userId": 1, "username": "admin", "role": "admin", "techNumber": 0, "bancoId": 0,
+        "expiresAt": datetime.utcnow() + timedelta(hours=1),
+    }}))
+    with Session(oi_engine) as session:
+        for i in range(23):
+            # Empates de fecha (de a 3) para ejercitar el desempate por id
+            session.add(OI(code=f"OI-{i:04d}-2025", q3=2.5, alcance=100, pma=16, presion_bar=25.6,
+                           banco_id=1, tech_number=1, created_at=base + timedelta(hours=i // 3)))
+        session.commit()
+        # sort_at se mantiene al editar
+        oi = session.exec(select(OI).where(OI.code == "OI-0000-2025")).one()
+        oi.updated_at = base + timedelta(days=10)
+        session.add(oi)
+        session.commit()
+        assert oi.sort_at == base + timedelta(days=10)
+
+    def page(**kwargs):
+        with Session(oi_engine) as session:
+            return oi_api.list_oi(limit=10, session=session, authorization="Bearer t", **kwargs)
+
+    by_offset = [item.code for offset in (0, 10, 20) for item in page(offset=offset).items]
+    by_cursor, cursor, pages = [], "", 0
+    while cursor is not None:
+        result = page(cursor=cursor)
+        by_cursor += [item.code for item in result.items]
+        cursor = result.next_cursor
+        pages += 1
+    assert pages == 3 and by_cursor == by_offset
+    assert by_cursor[0] == "OI-0000-2025" and len(set(by_cursor)) == 23
+
+    with pytest.raises(HTTPException) as exc:
+        page(cursor="no-es-un-cursor")
+    assert exc.value.status_code == 400
+
+
+def test_formato_ac_history_cursor(monkeypatch, engine):
+    monkeypatch.setattr(formato_ac_history, "engine", engine)
+    with Session(engine) as session:
+        for i in range(5):
+            session.add(FormatoAcRun(operation_id=f"op{i}", origin="VIMA_LISTA", created_by_username="tec",
+                                     created_at=datetime(2025, 1, 1) + timedelta(minutes=i // 2)))
+        session.commit()
+
+    first = formato_ac_history.formato_ac_history_list(limit=2, cursor="")
+    second = formato_ac_history.formato_ac_history_list(limit=2, cursor=first.next_cursor)
+    third = formato_ac_history.formato_ac_history_list(limit=2, cursor=second.next_cursor)
+    ops = [r.operation_id for r in first.items + second.items + third.items]
+    assert ops == ["op4", "op3", "op2", "op1", "op0"]
+    assert third.next_cursor is None and first.total == 5
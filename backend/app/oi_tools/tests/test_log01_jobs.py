@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import cast
+
+import pytest
+from sqlmodel import Session, select
+
+import app.logistica.routers.log01 as log01_router
+from app.core.settings import get_settings
+from app.logistica.services import log01_consolidate as log01
+from app.logistica.services import log01_jobs
+from app.models import Log01Artifact, Log01JobRecord, Log01Run
+from app.oi_tools.tests.test_log01_parallel import _bases_file
+from app.services.export_cache import ExportCache
+
+
+@pytest.fixture
+def log01_engine(engine, monkeypatch, tmp_path):
+    """engine para los jobs LOG-01, con la carpeta de datos y la caché de lectura en tmp_path."""
+    monkeypatch.setattr(log01_jobs, "engine", engine)
+    monkeypatch.setattr(log01_router, "engine", engine)
+    monkeypatch.setattr(log01_router, "LOG01_JOBS", {})
+    monkeypatch.setattr(
+        log01_router, "get_settings", lambda: SimpleNamespace(data_dir=tmp_path, log01_resume_jobs=True)
+    )
+    monkeypatch.setattr(get_settings(), "log01_parse_workers", 1)
+    monkeypatch.setattr(log01, "get_parse_cache", lambda: ExportCache(tmp_path / "parse_cache", 0))
+    return engine
+
+
+def _interrupted_job(monkeypatch, tmp_path, operation_id: str = "op-1"):
+    """Job de un proceso anterior: 3 archivos subidos, el primero ya con checkpoint."""
+    work_dir = tmp_path / "jobs" / operation_id
+    work_dir.mkdir(parents=True)
+    inputs = [
+        _bases_file("OI-0001-2025", [("M1", "CONFORME"), ("M2", "NO CONFORME")]),
+        _bases_file("OI-0002-2025", [("M2", "CONFORME"), ("M3", "CONFORME")]),
+        _bases_file("OI-0003-2025", [("M4", "CONFORME")]),
+    ]
+    files = []
+    for idx, item in enumerate(inputs, start=1):
+        path = work_dir / f"{idx}_{item.name}"
+        path.write_bytes(item.data or b"")
+        files.append({"name": item.name, "path": str(path)})
+
+    first = log01.Log01InputFile(**files[0])
+    log01.Log01Checkpoints(work_dir / "checkpoints").save(
+        1, log01.parse_cache_key(first, "AUTO", 1), log01.parse_log01_file(first, "AUTO", 1)
+    )
+    monkeypatch.setattr(log01_jobs, "RUNNER_ID", "proceso-anterior")
+    log01_jobs.create_job(operation_id, "AUTO", None, str(work_dir), files, {"userId": 7, "username": "tec"})
+    # El proceso anterior murió: su lease ya venció
+    log01_jobs.update_job(
+        operation_id, status="running", files_done=1, attempts=1, lease_until=datetime.utcnow() - timedelta(seconds=1)
+    )
+    monkeypatch.setattr(log01_jobs, "RUNNER_ID", "proceso-actual")
+    return work_dir
+
+
+def test_resume_continues_from_last_checkpoint(monkeypatch, tmp_path, log01_engine):
+    work_dir = _interrupted_job(monkeypatch, tmp_path)
+
+    parsed_names = []
+    real_parse = log01.parse_log01_file
+
+    def _counting_parse(item, source="AUTO", index=1):
+        parsed_names.append(item.name)
+        return real_parse(item, source, index)
+
+    monkeypatch.setattr(log01, "parse_log01_file", _counting_parse)
+
+    thread = log01_router.resume_log01_jobs()
+    assert thread is not None
+    thread.join(timeout=60)
+
+    # Solo se leen los archivos sin checkpoint
+    assert parsed_names == ["Base Comercial OI-0002-2025.xlsx", "Base Comercial OI-0003-2025.xlsx"]
+    record = log01_jobs.get_job("op-1")
+    assert record is not None
+    assert (record.status, record.files_done, record.attempts, record.runner_id) == ("complete", 3, 2, "proceso-actual")
+    assert record.result_path and (work_dir / "result.xlsx").exists()
+    assert len(list((work_dir / "checkpoints").glob(f"*{log01.PARSED_FILE_SUFFIX}"))) == 3
+    with Session(log01_engine) as session:
+        runs = session.exec(select(Log01Run).where(Log01Run.operation_id == "op-1")).all()
+    assert len(runs) == 1 and runs[0].created_by_user_id == 7
+    assert runs[0].summary_json["series_conformes"] == 4
+
+    # Ya no queda nada que reanudar
+    assert log01_router.resume_log01_jobs() is None
+
+    # Tras otro reinicio el resultado se sigue pudiendo descargar
+    monkeypatch.setattr(log01_router, "LOG01_JOBS", {})
+    job = log01_router._get_log01_job("op-1")
+    assert job is not None and job.status == "complete" and job.result_path == record.result_path
+
+
+def test_resume_drops_jobs_without_inputs_and_expired_jobs(monkeypatch, tmp_path, log01_engine):
+    lost_dir = _interrupted_job(monkeypatch, tmp_path, "op-perdido")
+    for path in lost_dir.glob("*.xlsx"):
+        path.unlink()
+
+    old_dir = tmp_path / "jobs" / "op-viejo"
+    old_dir.mkdir(parents=True)
+    log01_jobs.create_job("op-viejo", "AUTO", None, str(old_dir), [], {})
+    log01_jobs.update_job("op-viejo", status="complete")
+    with Session(log01_engine) as session:
+        old = session.exec(select(Log01JobRecord).where(Log01JobRecord.operation_id == "op-viejo")).one()
+        old.updated_at = datetime.utcnow() - timedelta(seconds=log01_router.LOG01_TTL_SECONDS + 60)
+        session.add(old)
+        session.commit()
+
+    thread = log01_router.resume_log01_jobs()
+    assert thread is not None
+    thread.join(timeout=60)
+
+    assert log01_jobs.get_job("op-perdido") is None and not lost_dir.exists()
+    assert log01_jobs.get_job("op-viejo") is None and not old_dir.exists()
+    assert log01_router.LOG01_JOBS == {}
+
+
+def test_live_lease_is_not_stolen_by_another_runner(monkeypatch, tmp_path, log01_engine):
+    _interrupted_job(monkeypatch, tmp_path)
+    # Otro proceso vivo lo retoma primero y renueva su lease
+    monkeypatch.setattr(log01_jobs, "RUNNER_ID", "proceso-b")
+    record = log01_jobs.list_interrupted()[0]
+    assert log01_jobs.claim_job(record)
+    log01_jobs.mark_running("op-1")
+
+    monkeypatch.setattr(log01_jobs, "RUNNER_ID", "proceso-c")
+    assert log01_jobs.list_interrupted() == []
+    assert not log01_jobs.claim_job(log01_jobs.get_job("op-1"))
+    assert log01_jobs.get_job("op-1").runner_id == "proceso-b"
+
+    # B deja de renovar (murió): C lo toma cuando vence el lease
+    log01_jobs.update_job("op-1", lease_until=datetime.utcnow() + timedelta(seconds=0.3))
+    thread = log01_router.resume_log01_jobs()
+    assert thread is not None
+    assert log01_jobs.get_job("op-1").runner_id == "proceso-b"
+    thread.join(timeout=60)
+    record = log01_jobs.get_job("op-1")
+    assert (record.status, record.runner_id, record.attempts) == ("complete", "proceso-c", 3)
+
+
+def test_run_is_persisted_together_with_its_artifacts(log01_engine):
+    res = log01.Log01ProcessResult(
+        xlsx_bytes=b"xlsx", out_name="BD_1_AL_2.xlsx", summary={"serie_ini": "1", "serie_fin": "2"},
+        no_conforme_json=b"[]", manifest_json=cast(bytes, None),
+        no_conforme_filename="nc.json", manifest_filename="manifiesto.json",
+    )
+    # Falla el último artefacto: la corrida no debe quedar registrada sin él
+    with pytest.raises(TypeError):
+        log01_router._persist_log01_run("op-1", "AUTO", res, {"userId": 7, "username": "tec"})
+    assert not log01_router._log01_run_exists("op-1")
+
+    # El reintento (p. ej. el job reanudado) registra corrida y artefactos
+    res.manifest_json = b"{}"
+    log01_router._persist_log01_run("op-1", "AUTO", res, {"userId": 7, "username": "tec"})
+    log01_router._persist_log01_run("op-1", "AUTO", res, {"userId": 7, "username": "tec"})
+    with Session(log01_engine) as session:
+        runs = session.exec(select(Log01Run)).all()
+        kinds = sorted(a.kind for a in session.exec(select(Log01Artifact)))
+    assert len(runs) == 1 and runs[0].serie_fin_num == 2
+    assert kinds == ["EXCEL_FINAL", "JSON_MANIFIESTO", "JSON_NO_CONFORME_FINAL"]
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from datetime import date, datetime, time
+from io import BytesIO
+from pathlib import Path
+
+from openpyxl import load_workbook
+
+from app.core.settings import get_settings
+from app.logistica.services import log01_consolidate, log01_ooxml
+
+
+def _sheet_snapshot(data: bytes) -> dict:
+    wb = load_workbook(BytesIO(data))
+    ws = log01_consolidate._output_sheet(wb)
+    cells = {}
+    for row in ws.iter_rows():
+        for c in row:
+            cells[c.coordinate] = (
+                c.value, c.data_type, c.number_format, repr(c.font), repr(c.fill),
+                repr(c.border), repr(c.alignment), repr(c.protection),
+            )
+    return {"title": ws.title, "cells": cells, "auto_filter": ws.auto_filter.ref}
+
+
+def _rows() -> list[dict]:
+    rows = []
+    for i in range(1200):
+        rows.append(
+            {
+                "medidor": f"M{i:05d}",
+                "q3": 2500.456 + i,
+                "error_q3": -0.04 if i % 2 else 1e-12,
+                "q2": 16,
+                "error_q2": None,
+                "q1": "10,5",
+                "error_q1": 0.35,
+                "estado_pe": "CONFORME",
+                "fecha": [date(2025, 3, 1), "05/03/2025", datetime(2025, 3, 2, 10, 30), 45000, None][i % 5],
+                "certificado": "  CERT-1 " if i % 7 == 0 else f"C{i}",
+                "estado": "CONFORME",
+                "precinto": 123456 + i,
+                "banco_numero": "#N/A" if i == 3 else 4,
+                "certificado_banco": "=1+1" if i == 5 else "CB-01",
+                "organismo": "OI-040",
+            }
+        )
+    # Fechas/horas en columnas sin formato de fecha: openpyxl comparte el estilo de la
+    # fila modelo entre todas las filas, el formato que fija aplica a toda la columna
+    rows[0]["certificado"] = datetime(2025, 1, 2, 8, 0)
+    rows[1]["precinto"] = time(8, 30)
+    return rows
+
+
+def test_ooxml_output_matches_openpyxl_cell_for_cell():
+    template = get_settings().log01_template_abs_path
+    rows = _rows()
+    seen: list[int] = []
+
+    legacy = log01_consolidate._render_output_openpyxl(template, rows, lambda i: None)
+    direct = log01_ooxml.render_log01_ooxml(template, rows, seen.append)
+
+    assert direct is not None
+    assert seen == list(range(1, len(rows) + 1))
+    assert _sheet_snapshot(direct) == _sheet_snapshot(legacy)
+
+
+def test_ooxml_output_without_rows_keeps_template():
+    template = get_settings().log01_template_abs_path
+    legacy = log01_consolidate._render_output_openpyxl(template, [], lambda i: None)
+    direct = log01_ooxml.render_log01_ooxml(template, [], lambda i: None)
+    assert direct is not None
+    assert _sheet_snapshot(direct) == _sheet_snapshot(legacy)
+
+
+def test_template_with_data_rows_falls_back_to_openpyxl(tmp_path: Path):
+    wb = load_workbook(get_settings().log01_template_abs_path)
+    ws = log01_consolidate._output_sheet(wb)
+    ws.cell(row=2, column=1, value=1)
+    path = tmp_path / "plantilla_con_datos.xlsx"
+    wb.save(path)
+    assert log01_ooxml.render_log01_ooxml(str(path), [], lambda i: None) is None
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import pickle
+import zlib
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from io import BytesIO
+
+from openpyxl import Workbook
+
+from app.core.settings import get_settings
+from app.logistica.services import log01_consolidate as log01
+from app.logistica.services.log01_consolidate import Log01InputFile
+from app.oi_tools.services.progress_manager import progress_manager
+from app.services.export_cache import ExportCache
+
+
+_BASES_KEYS = log01._REQUIRED_INPUT_KEYS_BASES
+
+
+def _bases_file(oi_tag: str, rows: list[tuple[str, str]]) -> Log01InputFile:
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Item", *_BASES_KEYS])
+    for idx, (serie, estado) in enumerate(rows, start=1):
+        values = {key: f"{key}-{serie}" for key in _BASES_KEYS}
+        values.update(medidor=serie, estado=estado, fecha="2025-03-01", organismo="OI-040")
+        ws.append([idx, *[values[key] for key in _BASES_KEYS]])
+    buf = BytesIO()
+    wb.save(buf)
+    return Log01InputFile(name=f"Base Comercial {oi_tag}.xlsx", data=buf.getvalue())
+
+
+def _inputs() -> list[Log01InputFile]:
+    return [
+        _bases_file("OI-0001-2025", [("M1", "NO CONFORME"), ("M2", "CONFORME"), ("M3", "x")]),
+        _bases_file("OI-0002-2025", [("M1", "CONFORME"), ("M2", "NO CONFORME"), ("M4", "NO CONFORME")]),
+        Log01InputFile(name="vacio.xlsx", data=b""),
+        _bases_file("OI-0003-2024", [("M4", "CONFORME")]),
+    ]
+
+
+def _merge(parsed_files) -> log01._Log01Merge:
+    merge = log01._Log01Merge()
+    for parsed in parsed_files:
+        merge.add(parsed)
+    return merge
+
+
+def test_parse_log01_file_extracts_rows_and_counters():
+    parsed = log01.parse_log01_file(_inputs()[0], "AUTO")
+    assert parsed.status == "OK"
+    assert parsed.source_type == "BASES"
+    assert (parsed.oi_num, parsed.oi_year, parsed.oi_tag) == (1, 2025, "OI-0001-2025")
+    assert [(serie, estado) for serie, estado, _ in parsed.rows] == [("M1", "NO CONFORME"), ("M2", "CONFORME")]
+    assert (parsed.conformes, parsed.no_conformes, parsed.ignored_invalid_estado) == (1, 1, 1)
+    assert parsed.series_no_conforme_origen == ["M1"]
+
+
+def test_pool_merge_matches_sequential_merge(tmp_path):
+    items = _inputs()
+    sequential = _merge(log01.parse_log01_file(item, "AUTO", idx) for idx, item in enumerate(items, start=1))
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        pooled = _merge(log01.iter_parsed_files(items, "AUTO", lambda: None, executor=pool, cache=ExportCache(tmp_path, 0)))
+
+    assert list(pooled.series.records()) == list(sequential.series.records())
+    assert pooled.series.conflicts() == sequential.series.conflicts()
+    assert pooled.audit_by_oi == sequential.audit_by_oi
+    assert pooled.files_rejected == sequential.files_rejected
+    assert pooled.by_source == sequential.by_source
+
+    # CONFORME prevalece; entre iguales gana la OI mayor
+    assert pooled.series.get("M1").estado == "CONFORME" and pooled.series.get("M1").oi_num == 2
+    assert pooled.series.get("M2").estado == "CONFORME" and pooled.series.get("M2").oi_num == 1
+    assert pooled.series.get("M4").estado == "CONFORME" and pooled.series.get("M4").oi_year == 2024
+    # NO CONFORME más reciente que la CONFORME elegida (M4: 2025 > 2024)
+    assert [c["serie"] for c in pooled.series.conflicts()] == ["M2", "M4"]
+    assert (pooled.ok_files, pooled.bad_files, pooled.rows_total_read) == (3, 1, 6)
+    assert [f["filename"] for f in pooled.files_rejected] == ["vacio.xlsx"]
+
+
+def test_parse_cache_only_parses_new_or_changed_files(monkeypatch, tmp_path):
+    monkeypatch.setattr(get_settings(), "log01_parse_workers", 1)
+    cache = ExportCache(tmp_path / "log01_parse_cache", 16 * 1024 * 1024, suffix=log01.PARSED_FILE_SUFFIX)
+    items = _inputs()
+    first = _merge(log01.iter_parsed_files(items, "AUTO", lambda: None, cache=cache))
+    assert len(list((tmp_path / "log01_parse_cache").glob(f"*{log01.PARSED_FILE_SUFFIX}"))) == len(items)
+
+    parsed_names = []
+    real_parse = log01.parse_log01_file
+
+    def _counting_parse(item, source="AUTO", index=1):
+        parsed_names.append(item.name)
+        return real_parse(item, source, index)
+
+    monkeypatch.setattr(log01, "parse_log01_file", _counting_parse)
+    second = _merge(log01.iter_parsed_files(items, "AUTO", lambda: None, cache=cache))
+    assert parsed_names == []
+    assert list(second.series.records()) == list(first.series.records())
+    assert second.audit_by_oi == first.audit_by_oi
+    assert second.files_rejected == first.files_rejected
+
+    # Mismo nombre, contenido distinto: se vuelve a leer solo ese archivo
+    items[3] = _bases_file("OI-0003-2024", [("M4", "NO CONFORME")])
+    third = _merge(log01.iter_parsed_files(items, "AUTO", lambda: None, cache=cache))
+    assert parsed_names == ["Base Comercial OI-0003-2024.xlsx"]
+    assert third.series.get("M4").estado == "NO CONFORME" and third.series.get("M4").oi_num == 2
+
+    # Otro modo de origen es otra clave
+    assert log01.parse_cache_key(items[0], "AUTO") != log01.parse_cache_key(items[0], "BASES")
+
+
+def test_parsed_files_are_stored_as_json_not_pickle(tmp_path):
+    parsed = log01.parse_log01_file(_inputs()[0], "AUTO", 1)
+    when = datetime(2025, 3, 1, 8, 30)
+    parsed.rows.append(("M9", "CONFORME", {"fecha": when.date(), "hora": when.time(), "ts": when, "q3": 2.5}))
+    key = log01.parse_cache_key(_inputs()[0], "AUTO", 1)
+
+    checkpoints = log01.Log01Checkpoints(tmp_path / "checkpoints")
+    checkpoints.save(1, key, parsed)
+    assert checkpoints.load(1, key) == parsed
+    assert checkpoints.load(1, "otra-clave") is None
+
+    # Un pickle plantado en la carpeta no se deserializa
+    payload = pickle.dumps(parsed)
+    (tmp_path / "checkpoints" / f"00002{log01.PARSED_FILE_SUFFIX}").write_bytes(zlib.compress(payload))
+    assert checkpoints.load(2, key) is None
+    cache = ExportCache(tmp_path / "cache", 1024 * 1024, suffix=log01.PARSED_FILE_SUFFIX)
+    cache.put(key, zlib.compress(payload))
+    assert log01._load_cached(cache, key) is None
+
+
+def test_file_event_precedes_its_result_with_the_pool(monkeypatch, tmp_path):
+    monkeypatch.setattr(log01, "get_parse_cache", lambda: ExportCache(tmp_path, 0))
+    # Sin fusión de eventos "status": se ven todos
+    monkeypatch.setattr(get_settings(), "progress_coalesce_ms", 0)
+    started: dict[int, threading.Event] = {idx: threading.Event() for idx in range(1, 5)}
+    seen_started = []
+    real_parse = log01.parse_log01_file
+
+    def _parse(item, source="AUTO", index=1):
+        # El evento "file" del archivo ya salió mientras se lee (no al terminar)
+        seen_started.append(started[index].wait(2))
+        return real_parse(item, source, index)
+
+    monkeypatch.setattr(log01, "parse_log01_file", _parse)
+    real_emit = log01._emit
+
+    def _emit(operation_id, event):
+        real_emit(operation_id, event)
+        if event.get("stage") == "file":
+            started[event["index"]].set()
+
+    monkeypatch.setattr(log01, "_emit", _emit)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        log01.process_log01_files(_inputs(), "op-file-order", None, None, executor=pool)
+    assert seen_started == [True] * 4
+
+    channel = progress_manager.get_channel("op-file-order")
+    stages = [
+        (ev["stage"], ev.get("index"))
+        for ev in channel.events_after(-1)
+        if ev.get("stage") in ("file", "file_done", "file_error")
+    ]
+    # Mismo orden que la lectura secuencial: "file" (inicio) y luego su resultado, archivo por archivo
+    assert stages == [
+        ("file", 1), ("file_done", None),
+        ("file", 2), ("file_done", None),
+        ("file", 3), ("file_error", None),
+        ("file", 4), ("file_done", None),
+    ]
+    progress_manager.finish("op-file-order")
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import random
+
+from app.logistica.services import log01_consolidate as log01
+from app.logistica.services.log01_series import Log01SeriesStore
+
+
+def _reference_dedupe(files):
+    """Dedupe fila por fila (implementación previa al almacén columnar)."""
+    series, meta_by_serie = {}, {}
+    for source_type, oi_year, oi_num, rows in files:
+        for serie, estado, values in rows:
+            prev = series.get(serie)
+            if source_type == "BASES":
+                oi_key = (oi_year or 0, oi_num or 0)
+                meta = meta_by_serie.setdefault(
+                    serie, {"has_c": False, "has_nc": False, "latest": None, "latest_estado": None, "best_c": None, "best_nc": None}
+                )
+                if meta["latest"] is None or oi_key > meta["latest"]:
+                    meta["latest"], meta["latest_estado"] = oi_key, estado
+                if estado == "CONFORME":
+                    meta["has_c"] = True
+                    if meta["best_c"] is None or oi_key > meta["best_c"]:
+                        meta["best_c"] = oi_key
+                        series[serie] = (oi_key[1], oi_key[0], estado, values)
+                else:
+                    meta["has_nc"] = True
+                    if meta["best_nc"] is None or oi_key > meta["best_nc"]:
+                        meta["best_nc"] = oi_key
+                        if not meta["has_c"]:
+                            series[serie] = (oi_key[1], oi_key[0], estado, values)
+            elif prev is None or (prev[0] == 0 and prev[1] == 0):
+                series[serie] = (0, 0, estado, values)
+    conflicts = sorted(
+        (
+            serie
+            for serie, meta in meta_by_serie.items()
+            if meta["has_c"] and meta["has_nc"] and meta["latest_estado"] == "NO CONFORME"
+        ),
+        key=log01._natural_key,
+    )
+    return series, conflicts
+
+
+def _random_files(rng: random.Random, n_files: int, n_series: int):
+    files = []
+    for f in range(n_files):
+        source_type = "GASELAG" if rng.random() < 0.3 else "BASES"
+        oi_year, oi_num = (0, 0) if source_type == "GASELAG" else (rng.choice([0, 2024, 2025]), rng.randint(0, 3))
+        rows = []
+        for r in range(rng.randint(0, 40)):
+            serie = f"M{rng.randint(1, n_series)}" if rng.random() < 0.9 else f"m0{rng.randint(1, n_series)}"
+            estado = rng.choice(["CONFORME", "NO CONFORME"])
+            rows.append((serie, estado, {key: f"{key}-{f}-{r}" for key in log01._OUTPUT_KEYS}))
+        files.append((source_type, oi_year, oi_num, rows))
+    return files
+
+
+def test_columnar_dedupe_matches_row_by_row_reference():
+    rng = random.Random(20251016)
+    for _ in range(200):
+        files = _random_files(rng, rng.randint(1, 8), rng.randint(1, 30))
+        store = Log01SeriesStore(log01._OUTPUT_KEYS, log01._natural_key, capacity=4)
+        for source_type, oi_year, oi_num, rows in files:
+            store.add_file(rows, source_type, oi_year, oi_num)
+
+        expected, expected_conflicts = _reference_dedupe(files)
+        got = {
+            serie: (info.oi_num, info.oi_year, info.estado, info.values) for serie, info in store.records()
+        }
+        assert got == expected
+        assert list(got) == list(expected)
+        assert [c["serie"] for c in store.conflicts()] == expected_conflicts
+
+        # Orden natural estable (empates como "M01"/"m1" en orden de aparición)
+        names = [store.names[sid] for sid in store.ids().tolist()]
+        assert names == sorted(expected, key=log01._natural_key)
+        conformes = [store.names[sid] for sid in store.ids("CONFORME").tolist()]
+        assert conformes == sorted((s for s, v in expected.items() if v[2] == "CONFORME"), key=log01._natural_key)
+        assert list(store.output_rows(store.ids("CONFORME"))) == [expected[s][3] for s in conformes]
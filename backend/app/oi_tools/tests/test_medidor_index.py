@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+from sqlalchemy import event
+from sqlmodel import Session, select
+
+import pytest
+
+from app.api.oi import DuplicateMedidoresError, _build_oi_filters, _validate_no_duplicate_medidores
+from app.models import OI, Bancada, BancadaMedidor
+from app.services import medidor_index
+
+
+def _add_oi(session: Session, code: str) -> OI:
+    oi = OI(code=code, q3=2.5, alcance=100, pma=16, presion_bar=25.6, banco_id=1, tech_number=7)
+    session.add(oi)
+    session.flush()
+    return oi
+
+
+def test_search_uses_index_and_backfill(session):
+    admin = {"username": "admin", "role": "admin"}
+    oi_a = _add_oi(session, "OI-0001-2025")
+    oi_b = _add_oi(session, "OI-0002-2025")
+    session.add(Bancada(oi_id=oi_a.id, item=1, medidor="abc100", rows=2,
+                        rows_data=[{"medidor": "ABC100"}, {"medidor": " abc101 "}]))
+    session.add(Bancada(oi_id=oi_b.id, item=1, medidor="X_9%", rows=1))
+    session.commit()
+
+    # Bancadas previas al índice: el backfill las indexa una sola vez
+    assert medidor_index.backfill_bancada_medidor(session, batch_size=1) == 2
+    assert medidor_index.backfill_bancada_medidor(session) == 0
+    values = set(session.exec(select(BancadaMedidor.medidor)).all())
+    assert values == {"ABC100", "ABC101", "X_9%"}
+
+    _, ids = _build_oi_filters(session, admin, "c10", None, None, None)
+    assert ids == {oi_a.id}
+    # Comodines LIKE se tratan como texto literal
+    _, ids = _build_oi_filters(session, admin, "x_9%", None, None, None)
+    assert ids == {oi_b.id}
+    # Coincidencia por código de OI se mantiene
+    _, ids = _build_oi_filters(session, admin, "0002", None, None, None)
+    assert ids == {oi_b.id}
+
+    bancada = session.exec(select(Bancada).where(Bancada.oi_id == oi_a.id)).one()
+    bancada.rows_data = [{"medidor": "ZZZ1"}]
+    bancada.medidor = "ZZZ1"
+    medidor_index.sync_bancada_medidores(session, bancada, oi_a.numeration_type)
+    session.commit()
+    _, ids = _build_oi_filters(session, admin, "abc", None, None, None)
+    assert ids == set()
+
+
+def test_duplicate_validation_uses_index(session):
+    admin = {"username": "admin", "role": "admin"}
+    oi = _add_oi(session, "OI-0003-2025")
+    # Serie correlativa sin grid: ocupa A001..A003
+    b1 = Bancada(oi_id=oi.id, item=1, medidor="A001", rows=3)
+    b2 = Bancada(oi_id=oi.id, item=2, medidor="X", rows=2, rows_data=[{"medidor": "b7"}, {"medidor": "B8"}])
+    session.add(b1)
+    session.add(b2)
+    session.flush()
+    medidor_index.sync_bancada_medidores(session, b1, oi.numeration_type)
+    medidor_index.sync_bancada_medidores(session, b2, oi.numeration_type)
+    session.commit()
+
+    with pytest.raises(DuplicateMedidoresError) as exc_info:
+        _validate_no_duplicate_medidores(session, oi, {"A002", "B8", "Z9"})
+    exc = exc_info.value
+    assert exc.message == "Medidores repetidos dentro de la OI: A002 (bancada #1), B8 (bancada #2)"
+    assert exc.duplicates == [
+        {"medidor": "A002", "bancada_id": b1.id, "bancada_item": 1},
+        {"medidor": "B8", "bancada_id": b2.id, "bancada_item": 2},
+    ]
+
+    # La propia bancada se excluye al editar
+    _validate_no_duplicate_medidores(session, oi, {"A001", "A002"}, exclude_bancada_id=b1.id)
+    # El medidor de cabecera 'X' no cuenta para duplicados si hay grid
+    _validate_no_duplicate_medidores(session, oi, {"X"})
+
+    # La búsqueda solo usa medidores visibles (no la serie expandida)
+    _, ids = _build_oi_filters(session, admin, "A002", None, None, None)
+    assert ids == set()
+
+
+def test_substring_search_reads_only_the_covering_index(session):
+    admin = {"username": "admin", "role": "admin"}
+    oi = _add_oi(session, "OI-0001-2025")
+    session.add(Bancada(oi_id=oi.id, item=1, medidor="ABC100", rows=1))
+    session.flush()
+    medidor_index.sync_bancada_medidores(session, session.exec(select(Bancada)).one(), oi.numeration_type)
+    session.commit()
+
+    statements = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if "bancada_medidor" in statement:
+            statements.append((statement, parameters))
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", _capture)
+    _, ids = _build_oi_filters(session, admin, "c10", None, None, None)
+    event.remove(engine, "before_cursor_execute", _capture)
+    assert ids == {oi.id}
+
+    (statement, params), = statements
+    plan = " | ".join(
+        row[-1] for row in session.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + statement, params).all()
+    )
+    assert "COVERING INDEX idx_bancada_medidor_search" in plan, plan
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import csv
+from datetime import datetime, timedelta
+from io import StringIO
+
+from sqlmodel import Session
+
+import app.api.oi as oi_api
+from app.models import OI, Bancada, User
+from app.services import medidor_counters
+
+
+def test_iter_oi_csv_keyset_chunks(oi_engine):
+    base = datetime(2025, 1, 1, 8, 0)
+    with Session(oi_engine) as session:
+        session.add(User(username="tec", first_name="Ana", last_name="Pérez", password_hash="x", tech_number=7))
+        # Varias OIs con la misma fecha de orden para probar el desempate por id
+        for idx in range(7):
+            ts = base + timedelta(hours=idx // 3)
+            oi = OI(code=f"OI-{idx:04d}-2025", q3=2.5, alcance=100, pma=16, presion_bar=25.6,
+                    banco_id=1, tech_number=7, created_at=ts, updated_at=None if idx % 2 else ts)
+            session.add(oi)
+            session.flush()
+            session.add(Bancada(oi_id=oi.id, item=1, rows=idx + 1))
+        session.commit()
+        medidor_counters.rebuild_counters(session)
+
+    chunks = list(oi_api._iter_oi_csv([], chunk_size=2))
+    assert chunks[0].startswith("\ufeff".encode("utf-8"))
+    text = b"".join(chunks).decode("utf-8-sig")
+    rows = list(csv.reader(StringIO(text)))
+    assert rows[0] == oi_api.OI_CSV_HEADER
+    assert [r[0] for r in rows[1:]] == ["7", "6", "5", "4", "3", "2", "1"]
+    assert rows[1][2] == "7 / 7"
+    assert rows[1][8] == "Ana Pérez"
+
+    only_header = b"".join(oi_api._iter_oi_csv(None)).decode("utf-8-sig")
+    assert list(csv.reader(StringIO(only_header))) == [oi_api.OI_CSV_HEADER]
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import cast
+
+from sqlalchemy import event
+from sqlmodel import Session
+
+import app.api.oi as oi_api
+from app.models import OI, Bancada
+from app.services import medidor_counters
+
+
+def test_compute_list_summary_single_query(session):
+    # Mismo código en dos técnicos; una OI sin bancadas
+    specs = [("OI-0001-2025", 7, [5, 10]), ("OI-0001-2025", 8, [3]), ("OI-0002-2025", 7, []), ("OI-0003-2025", 8, [4])]
+    for code, tech, rows in specs:
+        oi = OI(code=code, q3=2.5, alcance=100, pma=16, presion_bar=25.6, banco_id=1, tech_number=tech)
+        session.add(oi)
+        session.flush()
+        for idx, n in enumerate(rows, start=1):
+            session.add(Bancada(oi_id=oi.id, item=idx, rows=n))
+    session.commit()
+    medidor_counters.rebuild_counters(session)
+
+    total, summary = oi_api._compute_list_summary(session, [OI.tech_number == 7])
+    assert total == 2
+    assert summary.medidores_resultado == 15
+    assert summary.oi_unicas == 2
+    # El total por código incluye OIs de otros técnicos
+    assert summary.medidores_total_oi_unicas == 18
+
+    total, summary = oi_api._compute_list_summary(session, [])
+    assert (total, summary.medidores_resultado, summary.oi_unicas, summary.medidores_total_oi_unicas) == (4, 22, 3, 22)
+
+    # Caché por filtros: mismo resultado hasta invalidar
+    oi_api._invalidate_list_summary_cache()
+    key = ("test",)
+    assert oi_api._get_list_summary(session, [], key)[0] == 4
+    session.add(OI(code="OI-0009-2025", q3=2.5, alcance=100, pma=16, presion_bar=25.6, banco_id=1, tech_number=7))
+    session.commit()
+    assert oi_api._get_list_summary(session, [], key)[0] == 4
+    oi_api._invalidate_list_summary_cache()
+    assert oi_api._get_list_summary(session, [], key)[0] == 5
+    oi_api._invalidate_list_summary_cache()
+
+
+def test_counters_follow_bancada_deltas(session):
+    oi_a = OI(code="OI-0001-2025", q3=2.5, alcance=100, pma=16, presion_bar=25.6, banco_id=1, tech_number=7)
+    oi_b = OI(code="OI-0001-2025", q3=2.5, alcance=100, pma=16, presion_bar=25.6, banco_id=1, tech_number=8)
+    session.add(oi_a)
+    session.add(oi_b)
+    session.flush()
+    session.add(Bancada(oi_id=oi_a.id, item=1, rows=15))
+    medidor_counters.apply_rows_delta(session, oi_a, 15)
+    session.add(Bancada(oi_id=oi_b.id, item=1, rows=4))
+    medidor_counters.apply_rows_delta(session, oi_b, 4)
+    medidor_counters.apply_rows_delta(session, oi_a, -5)
+    session.commit()
+    assert oi_a.medidores_usuario == 10
+    assert medidor_counters.code_total(session, "OI-0001-2025") == 14
+
+    medidor_counters.move_code(session, oi_b, oi_b.code, "OI-0002-2025")
+    oi_b.code = "OI-0002-2025"
+    session.add(oi_b)
+    session.commit()
+    assert medidor_counters.code_totals(session, ["OI-0001-2025", "OI-0002-2025"]) == {
+        "OI-0001-2025": 10,
+        "OI-0002-2025": 4,
+    }
+
+    # La reparación recalcula desde bancada (15 real en oi_a)
+    medidor_counters.rebuild_counters(session)
+    session.refresh(oi_a)
+    assert oi_a.medidores_usuario == 15
+    assert medidor_counters.code_total(session, "OI-0001-2025") == 15
+
+
+def test_saved_at_edits_invalidate_list_summary(monkeypatch, oi_engine):
+    admin = {"userId": 1, "username": "admin", "role": "admin"}
+    monkeypatch.setattr(oi_api, "_get_session_from_header", lambda *a, **k: admin)
+    with Session(oi_engine) as session:
+        oi = OI(code="OI-0001-2025", q3=2.5, alcance=100, pma=16, presion_bar=25.6, banco_id=1, tech_number=7,
+                saved_at=datetime(2025, 3, 1), updated_at=datetime(2025, 3, 1))
+        session.add(oi)
+        session.commit()
+        session.refresh(oi)
+        oi_id = cast(int, oi.id)
+
+        oi_api._get_list_summary(session, [], ("test",))
+        oi_api.update_oi_saved_at(
+            oi_id, oi_api.OISavedAtUpdate(saved_at=datetime(2025, 4, 1)), session=session, authorization=None
+        )
+        # La fecha entra en los filtros del listado: el resumen cacheado ya no sirve
+        assert oi_api._LIST_SUMMARY_CACHE == {}
+
+        oi_api._get_list_summary(session, [], ("test",))
+        oi_api.restore_oi_updated_at(
+            oi_id,
+            oi_api.OIRestoreUpdatedAtPayload(current_updated_at=cast(datetime, session.get(OI, oi_id).updated_at)),
+            session=session,
+            authorization=None,
+        )
+        assert oi_api._LIST_SUMMARY_CACHE == {}
+
+
+def test_code_total_survives_a_concurrent_first_insert(engine, session):
+    oi = OI(code="OI-0005-2025", q3=2.5, alcance=100, pma=16, presion_bar=25.6, banco_id=1, tech_number=7)
+    session.add(oi)
+    session.flush()
+    raced = []
+
+    def _other_writer(conn, cursor, statement, parameters, context, executemany):
+        # Otro worker crea el total del código justo antes de nuestro INSERT
+        if not raced and statement.lstrip().upper().startswith("INSERT INTO OI_CODE_TOTAL"):
+            raced.append(1)
+            cursor.execute("INSERT INTO oi_code_total (code, medidores_total) VALUES ('OI-0005-2025', 4)")
+
+    event.listen(engine, "before_cursor_execute", _other_writer)
+    try:
+        medidor_counters.apply_rows_delta(session, oi, 6)
+    finally:
+        event.remove(engine, "before_cursor_execute", _other_writer)
+    session.commit()
+    assert raced and medidor_counters.code_total(session, "OI-0005-2025") == 10
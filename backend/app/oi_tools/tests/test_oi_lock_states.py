@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlmodel import Session
+
+import app.api.auth as auth_api
+import app.api.oi as oi_api
+from app.core.session_store import MemorySessionStore
+from app.models import OI, User
+
+ADMIN = {"userId": 1, "username": "admin", "user": "admin", "role": "admin", "techNumber": 0, "bancoId": 0}
+
+
+def test_batched_lock_states_match_per_oi_and_keep_query_count_constant(monkeypatch, oi_engine):
+    now = datetime.utcnow()
+    with Session(oi_engine) as session:
+        session.add(User(username="admin", first_name="Admin", last_name="Sistema", password_hash="x",
+                         tech_number=0, role="admin"))
+        for i in range(30):
+            user = User(username=f"tec{i}", first_name="Tec", last_name=str(i), password_hash="x",
+                        tech_number=i + 1, role="technician")
+            session.add(user)
+            session.flush()
+            # Variantes: lock activo, lock vencido, lock del admin y sin lock
+            kind = i % 4
+            session.add(OI(
+                code=f"OI-{i:04d}-2025", q3=2.5, alcance=100, pma=16, presion_bar=25.6, banco_id=1,
+                tech_number=i + 1,
+                locked_by_user_id={0: user.id, 1: user.id, 2: 1, 3: None}[kind],
+                locked_at={0: now, 1: now - timedelta(days=2), 2: now, 3: None}[kind],
+                created_at=now - timedelta(seconds=i),
+            ))
+        session.commit()
+
+    with Session(oi_engine) as session:
+        ois = session.exec(oi_api.select(OI)).all()
+        batched = oi_api._get_lock_states(ois, session, ADMIN)
+        for oi in ois:
+            expected = oi_api._get_lock_state(oi, session, ADMIN)
+            got = batched[oi.id]
+            assert {k: v for k, v in got.items() if k != "owner"} == {k: v for k, v in expected.items() if k != "owner"}
+            assert getattr(got["owner"], "id", None) == getattr(expected["owner"], "id", None)
+        assert sum(1 for st in batched.values() if st["read_only"]) == 8
+
+    monkeypatch.setattr(oi_api, "_SESSIONS", MemorySessionStore({"t": {**ADMIN, "expiresAt": now + timedelta(hours=1)}}))
+    statements = []
+    event.listen(oi_engine, "before_cursor_execute", lambda *a, **k: statements.append(1))
+    counts = []
+    for limit in (5, 25):
+        auth_api.invalidate_full_name_cache()
+        oi_api._invalidate_list_summary_cache()
+        statements.clear()
+        with Session(oi_engine) as session:
+            page = oi_api.list_oi(limit=limit, session=session, authorization="Bearer t")
+        assert len(page.items) == limit
+        counts.append(len(statements))
+    assert counts[0] == counts[1]
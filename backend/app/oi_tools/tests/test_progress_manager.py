@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+
+from app.core.settings import get_settings
+from app.oi_tools.services.progress_manager import MIN_CHUNK, REPLAY_SIZE, ProgressChannel, ProgressManager
+
+
+def test_ring_buffer_keeps_latest_events_and_cursors():
+    channel = ProgressChannel(ring_size=5, coalesce_s=0)
+    for i in range(8):
+        channel.add({"type": "progress", "i": i})
+
+    assert [ev["cursor"] for ev in channel.history] == [3, 4, 5, 6, 7]
+    assert [ev["cursor"] for ev in channel.events_after(5)] == [6, 7]
+    # Suscriptor atrasado: recibe lo que sigue en el buffer
+    assert [ev["cursor"] for ev in channel.events_after(0)] == [3, 4, 5, 6, 7]
+    assert channel.events_after(7) == []
+
+    channel.close()
+    channel.add({"type": "progress"})
+    assert channel.last_cursor == 7
+
+
+def test_subscribe_replays_tail_and_every_subscriber_gets_live_events(monkeypatch):
+    monkeypatch.setattr(get_settings(), "progress_coalesce_ms", 0)
+    pm = ProgressManager()
+    for i in range(REPLAY_SIZE + 10):
+        pm.emit("op", {"type": "progress", "i": i})
+    channel, history = pm.subscribe("op")
+    _, history_b = pm.subscribe("op")
+    assert len(history) == REPLAY_SIZE
+    assert history[-1]["i"] == REPLAY_SIZE + 9
+
+    async def collect(hist):
+        return [ev["i"] async for batch in pm.follow(channel, hist) for ev in batch]
+
+    async def main():
+        tasks = [asyncio.create_task(collect(history)), asyncio.create_task(collect(history_b))]
+        await asyncio.sleep(0.01)
+
+        def produce():
+            for i in range(3):
+                pm.emit("op", {"type": "progress", "i": 100 + i})
+            pm.finish("op")
+
+        threading.Thread(target=produce).start()
+        return await asyncio.wait_for(asyncio.gather(*tasks), 2)
+
+    assert asyncio.run(main()) == [[100, 101, 102], [100, 101, 102]]
+
+    pm.unsubscribe("op")
+    pm.unsubscribe("op")
+    assert pm.get_channel("op") is None
+
+
+def test_follow_heartbeat_and_sync_follow():
+    pm = ProgressManager()
+    channel, history = pm.subscribe("op")
+
+    async def first_item():
+        async for batch in pm.follow(channel, history, heartbeat_s=0.01):
+            return batch
+
+    assert asyncio.run(first_item()) is None
+
+    def produce():
+        time.sleep(0.02)
+        pm.emit("op", {"type": "status"})
+        pm.finish("op")
+
+    threading.Thread(target=produce).start()
+    events = [ev for batch in pm.follow_sync(channel, history, heartbeat_s=1.0) if batch for ev in batch]
+    assert [ev["type"] for ev in events] == ["status"]
+
+
+def test_coalesces_progress_per_stage_and_keeps_order():
+    channel = ProgressChannel(coalesce_s=60)
+    channel.add({"type": "status", "stage": "start"})
+    for i in range(1000):
+        channel.add({"type": "progress", "stage": "filas", "current": i})
+        channel.add({"type": "status", "stage": "oi", "current": i})
+    channel.add({"type": "file_ok", "file": "a.pdf"})
+    channel.add({"type": "progress", "stage": "filas", "current": 1000})
+    channel.close()
+
+    published = [(ev["type"], ev.get("stage"), ev.get("current")) for ev in channel.history]
+    assert published == [
+        ("status", "start", None),
+        ("progress", "filas", 999),
+        ("status", "oi", 999),
+        ("file_ok", None, None),
+        ("progress", "filas", 1000),
+    ]
+    assert channel.coalesced == 1998
+
+
+def test_pending_events_flush_when_window_expires():
+    channel = ProgressChannel(coalesce_s=0.05)
+    channel.add({"type": "progress", "current": 1})
+    channel.add({"type": "progress", "current": 2})
+    assert [ev["current"] for ev in channel.events_after(-1)] == [1]
+
+    # El suscriptor que espera publica lo pendiente al vencer la ventana
+    assert [ev["current"] for ev in channel.wait(0, timeout=1.0)] == [2]
+
+
+def test_encode_events_pads_once_per_chunk():
+    events = [{"type": "progress", "current": i} for i in range(3)]
+    chunk = ProgressManager.encode_events(events)
+    lines = chunk.decode("utf-8").splitlines()
+    assert [json.loads(line)["current"] for line in lines] == [0, 1, 2]
+    assert len(chunk) == MIN_CHUNK
+    assert len(ProgressManager.encode_event(events[0])) == MIN_CHUNK
+    assert ProgressManager.encode_events([]) == b""
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import json
+
+from sqlmodel import Session
+
+from app.core import rows_codec
+from app.core.settings import get_settings
+from app.models import OI, Bancada
+
+
+def _rows(count: int) -> list[dict]:
+    return [
+        {
+            "medidor": f"M{i:03d}",
+            "estado": 0,
+            "q3": {"c1": 20.1, "c4": 10.5 + i, "c7": "00:30", "c7_seconds": 30},
+            "q1": {"c1": None},
+            "nota": {"texto": f"fila {i}"},
+        }
+        for i in range(count)
+    ]
+
+
+def _raw_rows_data(session: Session, bancada_id: int):
+    raw = session.connection().exec_driver_sql("SELECT rows_data FROM bancada WHERE id = ?", (bancada_id,)).scalar()
+    return json.loads(raw)
+
+
+def test_encode_decode_roundtrip_keeps_missing_and_null_cells():
+    rows = _rows(40)
+    del rows[3]["medidor"]
+    rows[5]["q2"] = {}
+    rows.append({})
+
+    envelope = rows_codec.encode_rows(rows)
+    assert rows_codec.is_compact(envelope)
+    assert rows_codec.decode_rows(envelope) == rows
+    assert rows_codec.decode_rows(rows_codec.encode_rows([])) == []
+
+
+def test_model_stores_compact_and_reads_rows(monkeypatch, session):
+    monkeypatch.setattr(get_settings(), "rows_data_encoding", "compact")
+    rows = _rows(15)
+    session.add(OI(id=1, code="OI-0001-2025", q3=2.5, alcance=100, pma=16, presion_bar=25.6,
+                   banco_id=1, tech_number=7))
+    session.add(Bancada(id=1, oi_id=1, item=1, rows=15, rows_data=rows))
+    session.commit()
+
+    assert rows_codec.is_compact(_raw_rows_data(session, 1))
+    session.expire_all()
+    assert session.get(Bancada, 1).rows_data == rows
+
+
+def test_convert_stored_rows_both_ways(monkeypatch, session):
+    rows = _rows(20)
+    session.add(OI(id=1, code="OI-0001-2025", q3=2.5, alcance=100, pma=16, presion_bar=25.6,
+                   banco_id=1, tech_number=7))
+    session.add(Bancada(id=1, oi_id=1, item=1, rows=20, rows_data=rows))
+    # Datos legacy no-dict: no se pueden compactar y se quedan en JSON
+    session.add(Bancada(id=2, oi_id=1, item=2, rows=1, rows_data=["x"]))
+    session.add(Bancada(id=3, oi_id=1, item=3, rows=1))
+    session.commit()
+    assert _raw_rows_data(session, 1) == rows
+
+    assert rows_codec.convert_stored_rows(session, "compact", batch_size=1) == 1
+    assert rows_codec.convert_stored_rows(session, "compact") == 0
+    assert rows_codec.is_compact(_raw_rows_data(session, 1))
+    assert _raw_rows_data(session, 2) == ["x"]
+
+    session.expire_all()
+    assert session.get(Bancada, 1).rows_data == rows
+
+    assert rows_codec.convert_stored_rows(session, "json") == 1
+    assert _raw_rows_data(session, 1) == rows
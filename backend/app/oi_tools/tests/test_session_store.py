@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from sqlmodel import Session, select
+
+import app.api.auth as auth_api
+import app.api.oi as oi_api
+from app.core.security import get_password_hash
+from app.core.session_store import DbSessionStore, MemorySessionStore
+from app.models import User
+
+
+def _sess(token: str, expires_at: datetime, **extra) -> dict:
+    return {"token": token, "userId": 1, "username": "tec", "bancoId": None,
+            "createdAt": expires_at - timedelta(hours=12), "expiresAt": expires_at, **extra}
+
+
+def test_db_store_is_shared_between_workers_and_purges(engine):
+    clock = [0.0]
+    worker_a = DbSessionStore(engine, cache_ttl_s=5.0, clock=lambda: clock[0])
+    worker_b = DbSessionStore(engine, cache_ttl_s=5.0, clock=lambda: clock[0])
+    now = datetime.utcnow()
+
+    worker_a["t1"] = _sess("t1", now + timedelta(hours=1))
+    worker_a["old"] = _sess("old", now - timedelta(seconds=1))
+    # Un miss siempre consulta la BD: el login de A es visible en B de inmediato
+    sess = worker_b.get("t1")
+    assert sess is not None and sess["expiresAt"] == now + timedelta(hours=1)
+    assert "t1" in worker_b and worker_b.get("nope") is None
+
+    # Cambios de A se ven en B cuando vence su caché
+    sess_a = worker_a.get("t1")
+    sess_a["bancoId"] = 3
+    worker_a["t1"] = sess_a
+    assert worker_b.get("t1")["bancoId"] is None
+    clock[0] += 6
+    assert worker_b.get("t1")["bancoId"] == 3
+
+    worker_b.purge_expired(now)
+    assert sorted(worker_a.keys()) == ["t1"]
+    assert worker_a.pop("t1")["username"] == "tec"
+    assert worker_a.get("t1") is None and len(worker_b) == 0
+
+
+def test_login_and_set_banco_go_through_store(monkeypatch, oi_engine):
+    store = DbSessionStore(oi_engine, cache_size=0)
+    monkeypatch.setattr(auth_api, "_SESSIONS", store)
+    monkeypatch.setattr(oi_api, "_SESSIONS", store)
+    with Session(oi_engine) as session:
+        session.add(User(username="tec", first_name="Ana", last_name="Pérez",
+                         password_hash=get_password_hash("clave"), tech_number=7, role="technician"))
+        session.commit()
+
+    with Session(oi_engine) as session:
+        out = auth_api.login(auth_api.LoginRequest(username="tec", password="clave"), session=session)
+    token = out["token"]
+    header = f"Bearer {token}"
+
+    sess = auth_api.get_current_user_session(authorization=header)
+    auth_api.set_banco(auth_api.SetBancoRequest(bancoId=4), sess=sess)
+    # Otra "instancia" (otro worker) ve el banco elegido
+    assert DbSessionStore(oi_engine).get(token)["bancoId"] == 4
+    assert oi_api._get_session_from_header(header)["techNumber"] == 7
+
+    auth_api.logout(authorization=header)
+    assert store.get(token) is None
+
+
+def test_memory_store_keeps_dict_contract():
+    store = MemorySessionStore()
+    now = datetime.utcnow()
+    store["a"] = _sess("a", now - timedelta(seconds=1))
+    store["b"] = _sess("b", now + timedelta(hours=1))
+    store.purge_expired(now)
+    assert list(store) == ["b"] and store.get("b")["token"] == "b"
+
+
+def test_full_name_cache_expires_for_other_workers(monkeypatch, oi_engine):
+    clock = [100.0]
+    monkeypatch.setattr(auth_api.time, "monotonic", lambda: clock[0])
+    with Session(oi_engine) as session:
+        session.add(User(username="tec", first_name="Ana", last_name="Pérez",
+                         password_hash="x", tech_number=7, role="technician"))
+        session.commit()
+    assert auth_api.get_full_name_by_tech_number(7) == "Ana Pérez"
+
+    # Edición hecha por otro worker: este proceso no recibe la invalidación
+    with Session(oi_engine) as session:
+        user = session.exec(select(User)).one()
+        user.last_name = "Rojas"
+        session.add(user)
+        session.commit()
+    assert auth_api.get_full_name_by_tech_number(7) == "Ana Pérez"
+    clock[0] += auth_api.get_settings().full_name_cache_ttl_s + 1
+    assert auth_api.get_full_name_by_tech_number(7) == "Ana Rojas"
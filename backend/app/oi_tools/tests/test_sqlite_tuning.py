@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlmodel import SQLModel, Session, create_engine
+
+import app.api.admin as admin_api
+from app.core.rbac import SUPERUSER_USERNAME
+from app.core.sqlite_tuning import (
+    WriterQueue,
+    build_sqlite_pragmas,
+    install_single_writer,
+    install_sqlite_pragmas,
+    pool_stats,
+    read_sqlite_pragmas,
+)
+from app.models import OICodeTotal
+
+
+def _file_engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{(tmp_path / 'vi.db').as_posix()}",
+        connect_args={"check_same_thread": False, "timeout": 5.0},
+        pool_size=3,
+        max_overflow=2,
+    )
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def test_pragmas_apply_to_every_pooled_connection(tmp_path):
+    engine = _file_engine(tmp_path)
+    profile = SimpleNamespace(
+        sqlite_busy_timeout_ms=7000,
+        sqlite_synchronous="normal",
+        sqlite_cache_size_kb=4096,
+        sqlite_mmap_size_mb=0,
+        sqlite_temp_store="bogus",  # inválido -> MEMORY
+    )
+    pragmas = build_sqlite_pragmas(profile)
+    engine.dispose()
+    install_sqlite_pragmas(engine, pragmas)
+
+    conns = [engine.connect() for _ in range(3)]
+    try:
+        for conn in conns:
+            assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == 7000
+            assert conn.exec_driver_sql("PRAGMA cache_size").scalar() == -4096
+            assert conn.exec_driver_sql("PRAGMA temp_store").scalar() == 2  # MEMORY
+            assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+        assert pool_stats(engine)["checkedout"] == 3
+    finally:
+        for conn in conns:
+            conn.close()
+    assert pool_stats(engine)["checkedout"] == 0
+    assert read_sqlite_pragmas(engine, ["busy_timeout"]) == {"busy_timeout": 7000}
+
+
+def test_single_writer_serializes_write_transactions(tmp_path):
+    engine = _file_engine(tmp_path)
+    queue = WriterQueue()
+    install_single_writer(engine, queue, timeout_s=5.0)
+    events: list[str] = []
+    first_flushed = threading.Event()
+
+    def writer(name: str, hold_s: float, started: threading.Event | None) -> None:
+        with Session(engine) as session:
+            session.add(OICodeTotal(code=name, medidores_total=1))
+            session.flush()
+            events.append(f"{name}:flush")
+            if started is not None:
+                started.set()
+            time.sleep(hold_s)
+            events.append(f"{name}:commit")
+            session.commit()
+
+    a = threading.Thread(target=writer, args=("A", 0.2, first_flushed))
+    a.start()
+    first_flushed.wait(2)
+    b = threading.Thread(target=writer, args=("B", 0.0, None))
+    b.start()
+    a.join()
+    b.join()
+
+    assert events == ["A:flush", "A:commit", "B:flush", "B:commit"]
+    stats = queue.stats()
+    assert stats["acquisitions"] == 2 and stats["timeouts"] == 0 and not stats["busy"]
+    assert stats["max_wait_ms"] > 0
+
+    # Lecturas y sesiones sin cambios no toman la cola
+    with Session(engine) as session:
+        session.get(OICodeTotal, "A")
+    assert queue.stats()["acquisitions"] == 2
+
+
+def test_writer_queue_timeout_does_not_block_forever():
+    queue = WriterQueue()
+    ticket = queue.acquire()
+    assert ticket is not None
+    # Sin reentrancia por hilo: otro turno del mismo hilo también espera
+    assert queue.acquire(timeout=0.05) is None
+    result: list[object] = []
+    t = threading.Thread(target=lambda: result.append(queue.acquire(timeout=0.05)))
+    t.start()
+    t.join()
+    assert result == [None] and queue.stats()["timeouts"] == 2
+    queue.release(ticket)
+    assert not queue.stats()["busy"]
+
+
+def test_writer_queue_released_from_another_thread(tmp_path):
+    queue = WriterQueue()
+    ticket = queue.acquire()
+    t = threading.Thread(target=queue.release, args=(ticket,))
+    t.start()
+    t.join()
+    assert not queue.stats()["busy"]
+
+    # Session que escribe en un hilo y se cierra (sin commit) en otro, como el
+    # `get_session` de FastAPI en el threadpool
+    engine = _file_engine(tmp_path)
+    install_single_writer(engine, queue, timeout_s=5.0)
+    session = Session(engine)
+    session.add(OICodeTotal(code="A", medidores_total=1))
+    session.flush()
+    assert queue.stats()["busy"]
+    t = threading.Thread(target=session.close)
+    t.start()
+    t.join()
+    assert not queue.stats()["busy"]
+
+    with Session(engine) as session:
+        session.add(OICodeTotal(code="B", medidores_total=1))
+        session.flush()
+        session.rollback()
+        assert not queue.stats()["busy"]
+    assert queue.stats()["timeouts"] == 0
+
+
+def test_db_diagnostics_endpoint_requires_superuser(monkeypatch):
+    with pytest.raises(HTTPException) as exc:
+        admin_api.get_db_diagnostics(sess={"username": "tecnico"})
+    assert exc.value.status_code == 403
+
+    monkeypatch.setattr(admin_api, "db_diagnostics", lambda: {"backend": "sqlite", "pool": {}})
+    assert admin_api.get_db_diagnostics(sess={"username": SUPERUSER_USERNAME})["backend"] == "sqlite"
@@ -87,6 +87,31 @@ class BancadaUpdate(BancadaBase):
     updated_at: datetime
 
 
+class BancadaRowPatch(BaseModel):
+    """Fila del grid a reemplazar (posición 0-based en rows_data)."""
+    index: int = Field(ge=0, le=10000)
+    row: BancadaRow
+
+
+class BancadaDelta(BaseModel):
+    """
+    Cambios de una bancada dentro de un guardado por lote.
+    Solo se aplican los campos enviados; rows_patch reemplaza filas puntuales
+    del grid (después de rows_data, si también viene).
+    """
+    id: int
+    updated_at: datetime
+    medidor: Optional[str] = None
+    estado: Optional[int] = Field(default=None, ge=0, le=5)
+    rows: Optional[int] = Field(default=None, ge=1)
+    rows_data: Optional[List[BancadaRow]] = None
+    rows_patch: Optional[List[BancadaRowPatch]] = None
+
+
+class BancadaBatchUpdate(BaseModel):
+    items: List[BancadaDelta] = Field(min_length=1, max_length=200)
+
+
 class BancadaRead(BancadaBase):
     id: int
     item: int
@@ -96,6 +121,10 @@ class BancadaRead(BancadaBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class BancadaBatchRead(BaseModel):
+    items: List[BancadaRead] = Field(default_factory=list)
+
+
 class OiWithBancadasRead(OIRead):
     bancadas: List[BancadaRead] = Field(default_factory=list)
 
@@ -139,6 +168,8 @@ class OIListResponse(BaseModel):
     total: int
     limit: int
     offset: int
+    # Paginación por cursor (?cursor=): token de la página siguiente; None si no hay más
+    next_cursor: Optional[str] = None
     summary: Optional[OIListSummary] = None
 
 class Log01ArtifactRead(BaseModel):
@@ -193,6 +224,7 @@ class Log01RunListResponse(BaseModel):
     total: int
     limit: int
     offset: int
+    next_cursor: Optional[str] = None
 
 
 class FormatoAcRunListItem(BaseModel):
@@ -213,6 +245,7 @@ class FormatoAcRunListResponse(BaseModel):
     total: int
     limit: int
     offset: int
+    next_cursor: Optional[str] = None
 
 class Log01RunDeleteRequest(BaseModel):
     reason: Optional[str] = None
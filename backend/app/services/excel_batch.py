@@ -0,0 +1,204 @@
+"""
+Exportación masiva de Formato VI: varios Excel de OI en un solo ZIP.
+
+Cada Excel se genera en un pool de procesos (generate_excel es CPU puro y no
+toca la BD); el ZIP se va escribiendo y entregando a medida que cada libro
+termina. El progreso se publica por progress_manager (NDJSON) y la operación
+se puede cancelar con cancel_manager.
+"""
+
+import atexit
+import logging
+import os
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, Iterator, Optional
+from zipfile import ZipFile, ZIP_STORED
+
+from ..core.settings import get_settings
+from ..models import OI, Bancada
+from ..oi_tools.services.cancel_manager import CancelToken, cancel_manager
+from ..oi_tools.services.progress_manager import progress_manager
+from .excel_service import generate_excel
+
+logger = logging.getLogger(__name__)
+
+ERRORS_FILENAME = "ERRORES.txt"
+
+
+@dataclass(frozen=True)
+class ExcelBatchJob:
+    """Datos planos (picklables) para generar el Excel de una OI en otro proceso."""
+    oi_id: int
+    code: str
+    filename: str
+    oi: dict
+    bancadas: tuple[dict, ...]
+    password: Optional[str]
+    work_dt: Optional[datetime]
+
+
+def build_excel_job(job: ExcelBatchJob) -> bytes:
+    """Se ejecuta en el proceso worker."""
+    oi = OI(**job.oi)
+    bancadas = [Bancada(**b) for b in job.bancadas]
+    data, _ = generate_excel(oi, bancadas, password=job.password, work_dt=job.work_dt)
+    return data
+
+
+_POOL_LOCK = threading.Lock()
+_POOL: Optional[ProcessPoolExecutor] = None
+
+
+def pool_size() -> int:
+    configured = int(getattr(get_settings(), "excel_batch_workers", 0) or 0)
+    return max(1, configured or os.cpu_count() or 1)
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Pool compartido (se crea al primer uso; los procesos se reutilizan entre requests)."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ProcessPoolExecutor(max_workers=pool_size())
+        return _POOL
+
+
+def shutdown_pool() -> None:
+    global _POOL
+    with _POOL_LOCK:
+        pool, _POOL = _POOL, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(shutdown_pool)
+
+
+class _ZipSink:
+    """Destino no 'seekable' para ZipFile: acumula bytes hasta que se drenan al stream."""
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _unique_name(filename: str, used: set[str]) -> str:
+    candidate = filename
+    stem, dot, ext = filename.rpartition(".")
+    n = 2
+    while candidate.lower() in used:
+        candidate = f"{stem} ({n}).{ext}" if dot else f"{filename} ({n})"
+        n += 1
+    used.add(candidate.lower())
+    return candidate
+
+
+def iter_excel_zip(
+    jobs: Iterable[ExcelBatchJob],
+    total: int,
+    *,
+    operation_id: Optional[str] = None,
+    cancel_token: Optional[CancelToken] = None,
+    executor: Optional[Executor] = None,
+) -> Iterator[bytes]:
+    """
+    Genera el ZIP por partes: cada Excel se agrega (sin recomprimir) en cuanto su
+    worker termina. Los errores por OI (p.ej. Q3 fuera de lista) no cortan el lote:
+    se listan en ERRORES.txt. Si se cancela, el ZIP se cierra con lo ya generado.
+    """
+    pool = executor or get_pool()
+    max_in_flight = max(1, getattr(pool, "_max_workers", None) or pool_size()) * 2
+    sink = _ZipSink()
+    zf = ZipFile(sink, "w", ZIP_STORED)
+    used_names: set[str] = set()
+    errors: list[str] = []
+    pending: dict[Future, ExcelBatchJob] = {}
+    job_iter = iter(jobs)
+    done = 0
+    cancelled = False
+
+    def emit(event: dict) -> None:
+        progress_manager.emit(operation_id, event)
+
+    def submit_more() -> None:
+        # Ventana acotada: no cargar en memoria todos los payloads del lote
+        while len(pending) < max_in_flight:
+            job = next(job_iter, None)
+            if job is None:
+                return
+            pending[pool.submit(build_excel_job, job)] = job
+
+    try:
+        emit({"type": "status", "stage": "start", "message": f"Generando {total} Excel...", "percent": 0.0})
+        submit_more()
+        while pending:
+            if cancel_token is not None and cancel_token.is_cancelled():
+                cancelled = True
+                break
+            finished, _ = wait(list(pending), timeout=0.25, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                job = pending.pop(fut)
+                try:
+                    data = fut.result()
+                except ValueError as exc:
+                    errors.append(f"{job.code}: {exc}")
+                except BrokenProcessPool:
+                    logger.exception("Pool de exportación Excel caído (oi_id=%s)", job.oi_id)
+                    shutdown_pool()
+                    errors.append(f"{job.code}: error interno al generar el Excel")
+                except Exception:
+                    logger.exception("Error generando Excel en lote (oi_id=%s)", job.oi_id)
+                    errors.append(f"{job.code}: error interno al generar el Excel")
+                else:
+                    zf.writestr(_unique_name(job.filename, used_names), data)
+                done += 1
+                emit({
+                    "type": "progress",
+                    "stage": "excel",
+                    "message": f"{job.code} ({done}/{total})",
+                    "current": done,
+                    "total": total,
+                    "percent": round(done * 100.0 / max(1, total), 1),
+                })
+                chunk = sink.drain()
+                if chunk:
+                    yield chunk
+            if not cancelled:
+                submit_more()
+
+        if errors:
+            zf.writestr(ERRORS_FILENAME, "\r\n".join(errors).encode("utf-8"))
+        zf.close()
+        yield sink.drain()
+
+        if cancelled:
+            emit({"type": "status", "stage": "cancelled", "message": "Operación cancelada"})
+        else:
+            emit({
+                "type": "complete",
+                "stage": "done",
+                "message": "Exportación completada",
+                "percent": 100.0,
+                "result": {"total": total, "generados": done - len(errors), "errores": len(errors)},
+            })
+    finally:
+        for fut in pending:
+            fut.cancel()
+        if operation_id:
+            progress_manager.finish(operation_id)
+            cancel_manager.remove(operation_id)
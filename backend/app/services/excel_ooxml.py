@@ -0,0 +1,660 @@
+"""
+Motor OOXML del Formato VI (hoja "ERROR FINAL").
+
+En vez de escribir celda por celda con openpyxl, se compila una vez por versión
+de plantilla (SHA-256) un plan con:
+- el XML de la hoja partido en cabecera / fila 9 / cola,
+- las fórmulas de la banda Q..BL precompiladas (solo se sustituye el número de fila),
+- los ids de estilo de la fila 9 y sus variantes (borde grueso / desbloqueada) ya
+  agregados a styles.xml,
+- workbook.xml, [Content_Types].xml y rels listos para inyectar protección y
+  <fileSharing> (sin calcChain, con fullCalcOnLoad).
+
+Por request solo se generan las filas de datos y el zip se escribe en una pasada.
+El resultado es equivalente celda por celda al de excel_service.generate_excel
+(valores, fórmulas, formato y protección), no idéntico byte a byte.
+Si la plantilla no es compatible, generate_excel_ooxml devuelve None y se usa openpyxl.
+"""
+
+import hashlib
+import logging
+import pickle
+import re
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime
+from io import BytesIO
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Tuple, cast
+from xml.etree import ElementTree as ET
+from xml.sax.saxutils import escape
+from zipfile import ZipFile, ZipInfo, ZIP_DEFLATED
+
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.formula.tokenizer import Token, Tokenizer
+from openpyxl.styles.numbers import is_date_format
+from openpyxl.utils.cell import column_index_from_string, get_column_letter
+from openpyxl.utils.datetime import to_excel
+from openpyxl.utils.exceptions import IllegalCharacterError
+from openpyxl.utils.protection import hash_password
+from openpyxl.workbook.protection import WorkbookProtection
+from openpyxl.worksheet.protection import SheetProtection
+from openpyxl.xml.functions import tostring
+
+from ..core.settings import get_settings
+from ..models import OI, Bancada
+from .rules_service import pma_to_pressure
+from .excel_service import (
+    DATA_START_ROW,
+    EDITABLE_DATA_COLS,
+    FORMULA_END_COL,
+    FORMULA_START_COL,
+    HEADER_ROW,
+    MANUAL_LI_LF_COLS,
+    SHEET_NAME,
+    WORKBOOK_XML_PATH,
+    _TemplateSnapshot,
+    _block_has_data,
+    _coerce_estado,
+    _find_header_col,
+    _get_sheet,
+    _get_template_snapshot,
+    _resolve_header_values,
+    _to_float_or_none,
+    _work_date,
+)
+
+
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+CONTENT_TYPES_PATH = "[Content_Types].xml"
+WORKBOOK_RELS_PATH = "xl/_rels/workbook.xml.rels"
+STYLES_XML_PATH = "xl/styles.xml"
+
+logger = logging.getLogger(__name__)
+
+_BLOCK_KEYS = ("c1", "c2", "c3", "c4", "c5", "c6", "c7")
+_SHARED_BLOCK_INDICES = {0, 1, 2, 5, 6}
+_BLOCK_START_COLS = ((10, "q3"), (22, "q2"), (34, "q1"))  # J, V, AH
+
+_ROW_RE = re.compile(r'<row\b[^>]*?\br="(\d+)"[^>]*?(?:/>|>.*?</row>)', re.S)
+_CELL_RE = re.compile(r'<c\b[^>]*?\br="([A-Z]+)(\d+)"[^>]*?(?:/>|>.*?</c>)', re.S)
+_XF_RE = re.compile(r"<xf\b[^>]*?/>|<xf\b[^>]*>.*?</xf>", re.S)
+_BORDER_RE = re.compile(r"<border\b[^>]*?/>|<border\b[^>]*>.*?</border>", re.S)
+_STYLE_ATTR_RE = re.compile(r'\ss="(\d+)"')
+
+# Mismas expresiones que openpyxl.formula.translate.Translator
+_ROW_RANGE_RE = re.compile(r"(\$?[1-9][0-9]{0,6}):(\$?[1-9][0-9]{0,6})$")
+_COL_RANGE_RE = re.compile(r"(\$?[A-Za-z]{1,3}):(\$?[A-Za-z]{1,3})$")
+_CELL_REF_RE = re.compile(r"(\$?[A-Za-z]{1,3})(\$?[1-9][0-9]{0,6})$")
+
+
+@dataclass(frozen=True)
+class _CompiledFormula:
+    """Fórmula de la fila 9 lista para cualquier fila: texto XML con campos {i} por desplazamiento."""
+    template: str
+    offsets: tuple[int, ...]
+
+    def render(self, row: int) -> str:
+        if not self.offsets:
+            return self.template
+        return self.template.format(*[row + off for off in self.offsets])
+
+
+def _compile_formula(formula: str, origin_row: int) -> _CompiledFormula:
+    """Equivalente precompilado de Translator(formula, origin).translate_formula(dest)."""
+    offsets: list[int] = []
+
+    def literal(text: str) -> str:
+        return escape(text).replace("{", "{{").replace("}", "}}")
+
+    def row_field(row_str: str) -> str:
+        if row_str.startswith("$"):
+            return literal(row_str)
+        off = int(row_str) - origin_row
+        if off not in offsets:
+            offsets.append(off)
+        return "{%d}" % offsets.index(off)
+
+    def compile_range(range_str: str) -> str:
+        ws_part = ""
+        if "!" in range_str:
+            ws_name, range_str = range_str.rsplit("!", 1)
+            ws_part = literal(ws_name + "!")
+        match = _ROW_RANGE_RE.match(range_str)
+        if match is not None:
+            return ws_part + row_field(match.group(1)) + ":" + row_field(match.group(2))
+        if _COL_RANGE_RE.match(range_str) is not None:
+            return ws_part + literal(range_str)
+        if ":" in range_str:
+            return ws_part + ":".join(compile_range(piece) for piece in range_str.split(":"))
+        match = _CELL_REF_RE.match(range_str)
+        if match is None:  # rango con nombre
+            return literal(range_str)
+        return ws_part + literal(match.group(1)) + row_field(match.group(2))
+
+    parts: list[str] = []
+    for token in Tokenizer(formula).items:
+        if token.type == Token.OPERAND and token.subtype == Token.RANGE:
+            parts.append(compile_range(token.value))
+        else:
+            parts.append(literal(token.value))
+    return _CompiledFormula("".join(parts), tuple(offsets))
+
+
+def _set_attr(tag_xml: str, name: str, value: str) -> str:
+    """Fija un atributo en la etiqueta de apertura de un elemento XML (texto)."""
+    end = tag_xml.index(">")
+    open_tag = tag_xml[:end + 1]
+    pattern = re.compile(rf'\s{name}="[^"]*"')
+    if pattern.search(open_tag):
+        open_tag = pattern.sub(f' {name}="{value}"', open_tag, count=1)
+    else:
+        closing = "/>" if open_tag.endswith("/>") else ">"
+        open_tag = f'{open_tag[:-len(closing)].rstrip()} {name}="{value}"{closing}'
+    return open_tag + tag_xml[end + 1:]
+
+
+def _insert_child(element_xml: str, tag: str, child_xml: str, before: tuple[str, ...]) -> str:
+    """Reemplaza/inserta un hijo <tag> respetando el orden del esquema (antes de `before`)."""
+    element_xml = re.sub(rf"<{tag}\b[^>]*?/>|<{tag}\b[^>]*>.*?</{tag}>", "", element_xml, flags=re.S)
+    head_end = element_xml.index(">")
+    if element_xml[head_end - 1] == "/":
+        name = re.match(r"<(\w+)", element_xml).group(1)  # type: ignore[union-attr]
+        return f"{element_xml[:head_end - 1].rstrip()}>{child_xml}</{name}>"
+    positions = [element_xml.find(f"<{b}", head_end) for b in before]
+    positions = [p for p in positions if p != -1]
+    pos = min(positions) if positions else element_xml.rindex("</")
+    return element_xml[:pos] + child_xml + element_xml[pos:]
+
+
+class _StylesPatch:
+    """Agrega a styles.xml las variantes de xf (borde inferior grueso / desbloqueada)."""
+
+    def __init__(self, xml: str):
+        self.xml = xml
+        xfs = re.search(r"<cellXfs\b[^>]*>(.*?)</cellXfs>", xml, re.S)
+        borders = re.search(r"<borders\b[^>]*>(.*?)</borders>", xml, re.S)
+        if xfs is None or borders is None:
+            raise ValueError("styles.xml sin cellXfs/borders")
+        self.xfs = _XF_RE.findall(xfs.group(1))
+        self.borders = _BORDER_RE.findall(borders.group(1))
+        self._variants: dict[tuple[int, bool, bool], int] = {}
+
+    def variant(self, style_id: int, thick: bool, unlocked: bool) -> int:
+        if not thick and not unlocked:
+            return style_id
+        key = (style_id, thick, unlocked)
+        cached = self._variants.get(key)
+        if cached is not None:
+            return cached
+        xf = self.xfs[style_id]
+        if thick:
+            border_match = re.search(r'\sborderId="(\d+)"', xf[:xf.index(">")])
+            border = self.borders[int(border_match.group(1)) if border_match else 0]
+            # Igual que _with_bottom_border: se reconstruye el borde sin diagonalUp/Down
+            border = re.sub(r'\sdiagonal(?:Up|Down)="[^"]*"', "", border, count=2)
+            border = _insert_child(
+                border, "bottom", '<bottom style="thick"/>', ("diagonal", "vertical", "horizontal")
+            )
+            self.borders.append(border)
+            xf = _set_attr(xf, "borderId", str(len(self.borders) - 1))
+            xf = _set_attr(xf, "applyBorder", "1")
+        if unlocked:
+            xf = _insert_child(xf, "protection", '<protection locked="0"/>', ("extLst",))
+            xf = _set_attr(xf, "applyProtection", "1")
+        self.xfs.append(xf)
+        self._variants[key] = len(self.xfs) - 1
+        return self._variants[key]
+
+    def render(self) -> str:
+        def section(tag: str, items: list[str]) -> Callable[[re.Match], str]:
+            def repl(match: re.Match) -> str:
+                open_tag = _set_attr(match.group(1), "count", str(len(items)))
+                return open_tag + "".join(items) + f"</{tag}>"
+            return repl
+
+        xml = re.sub(r"(<cellXfs\b[^>]*>).*?</cellXfs>", section("cellXfs", self.xfs), self.xml, count=1, flags=re.S)
+        return re.sub(r"(<borders\b[^>]*>).*?</borders>", section("borders", self.borders), xml, count=1, flags=re.S)
+
+
+@dataclass(frozen=True)
+class _OoxmlPlan:
+    """Plantilla VI compilada para escritura directa del XML (por SHA-256)."""
+    sha256: str
+    entries: tuple[tuple[ZipInfo, Optional[bytes]], ...]  # partes en orden (sin calcChain); None = por request
+    sheet_path: str
+    head: tuple[str, str, str, str]      # XML antes de la fila 9, partido en <dimension>, E4 y O4
+    row9_xml: str                        # fila 9 original (OI sin bancadas)
+    row_attrs: str                       # atributos de la fila 9 (sin r)
+    tail: tuple[str, str]                # desde </sheetData>, partido donde va <sheetProtection>
+    dimension_ref_start: str             # celda inicial del <dimension>
+    max_col: int
+    col_letters: tuple[str, ...]         # índice 1..max_col
+    row_styles: tuple[int, ...]          # s por columna (editables desbloqueadas)
+    border_styles: tuple[int, ...]       # idem + borde inferior grueso
+    e4_style: int
+    o4_style: int
+    row9_values: dict[int, object]       # valores de la fila 9 (fórmulas compiladas)
+    band_cols: tuple[int, ...]           # Q..BL sin L.I./L.F. manuales
+    estado_col: int
+    medidor_col: int
+    epoch: datetime
+    workbook: tuple[str, str, str]       # workbook.xml partido donde van <fileSharing> y <workbookProtection>
+
+
+_PLAN_LOCK = threading.Lock()
+_PLAN_CACHE: dict[str, Optional[_OoxmlPlan]] = {}
+
+
+def _resolve_sheet_path(workbook_xml: bytes, rels_xml: bytes, sheet_name: str) -> tuple[Optional[str], Optional[str]]:
+    """Rutas dentro del zip de la hoja `sheet_name` y de calcChain.xml (si existe)."""
+    wb_root = ET.fromstring(workbook_xml)
+    rels_root = ET.fromstring(rels_xml)
+    targets: dict[str, str] = {}
+    calc_chain: Optional[str] = None
+    for rel in rels_root.iter(f"{{{PKG_REL_NS}}}Relationship"):
+        target = rel.get("Target", "")
+        path = target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+        targets[rel.get("Id", "")] = path
+        if rel.get("Type", "").endswith("/calcChain"):
+            calc_chain = path
+    for sheet in wb_root.iter():
+        if sheet.tag.endswith("}sheet") and sheet.get("name") == sheet_name:
+            return targets.get(sheet.get(f"{{{REL_NS}}}id", "")), calc_chain
+    return None, calc_chain
+
+
+def _compile_plan(template_bytes: bytes, snapshot: _TemplateSnapshot) -> Optional[_OoxmlPlan]:
+    wb = cast(Workbook, pickle.loads(snapshot.blob))
+    if SHEET_NAME not in wb.sheetnames:
+        return None
+    ws = _get_sheet(wb, SHEET_NAME)
+    max_col = column_index_from_string(FORMULA_END_COL)
+
+    estado_col = _find_header_col(ws, "Estado", header_row=HEADER_ROW)
+    medidor_col = (
+        _find_header_col(ws, "# Medidor", header_row=HEADER_ROW)
+        or _find_header_col(ws, "# Medidor", header_row=6)
+        or column_index_from_string("G")
+    )
+    if estado_col is None or estado_col > max_col or medidor_col > max_col:
+        return None
+    if any(rng.max_row >= DATA_START_ROW for rng in ws.merged_cells.ranges):
+        return None
+    if not (is_date_format(ws.cell(row=DATA_START_ROW, column=2).number_format)
+            and is_date_format(ws.cell(row=DATA_START_ROW, column=3).number_format)):
+        return None
+
+    row9_values: dict[int, object] = {}
+    for c in range(1, max_col + 1):
+        value = ws.cell(row=DATA_START_ROW, column=c).value
+        if isinstance(value, str) and len(value) > 1 and value.startswith("="):
+            row9_values[c] = _compile_formula(value, DATA_START_ROW)
+        elif value is None or isinstance(value, (str, int, float, date)):
+            row9_values[c] = value
+        else:
+            return None  # fórmulas de arreglo, etc.
+
+    with ZipFile(BytesIO(template_bytes)) as zin:
+        infos = {info.filename: info for info in zin.infolist()}
+        if WORKBOOK_XML_PATH not in infos or WORKBOOK_RELS_PATH not in infos or STYLES_XML_PATH not in infos:
+            return None
+        sheet_path, calc_chain_path = _resolve_sheet_path(
+            zin.read(WORKBOOK_XML_PATH), zin.read(WORKBOOK_RELS_PATH), SHEET_NAME
+        )
+        if sheet_path is None or sheet_path not in infos:
+            return None
+        sheet_xml = zin.read(sheet_path).decode("utf-8")
+        styles = _StylesPatch(zin.read(STYLES_XML_PATH).decode("utf-8"))
+        workbook_xml = zin.read(WORKBOOK_XML_PATH).decode("utf-8")
+        content_types = zin.read(CONTENT_TYPES_PATH).decode("utf-8")
+        rels_xml = zin.read(WORKBOOK_RELS_PATH).decode("utf-8")
+        entries: list[tuple[ZipInfo, Optional[bytes]]] = [
+            (info, zin.read(info.filename))
+            for info in zin.infolist()
+            if info.filename != calc_chain_path
+        ]
+
+    # --- Hoja: cabecera / fila 9 / cola ---
+    sheet_data_end = sheet_xml.find("</sheetData>")
+    row9 = None
+    for match in _ROW_RE.finditer(sheet_xml, 0, sheet_data_end):
+        if int(match.group(1)) > DATA_START_ROW:
+            return None
+        if int(match.group(1)) == DATA_START_ROW:
+            row9 = match
+    if row9 is None or sheet_xml[row9.end():sheet_data_end].strip():
+        return None
+    head_xml = sheet_xml[:row9.start()]
+    row9_xml = row9.group(0)
+    row_open = re.match(r"<row\b([^>]*?)/?>", row9_xml)
+    row_attrs = re.sub(r'\sr="\d+"', "", row_open.group(1)) if row_open else ""  # type: ignore[union-attr]
+
+    base_styles = [0] * (max_col + 1)
+    for cell in _CELL_RE.finditer(row9_xml):
+        col = column_index_from_string(cell.group(1))
+        if col > max_col:
+            return None
+        style = _STYLE_ATTR_RE.search(cell.group(0)[:cell.group(0).index(">")])
+        base_styles[col] = int(style.group(1)) if style else 0
+
+    dimension = re.search(r'<dimension ref="([A-Z]+\d+)(?::[A-Z]+\d+)?"\s*/>', head_xml)
+    e4 = re.search(r'<c r="E4"[^>]*?(?:/>|>.*?</c>)', head_xml, re.S)
+    o4 = re.search(r'<c r="O4"[^>]*?(?:/>|>.*?</c>)', head_xml, re.S)
+    if dimension is None or e4 is None or o4 is None or not (dimension.end() <= e4.start() < o4.start()):
+        return None
+
+    def cell_style(match: re.Match) -> int:
+        style = _STYLE_ATTR_RE.search(match.group(0)[:match.group(0).index(">")])
+        return int(style.group(1)) if style else 0
+
+    head = (
+        head_xml[:dimension.start()],
+        head_xml[dimension.end():e4.start()],
+        head_xml[e4.end():o4.start()],
+        head_xml[o4.end():],
+    )
+
+    # <sheetProtection> va tras </sheetData> (y tras <sheetCalcPr> si existe)
+    tail_xml = re.sub(r"<sheetProtection\b[^>]*?/>", "", sheet_xml[sheet_data_end:])
+    calc_pr = re.match(r"</sheetData>\s*<sheetCalcPr\b[^>]*?/>", tail_xml)
+    split_at = calc_pr.end() if calc_pr else len("</sheetData>")
+    tail = (tail_xml[:split_at], tail_xml[split_at:])
+
+    # --- Estilos: variantes por columna ---
+    editable = set(EDITABLE_DATA_COLS)
+    row_styles = [0] * (max_col + 1)
+    border_styles = [0] * (max_col + 1)
+    for c in range(1, max_col + 1):
+        row_styles[c] = styles.variant(base_styles[c], False, c in editable)
+        border_styles[c] = styles.variant(base_styles[c], True, c in editable)
+    e4_style = styles.variant(cell_style(e4), False, True)
+    o4_style = styles.variant(cell_style(o4), False, True)
+
+    # --- Libro: sin calcChain, recalcular al abrir, huecos para fileSharing/protección ---
+    workbook_xml = re.sub(r"<(?:fileSharing|workbookProtection)\b[^>]*?/>", "", workbook_xml)
+    workbook_xml = re.sub(
+        r"<calcPr\b[^>]*?/>", lambda m: _set_attr(m.group(0), "fullCalcOnLoad", "1"), workbook_xml, count=1
+    )
+    file_version = re.search(r"<fileVersion\b[^>]*?/>", workbook_xml)
+    share_at = file_version.end() if file_version else workbook_xml.index(">", workbook_xml.index("<workbook")) + 1
+    protect_at = workbook_xml.find("<bookViews")
+    if protect_at == -1:
+        protect_at = workbook_xml.find("<sheets")
+    if protect_at < share_at:
+        return None
+    workbook = (workbook_xml[:share_at], workbook_xml[share_at:protect_at], workbook_xml[protect_at:])
+
+    if calc_chain_path:
+        part_name = "/" + calc_chain_path
+        content_types = re.sub(rf'<Override PartName="{re.escape(part_name)}"[^>]*?/>', "", content_types)
+        rels_xml = re.sub(r'<Relationship\b[^>]*?Type="[^"]*/calcChain"[^>]*?/>', "", rels_xml)
+    # Partes fijas ya parchadas; hoja y workbook.xml (None) se generan por request
+    patched: dict[str, Optional[bytes]] = {
+        CONTENT_TYPES_PATH: content_types.encode("utf-8"),
+        WORKBOOK_RELS_PATH: rels_xml.encode("utf-8"),
+        STYLES_XML_PATH: styles.render().encode("utf-8"),
+        WORKBOOK_XML_PATH: None,
+        sheet_path: None,
+    }
+    entries = [(info, patched[info.filename] if info.filename in patched else data) for info, data in entries]
+
+    band_start = column_index_from_string(FORMULA_START_COL)
+    return _OoxmlPlan(
+        sha256=snapshot.sha256,
+        entries=tuple(entries),
+        sheet_path=sheet_path,
+        head=head,
+        row9_xml=row9_xml,
+        row_attrs=row_attrs,
+        tail=tail,
+        dimension_ref_start=dimension.group(1),
+        max_col=max_col,
+        col_letters=("",) + tuple(get_column_letter(c) for c in range(1, max_col + 1)),
+        row_styles=tuple(row_styles),
+        border_styles=tuple(border_styles),
+        e4_style=e4_style,
+        o4_style=o4_style,
+        row9_values=row9_values,
+        band_cols=tuple(c for c in range(band_start, max_col + 1) if c not in MANUAL_LI_LF_COLS),
+        estado_col=estado_col,
+        medidor_col=medidor_col,
+        epoch=wb.epoch,
+        workbook=workbook,
+    )
+
+
+def _get_plan(tpl: Path, snapshot: _TemplateSnapshot) -> Optional[_OoxmlPlan]:
+    """Plan compilado para la versión vigente de la plantilla (None si no es compatible)."""
+    with _PLAN_LOCK:
+        if snapshot.sha256 in _PLAN_CACHE:
+            return _PLAN_CACHE[snapshot.sha256]
+        template_bytes = tpl.read_bytes()
+        if hashlib.sha256(template_bytes).hexdigest() != snapshot.sha256:
+            return None  # la plantilla cambió entre el snapshot y la lectura
+        try:
+            plan = _compile_plan(template_bytes, snapshot)
+        except (ValueError, IndexError, KeyError, ET.ParseError):
+            logger.warning("Plantilla VI no compatible con el motor OOXML; se usa openpyxl", exc_info=True)
+            plan = None
+        # Solo la versión vigente: al cambiar la plantilla se descarta la anterior
+        _PLAN_CACHE.clear()
+        _PLAN_CACHE[snapshot.sha256] = plan
+        return plan
+
+
+def _num_xml(value: int | float) -> str:
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _cell_xml(ref: str, style: int, value: object, row: int, epoch: datetime) -> str:
+    """<c> de una celda con la misma tipificación que openpyxl al asignar `value`."""
+    head = f'<c r="{ref}" s="{style}"' if style else f'<c r="{ref}"'
+    if value is None or value == "":
+        return head + "/>"
+    if isinstance(value, _CompiledFormula):
+        return f"{head}><f>{value.render(row)}</f></c>"
+    if isinstance(value, bool):
+        return f'{head} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f"{head}><v>{_num_xml(value)}</v></c>"
+    if isinstance(value, (datetime, date)):
+        return f"{head}><v>{_num_xml(to_excel(value, epoch))}</v></c>"
+    text = str(value)
+    if len(text) > 1 and text.startswith("="):
+        return f"{head}><f>{escape(text[1:])}</f></c>"
+    if ILLEGAL_CHARACTERS_RE.search(text):
+        raise IllegalCharacterError(f"{text} cannot be used in worksheets.")
+    space = ' xml:space="preserve"' if text != text.strip() else ""
+    return f'{head} t="inlineStr"><is><t{space}>{escape(text)}</t></is></c>'
+
+
+def _put(cells: dict[int, object], col: int, value: object) -> None:
+    # Igual que ws.cell(..., value=None): None no modifica la celda
+    if value is not None:
+        cells[col] = value
+
+
+def _write_block(cells: dict[int, object], r: int, k: int, start_col: int, block: dict) -> None:
+    """Réplica de _write_block de generate_excel sobre el dict de celdas de la fila."""
+    time_text_val = block.get("c7", None)
+    for idx, key in enumerate(_BLOCK_KEYS):
+        val = block.get(key)
+        num_val = _to_float_or_none(val)
+        target_col = start_col + idx
+
+        # Lecturas manuales: solo si vienen informadas
+        if idx in (3, 4) and (val is None or val == ""):
+            cells[target_col] = None
+            continue
+
+        if start_col == 34 and idx == 3:
+            _put(cells, target_col, num_val if num_val is not None else val)
+        elif k > 0 and idx in _SHARED_BLOCK_INDICES:
+            cells[target_col] = f"={get_column_letter(target_col)}{r-1}"
+        elif idx == 6:
+            cells[target_col] = time_text_val or ""
+        elif num_val is not None:
+            cells[target_col] = num_val
+        else:
+            _put(cells, target_col, val)
+
+
+def _render_rows(
+    plan: _OoxmlPlan,
+    oi: OI,
+    bancadas: list[Bancada],
+    today_date: date,
+    presion_val: Optional[float],
+) -> Tuple[list[str], int]:
+    """XML de las filas de datos (desde la 9). Devuelve (fragmentos, siguiente fila libre)."""
+    out: list[str] = []
+    letters = plan.col_letters
+    row9_final: dict[int, object] = {}
+    carried: dict[str, _CompiledFormula] = {}
+
+    def carry(value: object) -> object:
+        # _copy_formulas: fórmulas trasladadas desde la fila 9, resto se copia tal cual
+        if isinstance(value, str) and len(value) > 1 and value.startswith("="):
+            compiled = carried.get(value)
+            if compiled is None:
+                compiled = carried[value] = _compile_formula(value, DATA_START_ROW)
+            return compiled
+        return value
+
+    current_row = DATA_START_ROW
+    for b in bancadas:
+        rows_source = getattr(b, "rows_data", []) or []
+        nrows = len(rows_source) if rows_source else int(getattr(b, "rows", 15) or 15)
+        bancada_estado = _coerce_estado(getattr(b, "estado", None))
+
+        for k in range(nrows):
+            r = current_row + k
+            row_payload = rows_source[k] if (rows_source and k < len(rows_source)) else {}
+            cells: dict[int, object] = dict(plan.row9_values) if r == DATA_START_ROW else {}
+
+            cells[1] = current_row - DATA_START_ROW + 1 + k
+            cells[2] = today_date
+            cells[3] = today_date
+            _put(cells, 4, oi.banco_id)
+            _put(cells, 5, oi.tech_number)
+            cells[plan.medidor_col] = row_payload.get("medidor") or b.medidor or ""
+
+            if presion_val is not None:
+                cells[8] = presion_val if k == 0 else f"=H{r-1}"
+
+            row_estado = _coerce_estado(row_payload.get("estado") if isinstance(row_payload, dict) else None)
+            if rows_source:
+                cells[plan.estado_col] = row_estado if row_estado is not None else (bancada_estado or 0)
+            elif k == 0:
+                cells[plan.estado_col] = bancada_estado if bancada_estado is not None else 0
+            else:
+                cells[plan.estado_col] = f"=I{r-1}"
+
+            if r != DATA_START_ROW:
+                for c in plan.band_cols:
+                    cells[c] = carry(row9_final.get(c))
+
+            for start_col, key in _BLOCK_START_COLS:
+                block = row_payload.get(key)
+                if _block_has_data(block):
+                    _write_block(cells, r, k, start_col, block)
+                else:
+                    for offset in range(7):
+                        cells[start_col + offset] = None
+
+            if r == DATA_START_ROW:
+                row9_final = cells
+
+            styles = plan.border_styles if k == nrows - 1 else plan.row_styles
+            out.append(f'<row r="{r}"{plan.row_attrs}>')
+            for c in range(1, plan.max_col + 1):
+                out.append(_cell_xml(f"{letters[c]}{r}", styles[c], cells.get(c), r, plan.epoch))
+            out.append("</row>")
+
+        current_row += nrows
+    return out, current_row
+
+
+def _inline_cell(ref: str, style: int, text: str) -> str:
+    return f'<c r="{ref}" s="{style}" t="inlineStr"><is><t>{escape(text)}</t></is></c>'
+
+
+def generate_excel_ooxml(
+    oi: OI,
+    bancadas: Iterable[Bancada],
+    password: str | None = None,
+    work_dt: Optional[datetime] = None,
+) -> Optional[Tuple[bytes, str]]:
+    """
+    Misma salida que excel_service.generate_excel escribiendo el XML directamente.
+    Devuelve None si no hay plantilla o no es compatible (el llamador usa openpyxl).
+    """
+    settings = get_settings()
+    tpl = Path(settings.template_abs_path)
+    snapshot = _get_template_snapshot(tpl) if tpl.exists() else None
+    if snapshot is None:
+        return None
+    plan = _get_plan(tpl, snapshot)
+    if plan is None:
+        return None
+
+    q3_value, alcance_value = _resolve_header_values(oi, list(snapshot.q3_values), list(snapshot.alcance_values))
+
+    rows = sorted(bancadas, key=lambda b: (b.item or 0))
+    today_date = _work_date(work_dt)
+    presion_val = pma_to_pressure(oi.pma) if oi.pma else None
+    row_parts, next_row = _render_rows(plan, oi, rows, today_date, presion_val)
+
+    last_row = max(next_row - 1, DATA_START_ROW)
+    dimension = f'<dimension ref="{plan.dimension_ref_start}:{plan.col_letters[plan.max_col]}{last_row}"/>'
+
+    # ----- Protección interna de libro y hoja (celdas bloqueadas) -----
+    internal_pwd = getattr(settings, "cells_protection_password", None)
+    wb_protection = WorkbookProtection(lockStructure=True, lockRevision=True)
+    sheet_protection = SheetProtection()
+    sheet_protection.enable()
+    if internal_pwd:
+        wb_protection.set_workbook_password(internal_pwd)
+        wb_protection.set_revisions_password(internal_pwd)
+        sheet_protection.set_password(internal_pwd)
+
+    # ----- Contraseña ingresada por el usuario → solo lectura recomendada -----
+    file_sharing = ""
+    if password:
+        attrs = {"reservationPassword": hash_password(password)}
+        if oi.banco_id is not None:
+            attrs["userName"] = f"Banco{oi.banco_id:02d}"
+        file_sharing = tostring(ET.Element("fileSharing", attrs)).decode("utf-8")
+
+    sheet_xml = "".join([
+        plan.head[0],
+        dimension,
+        plan.head[1],
+        _inline_cell("E4", plan.e4_style, q3_value),
+        plan.head[2],
+        _inline_cell("O4", plan.o4_style, alcance_value),
+        plan.head[3],
+        "".join(row_parts) if row_parts else plan.row9_xml,
+        plan.tail[0],
+        tostring(sheet_protection.to_tree("sheetProtection")).decode("utf-8"),
+        plan.tail[1],
+    ])
+    workbook_xml = "".join([
+        plan.workbook[0],
+        file_sharing,
+        plan.workbook[1],
+        tostring(wb_protection.to_tree("workbookProtection")).decode("utf-8"),
+        plan.workbook[2],
+    ])
+
+    buf = BytesIO()
+    with ZipFile(buf, "w", ZIP_DEFLATED) as zout:
+        dynamic = {WORKBOOK_XML_PATH: workbook_xml, plan.sheet_path: sheet_xml}
+        for info, data in plan.entries:
+            zout.writestr(info, data if data is not None else dynamic[info.filename].encode("utf-8"))
+
+    filename = f"{oi.code}.xlsx"
+    return buf.getvalue(), filename
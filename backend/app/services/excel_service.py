@@ -1,7 +1,11 @@
+import hashlib
+import pickle
+import threading
+from dataclasses import dataclass
 from io import BytesIO
 from pathlib import Path
 from typing import Iterable, Tuple, Optional, cast
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
 from zoneinfo import ZoneInfo
 from zipfile import ZipFile, ZIP_DEFLATED
 from xml.etree import ElementTree as ET
@@ -38,6 +42,8 @@ MANUAL_LI_LF_COLS = {
     column_index_from_string("AK"),  # Q1 L.I.
     column_index_from_string("AL"),  # Q1 L.F.
 }
+# Columnas editables (desbloqueadas) en las filas de datos: A, G, I..P, V..AB, AH..AN
+EDITABLE_DATA_COLS = [1, 7] + list(range(9, 17)) + list(range(22, 29)) + list(range(34, 41))
 
 def _inject_reservation_notice(xlsx_bytes: bytes, hashed_password: str, reserved_by: str | None = None) -> bytes:
     """
@@ -90,13 +96,77 @@ def _find_header_col(ws: Worksheet, header_name: str, header_row: int = HEADER_R
                 return column_index_from_string(raw)
     return None
 
+@dataclass(frozen=True)
+class _TemplateSnapshot:
+    """Plantilla parseada una vez por versión (mtime/tamaño + SHA-256 del archivo)."""
+    stat_key: tuple[int, int]
+    sha256: str
+    blob: bytes                      # Workbook serializado (pickle) para copias por request
+    q3_values: tuple[str, ...]       # Q3_RANGE ya normalizado
+    alcance_values: tuple[str, ...]  # ALCANCE_RANGE ya normalizado
+
+
+_TEMPLATE_LOCK = threading.Lock()
+_TEMPLATE_CACHE: dict[str, _TemplateSnapshot] = {}
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _get_template_snapshot(tpl: Path) -> Optional[_TemplateSnapshot]:
+    """
+    Devuelve la plantilla cacheada; se vuelve a parsear solo si cambió el archivo.
+    El stat (mtime/tamaño) se revisa en cada llamada; el hash solo cuando el stat cambia.
+    """
+    try:
+        st = tpl.stat()
+    except OSError:
+        return None
+    stat_key = (st.st_mtime_ns, st.st_size)
+    cache_key = str(tpl)
+    with _TEMPLATE_LOCK:
+        cached = _TEMPLATE_CACHE.get(cache_key)
+        if cached is not None and cached.stat_key == stat_key:
+            return cached
+
+        sha256 = _file_sha256(tpl)
+        if cached is not None and cached.sha256 == sha256:
+            # Mismo contenido (p.ej. archivo copiado/tocado): no re-parsear
+            snapshot = _TemplateSnapshot(stat_key, sha256, cached.blob, cached.q3_values, cached.alcance_values)
+        else:
+            # Mantener vínculos externos tal cual en la plantilla para evitar
+            # los avisos de “reparaciones” al abrir en Excel.
+            wb = load_workbook(tpl, data_only=False, keep_links=True)
+            ws = _get_sheet(wb, SHEET_NAME)
+            snapshot = _TemplateSnapshot(
+                stat_key=stat_key,
+                sha256=sha256,
+                blob=pickle.dumps(wb, protocol=pickle.HIGHEST_PROTOCOL),
+                q3_values=tuple(_iter_range_values(ws, Q3_RANGE)),
+                alcance_values=tuple(_iter_range_values(ws, ALCANCE_RANGE)),
+            )
+        _TEMPLATE_CACHE[cache_key] = snapshot
+        return snapshot
+
+
+def template_fingerprint() -> Optional[str]:
+    """SHA-256 de la plantilla VI vigente (None si no existe)."""
+    snapshot = _get_template_snapshot(Path(get_settings().template_abs_path))
+    return snapshot.sha256 if snapshot else None
+
+
 def _ensure_workbook() -> Tuple[Workbook, Worksheet]:
     settings = get_settings()
     tpl = Path(settings.template_abs_path)
-    if tpl.exists():
-        # Mantener vínculos externos tal cual en la plantilla para evitar
-        # los avisos de “reparaciones” al abrir en Excel.
-        wb = load_workbook(tpl, data_only=False, keep_links=True)
+    snapshot = _get_template_snapshot(tpl) if tpl.exists() else None
+    if snapshot is not None:
+        # Copia independiente por request (deserializar es más barato que load_workbook)
+        wb = cast(Workbook, pickle.loads(snapshot.blob))
         active = wb.active or (wb.worksheets[0] if wb.worksheets else None)
         if active is None:
             wb.create_sheet("Sheet1")
@@ -115,6 +185,14 @@ def _ensure_workbook() -> Tuple[Workbook, Worksheet]:
         ws["C8"] = "Estado"
     return wb, ws
 
+
+def _template_list_values(ws: Worksheet) -> Tuple[list[str], list[str]]:
+    """Listas de Q3/Alcance: precalculadas por versión de plantilla; si no hay plantilla, desde la hoja."""
+    snapshot = _get_template_snapshot(Path(get_settings().template_abs_path))
+    if snapshot is not None:
+        return list(snapshot.q3_values), list(snapshot.alcance_values)
+    return _iter_range_values(ws, Q3_RANGE), _iter_range_values(ws, ALCANCE_RANGE)
+
 def _get_sheet(wb: Workbook, name: str) -> Worksheet:
     if name in wb.sheetnames:
         return wb[name]
@@ -238,28 +316,59 @@ def _coerce_estado(val) -> Optional[int]:
         return None
     return max(0, min(5, n))
 
+def _block_has_data(block) -> bool:
+    if not isinstance(block, dict):
+        return False
+    for key in ("c1", "c2", "c3", "c4", "c5", "c6", "c7", "c7_seconds"):
+        val = block.get(key, None)
+        if val not in (None, "", 0):
+            return True
+    return False
+
+def _resolve_header_values(oi: OI, q3_candidates: list[str], alcance_candidates: list[str]) -> Tuple[str, str]:
+    """Valores exactos de E4 (Q3) y O4 (Alcance) según las listas de la plantilla."""
+    # normalize_for_excel_list puede devolver None → forzamos str con ""
+    q3_value = find_exact_in_range(q3_candidates, normalize_for_excel_list(oi.q3) or "")
+    alcance_value = find_exact_in_range(alcance_candidates, normalize_for_excel_list(oi.alcance) or "")
+
+    if q3_value is None:
+        raise ValueError("Q3 no coincide con la lista de la plantilla")
+    if alcance_value is None:
+        raise ValueError("Alcance no coincide con la lista de la plantilla")
+    return q3_value, alcance_value
+
+def _work_date(work_dt: Optional[datetime]) -> date:
+    """Fecha de trabajo (columnas B y C) en hora de Lima."""
+    work_dt = work_dt or datetime.utcnow()
+    if work_dt.tzinfo is None:
+        dt_utc = work_dt.replace(tzinfo=timezone.utc)
+    else:
+        dt_utc = work_dt.astimezone(timezone.utc)
+    return dt_utc.astimezone(ZoneInfo("America/Lima")).date()
+
 def generate_excel(
     oi: OI,
     bancadas: Iterable[Bancada],
     password: str | None = None,
     work_dt: Optional[datetime] = None,
 ) -> Tuple[bytes, str]:
+    bancadas = list(bancadas)
+    if getattr(get_settings(), "excel_engine", "openpyxl") == "ooxml":
+        # Motor alternativo: parchea el XML de la hoja directamente.
+        # Devuelve None si la plantilla no es compatible → seguimos con openpyxl.
+        from .excel_ooxml import generate_excel_ooxml
+
+        result = generate_excel_ooxml(oi, bancadas, password=password, work_dt=work_dt)
+        if result is not None:
+            return result
+
     wb, _ws_active = _ensure_workbook()
     ws = _get_sheet(wb, SHEET_NAME)  # usar siempre "ERROR FINAL"
 
     # Celdas fijas de cabecera (selección exacta desde listas)
-    q3_candidates = _iter_range_values(ws, Q3_RANGE)
-    alcance_candidates = _iter_range_values(ws, ALCANCE_RANGE)
-    
-    # normalize_for_excel_list puede devolver None → forzamos str con ""
-    q3_value = find_exact_in_range(q3_candidates, normalize_for_excel_list(oi.q3) or "")
-    alcance_value = find_exact_in_range(alcance_candidates, normalize_for_excel_list(oi.alcance) or "")
-    
-    if q3_value is None:
-        raise ValueError("Q3 no coincide con la lista de la plantilla")
-    if alcance_value is None:
-        raise ValueError("Alcance no coincide con la lista de la plantilla")
-        
+    q3_candidates, alcance_candidates = _template_list_values(ws)
+    q3_value, alcance_value = _resolve_header_values(oi, q3_candidates, alcance_candidates)
+
     ws["E4"] = q3_value
     ws["O4"] = alcance_value
 
@@ -284,13 +393,7 @@ def generate_excel(
     rows.sort(key=lambda b: (b.item or 0))
     
     # Datos globales para columnas B, C, D, E, H
-    work_dt = work_dt or datetime.utcnow()
-    if work_dt.tzinfo is None:
-        dt_utc = work_dt.replace(tzinfo=timezone.utc)
-    else:
-        dt_utc = work_dt.astimezone(timezone.utc)
-    dt_pe = dt_utc.astimezone(ZoneInfo("America/Lima"))
-    today_date = dt_pe.date()
+    today_date = _work_date(work_dt)
     presion_val = pma_to_pressure(oi.pma) if oi.pma else None
 
     current_row = DATA_START_ROW
@@ -343,15 +446,6 @@ def generate_excel(
                     ws.cell(row=r, column=estado_col, value=f"=I{r-1}")
 
             # --- Funciones internas auxiliares (en scope de r y k) ---
-            def _block_has_data(block) -> bool:
-                if not isinstance(block, dict):
-                    return False
-                for key in ("c1", "c2", "c3", "c4", "c5", "c6", "c7", "c7_seconds"):
-                    val = block.get(key, None)
-                    if val not in (None, "", 0):
-                        return True
-                return False
-
             def _clear_block(row_idx: int, start_col: int) -> None:
                 # c1..c7
                 for offset in range(7):
@@ -453,11 +547,9 @@ def generate_excel(
     ws["O4"].protection = unlocked_protection
 
     # 2. Filas de Datos
-    editable_col_ranges = [1, 7] + list(range(9, 17)) + list(range(22, 29)) + list(range(34, 41))
-
     if current_row > DATA_START_ROW:
         for r_idx in range(DATA_START_ROW, current_row):
-            for c_idx in editable_col_ranges:
+            for c_idx in EDITABLE_DATA_COLS:
                 try:
                     ws.cell(row=r_idx, column=c_idx).protection = unlocked_protection
                 except AttributeError:
@@ -0,0 +1,124 @@
+"""
+Caché en disco de exportaciones (Excel de OI) direccionada por contenido.
+
+La clave es un SHA-256 de todo lo que determina el archivo (versión de la OI y
+sus bancadas, hash de plantilla, hash de contraseña, motor); el archivo se
+guarda como <clave>.xlsx bajo settings.data_dir/export_cache/<espacio>.
+Expulsión LRU por tamaño total: cada acierto "toca" el archivo (mtime), y al
+reconstruir el índice tras reiniciar se respeta ese orden.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, Optional
+
+from ..core.settings import get_settings
+
+
+def make_key(parts: Iterable[object]) -> str:
+    """SHA-256 estable de los componentes de la clave (repr separado por \\x1f)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(repr(part).encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+class ExportCache:
+    def __init__(self, root: Path, max_bytes: int, suffix: str = ".xlsx"):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        self._index: Optional["OrderedDict[str, int]"] = None  # clave -> bytes (más antiguo primero)
+        self._total = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}{self.suffix}"
+
+    def _load_index(self) -> "OrderedDict[str, int]":
+        if self._index is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            entries = []
+            for path in self.root.glob(f"*{self.suffix}"):
+                try:
+                    st = path.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime_ns, path.name[: -len(self.suffix)], st.st_size))
+            entries.sort()
+            self._index = OrderedDict((key, size) for _, key, size in entries)
+            self._total = sum(size for _, _, size in entries)
+        return self._index
+
+    def get(self, key: str) -> Optional[Path]:
+        """Ruta del archivo cacheado (y lo marca como usado) o None."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            index = self._load_index()
+            path = self._path(key)
+            if key not in index:
+                return None
+            try:
+                os.utime(path)
+            except OSError:
+                # Borrado por fuera: olvidar la entrada
+                self._total -= index.pop(key)
+                return None
+            index.move_to_end(key)
+            return path
+
+    def put(self, key: str, data: bytes) -> None:
+        if not self.enabled or len(data) > self.max_bytes:
+            return
+        with self._lock:
+            index = self._load_index()
+            path = self._path(key)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            try:
+                tmp.write_bytes(data)
+                os.replace(tmp, path)
+            except OSError:
+                tmp.unlink(missing_ok=True)
+                return
+            self._total += len(data) - index.pop(key, 0)
+            index[key] = len(data)
+            self._evict(index)
+
+    def _evict(self, index: "OrderedDict[str, int]") -> None:
+        while self._total > self.max_bytes and index:
+            old_key, size = index.popitem(last=False)
+            self._total -= size
+            try:
+                self._path(old_key).unlink(missing_ok=True)
+            except OSError:
+                pass
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            self._load_index()
+            return self._total
+
+
+_CACHES: dict[str, ExportCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_export_cache(namespace: str = "oi_excel") -> ExportCache:
+    """Caché compartida por espacio de nombres (tamaño: VI_EXPORT_CACHE_MAX_MB)."""
+    with _CACHES_LOCK:
+        cache = _CACHES.get(namespace)
+        if cache is None:
+            settings = get_settings()
+            max_mb = int(getattr(settings, "export_cache_max_mb", 0) or 0)
+            cache = ExportCache(settings.data_dir / "export_cache" / namespace, max_mb * 1024 * 1024)
+            _CACHES[namespace] = cache
+        return cache
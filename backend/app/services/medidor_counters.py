@@ -0,0 +1,131 @@
+from typing import Iterable
+
+from sqlmodel import Session, select, delete
+from sqlalchemy import func, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.attributes import set_committed_value
+
+from ..models import OI, Bancada, OICodeTotal
+
+# Contadores desnormalizados de medidores:
+# - OI.medidores_usuario = sum(Bancada.rows) de la OI
+# - OICodeTotal.medidores_total = sum(OI.medidores_usuario) por código
+# Se actualizan con deltas atómicos (UPDATE col = col + delta) dentro de la
+# transacción de la escritura; rebuild_counters() los recalcula desde cero.
+
+
+def _apply_code_delta(session: Session, code: str | None, delta: int) -> None:
+    if not code or not delta:
+        return
+    # Upsert en una sola sentencia: dos escrituras que crean el primer total del
+    # código a la vez (otro request u otro worker) no chocan en la PK.
+    table = OICodeTotal.__table__  # type: ignore[attr-defined]
+    dialect = session.get_bind().dialect.name
+    if dialect == "sqlite":
+        stmt = sqlite_insert(table).values(code=code, medidores_total=delta)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.code],
+            set_={"medidores_total": table.c.medidores_total + delta},
+        )
+    elif dialect in ("mysql", "mariadb"):
+        stmt = mysql_insert(table).values(code=code, medidores_total=delta)
+        stmt = stmt.on_duplicate_key_update(medidores_total=table.c.medidores_total + delta)
+    else:
+        _apply_code_delta_savepoint(session, code, delta)
+        return
+    session.exec(stmt)  # type: ignore[call-overload]
+
+
+def _apply_code_delta_savepoint(session: Session, code: str, delta: int) -> None:
+    """Otros motores: UPDATE y, si no había fila, INSERT en un SAVEPOINT (si otro lo creó, se reintenta el UPDATE)."""
+    stmt = (
+        update(OICodeTotal)
+        .where(OICodeTotal.code == code)  # type: ignore[arg-type]
+        .values(medidores_total=OICodeTotal.medidores_total + delta)
+    )
+    if session.exec(stmt).rowcount:  # type: ignore[call-overload]
+        return
+    try:
+        with session.begin_nested():
+            session.add(OICodeTotal(code=code, medidores_total=delta))
+    except IntegrityError:
+        session.exec(stmt)  # type: ignore[call-overload]
+
+
+def apply_rows_delta(session: Session, oi: OI, delta: int) -> None:
+    """Suma 'delta' medidores a la OI y a su código (no hace commit)."""
+    if oi.id is None or not delta:
+        return
+    session.exec(  # type: ignore[call-overload]
+        update(OI)
+        .where(OI.id == oi.id)  # type: ignore[arg-type]
+        .values(medidores_usuario=func.coalesce(OI.medidores_usuario, 0) + delta)
+        .execution_options(synchronize_session=False)
+    )
+    # Reflejar en memoria sin marcar el atributo como modificado (no pisar el UPDATE atómico)
+    set_committed_value(oi, "medidores_usuario", int(oi.medidores_usuario or 0) + delta)
+    _apply_code_delta(session, oi.code, delta)
+
+
+def move_code(session: Session, oi: OI, old_code: str | None, new_code: str | None) -> None:
+    """Traslada los medidores de la OI de un código a otro (cambio de código)."""
+    if old_code == new_code:
+        return
+    amount = int(oi.medidores_usuario or 0)
+    _apply_code_delta(session, old_code, -amount)
+    _apply_code_delta(session, new_code, amount)
+
+
+def remove_oi(session: Session, oi: OI) -> None:
+    """Descuenta del total del código los medidores de una OI que se elimina."""
+    _apply_code_delta(session, oi.code, -int(oi.medidores_usuario or 0))
+
+
+def code_totals(session: Session, codes: Iterable[str]) -> dict[str, int]:
+    wanted = list({code for code in codes if code})
+    if not wanted:
+        return {}
+    stmt = select(OICodeTotal.code, OICodeTotal.medidores_total).where(
+        OICodeTotal.code.in_(wanted)  # type: ignore[attr-defined]
+    )
+    return {str(code): int(total or 0) for code, total in session.exec(stmt).all()}
+
+
+def code_total(session: Session, code: str | None) -> int:
+    if not code:
+        return 0
+    return code_totals(session, [code]).get(code, 0)
+
+
+def rebuild_counters(session: Session) -> tuple[int, int]:
+    """
+    Recalcula OI.medidores_usuario desde bancada y reconstruye oi_code_total.
+    Devuelve (OIs, códigos). Hace commit.
+    """
+    per_oi = (
+        select(func.coalesce(func.sum(Bancada.rows), 0))
+        .where(Bancada.oi_id == OI.id)
+        .scalar_subquery()
+    )
+    session.exec(  # type: ignore[call-overload]
+        update(OI).values(medidores_usuario=per_oi).execution_options(synchronize_session=False)
+    )
+    session.exec(delete(OICodeTotal))  # type: ignore[call-overload]
+    rows = session.exec(
+        select(OI.code, func.coalesce(func.sum(OI.medidores_usuario), 0)).group_by(OI.code)
+    ).all()
+    for code, total in rows:
+        session.add(OICodeTotal(code=code, medidores_total=int(total or 0)))
+    session.commit()
+    oi_count = session.exec(select(func.count()).select_from(OI)).one()
+    return int(oi_count or 0), len(rows)
+
+
+def counters_need_rebuild(session: Session) -> bool:
+    """True si hay OIs pero oi_code_total está vacío (tabla nueva o datos migrados)."""
+    has_oi = session.exec(select(OI.id).limit(1)).first() is not None
+    if not has_oi:
+        return False
+    return session.exec(select(OICodeTotal.code).limit(1)).first() is None
@@ -0,0 +1,235 @@
+import re
+from typing import Collection, Optional, Sequence
+
+from sqlmodel import Session, select, delete
+from sqlalchemy import exists
+
+from ..models import OI, Bancada, BancadaMedidor
+from ..schemas import NumerationType
+
+# Tamaño de lote para el backfill inicial del índice
+BACKFILL_BATCH_SIZE = 500
+# Máximo de valores por cláusula IN (límite de variables en SQLite)
+IN_CHUNK_SIZE = 500
+
+_MEDIDOR_SUFFIX_RE = re.compile(r"^(.*?)(\d+)$")
+
+
+def row_medidor_value(row: object) -> str:
+    """Valor de #Medidor de una fila del grid (dict o modelo), sin espacios."""
+    if row is None:
+        return ""
+    if isinstance(row, dict):
+        value = row.get("medidor")
+    else:
+        value = getattr(row, "medidor", None)
+    if value is None:
+        return ""
+    return str(value).strip()
+
+
+def normalize_medidor_value(value: object) -> str:
+    if value is None:
+        return ""
+    return str(value).strip().upper()
+
+
+def split_medidor_suffix(value: str) -> tuple[str, int, int] | None:
+    match = _MEDIDOR_SUFFIX_RE.match(value)
+    if not match:
+        return None
+    prefix, num_str = match.group(1), match.group(2)
+    try:
+        number = int(num_str)
+    except ValueError:
+        return None
+    return prefix, number, len(num_str)
+
+
+def expand_correlativo_by_count(base: str, count: int) -> list[str]:
+    """Expande una serie correlativa; ValueError si la base no termina en números."""
+    if count <= 1:
+        return [base]
+    parsed = split_medidor_suffix(base)
+    if not parsed:
+        raise ValueError("Serie de medidor correlativa invalida; debe terminar en numeros.")
+    prefix, number, width = parsed
+    return [f"{prefix}{str(number + offset).zfill(width)}" for offset in range(count)]
+
+
+def bancada_medidor_set(
+    rows_data: Sequence[object] | None,
+    medidor: str | None,
+    rows: int | None,
+    numeration_type: NumerationType,
+) -> set[str]:
+    """
+    Medidores que ocupa la bancada para la validación de duplicados:
+    los del grid si existen; si no, el medidor base expandido por 'rows'.
+    """
+    values: list[str] = []
+    if rows_data:
+        for row in rows_data:
+            normalized = normalize_medidor_value(row_medidor_value(row))
+            if normalized:
+                values.append(normalized)
+    if values:
+        return set(values)
+
+    base = normalize_medidor_value(medidor)
+    if not base:
+        return set()
+
+    count = int(rows or 0)
+    if count <= 1:
+        return {base}
+    if numeration_type == NumerationType.correlativo:
+        return set(expand_correlativo_by_count(base, count))
+    return {base}
+
+
+def bancada_search_values(medidor: Optional[str], rows_data: Optional[Sequence[object]]) -> set[str]:
+    """Medidores de la bancada para búsqueda: medidor de cabecera + medidores del grid."""
+    values: set[str] = set()
+    base = normalize_medidor_value(medidor)
+    if base:
+        values.add(base)
+    for row in rows_data or []:
+        normalized = normalize_medidor_value(row_medidor_value(row))
+        if normalized:
+            values.add(normalized)
+    return values
+
+
+def like_pattern(search: str) -> str:
+    """
+    Patrón LIKE '%texto%' (escapado con '\\') sobre el valor normalizado.
+
+    La búsqueda es por subcadena (p.ej. los últimos dígitos de la serie), así
+    que ningún índice B-tree permite buscar por rango: la consulta recorre el
+    índice cubriente idx_bancada_medidor_search (searchable, medidor, oi_id)
+    en lugar de la tabla.
+    """
+    needle = normalize_medidor_value(search)
+    needle = needle.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{needle}%"
+
+
+def _coerce_numeration_type(raw: object) -> NumerationType:
+    if isinstance(raw, NumerationType):
+        return raw
+    try:
+        return NumerationType(raw)
+    except Exception:
+        return NumerationType._missing_(raw) or NumerationType.correlativo
+
+
+def _index_rows(bancada: Bancada, numeration_type: NumerationType) -> list[BancadaMedidor]:
+    if bancada.id is None:
+        return []
+    searchable = bancada_search_values(bancada.medidor, bancada.rows_data)
+    try:
+        dup_set = bancada_medidor_set(bancada.rows_data, bancada.medidor, bancada.rows, numeration_type)
+    except ValueError:
+        # Bancadas antiguas con serie inválida: se indexa solo el medidor base
+        base = normalize_medidor_value(bancada.medidor)
+        dup_set = {base} if base else set()
+    return [
+        BancadaMedidor(
+            oi_id=bancada.oi_id,
+            bancada_id=bancada.id,
+            medidor=value,
+            searchable=value in searchable,
+            dup_check=value in dup_set,
+        )
+        for value in sorted(searchable | dup_set)
+    ]
+
+
+def sync_bancada_medidores(session: Session, bancada: Bancada, numeration_type: object) -> None:
+    """Reemplaza las entradas del índice de una bancada (requiere bancada.id; no hace commit)."""
+    if bancada.id is None:
+        return
+    delete_bancada_medidores(session, bancada.id)
+    for entry in _index_rows(bancada, _coerce_numeration_type(numeration_type)):
+        session.add(entry)
+
+
+def sync_oi_medidores(session: Session, oi_id: int, numeration_type: object) -> None:
+    """Reindexa todas las bancadas de la OI (p.ej. al cambiar el tipo de numeración)."""
+    delete_oi_medidores(session, oi_id)
+    enum_val = _coerce_numeration_type(numeration_type)
+    for bancada in session.exec(select(Bancada).where(Bancada.oi_id == oi_id)).all():
+        for entry in _index_rows(bancada, enum_val):
+            session.add(entry)
+
+
+def delete_bancada_medidores(session: Session, bancada_id: int) -> None:
+    stmt = delete(BancadaMedidor).where(BancadaMedidor.bancada_id == bancada_id)  # type: ignore[arg-type]
+    session.exec(stmt)
+
+
+def delete_oi_medidores(session: Session, oi_id: int) -> None:
+    stmt = delete(BancadaMedidor).where(BancadaMedidor.oi_id == oi_id)  # type: ignore[arg-type]
+    session.exec(stmt)
+
+
+def find_overlaps(
+    session: Session,
+    oi_id: int,
+    new_set: set[str],
+    exclude_bancada_id: int | None = None,
+    exclude_bancada_ids: Collection[int] = (),
+) -> list[tuple[str, int, int]]:
+    """
+    Devuelve (medidor, bancada_id, bancada_item) de las bancadas de la OI que
+    ya ocupan alguno de los medidores de new_set. Costo proporcional a new_set.
+    """
+    excluded = set(exclude_bancada_ids)
+    if exclude_bancada_id is not None:
+        excluded.add(exclude_bancada_id)
+    values = sorted(new_set)
+    found: list[tuple[str, int, int]] = []
+    for start in range(0, len(values), IN_CHUNK_SIZE):
+        chunk = values[start:start + IN_CHUNK_SIZE]
+        stmt = (
+            select(BancadaMedidor.medidor, Bancada.id, Bancada.item)
+            .join(Bancada, Bancada.id == BancadaMedidor.bancada_id)  # type: ignore[arg-type]
+            .where(BancadaMedidor.oi_id == oi_id)
+            .where(BancadaMedidor.dup_check == True)  # noqa: E712
+            .where(BancadaMedidor.medidor.in_(chunk))  # type: ignore[attr-defined]
+        )
+        if excluded:
+            stmt = stmt.where(BancadaMedidor.bancada_id.not_in(sorted(excluded)))  # type: ignore[attr-defined]
+        found.extend(session.exec(stmt).all())
+    found.sort(key=lambda x: (x[1], x[0]))
+    return found
+
+
+def backfill_bancada_medidor(session: Session, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """
+    Indexa las bancadas que aún no tienen entradas en bancada_medidor.
+    Procesa por lotes (commit por lote) y es idempotente: una bancada sin
+    medidores vuelve a evaluarse en cada arranque, pero no genera filas.
+    """
+    processed = 0
+    last_id = 0
+    while True:
+        stmt = (
+            select(Bancada, OI.numeration_type)
+            .join(OI, OI.id == Bancada.oi_id)  # type: ignore[arg-type]
+            .where(Bancada.id > last_id)  # type: ignore[operator]
+            .where(~exists().where(BancadaMedidor.bancada_id == Bancada.id))
+            .order_by(Bancada.id)  # type: ignore[arg-type]
+            .limit(batch_size)
+        )
+        batch = list(session.exec(stmt).all())
+        if not batch:
+            break
+        for bancada, numeration_type in batch:
+            for entry in _index_rows(bancada, _coerce_numeration_type(numeration_type)):
+                session.add(entry)
+        session.commit()
+        processed += len(batch)
+        last_id = int(batch[-1][0].id or last_id)
+    return processed
@@ -1,4 +1,5 @@
 import logging
+import multiprocessing
 import os
 import socket
 import sys
@@ -71,6 +72,58 @@ def choose_port(host: str, preferred: int) -> int:
     return int(fallback_port)
 
 
+_SERVER_PROCESS: "multiprocessing.Process | None" = None
+
+
+def _server_workers() -> int:
+    """Number of Uvicorn workers (VI_SERVER_WORKERS, default 1)."""
+    from app.core.settings import get_settings
+
+    return max(1, int(get_settings().server_workers or 1))
+
+
+def run_server_workers(host: str, port: int, workers: int) -> None:
+    """
+    Run Uvicorn with several worker processes (child process entry point).
+
+    Uvicorn's supervisor needs the main thread of its process, so this runs in a
+    dedicated process instead of a thread. Sessions and job progress/cancel
+    state must be shared between workers, so the DB backends are forced via the
+    environment, which the spawned workers inherit.
+    """
+    os.environ["VI_SESSION_BACKEND"] = "db"
+    os.environ["VI_JOB_STATE_BACKEND"] = "db"
+    from app.core.db import init_db
+
+    # Migrate once up front so the workers' startup hooks find the schema ready
+    init_db()
+    try:
+        uvicorn.run(
+            "app.main:app",
+            host=host,
+            port=port,
+            workers=workers,
+            log_level="info",
+            access_log=False,
+            log_config=None,
+        )
+    except Exception:
+        logger.exception("Fatal error while running Uvicorn workers")
+
+
+def start_server(host: str, port: int) -> None:
+    """Start the backend: one in-process thread, or a worker pool if configured."""
+    workers = _server_workers()
+    if workers <= 1:
+        threading.Thread(target=run_server_thread, args=(host, port), daemon=True).start()
+        return
+    global _SERVER_PROCESS
+    logger.info("Starting Uvicorn with %s workers", workers)
+    # Not a daemon: daemonic processes cannot spawn the Uvicorn workers
+    _SERVER_PROCESS = multiprocessing.Process(target=run_server_workers, args=(host, port, workers))
+    _SERVER_PROCESS.start()
+
+
 def run_server_thread(host: str, port: int) -> None:
     """Run Uvicorn in a background thread."""
     try:
@@ -95,6 +148,10 @@ def open_browser_delayed(url: str) -> None:
 def on_exit(icon, _item):
     logger.info("Closing app from tray menu")
     icon.stop()
+    if _SERVER_PROCESS is not None and _SERVER_PROCESS.is_alive():
+        # Uvicorn's supervisor stops its workers on SIGTERM
+        _SERVER_PROCESS.terminate()
+        _SERVER_PROCESS.join(timeout=10)
     os._exit(0)
 
 
@@ -113,7 +170,7 @@ def main() -> None:
     icon_path = _BUNDLE_DIR / "icon_vi.ico"
     if not icon_path.exists():
         logger.error("Icon not found at %s", icon_path)
-        threading.Thread(target=run_server_thread, args=(SERVER_HOST, port), daemon=True).start()
+        start_server(SERVER_HOST, port)
         return
 
     try:
@@ -132,8 +189,7 @@ def main() -> None:
 
     tray_icon = pystray.Icon("registro_vi", image, "Registro VI", menu)
 
-    server_thread = threading.Thread(target=run_server_thread, args=(SERVER_HOST, port), daemon=True)
-    server_thread.start()
+    start_server(SERVER_HOST, port)
 
     threading.Thread(target=open_browser, daemon=True).start()
 
@@ -142,6 +198,8 @@ def main() -> None:
 
 
 if __name__ == "__main__":
+    # Required in the PyInstaller exe: batch Excel export uses a process pool
+    multiprocessing.freeze_support()
     try:
         main()
     except Exception:
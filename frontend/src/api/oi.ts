@@ -228,6 +228,35 @@ export async function updateBancada(bancadaId: number, payload: BancadaUpdatePay
   }
 }
 
+// Guardado por lote (autosave): solo campos cambiados y filas modificadas del grid
+export type BancadaRowPatch = { index: number; row: BancadaRow };
+export type BancadaDelta = {
+  id: number;
+  updated_at: string;
+  medidor?: string | null;
+  estado?: number;
+  rows?: number;
+  rows_data?: BancadaRow[];
+  rows_patch?: BancadaRowPatch[];
+};
+
+export async function updateBancadasBatch(oiId: number, items: BancadaDelta[]): Promise<BancadaRead[]> {
+  try {
+    const { data } = await api.patch<{ items: BancadaRead[] }>(`/oi/${oiId}/bancadas`, { items });
+    return data.items;
+  } catch (e: any) {
+    const detail = e?.response?.data?.detail;
+    const msg = typeof detail === "string" ? detail : e?.message ?? "No se pudieron guardar las bancadas";
+    const err = new Error(msg) as Error & { status?: number; duplicates?: BancadaDuplicateEntry[] };
+    err.status = e?.response?.status;
+    const duplicates = e?.response?.data?.duplicates;
+    if (Array.isArray(duplicates)) {
+      err.duplicates = duplicates as BancadaDuplicateEntry[];
+    }
+    throw err;
+  }
+}
+
 export type BancadaSavedAtPayload = {
   saved_at: string;
 };
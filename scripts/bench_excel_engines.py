@@ -0,0 +1,106 @@
+"""Compara los motores de exportación Formato VI (openpyxl vs OOXML directo).
+
+Genera una OI sintética en memoria (sin BD) con N bancadas de M filas y mide
+generate_excel con cada motor sobre la plantilla configurada (VI_DATA_TEMPLATE_PATH).
+Opcionalmente verifica que ambas salidas sean equivalentes celda por celda.
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import time
+from datetime import datetime
+from io import BytesIO
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+BACKEND_DIR = REPO_ROOT / "backend"
+
+# Asegura imports del paquete `app` (backend/app)
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from openpyxl import load_workbook  # noqa: E402
+
+from app.core.settings import get_settings  # noqa: E402
+from app.models import OI, Bancada  # noqa: E402
+from app.services import excel_service  # noqa: E402
+
+
+def _sample(bancadas: int, rows: int) -> tuple[OI, list[Bancada]]:
+    oi = OI(id=1, code="OI-0001-2025", q3=2.5, alcance=100, pma=16, presion_bar=25.6, banco_id=3, tech_number=7)
+    result = []
+    for b in range(bancadas):
+        rows_data = [
+            {
+                "medidor": f"M{b:03d}{i:03d}",
+                "estado": 0,
+                "q3": {"c1": 20.1, "c2": 1.2, "c3": 1.1, "c4": 10.5 + i, "c5": 20.7 + i, "c6": 10, "c7": "00:30"},
+                "q2": {"c1": 20.1, "c2": 1.2, "c3": 1.1, "c4": 30.5 + i, "c5": 40.6 + i, "c6": 10, "c7": "01:30"},
+                "q1": {"c1": 20.1, "c2": 1.2, "c3": 1.1, "c4": 50.5 + i, "c5": 60.6 + i, "c6": 10, "c7": "02:30"},
+            }
+            for i in range(rows)
+        ]
+        result.append(Bancada(id=b + 1, oi_id=1, item=b + 1, medidor=f"M{b:03d}000", rows=rows, rows_data=rows_data))
+    return oi, result
+
+
+def _run(engine: str, oi: OI, bancadas: list[Bancada], repeat: int) -> tuple[list[float], bytes]:
+    settings = get_settings()
+    previous = settings.excel_engine
+    settings.excel_engine = engine
+    try:
+        times: list[float] = []
+        data = b""
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            data, _ = excel_service.generate_excel(oi, bancadas, password="clave", work_dt=datetime(2025, 1, 1))
+            times.append(time.perf_counter() - t0)
+        return times, data
+    finally:
+        settings.excel_engine = previous
+
+
+def _cells(data: bytes) -> dict:
+    ws = load_workbook(BytesIO(data))[excel_service.SHEET_NAME]
+    return {
+        c.coordinate: (c.value, c.number_format, repr(c.font), repr(c.fill), repr(c.border), repr(c.protection))
+        for row in ws.iter_rows()
+        for c in row
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bancadas", type=int, default=20, help="Cantidad de bancadas (default: 20).")
+    parser.add_argument("--filas", type=int, default=15, help="Filas por bancada (default: 15).")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por motor (default: 3).")
+    parser.add_argument("--verify", action="store_true", help="Comparar ambas salidas celda por celda.")
+    args = parser.parse_args()
+
+    oi, bancadas = _sample(args.bancadas, args.filas)
+    print(f"OI sintética: {args.bancadas} bancadas x {args.filas} filas = {args.bancadas * args.filas} medidores")
+
+    # Calentar caches de plantilla (snapshot y plan compilado) fuera de la medición
+    _run("ooxml", oi, bancadas[:1], 1)
+
+    results = {}
+    medians = {}
+    for engine in ("openpyxl", "ooxml"):
+        times, data = _run(engine, oi, bancadas, args.repeat)
+        results[engine] = data
+        medians[engine] = statistics.median(times)
+        print(f"{engine:>9}: mediana {medians[engine]:.3f}s  min {min(times):.3f}s  ({len(data)} bytes)")
+    print(f"Aceleración: x{medians['openpyxl'] / medians['ooxml']:.1f}")
+
+    if args.verify:
+        diff = _cells(results["openpyxl"]) != _cells(results["ooxml"])
+        print("Verificación celda por celda:", "DIFERENCIAS" if diff else "OK")
+        if diff:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
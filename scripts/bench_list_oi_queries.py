@@ -0,0 +1,97 @@
+"""Cuenta las consultas SQL por página de GET /oi (list_oi).
+
+Crea una BD SQLite en memoria con OIs bloqueadas por técnicos distintos y llama
+a list_oi como admin con varios tamaños de página, contando las sentencias que
+llegan al motor. Con la resolución de locks en lote la cantidad debe mantenerse
+constante; como referencia se muestra lo que costaría resolver cada lock por fila.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+BACKEND_DIR = REPO_ROOT / "backend"
+
+# Asegura imports del paquete `app` (backend/app)
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+from sqlmodel import SQLModel, Session, create_engine  # noqa: E402
+
+import app.api.auth as auth_api  # noqa: E402
+import app.api.oi as oi_api  # noqa: E402
+from app.core.session_store import MemorySessionStore  # noqa: E402
+from app.models import OI, User  # noqa: E402
+
+TOKEN = "bench-admin"
+
+
+def _seed(engine, count: int) -> None:
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        session.add(User(username="admin", first_name="Admin", last_name="Sistema",
+                         password_hash="x", tech_number=0, role="admin"))
+        for i in range(count):
+            user = User(username=f"tec{i}", first_name="Tec", last_name=str(i),
+                        password_hash="x", tech_number=i + 1, role="technician")
+            session.add(user)
+            session.flush()
+            session.add(OI(code=f"OI-{i:04d}-2025", q3=2.5, alcance=100, pma=16, presion_bar=25.6,
+                           banco_id=1, tech_number=i + 1, locked_by_user_id=user.id,
+                           locked_at=now - timedelta(minutes=1), created_at=now - timedelta(seconds=i)))
+        session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ois", type=int, default=200, help="OIs (cada una bloqueada por otro técnico)")
+    parser.add_argument("--limits", default="10,50,100", help="Tamaños de página a medir")
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    _seed(engine, args.ois)
+    oi_api.engine = engine
+    auth_api.engine = engine
+    oi_api._SESSIONS = MemorySessionStore({
+        TOKEN: {"userId": 1, "username": "admin", "user": "admin", "role": "admin",
+                "techNumber": 0, "bancoId": 0, "expiresAt": datetime.utcnow() + timedelta(hours=1)},
+    })
+
+    statements = [0]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(*_args, **_kwargs):
+        statements[0] += 1
+
+    print(f"{'limit':>6} {'queries':>8} {'por fila':>9} {'ms':>8}")
+    for limit in [int(x) for x in args.limits.split(",") if x.strip()]:
+        auth_api.invalidate_full_name_cache()
+        oi_api._invalidate_list_summary_cache()
+        with Session(engine) as session:
+            statements[0] = 0
+            t0 = time.perf_counter()
+            page = oi_api.list_oi(limit=limit, session=session, authorization=f"Bearer {TOKEN}")
+            elapsed = (time.perf_counter() - t0) * 1000
+            batched = statements[0]
+            read_only = sum(1 for item in page.items if item.read_only_for_current_user)
+
+        # Referencia: un session.get(User) por fila (camino anterior)
+        with Session(engine) as session:
+            rows = session.exec(oi_api.select(OI).limit(limit)).all()
+            statements[0] = 0
+            for oi in rows:
+                oi_api._get_lock_state(oi, session)
+            per_row = batched + statements[0] - 1
+        print(f"{limit:>6} {batched:>8} {per_row:>9} {elapsed:>8.1f}   (solo lectura: {read_only})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Mide la consolidación LOG-01 (dedupe de series): almacén columnar vs dict por serie.
+
+Genera N filas sintéticas ya leídas (BASES, ~20% de series repetidas entre OIs) y
+las consolida con el almacén columnar (Log01SeriesStore) y con la implementación
+anterior (SerieInfo + dict de metadatos por serie), incluyendo el orden natural y
+las filas de salida. Cada caso corre en un subproceso para medir el pico de RSS
+(ru_maxrss; no disponible en Windows) por encima de las filas de entrada.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+BACKEND_DIR = REPO_ROOT / "backend"
+
+# Asegura imports del paquete `app` (backend/app)
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+ROWS_PER_FILE = 5_000
+
+
+def _peak_rss_mib() -> float:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KiB; macOS: bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _files(n_rows: int):
+    from app.logistica.services.log01_consolidate import _OUTPUT_KEYS, Log01ParsedFile
+
+    n_series = max(int(n_rows * 0.8), 1)
+    files = []
+    for f, start in enumerate(range(0, n_rows, ROWS_PER_FILE), start=1):
+        parsed = Log01ParsedFile(
+            filename=f"Base Comercial OI-{f:04d}-2025.xlsx", source_type="BASES", oi_num=f, oi_year=2025
+        )
+        for i in range(start, min(start + ROWS_PER_FILE, n_rows)):
+            serie = f"M{(i * 7919) % n_series:07d}"
+            estado = "NO CONFORME" if i % 10 == 0 else "CONFORME"
+            values = {key: f"{key}-{i}" for key in _OUTPUT_KEYS}
+            values.update(medidor=serie, estado=estado, q3=2500.0, q2=16.0, q1=10.0)
+            parsed.rows.append((serie, estado, values))
+        files.append(parsed)
+    return files
+
+
+def _consolidate_columnar(files):
+    from app.logistica.services.log01_consolidate import _Log01Merge
+
+    merge = _Log01Merge()
+    for parsed in files:
+        merge.add(parsed)
+    series = merge.series
+    conforme_ids = series.ids("CONFORME")
+    out_rows = series.output_rows(conforme_ids)
+    for vals in out_rows:
+        pass
+    return len(series), len(conforme_ids), len(series.conflicts())
+
+
+def _consolidate_dict(files):
+    """Implementación anterior: SerieInfo + dict de 12 claves por serie."""
+    from app.logistica.services.log01_consolidate import _natural_key, _oi_compare_key
+    from app.logistica.services.log01_series import SerieInfo
+
+    series, series_meta = {}, {}
+    for parsed in files:
+        oi_key = _oi_compare_key(parsed.oi_year, parsed.oi_num)
+        for serie, estado, row_values in parsed.rows:
+            meta = series_meta.setdefault(
+                serie,
+                {
+                    "has_conforme": False, "has_no_conforme": False, "latest_key": None, "latest_estado": None,
+                    "latest_oi_year": None, "latest_oi_num": None, "best_conforme_key": None,
+                    "best_conforme_oi_year": None, "best_conforme_oi_num": None, "best_no_conforme_key": None,
+                    "best_no_conforme_oi_year": None, "best_no_conforme_oi_num": None,
+                },
+            )
+            if meta["latest_key"] is None or oi_key > meta["latest_key"]:
+                meta.update(latest_key=oi_key, latest_estado=estado, latest_oi_year=oi_key[0], latest_oi_num=oi_key[1])
+            if estado == "CONFORME":
+                meta["has_conforme"] = True
+                if meta["best_conforme_key"] is None or oi_key > meta["best_conforme_key"]:
+                    meta.update(best_conforme_key=oi_key, best_conforme_oi_year=oi_key[0], best_conforme_oi_num=oi_key[1])
+                    series[serie] = SerieInfo(oi_num=oi_key[1], oi_year=oi_key[0], estado=estado, values=row_values)
+            else:
+                meta["has_no_conforme"] = True
+                if meta["best_no_conforme_key"] is None or oi_key > meta["best_no_conforme_key"]:
+                    meta.update(
+                        best_no_conforme_key=oi_key, best_no_conforme_oi_year=oi_key[0], best_no_conforme_oi_num=oi_key[1]
+                    )
+                    if not meta["has_conforme"]:
+                        series[serie] = SerieInfo(oi_num=oi_key[1], oi_year=oi_key[0], estado=estado, values=row_values)
+    conformes = sorted((s for s, info in series.items() if info.estado == "CONFORME"), key=_natural_key)
+    out_rows = [series[s].values for s in conformes]
+    conflicts = [
+        s for s, m in series_meta.items()
+        if m["has_conforme"] and m["has_no_conforme"] and m["latest_estado"] == "NO CONFORME"
+    ]
+    conflicts.sort(key=_natural_key)
+    return len(series), len(out_rows), len(conflicts)
+
+
+_IMPLS = {"columnar": _consolidate_columnar, "dict": _consolidate_dict}
+
+
+def _run_case(impl: str, n_rows: int) -> dict:
+    files = _files(n_rows)
+    base_rss = _peak_rss_mib()
+    t0 = time.perf_counter()
+    n_series, n_conformes, n_conflicts = _IMPLS[impl](files)
+    elapsed = time.perf_counter() - t0
+    return {
+        "elapsed": elapsed,
+        "peak_rss": _peak_rss_mib(),
+        "delta_rss": _peak_rss_mib() - base_rss,
+        "series": n_series,
+        "conformes": n_conformes,
+        "conflicts": n_conflicts,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 500_000],
+                        help="Filas de entrada a consolidar (default: 10000 100000 500000).")
+    parser.add_argument("--case", nargs=2, metavar=("IMPL", "ROWS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(_run_case(args.case[0], int(args.case[1]))))
+        return
+
+    print(f"{'filas':>8} {'impl':>9} {'series':>8} {'tiempo (s)':>11} {'pico RSS (MiB)':>15} {'+RSS (MiB)':>11}")
+    for n in args.rows:
+        for impl in _IMPLS:
+            out = subprocess.run(
+                [sys.executable, __file__, "--case", impl, str(n)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            print(
+                f"{n:>8} {impl:>9} {r['series']:>8} {r['elapsed']:>11.2f} "
+                f"{r['peak_rss']:>15.1f} {r['delta_rss']:>11.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Compara los motores de escritura de la salida LOG-01 (openpyxl vs OOXML en streaming).
+
+Genera N series conformes sintéticas y escribe la plantilla LOG-01 configurada
+(VI_LOG01_TEMPLATE_PATH) con cada motor. Mide el tiempo y el pico de memoria de
+Python (tracemalloc, en una corrida aparte para no distorsionar el tiempo).
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+BACKEND_DIR = REPO_ROOT / "backend"
+
+# Asegura imports del paquete `app` (backend/app)
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from app.core.settings import get_settings  # noqa: E402
+from app.logistica.services import log01_consolidate, log01_ooxml  # noqa: E402
+
+
+def _rows(n: int) -> list[dict]:
+    start = date(2025, 1, 1)
+    return [
+        {
+            "medidor": f"M{i:07d}",
+            "q3": 2500.0 + i % 7,
+            "error_q3": 0.31,
+            "q2": 16.0,
+            "error_q2": -0.12,
+            "q1": 10.0,
+            "error_q1": 1.4,
+            "estado_pe": "CONFORME",
+            "fecha": start + timedelta(days=i % 300),
+            "certificado": f"CERT-{i:07d}",
+            "estado": "CONFORME",
+            "precinto": 1000000 + i,
+            "banco_numero": 3,
+            "certificado_banco": "CB-2025-01",
+            "organismo": "OI-040",
+        }
+        for i in range(n)
+    ]
+
+
+def _engines(template: str):
+    return {
+        "openpyxl": lambda rows: log01_consolidate._render_output_openpyxl(template, rows, lambda i: None),
+        "ooxml": lambda rows: log01_ooxml.render_log01_ooxml(template, rows, lambda i: None),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--series", type=int, nargs="+", default=[10_000, 50_000],
+                        help="Series conformes a escribir (default: 10000 50000).")
+    parser.add_argument("--no-memory", action="store_true", help="No medir el pico de memoria.")
+    args = parser.parse_args()
+
+    template = get_settings().log01_template_abs_path
+    engines = _engines(template)
+    print(f"{'series':>8} {'motor':>9} {'tiempo (s)':>11} {'pico (MiB)':>11} {'xlsx (KiB)':>11}")
+    for n in args.series:
+        rows = _rows(n)
+        for name, render in engines.items():
+            t0 = time.perf_counter()
+            data = render(rows)
+            elapsed = time.perf_counter() - t0
+            assert data is not None, f"La plantilla no es compatible con el motor {name}"
+
+            peak = float("nan")
+            if not args.no_memory:
+                tracemalloc.start()
+                render(rows)
+                peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+                tracemalloc.stop()
+            print(f"{n:>8} {name:>9} {elapsed:>11.2f} {peak:>11.1f} {len(data) / 1024:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Mide el canal de progreso con muchos streams abiertos (eventos/s y CPU en reposo).
+
+Abre N suscriptores asíncronos sobre una misma operación (como los streams NDJSON)
+y compara:
+- "await": ProgressManager.follow (espera notificación, sin sondeo)
+- "poll": sondeo cada 50 ms como hacían los streams antes (referencia)
+Para cada modo mide la CPU del proceso con los streams ociosos y el throughput
+de un productor en otro hilo hasta que todos los suscriptores reciben todo.
+
+Además mide los bytes NDJSON que recibe un stream en un job con un evento de
+progreso por fila (como VIMA -> Lista), con y sin fusión de eventos.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+BACKEND_DIR = REPO_ROOT / "backend"
+
+# Asegura imports del paquete `app` (backend/app)
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from app.core.settings import get_settings  # noqa: E402
+from app.oi_tools.services.progress_manager import ProgressManager  # noqa: E402
+
+
+async def _consume_await(pm: ProgressManager, channel, history) -> int:
+    count = 0
+    async for batch in pm.follow(channel, history):
+        count += len(batch)
+    return count
+
+
+async def _consume_poll(pm: ProgressManager, channel, history) -> int:
+    count = 0
+    cursor = history[-1]["cursor"] if history else -1
+    while True:
+        events = channel.events_after(cursor)
+        if not events:
+            if channel.closed:
+                return count
+            await asyncio.sleep(0.05)
+            continue
+        count += len(events)
+        cursor = events[-1]["cursor"]
+
+
+async def _run(mode: str, streams: int, events: int, idle_s: float) -> tuple[float, float, int]:
+    # Eventos sin "type" de progreso: no se fusionan, se mide solo la entrega
+    pm = ProgressManager()
+    op = f"bench-{mode}"
+    consume = _consume_await if mode == "await" else _consume_poll
+    tasks = []
+    for _ in range(streams):
+        channel, history = pm.subscribe(op)
+        tasks.append(asyncio.create_task(consume(pm, channel, history)))
+    await asyncio.sleep(0.05)
+
+    cpu0 = time.process_time()
+    await asyncio.sleep(idle_s)
+    idle_cpu = (time.process_time() - cpu0) / idle_s * 100
+
+    def produce():
+        for i in range(events):
+            pm.emit(op, {"type": "tick", "i": i})
+        pm.finish(op)
+
+    t0 = time.perf_counter()
+    threading.Thread(target=produce).start()
+    counts = await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - t0
+    return idle_cpu, events / elapsed, min(counts)
+
+
+async def _job_bytes(coalesce_ms: int, rows: int, duration_s: float) -> tuple[int, int]:
+    settings = get_settings()
+    previous = settings.progress_coalesce_ms
+    settings.progress_coalesce_ms = coalesce_ms
+    try:
+        pm = ProgressManager()
+        channel, history = pm.subscribe("bench-bytes")
+    finally:
+        settings.progress_coalesce_ms = previous
+
+    def produce():
+        pause = duration_s / rows
+        for i in range(rows):
+            pm.emit("bench-bytes", {"type": "progress", "stage": "filas", "current": i + 1, "total": rows,
+                                    "percent": round((i + 1) * 100 / rows, 2)})
+            if i % 100 == 0:
+                time.sleep(pause * 100)
+        pm.emit("bench-bytes", {"type": "complete", "result": {"total": rows}})
+        pm.finish("bench-bytes")
+
+    threading.Thread(target=produce).start()
+    sent = lines = 0
+    async for batch in pm.follow(channel, history):
+        chunk = pm.encode_events(batch)
+        sent += len(chunk)
+        lines += len(batch)
+    return sent, lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--streams", type=int, default=50, help="Streams abiertos (default: 50).")
+    parser.add_argument("--events", type=int, default=20000, help="Eventos emitidos (default: 20000).")
+    parser.add_argument("--idle", type=float, default=2.0, help="Segundos en reposo para medir CPU (default: 2).")
+    parser.add_argument("--rows", type=int, default=20000, help="Filas del job de bytes (default: 20000).")
+    parser.add_argument("--job-seconds", type=float, default=3.0, help="Duración del job de bytes (default: 3).")
+    args = parser.parse_args()
+
+    print(f"{args.streams} streams, {args.events} eventos")
+    for mode in ("await", "poll"):
+        idle_cpu, rate, received = asyncio.run(_run(mode, args.streams, args.events, args.idle))
+        print(f"{mode:>6}: CPU en reposo {idle_cpu:5.1f}%  {rate:>10.0f} eventos/s  "
+              f"(mínimo recibido por stream: {received})")
+
+    print(f"Job de {args.rows} filas en ~{args.job_seconds:.0f}s, un evento por fila")
+    for coalesce_ms in (0, get_settings().progress_coalesce_ms):
+        sent, lines = asyncio.run(_job_bytes(coalesce_ms, args.rows, args.job_seconds))
+        print(f"  fusión {coalesce_ms:>4} ms: {sent / 1024:>10.1f} KiB en {lines} eventos")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Compara el almacenamiento de Bancada.rows_data en formato JSON vs compacto.
+
+Para cada tamaño de bancada (filas) crea una BD SQLite temporal por codificación
+con N bancadas sintéticas, mide el tamaño del archivo (tras VACUUM) y el tiempo de
+cargar todas las bancadas por el ORM (incluye la decodificación de rows_data).
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+BACKEND_DIR = REPO_ROOT / "backend"
+
+# Asegura imports del paquete `app` (backend/app)
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from sqlmodel import SQLModel, Session, create_engine, select  # noqa: E402
+
+from app.core.rows_codec import ENCODINGS  # noqa: E402
+from app.core.settings import get_settings  # noqa: E402
+from app.models import OI, Bancada  # noqa: E402
+
+
+def _rows(b: int, rows: int) -> list[dict]:
+    def block(i: int, base: float, c7: str) -> dict:
+        return {"c1": 20.1, "c2": 1.2, "c3": 1.1, "c4": base + i, "c5": base + 10.2 + i, "c6": 10,
+                "c7": c7, "c7_seconds": int(c7[:2]) * 60 + int(c7[3:])}
+
+    return [
+        {
+            "medidor": f"M{b:04d}{i:03d}",
+            "estado": 0,
+            "q3": block(i, 10.5, "00:30"),
+            "q2": block(i, 30.5, "01:30"),
+            "q1": block(i, 50.5, "02:30"),
+        }
+        for i in range(rows)
+    ]
+
+
+def _measure(path: Path, encoding: str, bancadas: int, rows: int, repeat: int) -> tuple[int, float]:
+    settings = get_settings()
+    previous = settings.rows_data_encoding
+    settings.rows_data_encoding = encoding
+    engine = create_engine(f"sqlite:///{path.as_posix()}")
+    try:
+        SQLModel.metadata.create_all(engine)
+        with Session(engine) as session:
+            session.add(OI(id=1, code="OI-0001-2025", q3=2.5, alcance=100, pma=16, presion_bar=25.6,
+                           banco_id=3, tech_number=7))
+            for b in range(bancadas):
+                session.add(Bancada(oi_id=1, item=b + 1, rows=rows, rows_data=_rows(b, rows)))
+            session.commit()
+        with engine.connect() as conn:
+            conn.exec_driver_sql("VACUUM")
+
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            with Session(engine) as session:
+                loaded = session.exec(select(Bancada)).all()
+                assert all(len(b.rows_data) == rows for b in loaded)
+            times.append(time.perf_counter() - t0)
+        return path.stat().st_size, statistics.median(times)
+    finally:
+        engine.dispose()
+        settings.rows_data_encoding = previous
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bancadas", type=int, default=500, help="Bancadas por BD (default: 500).")
+    parser.add_argument("--filas", type=int, nargs="+", default=[15, 50, 100, 200],
+                        help="Filas por bancada a probar (default: 15 50 100 200).")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones de la carga (default: 3).")
+    args = parser.parse_args()
+
+    print(f"{'filas':>5} {'formato':>8} {'BD (KiB)':>10} {'carga (ms)':>11} {'ms/bancada':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.filas:
+            sizes = {}
+            for encoding in ENCODINGS:
+                size, elapsed = _measure(Path(tmp) / f"{encoding}_{rows}.db", encoding, args.bancadas, rows, args.repeat)
+                sizes[encoding] = size
+                print(f"{rows:>5} {encoding:>8} {size / 1024:>10.0f} {elapsed * 1000:>11.1f} "
+                      f"{elapsed * 1000 / args.bancadas:>11.3f}")
+            print(f"{'':>5} {'':>8} compact/json = {sizes['compact'] / sizes['json']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Convierte bancada.rows_data entre el formato JSON histórico y el compacto.
+
+La migración 006 convierte una sola vez al arrancar con VI_ROWS_DATA_ENCODING=compact.
+Usar este script si se cambia la codificación en una BD ya migrada (o para volver
+a JSON). Usa la misma configuración de BD que la app (VI_DATABASE_URL / vi.db).
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+BACKEND_DIR = REPO_ROOT / "backend"
+
+# Asegura imports del paquete `app` (backend/app)
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from sqlmodel import Session  # noqa: E402
+
+from app.core.db import engine, init_db  # noqa: E402
+from app.core.rows_codec import ENCODINGS, convert_stored_rows  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--to", choices=ENCODINGS, required=True, help="Codificación destino.")
+    parser.add_argument("--batch-size", type=int, default=500, help="Bancadas por lote/commit (default: 500).")
+    parser.add_argument(
+        "--skip-init",
+        action="store_true",
+        help="No ejecutar init_db() antes de convertir (la BD ya tiene el esquema actual).",
+    )
+    args = parser.parse_args()
+
+    if not args.skip_init:
+        init_db()
+
+    with Session(engine) as session:
+        converted = convert_stored_rows(session, args.to, batch_size=args.batch_size)
+
+    print(f"Bancadas convertidas a {args.to}: {converted}")
+    if args.to == "compact":
+        print("Recordar VI_ROWS_DATA_ENCODING=compact para que las nuevas escrituras sigan en ese formato.")
+
+
+if __name__ == "__main__":
+    main()
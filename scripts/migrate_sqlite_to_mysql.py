@@ -28,7 +28,7 @@ DEFAULT_SQLITE_PATH = BACKEND_DIR / "data" / "vi.db"
 if str(BACKEND_DIR) not in sys.path:
     sys.path.insert(0, str(BACKEND_DIR))
 
-from app.models import User, OI, Bancada  # noqa: E402
+from app.models import User, OI, Bancada, SchemaVersion  # noqa: E402
 
 
 def _parse_dt(value):
@@ -217,6 +217,11 @@ def main():
             conn.execute(text(f"ALTER TABLE {quoted} AUTO_INCREMENT = {int(max_id) + 1};"))
         conn.execute(text("SET FOREIGN_KEY_CHECKS=1;"))
 
+        # Los datos se insertaron sin pasar por la app: vaciar schema_version para que
+        # el próximo arranque vuelva a correr los pasos de esquema y los backfills
+        # (sort_at, índice de medidores, contadores).
+        conn.execute(SchemaVersion.__table__.delete())
+
         user_count = conn.execute(select(func.count()).select_from(User.__table__)).scalar_one()
         oi_count = conn.execute(select(func.count()).select_from(OI.__table__)).scalar_one()
         bancada_count = conn.execute(select(func.count()).select_from(Bancada.__table__)).scalar_one()
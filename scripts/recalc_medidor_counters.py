@@ -0,0 +1,51 @@
+"""Recalcula los contadores desnormalizados de medidores.
+
+- oi.medidores_usuario  = sum(bancada.rows) por OI
+- oi_code_total         = suma de medidores por código de OI
+
+Usar como reparación si los contadores quedaron desalineados
+(p.ej. tras editar la BD a mano o después de migrar SQLite -> MySQL).
+Usa la misma configuración de BD que la app (VI_DATABASE_URL / vi.db).
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+BACKEND_DIR = REPO_ROOT / "backend"
+
+# Asegura imports del paquete `app` (backend/app)
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from sqlmodel import Session  # noqa: E402
+
+from app.core.db import engine, init_db  # noqa: E402
+from app.services.medidor_counters import rebuild_counters  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--skip-init",
+        action="store_true",
+        help="No ejecutar init_db() antes de recalcular (la BD ya tiene el esquema actual).",
+    )
+    args = parser.parse_args()
+
+    if not args.skip_init:
+        init_db()
+
+    with Session(engine) as session:
+        oi_count, code_count = rebuild_counters(session)
+
+    print("Contadores recalculados.")
+    print(f"oi: {oi_count}")
+    print(f"oi_code_total: {code_count} códigos")
+
+
+if __name__ == "__main__":
+    main()